@@ -77,25 +77,39 @@ def log_request(user_id, endpoint, method, status_code, response_time_ms,
         cur.close()
         conn.close()
 
-def log_api_usage(user_id, endpoint, model, input_tokens, output_tokens):
+def log_api_usage(user_id, endpoint, model, input_tokens, output_tokens,
+                  cache_creation_tokens=0, cache_read_tokens=0):
     """
     Log Anthropic API usage for cost tracking.
+
+    input_tokens is the UNCACHED input only — the API reports prompt-cache
+    writes and reads as separate fields, so callers that set cache_control must
+    pass them here or the row undercounts (migrations/add_api_usage_cache_tokens.sql).
     """
     # Estimate cost based on model
     # Sonnet: $3/M input, $15/M output
     # Opus: $15/M input, $75/M output
+    # Cache writes bill at 1.25x the input rate, cache reads at 0.1x.
     if 'opus' in model.lower():
-        cost = (input_tokens * 15 / 1_000_000) + (output_tokens * 75 / 1_000_000)
+        input_rate, output_rate = 15, 75
     else:  # Sonnet
-        cost = (input_tokens * 3 / 1_000_000) + (output_tokens * 15 / 1_000_000)
+        input_rate, output_rate = 3, 15
+    cache_creation_tokens = cache_creation_tokens or 0
+    cache_read_tokens = cache_read_tokens or 0
+    cost = ((input_tokens * input_rate
+             + cache_creation_tokens * input_rate * 1.25
+             + cache_read_tokens * input_rate * 0.1
+             + output_tokens * output_rate) / 1_000_000)
     
     conn = get_db_connection()
     cur = conn.cursor()
     try:
         cur.execute("""
-            INSERT INTO api_usage (user_id, endpoint, model, input_tokens, output_tokens, estimated_cost_usd)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (user_id, endpoint, model, input_tokens, output_tokens, cost))
+            INSERT INTO api_usage (user_id, endpoint, model, input_tokens, output_tokens,
+                                   cache_creation_tokens, cache_read_tokens, estimated_cost_usd)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (user_id, endpoint, model, input_tokens, output_tokens,
+              cache_creation_tokens, cache_read_tokens, cost))
         conn.commit()
     except Exception as e:
         conn.rollback()
@@ -109,77 +123,65 @@ def log_api_usage(user_id, endpoint, model, input_tokens, output_tokens):
 # ============================================
 
 def get_dashboard_stats():
-    """Get overview stats for admin dashboard."""
+    """Get overview stats for admin dashboard.
+
+    Reads the rollups in stats_rollups.py (O(days) rows) instead of scanning
+    users / request_logs / api_usage / market_sales / ebay_sales. The "24h" /
+    "today" figures are the current UTC day, "week" the last 7 UTC days."""
+    import stats_rollups
+    rollup_state = stats_rollups.maybe_refresh()
     conn = get_db_connection()
     cur = conn.cursor()
     try:
         stats = {}
+        today = stats_rollups.utc_today()
+        week_start = today - timedelta(days=6)
+        month_start = today.replace(day=1)
+        days = stats_rollups.daily(
+            cur, ('users.new', 'requests', 'api.', 'market_sales.new'),
+            since=min(week_start, month_start))
+        ebay_days = stats_rollups.daily(cur, 'ebay_sales.new')     # all-time total
         
         # User stats
-        cur.execute("""
-            SELECT 
-                COUNT(*) as total_users,
-                COUNT(*) FILTER (WHERE is_approved = TRUE) as approved_users,
-                COUNT(*) FILTER (WHERE is_approved = FALSE AND is_admin = FALSE) as pending_users,
-                COUNT(*) FILTER (WHERE created_at > NOW() - INTERVAL '7 days') as new_users_week,
-                COUNT(*) FILTER (WHERE created_at > NOW() - INTERVAL '24 hours') as new_users_today
-            FROM users
-        """)
-        stats['users'] = dict(cur.fetchone())
+        users = stats_rollups.counters(cur, 'users.')
+        stats['users'] = {
+            'total_users': users.get('users.total', (0, 0))[0],
+            'approved_users': users.get('users.approved', (0, 0))[0],
+            'pending_users': users.get('users.pending', (0, 0))[0],
+            'new_users_week': stats_rollups.total(days, 'users.new', week_start)[0],
+            'new_users_today': stats_rollups.total(days, 'users.new', today)[0],
+        }
         
-        # Request stats (last 24 hours)
-        cur.execute("""
-            SELECT 
-                COUNT(*) as total_requests,
-                COUNT(*) FILTER (WHERE error_message IS NOT NULL) as failed_requests,
-                AVG(response_time_ms) as avg_response_time,
-                COUNT(DISTINCT user_id) as active_users
-            FROM request_logs
-            WHERE created_at > NOW() - INTERVAL '24 hours'
-        """)
-        row = cur.fetchone()
+        # Request stats (today, UTC)
+        timed_n, timed_ms = stats_rollups.total(days, 'requests.timed', today)
         stats['requests_24h'] = {
-            'total': row['total_requests'],
-            'failed': row['failed_requests'],
-            'avg_response_time_ms': round(row['avg_response_time'] or 0, 2),
-            'active_users': row['active_users']
+            'total': stats_rollups.total(days, 'requests', today)[0],
+            'failed': stats_rollups.total(days, 'requests.failed', today)[0],
+            'avg_response_time_ms': round(timed_ms / timed_n, 2) if timed_n else 0,
+            'active_users': stats_rollups.active_users(cur, today)
         }
         
         # API usage (current month)
-        cur.execute("""
-            SELECT 
-                COALESCE(SUM(input_tokens), 0) as total_input_tokens,
-                COALESCE(SUM(output_tokens), 0) as total_output_tokens,
-                COALESCE(SUM(estimated_cost_usd), 0) as total_cost,
-                COUNT(*) as api_calls
-            FROM api_usage
-            WHERE created_at > DATE_TRUNC('month', CURRENT_DATE)
-        """)
-        row = cur.fetchone()
+        api_calls, api_cost = stats_rollups.total(days, 'api.calls', month_start)
         stats['api_usage_month'] = {
-            'input_tokens': int(row['total_input_tokens']),
-            'output_tokens': int(row['total_output_tokens']),
-            'estimated_cost_usd': round(float(row['total_cost']), 4),
-            'api_calls': row['api_calls']
+            'input_tokens': int(stats_rollups.total(days, 'api.input_tokens', month_start)[1]),
+            'output_tokens': int(stats_rollups.total(days, 'api.output_tokens', month_start)[1]),
+            'estimated_cost_usd': round(api_cost, 4),
+            'api_calls': api_calls
         }
         
         # Sales stats (combined: market_sales + ebay_sales)
-        cur.execute("""
-            SELECT
-                (SELECT COUNT(*) FROM market_sales) + (SELECT COUNT(*) FROM ebay_sales) as total_sales,
-                (SELECT COUNT(*) FROM market_sales WHERE created_at > NOW() - INTERVAL '24 hours') +
-                (SELECT COUNT(*) FROM ebay_sales WHERE created_at > NOW() - INTERVAL '24 hours') as sales_today,
-                (SELECT COUNT(*) FROM market_sales) as market_count,
-                (SELECT COUNT(*) FROM ebay_sales) as ebay_count,
-                COALESCE((SELECT AVG(price) FROM market_sales), 0) as avg_price
-        """)
-        row = cur.fetchone()
+        market = stats_rollups.counters(cur, 'market_sales.')
+        market_count = market.get('market_sales.total', (0, 0))[0]
+        priced_n, priced_sum = market.get('market_sales.priced', (0, 0))
+        ebay_count = stats_rollups.total(ebay_days, 'ebay_sales.new')[0]
         stats['sales'] = {
-            'total': row['total_sales'],
-            'today': row['sales_today'],
-            'market_count': row['market_count'],
-            'ebay_count': row['ebay_count'],
-            'avg_price': round(float(row['avg_price']), 2)
+            'total': market_count + ebay_count,
+            'today': (stats_rollups.total(days, 'market_sales.new', today)[0]
+                      + stats_rollups.total(ebay_days, 'ebay_sales.new', today)[0]),
+            'market_count': market_count,
+            'ebay_count': ebay_count,
+            'avg_price': round(priced_sum / priced_n, 2) if priced_n else 0
         }
         
         # Beta codes
@@ -191,7 +193,9 @@ def get_dashboard_stats():
             FROM beta_codes
         """)
         stats['beta_codes'] = dict(cur.fetchone())
-        
+
+        # False → user/sales counters read zero until an admin rebuild.
+        stats['rollups_seeded'] = rollup_state['seeded']
         return stats
     finally:
         cur.close()
@@ -664,6 +668,8 @@ def get_anthropic_usage_summary(days=30):
                 endpoint,
                 SUM(input_tokens) as input_tokens,
                 SUM(output_tokens) as output_tokens,
+                SUM(cache_creation_tokens) as cache_creation_tokens,
+                SUM(cache_read_tokens) as cache_read_tokens,
                 SUM(estimated_cost_usd) as cost,
                 COUNT(*) as api_calls
             FROM api_usage
@@ -695,6 +701,8 @@ def get_anthropic_usage_summary(days=30):
             SELECT 
                 SUM(input_tokens) as total_input,
                 SUM(output_tokens) as total_output,
+                SUM(cache_creation_tokens) as total_cache_creation,
+                SUM(cache_read_tokens) as total_cache_read,
                 SUM(estimated_cost_usd) as total_cost,
                 COUNT(*) as total_calls
             FROM api_usage
@@ -707,6 +715,8 @@ def get_anthropic_usage_summary(days=30):
             'totals': {
                 'input_tokens': int(totals['total_input'] or 0),
                 'output_tokens': int(totals['total_output'] or 0),
+                'cache_creation_tokens': int(totals['total_cache_creation'] or 0),
+                'cache_read_tokens': int(totals['total_cache_read'] or 0),
                 'cost_usd': round(float(totals['total_cost'] or 0), 4),
                 'api_calls': totals['total_calls'] or 0
             },
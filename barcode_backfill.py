@@ -0,0 +1,384 @@
+"""
+Barcode backfill job for market_sales R2 images.
+
+POST /api/admin/backfill-barcodes used to do the whole thing inside the HTTP
+request: ≤500 rows, one serial requests.get per image, a base64 round trip
+only to feed scan_barcode_from_base64, a commit per UPDATE, and a full
+COUNT(*) … LIKE on every call. A backlog of tens of thousands of images meant
+hundreds of admin clicks, each racing the gunicorn timeout.
+
+Now the route starts (or resumes) a JOB and returns at once:
+
+- State lives in barcode_backfill_jobs (migrations/add_barcode_backfill_jobs.sql):
+  keyset cursor (last_id), counters, a heartbeat and the owning worker.
+- The runner is a daemon thread in the worker that took the job. Per batch of
+  BATCH_SIZE candidate rows (id > last_id, ORDER BY id — an index range scan,
+  no OFFSET) it downloads + scans on a pool of WORKERS threads (downloads are
+  I/O, pyzbar releases the GIL), then writes ONE transaction: the barcode
+  UPDATE via execute_values, the scanned-marker UPDATE, and the job's cursor /
+  counters. Results and cursor commit together, so a crash or deploy loses at
+  most one batch and never double-counts.
+- Only one job runs at a time (partial unique index on status = 'running').
+  A job whose heartbeat is older than STALE_AFTER_S (worker died, deploy) or
+  that failed is resumed from its cursor by the next POST, on any worker.
+  The per-batch job UPDATE is guarded by `worker = me`, so a worker that lost
+  the job rolls its batch back instead of writing alongside the new owner.
+- Rows scanned with no barcode get market_sales.barcode_scanned_at, so later
+  jobs skip them (they used to be re-downloaded on every call forever).
+  Download failures are NOT marked — the next job retries them.
+- COUNT(*) runs once per job (total at start) against the partial index;
+  progress / throughput / ETA come from the job row (GET …/status).
+
+dry_run: scans and reports, writes nothing to market_sales (and so marks
+nothing scanned); counters and cursor still advance so the job finishes.
+"""
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db as _dbpool
+
+BATCH_SIZE = int(os.environ.get('BARCODE_BACKFILL_BATCH', '50'))
+WORKERS = int(os.environ.get('BARCODE_BACKFILL_WORKERS', '4'))
+DOWNLOAD_TIMEOUT_S = 10
+STALE_AFTER_S = 300        # > worst-case batch: BATCH_SIZE / WORKERS × DOWNLOAD_TIMEOUT_S
+DETAILS_KEEP = 10
+
+# ⚠️ Must match the partial index in add_barcode_backfill_jobs.sql, or the
+# keyset scan falls back to a seq scan of market_sales.
+CANDIDATE_WHERE = """
+    image_url LIKE '%%.r2.dev%%'
+    AND upc_main IS NULL
+    AND barcode_scanned_at IS NULL
+"""
+
+JOB_COLUMNS = """
+    id, status, dry_run, max_rows, last_id, total, processed, barcodes_found,
+    updated, errors, details, run_seconds, worker, error,
+    started_at, heartbeat_at, finished_at
+"""
+
+_local = threading.local()
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# ── Scanning ────────────────────────────────────────────────────────────────
+
+def _session():
+    """One requests.Session per pool thread (keep-alive to R2; Session
+    objects are not safe to share across threads)."""
+    if not hasattr(_local, 'session'):
+        import requests
+        _local.session = requests.Session()
+    return _local.session
+
+
+def scan_row(row, scan_bytes):
+    """(id, 'found' | 'none' | 'error', barcode dict or None) for one row."""
+    try:
+        response = _session().get(row['image_url'], timeout=DOWNLOAD_TIMEOUT_S)
+        if response.status_code != 200:
+            print(f"[Backfill] sale {row['id']}: HTTP {response.status_code}")
+            return row['id'], 'error', None
+        barcode = scan_bytes(response.content)
+        return row['id'], ('found' if barcode else 'none'), barcode
+    except Exception as e:
+        print(f"[Backfill] Error processing sale {row['id']}: {e}")
+        return row['id'], 'error', None
+
+
+# ── Job lifecycle ───────────────────────────────────────────────────────────
+
+def _count_candidates(cur):
+    # Empty params still run psycopg2's interpolation, so '%%' → '%' exactly as
+    # in the keyset SELECT (the partial index predicate must match textually).
+    cur.execute(f"SELECT COUNT(*) AS n FROM market_sales WHERE {CANDIDATE_WHERE}", ())
+    return cur.fetchone()['n']
+
+
+def start_job(scan_bytes, dry_run=False, max_rows=None, restart=False):
+    """
+    Start a job, or resume the unfinished one, and run it on a daemon thread.
+    Returns (job dict, started: bool). started=False means another worker is
+    actively running it — nothing was changed.
+
+    restart=True cancels any unfinished job and starts a fresh one (its own
+    total and cursor); otherwise the unfinished job keeps its own dry_run /
+    max_rows and the new values are ignored.
+    """
+    import psycopg2
+
+    me = worker_id()
+    conn = _dbpool.get_db(dict_rows=True)
+    try:
+        cur = conn.cursor()
+        if restart:
+            cur.execute("""
+                UPDATE barcode_backfill_jobs
+                SET status = 'cancelled', finished_at = NOW()
+                WHERE status IN ('running', 'failed')
+            """)
+
+        cur.execute(f"""
+            SELECT {JOB_COLUMNS} FROM barcode_backfill_jobs
+            WHERE status IN ('running', 'failed')
+            ORDER BY id DESC LIMIT 1
+        """)
+        job = cur.fetchone()
+
+        if job:
+            # Take it over only if it failed or its owner stopped heartbeating.
+            cur.execute(f"""
+                UPDATE barcode_backfill_jobs
+                SET status = 'running', worker = %s, heartbeat_at = NOW(), error = NULL
+                WHERE id = %s
+                  AND (status = 'failed'
+                       OR heartbeat_at < NOW() - make_interval(secs => %s))
+                RETURNING {JOB_COLUMNS}
+            """, (me, job['id'], STALE_AFTER_S))
+            claimed = cur.fetchone()
+            conn.commit()
+            if not claimed:
+                return dict(job), False
+            job = claimed
+            print(f"[Backfill] resuming job {job['id']} at id > {job['last_id']} "
+                  f"({job['processed']}/{job['total']} done)")
+        else:
+            total = _count_candidates(cur)
+            try:
+                cur.execute(f"""
+                    INSERT INTO barcode_backfill_jobs
+                        (status, dry_run, max_rows, total, worker, heartbeat_at)
+                    VALUES ('running', %s, %s, %s, %s, NOW())
+                    RETURNING {JOB_COLUMNS}
+                """, (bool(dry_run), max_rows, total, me))
+                job = cur.fetchone()
+                conn.commit()
+            except psycopg2.IntegrityError:
+                # Another worker inserted the running job between our SELECT and INSERT.
+                conn.rollback()
+                return get_job(), False
+            print(f"[Backfill] job {job['id']} started: {total} candidates"
+                  f"{' (dry run)' if dry_run else ''}")
+    finally:
+        conn.close()
+
+    threading.Thread(target=run_job, args=(job['id'], scan_bytes),
+                     name=f"barcode-backfill-{job['id']}", daemon=True).start()
+    return dict(job), True
+
+
+def run_job(job_id, scan_bytes, batch_size=None, workers=None):
+    """Process batches until the job completes, is cancelled, or is taken
+    over. Never raises; a batch error marks the job 'failed' (resumable)."""
+    me = worker_id()
+    batch_size = batch_size or BATCH_SIZE
+    with ThreadPoolExecutor(max_workers=workers or WORKERS,
+                            thread_name_prefix='barcode-scan') as pool:
+        while True:
+            try:
+                if not _run_batch(job_id, me, scan_bytes, pool, batch_size):
+                    return
+            except Exception as e:
+                print(f"[Backfill] job {job_id} failed: {e}")
+                _fail(job_id, me, str(e))
+                return
+
+
+def _run_batch(job_id, me, scan_bytes, pool, batch_size):
+    """One batch. Returns False when the runner should stop."""
+    from psycopg2.extras import Json, execute_values
+
+    t0 = time.monotonic()
+    conn = _dbpool.get_db(dict_rows=True)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {JOB_COLUMNS} FROM barcode_backfill_jobs WHERE id = %s", (job_id,))
+        job = cur.fetchone()
+        if not job or job['status'] != 'running' or job['worker'] != me:
+            print(f"[Backfill] job {job_id} no longer ours "
+                  f"({job['status'] if job else 'missing'}) — stopping")
+            return False
+
+        limit = batch_size
+        if job['max_rows'] is not None:
+            limit = min(limit, job['max_rows'] - job['processed'])
+        rows = []
+        if limit > 0:
+            cur.execute(f"""
+                SELECT id, title, issue, image_url
+                FROM market_sales
+                WHERE {CANDIDATE_WHERE} AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (job['last_id'], limit))
+            rows = cur.fetchall()
+
+        if not rows:
+            cur.execute("""
+                UPDATE barcode_backfill_jobs
+                SET status = 'completed', finished_at = NOW(), heartbeat_at = NOW()
+                WHERE id = %s AND worker = %s
+            """, (job_id, me))
+            conn.commit()
+            print(f"[Backfill] job {job_id} completed: {job['processed']} processed, "
+                  f"{job['barcodes_found']} barcodes, {job['errors']} errors")
+            return False
+        conn.commit()       # don't hold a transaction open across the downloads
+
+        by_id = {r['id']: r for r in rows}
+        results = list(pool.map(lambda r: scan_row(r, scan_bytes), rows))
+        found = [(sid, b) for sid, outcome, b in results if outcome == 'found']
+        scanned_none = [sid for sid, outcome, _ in results if outcome == 'none']
+        errors = sum(1 for _, outcome, _ in results if outcome == 'error')
+
+        details = list(job['details'] or [])
+        for sid, b in found:
+            if len(details) >= DETAILS_KEEP:
+                break
+            details.append({
+                'id': sid,
+                'title': by_id[sid]['title'],
+                'issue': by_id[sid]['issue'],
+                'upc_main': b.get('upc_main'),
+                'upc_addon': b.get('upc_addon'),
+                'is_reprint': b.get('is_reprint', False),
+            })
+
+        if not job['dry_run']:
+            if found:
+                execute_values(cur, """
+                    UPDATE market_sales AS m
+                    SET upc_main = v.upc_main,
+                        upc_addon = v.upc_addon,
+                        is_reprint = v.is_reprint,
+                        barcode_scanned_at = NOW()
+                    FROM (VALUES %s) AS v(id, upc_main, upc_addon, is_reprint)
+                    WHERE m.id = v.id
+                """, [(sid, b.get('upc_main'), b.get('upc_addon'), bool(b.get('is_reprint', False)))
+                      for sid, b in found],
+                    template='(%s, %s::text, %s::text, %s::boolean)')
+            if scanned_none:
+                cur.execute("UPDATE market_sales SET barcode_scanned_at = NOW() WHERE id = ANY(%s)",
+                            (scanned_none,))
+
+        cur.execute("""
+            UPDATE barcode_backfill_jobs
+            SET last_id = %s,
+                processed = processed + %s,
+                barcodes_found = barcodes_found + %s,
+                updated = updated + %s,
+                errors = errors + %s,
+                details = %s,
+                run_seconds = run_seconds + %s,
+                heartbeat_at = NOW()
+            WHERE id = %s AND worker = %s AND status = 'running'
+        """, (rows[-1]['id'], len(rows), len(found), len(found), errors, Json(details),
+              time.monotonic() - t0, job_id, me))
+        if cur.rowcount != 1:
+            # Cancelled or taken over while we were scanning: drop this batch.
+            conn.rollback()
+            print(f"[Backfill] job {job_id} cancelled/taken over mid-batch — batch discarded")
+            return False
+        conn.commit()
+        print(f"[Backfill] job {job_id}: ids {rows[0]['id']}..{rows[-1]['id']} "
+              f"{len(found)} found, {len(scanned_none)} none, {errors} errors "
+              f"in {time.monotonic() - t0:.1f}s")
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _fail(job_id, me, message):
+    try:
+        conn = _dbpool.get_db()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE barcode_backfill_jobs
+                SET status = 'failed', error = %s, heartbeat_at = NOW()
+                WHERE id = %s AND worker = %s AND status = 'running'
+            """, (message[:500], job_id, me))
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"[Backfill] could not mark job {job_id} failed: {e}")
+
+
+def cancel_job(job_id):
+    """Stop a job after its current batch. True if it was unfinished."""
+    conn = _dbpool.get_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE barcode_backfill_jobs
+            SET status = 'cancelled', finished_at = NOW()
+            WHERE id = %s AND status IN ('running', 'failed')
+        """, (job_id,))
+        conn.commit()
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+# ── Status ──────────────────────────────────────────────────────────────────
+
+def get_job(job_id=None):
+    """Job row (latest when job_id is None) as a dict, or None."""
+    conn = _dbpool.get_db(dict_rows=True)
+    try:
+        cur = conn.cursor()
+        if job_id is None:
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM barcode_backfill_jobs ORDER BY id DESC LIMIT 1")
+        else:
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM barcode_backfill_jobs WHERE id = %s", (job_id,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def describe(job, now=None):
+    """JSON-ready job status with throughput and ETA."""
+    if not job:
+        return None
+    target = job['total'] if job['max_rows'] is None else min(job['total'], job['max_rows'])
+    remaining = max(0, target - job['processed'])
+    rate = job['processed'] / job['run_seconds'] if job['run_seconds'] else None
+    stale = False
+    if job['status'] == 'running' and job['heartbeat_at'] is not None:
+        from datetime import datetime, timezone
+        now = now or datetime.now(timezone.utc)
+        stale = (now - job['heartbeat_at']).total_seconds() > STALE_AFTER_S
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'stale': stale,             # running but heartbeat lost — POST again to resume
+        'dry_run': job['dry_run'],
+        'max_rows': job['max_rows'],
+        'total_at_start': job['total'],
+        'processed': job['processed'],
+        'barcodes_found': job['barcodes_found'],
+        'updated': job['updated'],
+        'errors': job['errors'],
+        'remaining': remaining,
+        'progress_pct': round(100.0 * job['processed'] / target, 1) if target else 100.0,
+        'rows_per_second': round(rate, 2) if rate else None,
+        'eta_seconds': round(remaining / rate) if rate and job['status'] == 'running' else None,
+        'cursor_id': job['last_id'],
+        'worker': job['worker'],
+        'error': job['error'],
+        'started_at': job['started_at'].isoformat() if job['started_at'] else None,
+        'heartbeat_at': job['heartbeat_at'].isoformat() if job['heartbeat_at'] else None,
+        'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None,
+        'details': job['details'] or [],
+    }
@@ -368,6 +368,11 @@ def decode_barcode(digits: str) -> dict:
     }
 
 
+# Bump on ANY change to EXTRACTION_PROMPT or the post-processing below that
+# changes what a successful extraction returns — it keys the vision result
+# cache (vision_result_cache.py), so stale results stop being served.
+EXTRACTION_PROMPT_VERSION = "2026-10-19.1"
+
 # Vision Guide prompt - JSON template FIRST for better compliance
 EXTRACTION_PROMPT = """Analyze this comic book image and extract information.
 
@@ -674,7 +679,7 @@ def _extraction_low_confidence(extracted):
 
 
 def extract_from_base64(base64_data: str, media_type: str = "image/jpeg",
-                        photo_type: str = "front", timings=None) -> dict:
+                        photo_type: str = "front", timings=None, cache=None) -> dict:
     """
     Extract comic information from a base64-encoded image.
 
@@ -685,6 +690,10 @@ def extract_from_base64(base64_data: str, media_type: str = "image/jpeg",
         timings: optional recorder (duck-typed .mark(name) / .note(**kw)) so
                  /api/extract can segment this function from the outside.
                  Defaults to a no-op, so every other caller is unaffected.
+        cache: optional result cache probe (duck-typed .lookup([b64]) /
+               .store(result), vision_result_cache.ResultCacheProbe). Looked up
+               on the NORMALIZED image, so a retry of the same photo skips the
+               barcode scan and every vision pass. Only successes are stored.
 
     Returns:
         dict with extracted fields or error. On success it also carries
@@ -731,6 +740,20 @@ def extract_from_base64(base64_data: str, media_type: str = "image/jpeg",
     except Exception as _e:
         t.note(dims='unmeasured:%s' % type(_e).__name__)
 
+    if cache is not None:
+        cached = cache.lookup([base64_data])
+        if cached is not None:
+            # No vision call was made: report zero cost, not the stored counts.
+            cached['input_tokens'] = 0
+            cached['output_tokens'] = 0
+            t.mark('barcode_done')
+            t.mark('vision1_done')
+            t.mark('vision_done')
+            t.mark('post_done')
+            t.note(barcode='cached', vision_calls=0, reread='cached',
+                   outcome_detail='cached_%s' % cached.get('cache_match'))
+            return cached
+
     # First, try to scan barcode with pyzbar (more reliable than vision)
     scanned_barcode = None
     barcode_state = 'miss'
@@ -877,7 +900,7 @@ def extract_from_base64(base64_data: str, media_type: str = "image/jpeg",
                 extracted['barcode_source'] = 'vision_unverified'
 
             t.mark('post_done')
-            return {
+            result = {
                 "success": True,
                 "extracted": extracted,
                 # Real counts, summed across every pass this request made — so a
@@ -885,6 +908,9 @@ def extract_from_base64(base64_data: str, media_type: str = "image/jpeg",
                 "input_tokens": in_tok,
                 "output_tokens": out_tok
             }
+            if cache is not None:
+                cache.store(result)
+            return result
         else:
             t.mark('post_done')
             t.note(outcome_detail='unparseable')
@@ -12,7 +12,11 @@ Setup:
 
 import os
 import base64
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
 # ============================================
@@ -72,6 +76,188 @@ except Exception as e:
 MODERATION_AVAILABLE = rekognition_client is not None
 
 
+# ============================================
+# VERDICT CACHE
+# ============================================
+# The same cover is moderated again and again: extract, then grade (every
+# photo), then registry, then marketplace — each a Rekognition round trip on
+# byte-identical input. Verdicts are cached by SHA-256 of the DECODED bytes
+# (not the base64 text: a data-URI prefix or line wrapping must not miss) plus
+# MODERATION_POLICY_KEY, so changing the threshold or either category list
+# invalidates every entry without a flush.
+#
+# Two tiers:
+#   - per-worker LRU, MODERATION_CACHE_MAX_ENTRIES verdicts (~0.5KB each)
+#   - Postgres moderation_verdicts (migrations/add_moderation_verdicts.sql),
+#     shared by every gunicorn worker. Expired rows and anything beyond
+#     MODERATION_CACHE_MAX_ROWS are swept every MODERATION_CACHE_SWEEP_EVERY
+#     writes.
+# Only real Rekognition verdicts are cached — never the fail-open result of an
+# outage or of moderation being unconfigured, which would otherwise outlive
+# the outage by the whole TTL.
+
+MODERATION_CACHE_ENABLED = os.environ.get('MODERATION_CACHE_ENABLED', '1') == '1'
+MODERATION_CACHE_TTL_HOURS = int(os.environ.get('MODERATION_CACHE_TTL_HOURS', '168'))
+MODERATION_CACHE_MAX_ENTRIES = int(os.environ.get('MODERATION_CACHE_MAX_ENTRIES', '2048'))
+MODERATION_CACHE_MAX_ROWS = int(os.environ.get('MODERATION_CACHE_MAX_ROWS', '200000'))
+MODERATION_CACHE_SWEEP_EVERY = 500
+
+MODERATION_POLICY_KEY = hashlib.sha256(json.dumps([
+    MODERATION_CONFIDENCE_THRESHOLD,
+    sorted(BLOCKED_CATEGORIES),
+    sorted(WARNING_CATEGORIES),
+]).encode()).hexdigest()[:16]
+
+_verdict_lock = threading.Lock()
+_verdicts = OrderedDict()   # digest -> (expires_at_epoch, result)
+_verdict_stats = {'lookups': 0, 'hits': 0, 'writes': 0}
+
+
+def image_digest(image_bytes):
+    """Cache key for a decoded image: full SHA-256 hex of the bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def _cache_get(digest):
+    now = time.time()
+    with _verdict_lock:
+        _verdict_stats['lookups'] += 1
+        entry = _verdicts.get(digest)
+        if entry and entry[0] > now:
+            _verdicts.move_to_end(digest)
+            _verdict_stats['hits'] += 1
+            return dict(entry[1])
+        if entry:
+            del _verdicts[digest]
+
+    if not os.environ.get('DATABASE_URL'):
+        return None
+    try:
+        import db as _dbpool
+        conn = _dbpool.get_db()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT result, EXTRACT(EPOCH FROM expires_at) FROM moderation_verdicts
+                WHERE digest = %s AND policy_key = %s AND expires_at > NOW()
+            """, (digest, MODERATION_POLICY_KEY))
+            row = cur.fetchone()
+            cur.close()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"[MODERATION] verdict cache lookup failed (treated as miss): {e}")
+        return None
+    if not row:
+        return None
+    result = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+    _cache_put_local(digest, result, float(row[1]))
+    with _verdict_lock:
+        _verdict_stats['hits'] += 1
+    return dict(result)
+
+
+def _cache_put_local(digest, result, expires_at):
+    with _verdict_lock:
+        _verdicts[digest] = (expires_at, result)
+        _verdicts.move_to_end(digest)
+        while len(_verdicts) > MODERATION_CACHE_MAX_ENTRIES:
+            _verdicts.popitem(last=False)
+
+
+def _cache_put(digest, result):
+    _cache_put_local(digest, result, time.time() + MODERATION_CACHE_TTL_HOURS * 3600)
+    with _verdict_lock:
+        _verdict_stats['writes'] += 1
+        sweep = _verdict_stats['writes'] % MODERATION_CACHE_SWEEP_EVERY == 0
+
+    if not os.environ.get('DATABASE_URL'):
+        return
+    conn = None
+    try:
+        import db as _dbpool
+        conn = _dbpool.get_db()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO moderation_verdicts (digest, policy_key, result, expires_at)
+            VALUES (%s, %s, %s, NOW() + make_interval(hours => %s))
+            ON CONFLICT (digest, policy_key) DO UPDATE
+                SET result = EXCLUDED.result, expires_at = EXCLUDED.expires_at
+        """, (digest, MODERATION_POLICY_KEY, json.dumps(result), MODERATION_CACHE_TTL_HOURS))
+        if sweep:
+            cur.execute("DELETE FROM moderation_verdicts WHERE expires_at <= NOW()")
+            cur.execute("""
+                DELETE FROM moderation_verdicts WHERE ctid IN (
+                    SELECT ctid FROM moderation_verdicts
+                    ORDER BY expires_at DESC OFFSET %s)
+            """, (MODERATION_CACHE_MAX_ROWS,))
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        print(f"[MODERATION] verdict cache store failed (non-fatal): {e}")
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def moderation_cache_stats():
+    """Per-worker counters: {'lookups', 'hits', 'writes', 'entries'}."""
+    with _verdict_lock:
+        return dict(_verdict_stats, entries=len(_verdicts))
+
+
+def clear_moderation_cache():
+    """Drop this worker's in-memory verdicts (the Postgres tier expires on its own)."""
+    with _verdict_lock:
+        _verdicts.clear()
+
+
+# ============================================
+# LOCAL STUB (tests / offline dev)
+# ============================================
+
+class StubRekognition:
+    """
+    Stand-in for the boto3 Rekognition client. Answers detect_moderation_labels
+    from `labels_by_digest` (image_digest → list of ModerationLabels dicts),
+    defaulting to no labels, and counts calls so a test can assert that a
+    repeat image never reached "the network".
+
+        stub = StubRekognition()
+        use_rekognition_client(stub)
+    """
+
+    def __init__(self, labels_by_digest=None):
+        self.labels_by_digest = labels_by_digest or {}
+        self.calls = 0
+
+    def detect_moderation_labels(self, Image, MinConfidence=0):
+        self.calls += 1
+        labels = self.labels_by_digest.get(image_digest(Image['Bytes']), [])
+        return {'ModerationLabels': [l for l in labels
+                                     if l.get('Confidence', 0) >= MinConfidence]}
+
+
+def use_rekognition_client(client):
+    """Swap the Rekognition client (a StubRekognition in tests). None disables moderation."""
+    global rekognition_client, MODERATION_AVAILABLE
+    rekognition_client = client
+    MODERATION_AVAILABLE = client is not None
+
+
+if os.environ.get('MODERATION_STUB') == '1' and not MODERATION_AVAILABLE:
+    use_rekognition_client(StubRekognition())
+    print("[MODERATION] MODERATION_STUB=1 - using local stub (every image passes)")
+
+
 # ============================================
 # CORE MODERATION FUNCTION
 # ============================================
@@ -110,7 +296,17 @@ def moderate_image(image_base64):
         
         # Decode base64 to bytes
         image_bytes = base64.b64decode(image_data)
-        
+
+        # Verdict cache — a repeat of these exact bytes skips Rekognition.
+        digest = image_digest(image_bytes) if MODERATION_CACHE_ENABLED else None
+        if digest:
+            cached = _cache_get(digest)
+            if cached is not None:
+                cached['cached'] = True
+                if cached.get('blocked'):
+                    print(f"[MODERATION] BLOCKED (cached verdict): {cached.get('reason')}")
+                return cached
+
         # Call Rekognition
         response = rekognition_client.detect_moderation_labels(
             Image={'Bytes': image_bytes},
@@ -152,24 +348,28 @@ def moderate_image(image_base64):
             # Image is blocked
             primary_reason = blocked_labels[0]['name']
             print(f"[MODERATION] BLOCKED: {primary_reason} (confidence: {blocked_labels[0]['confidence']}%)")
-            return {
+            result = {
                 'allowed': False,
                 'blocked': True,
                 'reason': f'Image contains inappropriate content ({primary_reason})',
                 'labels': blocked_labels,
                 'warnings': warning_labels
             }
-        
-        if warning_labels:
-            print(f"[MODERATION] WARNING (allowed): {[w['name'] for w in warning_labels]}")
-        
-        return {
-            'allowed': True,
-            'blocked': False,
-            'reason': None,
-            'labels': blocked_labels,
-            'warnings': warning_labels
-        }
+        else:
+            if warning_labels:
+                print(f"[MODERATION] WARNING (allowed): {[w['name'] for w in warning_labels]}")
+
+            result = {
+                'allowed': True,
+                'blocked': False,
+                'reason': None,
+                'labels': blocked_labels,
+                'warnings': warning_labels
+            }
+
+        if digest:
+            _cache_put(digest, result)
+        return result
         
     except Exception as e:
         # If Rekognition fails, log error but allow the image through
@@ -237,7 +437,9 @@ def log_moderation_incident(user_id, endpoint, result, image_hash=None):
 
 
 def get_image_hash(image_base64):
-    """Generate a SHA256 hash of the image for logging (not the image itself)."""
+    """Generate a SHA256 hash of the image for logging (not the image itself).
+    ⚠️ Hashes the base64 TEXT, truncated — fine for incident dedup, but not the
+    verdict-cache key (image_digest over the decoded bytes)."""
     import hashlib
     if ',' in image_base64:
         image_base64 = image_base64.split(',')[1]
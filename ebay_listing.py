@@ -4,6 +4,11 @@ Creates listings on eBay using the Inventory API.
 """
 
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
 import requests
 from ebay_oauth import get_user_token, is_sandbox_mode
 
@@ -19,6 +24,24 @@ COMIC_CATEGORY_ID = "259104"
 # Hosted on our Cloudflare Pages frontend
 PLACEHOLDER_IMAGE_URL = "https://slabworthy.com/images/placeholder.png"
 
+# Every eBay call carries a timeout — (connect, read) seconds. Before this the
+# createImageFromUrl POST had none, so one stuck upload hung the request until
+# the gunicorn worker timeout.
+EBAY_HTTP_TIMEOUT = (5, 30)
+
+# Photos are ingested concurrently (createImageFromUrl is a slow eBay-side
+# fetch, ~1-3s each): a 4-photo listing costs one upload's latency, not four.
+IMAGE_UPLOAD_WORKERS = int(os.environ.get('EBAY_IMAGE_UPLOAD_WORKERS', '4'))
+
+# Merchant location + business policy IDs almost never change, but each listing
+# used to re-read them (4 account-API GETs). Cached per user for
+# ACCOUNT_CACHE_TTL_S; any offer/publish error drops the entry so the next
+# attempt re-reads them (user edited policies in Seller Hub, reconnected a
+# different eBay account, ...). Only complete results are cached.
+ACCOUNT_CACHE_TTL_S = float(os.environ.get('EBAY_ACCOUNT_CACHE_TTL_S', '3600'))
+_account_cache = {}        # user_id → (expires_monotonic, location_key, policies)
+_account_cache_lock = threading.Lock()
+
 # Grade to eBay condition mapping (using Inventory API enum values)
 GRADE_TO_CONDITION = {
     'MT': 'LIKE_NEW',
@@ -90,7 +113,7 @@ def upload_image_to_ebay(access_token: str, image_url_or_bytes, filename: str =
         print(f"Calling eBay createImageFromUrl:")
         print(f"  URL: {create_url}")
         print(f"  imageUrl: {source_url[:80]}...")
-        response = requests.post(create_url, headers=headers, json=body)
+        response = requests.post(create_url, headers=headers, json=body, timeout=EBAY_HTTP_TIMEOUT)
 
         if response.status_code == 201:
             # Success — response body contains imageUrl (EPS URL) directly
@@ -114,7 +137,7 @@ def upload_image_to_ebay(access_token: str, image_url_or_bytes, filename: str =
                 get_response = requests.get(get_url, headers={
                     'Authorization': f'Bearer {access_token}',
                     'Accept': 'application/json'
-                })
+                }, timeout=EBAY_HTTP_TIMEOUT)
                 if get_response.status_code == 200:
                     eps_url = get_response.json().get('imageUrl')
                     if eps_url:
@@ -136,6 +159,33 @@ def upload_image_to_ebay(access_token: str, image_url_or_bytes, filename: str =
         print(f"Image upload error: {e}")
         return {'success': False, 'error': str(e)}
 
+def is_ebay_hosted(url: str) -> bool:
+    """True for eBay Picture Services URLs (already uploaded)."""
+    host = urlparse(url or '').hostname or ''
+    return host.endswith('ebayimg.com')
+
+
+def upload_images_to_ebay(access_token: str, image_urls: list, max_workers: int = None) -> list:
+    """
+    Upload several images concurrently (bounded by IMAGE_UPLOAD_WORKERS).
+
+    Returns one upload_image_to_ebay result dict per input URL, in input order.
+    URLs already hosted on eBay are passed through without a call.
+    """
+    def one(url):
+        if is_ebay_hosted(url):
+            return {'success': True, 'image_url': url}
+        return upload_image_to_ebay(access_token, url)
+
+    if not image_urls:
+        return []
+    workers = max(1, min(max_workers or IMAGE_UPLOAD_WORKERS, len(image_urls)))
+    if workers == 1:
+        return [one(url) for url in image_urls]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ebay-img') as pool:
+        return list(pool.map(one, image_urls))
+
+
 def get_api_url():
     """Get the appropriate eBay API URL based on sandbox mode."""
     return EBAY_SANDBOX_API_URL if is_sandbox_mode() else EBAY_API_URL
@@ -162,7 +212,7 @@ def get_or_create_merchant_location(access_token: str) -> str:
     # Try to get existing locations
     try:
         locations_url = f"{api_url}/sell/inventory/v1/location"
-        response = requests.get(locations_url, headers=headers)
+        response = requests.get(locations_url, headers=headers, timeout=EBAY_HTTP_TIMEOUT)
         
         if response.status_code == 200:
             data = response.json()
@@ -190,7 +240,8 @@ def get_or_create_merchant_location(access_token: str) -> str:
             "merchantLocationStatus": "ENABLED"
         }
         
-        create_response = requests.post(create_url, headers=headers, json=location_data)
+        create_response = requests.post(create_url, headers=headers, json=location_data,
+                                        timeout=EBAY_HTTP_TIMEOUT)
         
         if create_response.status_code in [200, 201, 204]:
             print(f"Created merchant location: {location_key}")
@@ -198,7 +249,8 @@ def get_or_create_merchant_location(access_token: str) -> str:
         else:
             print(f"Failed to create location: {create_response.status_code} - {create_response.text}")
             # Try with PUT instead (eBay API quirk)
-            create_response = requests.put(create_url, headers=headers, json=location_data)
+            create_response = requests.put(create_url, headers=headers, json=location_data,
+                                           timeout=EBAY_HTTP_TIMEOUT)
             if create_response.status_code in [200, 201, 204]:
                 print(f"Created merchant location with PUT: {location_key}")
                 return location_key
@@ -237,7 +289,7 @@ def get_or_create_listing_policies(access_token: str) -> dict:
     try:
         # Get fulfillment policies
         fulfillment_url = f"{api_url}/sell/account/v1/fulfillment_policy?marketplace_id=EBAY_US"
-        response = requests.get(fulfillment_url, headers=headers)
+        response = requests.get(fulfillment_url, headers=headers, timeout=EBAY_HTTP_TIMEOUT)
         print(f"Get fulfillment response: {response.status_code}")
         
         if response.status_code == 200:
@@ -249,7 +301,7 @@ def get_or_create_listing_policies(access_token: str) -> dict:
         
         # Get payment policies
         payment_url = f"{api_url}/sell/account/v1/payment_policy?marketplace_id=EBAY_US"
-        response = requests.get(payment_url, headers=headers)
+        response = requests.get(payment_url, headers=headers, timeout=EBAY_HTTP_TIMEOUT)
         print(f"Get payment response: {response.status_code}")
         
         if response.status_code == 200:
@@ -261,7 +313,7 @@ def get_or_create_listing_policies(access_token: str) -> dict:
         
         # Get return policies
         return_url = f"{api_url}/sell/account/v1/return_policy?marketplace_id=EBAY_US"
-        response = requests.get(return_url, headers=headers)
+        response = requests.get(return_url, headers=headers, timeout=EBAY_HTTP_TIMEOUT)
         print(f"Get return response: {response.status_code}")
         
         if response.status_code == 200:
@@ -283,6 +335,32 @@ def get_or_create_listing_policies(access_token: str) -> dict:
         return policies
 
 
+def get_listing_setup(user_id: str, access_token: str):
+    """
+    (merchant_location_key, policies) for the user, from the per-user cache
+    when fresh, else from eBay's account APIs. Either may be incomplete on
+    failure; incomplete results are not cached.
+    """
+    now = time.monotonic()
+    with _account_cache_lock:
+        hit = _account_cache.get(user_id)
+    if hit and hit[0] > now:
+        return hit[1], dict(hit[2])
+
+    location_key = get_or_create_merchant_location(access_token)
+    policies = get_or_create_listing_policies(access_token)
+    if location_key and all(policies.values()):
+        with _account_cache_lock:
+            _account_cache[user_id] = (now + ACCOUNT_CACHE_TTL_S, location_key, dict(policies))
+    return location_key, policies
+
+
+def invalidate_listing_setup(user_id: str):
+    """Forget the user's cached location / policy IDs (after an eBay error)."""
+    with _account_cache_lock:
+        _account_cache.pop(user_id, None)
+
+
 def create_listing(user_id: str, title: str, issue: str, price: float, grade: str = 'VF',
                     description: str = None, publish: bool = False, image_urls: list = None,
                     listing_format: str = 'FIXED_PRICE', auction_duration: str = 'DAYS_7',
@@ -299,7 +377,8 @@ def create_listing(user_id: str, title: str, issue: str, price: float, grade: st
         grade: Comic grade (NM, VF, FN, etc.)
         description: User-approved listing description (HTML)
         publish: If True, publish immediately (live). If False, create as draft (default)
-        image_urls: List of eBay-hosted image URLs. If None, uses placeholder.
+        image_urls: List of image URLs. eBay-hosted URLs are used as-is; public
+            (R2) URLs are uploaded to eBay concurrently first. If None, uses placeholder.
         listing_format: 'FIXED_PRICE' or 'AUCTION' (default: FIXED_PRICE)
         auction_duration: Duration for auctions - DAYS_1, DAYS_3, DAYS_5, DAYS_7, DAYS_10 (default: DAYS_7)
         start_price: Starting bid price for auctions (defaults to price if not set)
@@ -362,7 +441,6 @@ def create_listing(user_id: str, title: str, issue: str, price: float, grade: st
         """
     
     # Create inventory item SKU (with timestamp to ensure uniqueness)
-    import time
     timestamp = int(time.time())
     sku = f"CC-{title.replace(' ', '-')[:15]}-{issue}-{timestamp}"
     
@@ -374,6 +452,28 @@ def create_listing(user_id: str, title: str, issue: str, price: float, grade: st
     }
     
     try:
+        # Step 0: photos + account setup, concurrently. Photo uploads and the
+        # location/policy lookup (usually a cache hit) are independent, so
+        # the slowest of them sets the latency instead of their sum.
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='ebay-list') as pool:
+            images_future = pool.submit(upload_images_to_ebay, access_token, image_urls or [])
+            setup_future = pool.submit(get_listing_setup, user_id, access_token)
+            image_results = images_future.result()
+            location_key, policies = setup_future.result()
+
+        if image_urls:
+            image_urls = [r['image_url'] for r in image_results
+                          if r.get('success') and r.get('image_url')]
+            failed = len(image_results) - len(image_urls)
+            if failed:
+                print(f"{failed} of {len(image_results)} photo(s) failed to upload to eBay")
+            if not image_urls:
+                return {
+                    'success': False,
+                    'error': 'Could not upload photos to eBay. Please try again.',
+                    'image_errors': [r.get('error') for r in image_results]
+                }
+
         # Step 1: Create or update inventory item (with image!)
         inventory_url = f"{api_url}/sell/inventory/v1/inventory_item/{sku}"
         
@@ -410,7 +510,8 @@ def create_listing(user_id: str, title: str, issue: str, price: float, grade: st
         }
         
         print(f"Creating inventory item: {sku}")
-        inv_response = requests.put(inventory_url, headers=headers, json=inventory_data)
+        inv_response = requests.put(inventory_url, headers=headers, json=inventory_data,
+                                    timeout=EBAY_HTTP_TIMEOUT)
         
         if inv_response.status_code not in [200, 201, 204]:
             error_detail = inv_response.text
@@ -423,18 +524,15 @@ def create_listing(user_id: str, title: str, issue: str, price: float, grade: st
         
         print(f"Inventory item created successfully")
         
-        # Step 2: Get or create merchant location
-        location_key = get_or_create_merchant_location(access_token)
+        # Step 2: Merchant location (resolved in step 0)
         if not location_key:
             return {
                 'success': False,
                 'error': 'Could not set up merchant location. Please try again.'
             }
-        print(f"Created merchant location: {location_key}")
-        
-        # Step 3: Get or create listing policies
-        policies = get_or_create_listing_policies(access_token)
+        print(f"Using merchant location: {location_key}")
         
+        # Step 3: Listing policies (resolved in step 0)
         # Check if we have all required policies
         if not all([policies.get('fulfillmentPolicyId'), policies.get('paymentPolicyId'), policies.get('returnPolicyId')]):
             missing = [k.replace('PolicyId', '') for k, v in policies.items() if not v]
@@ -512,11 +610,14 @@ def create_listing(user_id: str, title: str, issue: str, price: float, grade: st
             offer_data["listingDuration"] = duration
         
         print(f"Creating offer with policies: {policies}")
-        offer_response = requests.post(offer_url, headers=headers, json=offer_data)
+        offer_response = requests.post(offer_url, headers=headers, json=offer_data,
+                                       timeout=EBAY_HTTP_TIMEOUT)
         
         if offer_response.status_code not in [200, 201]:
             error_detail = offer_response.text
             print(f"Offer creation failed: {offer_response.status_code} - {error_detail}")
+            # The cached location/policy IDs may be what eBay rejected.
+            invalidate_listing_setup(user_id)
             
             # Check if it's a policy error - common for new sellers
             if 'policy' in error_detail.lower() or 'fulfillment' in error_detail.lower():
@@ -541,11 +642,12 @@ def create_listing(user_id: str, title: str, issue: str, price: float, grade: st
             publish_url = f"{api_url}/sell/inventory/v1/offer/{offer_id}/publish"
             
             print(f"Publishing offer: {offer_id}")
-            publish_response = requests.post(publish_url, headers=headers)
+            publish_response = requests.post(publish_url, headers=headers, timeout=EBAY_HTTP_TIMEOUT)
             
             if publish_response.status_code not in [200, 201]:
                 error_detail = publish_response.text
                 print(f"Publish failed: {publish_response.status_code} - {error_detail}")
+                invalidate_listing_setup(user_id)
                 return {
                     'success': False,
                     'error': f'Created draft but failed to publish: {error_detail}',
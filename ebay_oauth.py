@@ -6,6 +6,8 @@ Handles user authentication and token management for eBay API access.
 import os
 import json
 import base64
+import threading
+import time
 import requests
 from datetime import datetime, timedelta
 from urllib.parse import urlencode
@@ -47,8 +49,86 @@ def get_db_connection():
         print(f"Database connection error: {e}")
         return None
 
+# ── Access-token cache ──
+# get_user_token used to run the CREATE TABLE DDL and open a DB connection on
+# EVERY call, and when a token was near expiry every concurrent listing request
+# for that user called refresh_access_token itself and raced on
+# save_user_token. Now:
+#   · the DDL runs once per process (wsgi calls init_ebay_tokens_table at boot;
+#     _ensure_tokens_table is the lazy fallback if that failed)
+#   · a per-process cache holds each user's access token until
+#     TOKEN_REFRESH_MARGIN before expiry — a hit touches neither DB nor eBay
+#   · misses are SINGLE-FLIGHT per user: one thread reads the row / refreshes /
+#     saves while the others wait on the user's lock, then read the cache.
+#     Inside the flight the DB row is re-read first, so a token another worker
+#     already refreshed is picked up instead of refreshed again.
+# Entries also expire after TOKEN_CACHE_TTL_S, so a disconnect / GDPR delete
+# handled by another worker stops being served here within minutes.
+# Across workers refreshes are not coordinated — eBay user refresh tokens are
+# long-lived and not rotated on use, so two workers refreshing at once both get
+# valid access tokens; the last save wins harmlessly.
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+TOKEN_CACHE_TTL_S = float(os.environ.get('EBAY_TOKEN_CACHE_TTL_S', '300'))
+REFRESH_FAILURE_BACKOFF_S = 30     # don't hammer eBay when a refresh is failing
+TOKEN_CACHE_MAX_USERS = 5000
+
+_tokens_table_ready = False        # one-time-per-process DDL guard
+_token_cache = {}                  # user_id → (access_token, token_expiry, cached_until)
+_refresh_failed = {}               # user_id → monotonic time of last failed refresh
+_token_cache_lock = threading.Lock()
+_user_locks = {}                   # user_id → [lock, waiters]
+
+
+def _cache_token(user_id, access_token, token_expiry):
+    with _token_cache_lock:
+        if len(_token_cache) >= TOKEN_CACHE_MAX_USERS:
+            _token_cache.clear()
+        _token_cache[user_id] = (access_token, token_expiry,
+                                 time.monotonic() + TOKEN_CACHE_TTL_S)
+        _refresh_failed.pop(user_id, None)
+
+
+def _cached_token(user_id):
+    with _token_cache_lock:
+        hit = _token_cache.get(user_id)
+    if not hit or not hit[0] or time.monotonic() >= hit[2]:
+        return None
+    if hit[1] is None or datetime.now() < hit[1] - TOKEN_REFRESH_MARGIN:
+        return hit[0]
+    return None
+
+
+def forget_user_token(user_id: str):
+    """Drop the user's cached access token in this worker (disconnect,
+    GDPR delete, reconnect)."""
+    with _token_cache_lock:
+        _token_cache.pop(str(user_id), None)
+        _refresh_failed.pop(str(user_id), None)
+
+
+def _user_lock(user_id):
+    with _token_cache_lock:
+        entry = _user_locks.setdefault(user_id, [threading.Lock(), 0])
+        entry[1] += 1
+    return entry
+
+
+def _release_user_lock(user_id, entry):
+    with _token_cache_lock:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _user_locks.pop(user_id, None)
+
+
+def _ensure_tokens_table():
+    if not _tokens_table_ready:
+        init_ebay_tokens_table()
+
+
 def init_ebay_tokens_table():
-    """Create table for storing eBay OAuth tokens."""
+    """Create table for storing eBay OAuth tokens. Called once at boot (wsgi);
+    sets the per-process guard so request paths skip the DDL."""
+    global _tokens_table_ready
     conn = get_db_connection()
     if not conn:
         return False
@@ -70,6 +150,7 @@ def init_ebay_tokens_table():
         conn.commit()
         cursor.close()
         conn.close()
+        _tokens_table_ready = True
         return True
     except Exception as e:
         print(f"Error creating ebay_tokens table: {e}")
@@ -218,7 +299,7 @@ def save_user_token(user_id: str, token_data: dict) -> bool:
     Returns:
         True if successful
     """
-    init_ebay_tokens_table()
+    _ensure_tokens_table()
     
     conn = get_db_connection()
     if not conn:
@@ -251,6 +332,10 @@ def save_user_token(user_id: str, token_data: dict) -> bool:
         conn.commit()
         cursor.close()
         conn.close()
+        if token_data.get('access_token'):
+            _cache_token(str(user_id), token_data['access_token'], expiry_time)
+        else:
+            forget_user_token(user_id)
         return True
     except Exception as e:
         print(f"Error saving eBay token: {e}")
@@ -264,13 +349,36 @@ def get_user_token(user_id: str) -> dict:
     """
     Get user's eBay access token, refreshing if expired.
     
+    Served from the per-process token cache until shortly before expiry;
+    misses and refreshes are single-flight per user (see the cache notes above).
+    
     Args:
         user_id: Unique identifier for the user
     
     Returns:
         Dict with access_token, or None if not found/authenticated
     """
-    init_ebay_tokens_table()
+    user_id = str(user_id)
+    access_token = _cached_token(user_id)
+    if access_token:
+        return {'access_token': access_token}
+
+    entry = _user_lock(user_id)
+    try:
+        with entry[0]:
+            # Another thread may have loaded / refreshed while we waited.
+            access_token = _cached_token(user_id)
+            if access_token:
+                return {'access_token': access_token}
+            return _load_or_refresh_token(user_id)
+    finally:
+        _release_user_lock(user_id, entry)
+
+
+def _load_or_refresh_token(user_id):
+    """Read the token row and refresh it if it is near expiry. Caller holds
+    the user's lock."""
+    _ensure_tokens_table()
     
     conn = get_db_connection()
     if not conn:
@@ -287,27 +395,6 @@ def get_user_token(user_id: str) -> dict:
         row = cursor.fetchone()
         cursor.close()
         conn.close()
-        
-        if not row:
-            return None
-        
-        access_token, refresh_token, token_expiry = row
-        
-        # Check if token is expired (with 5 min buffer)
-        if token_expiry and datetime.now() > (token_expiry - timedelta(minutes=5)):
-            # Token expired, try to refresh
-            if refresh_token:
-                try:
-                    new_token_data = refresh_access_token(refresh_token)
-                    save_user_token(user_id, new_token_data)
-                    return {'access_token': new_token_data.get('access_token')}
-                except Exception as e:
-                    print(f"Failed to refresh token: {e}")
-                    return None
-            else:
-                return None
-        
-        return {'access_token': access_token}
     except Exception as e:
         print(f"Error getting eBay token: {e}")
         try:
@@ -315,6 +402,35 @@ def get_user_token(user_id: str) -> dict:
         except:
             pass
         return None
+        
+    if not row:
+        return None
+    
+    access_token, refresh_token, token_expiry = row
+    
+    # Check if token is expired (with 5 min buffer)
+    if not token_expiry or datetime.now() <= token_expiry - TOKEN_REFRESH_MARGIN:
+        _cache_token(user_id, access_token, token_expiry)
+        return {'access_token': access_token}
+
+    # Token expired, try to refresh
+    if not refresh_token:
+        return None
+    with _token_cache_lock:
+        failed_at = _refresh_failed.get(user_id)
+    if failed_at and time.monotonic() - failed_at < REFRESH_FAILURE_BACKOFF_S:
+        return None
+    try:
+        new_token_data = refresh_access_token(refresh_token)
+    except Exception as e:
+        print(f"Failed to refresh token: {e}")
+        with _token_cache_lock:
+            _refresh_failed[user_id] = time.monotonic()
+        return None
+    # save_user_token caches the new token; if the save fails the token is
+    # still good for this request, just not cached.
+    save_user_token(user_id, new_token_data)
+    return {'access_token': new_token_data.get('access_token')}
 
 def is_user_connected(user_id: str) -> bool:
     """Check if user has a valid eBay connection."""
@@ -323,6 +439,7 @@ def is_user_connected(user_id: str) -> bool:
 
 def disconnect_user(user_id: str) -> bool:
     """Remove user's eBay connection."""
+    forget_user_token(user_id)
     conn = get_db_connection()
     if not conn:
         return False
@@ -331,6 +448,7 @@ def disconnect_user(user_id: str) -> bool:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM ebay_tokens WHERE user_id = %s', (user_id,))
         conn.commit()
+        forget_user_token(user_id)
         cursor.close()
         conn.close()
         return True
@@ -414,10 +532,13 @@ def delete_user_by_ebay_id(ebay_user_id: str) -> bool:
             return False
         
         # Delete the user's tokens
-        cursor.execute('DELETE FROM ebay_tokens WHERE ebay_username = %s', (ebay_user_id,))
-        deleted_count = cursor.rowcount
+        cursor.execute('DELETE FROM ebay_tokens WHERE ebay_username = %s RETURNING user_id', (ebay_user_id,))
+        deleted_users = [r[0] for r in cursor.fetchall()]
+        deleted_count = len(deleted_users)
         
         conn.commit()
+        for deleted_user in deleted_users:
+            forget_user_token(deleted_user)
         cursor.close()
         conn.close()
         
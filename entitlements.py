@@ -0,0 +1,135 @@
+"""
+Entitlement snapshot: one users-row read shared by every plan/cap gate.
+
+Before this, each gate read the users row on its own — check_feature_access
+(via get_user_plan, plus a COUNT(*) over comic_registry for the registration
+cap), daily_scan_cap, get_signature_id_entitlement, the grading cap check and
+its usage re-read, /my-plan. One grading request touched the row 3 times, an
+extra-photo upload twice.
+
+get_entitlements(user_id) returns a dict with everything those gates read:
+
+    plan, subscription_status, billing_period, current_period_end,
+    stripe_customer_id, stripe_subscription_id, is_admin,
+    valuations_this_month / _reset_date, gradings_this_month / _reset_date,
+    sig_checks_this_month / _reset_date, registrations (active count)
+
+Two cache layers:
+- Request: stored on flask.g, so every gate in one request shares one read.
+- Process: per-worker dict with a short TTL (ENTITLEMENT_CACHE_TTL_S, 20s), so
+  a page that fires /my-plan, /check-feature and a vision scan back to back
+  reads the row once.
+
+fresh=True skips the process cache (still at most one extra read per
+request). ⚠️ Gates that compare a COUNTER against a cap (grading, signature ID,
+registrations, valuations) must pass fresh=True — another worker may have
+incremented it within the TTL. Plan / status / admin gates may use the cache.
+
+Invalidation: invalidate(user_id) after anything that changes the row or the
+registration count — update_user_subscription (every Stripe webhook path),
+counter increments/resets, registration and status changes. It only clears
+THIS worker's process cache; other workers converge within the TTL, which is
+why counter gates read fresh.
+
+Errors propagate (never cached): get_user_plan keeps failing OPEN to a free
+plan, get_signature_id_entitlement keeps failing CLOSED — each caller's own
+policy, unchanged.
+"""
+import os
+import threading
+import time
+
+import db as _dbpool
+
+CACHE_TTL_S = float(os.environ.get('ENTITLEMENT_CACHE_TTL_S', '20'))
+CACHE_MAX_USERS = 10000
+
+_lock = threading.Lock()
+_cache = {}           # user_id → (expires_monotonic, snapshot)
+
+_G_ATTR = '_entitlements'   # flask.g: {user_id: (snapshot, fresh)}
+
+
+def _load(user_id):
+    conn = _dbpool.get_db(dict_rows=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT plan, stripe_customer_id, stripe_subscription_id,
+                   subscription_status, billing_period, current_period_end,
+                   valuations_this_month, valuations_reset_date,
+                   gradings_this_month, gradings_reset_date,
+                   sig_checks_this_month, sig_checks_reset_date,
+                   COALESCE(is_admin, FALSE) AS is_admin,
+                   (SELECT COUNT(*) FROM comic_registry cr
+                    WHERE cr.user_id = u.id AND cr.status = 'active') AS registrations
+            FROM users u
+            WHERE u.id = %s
+        """, (user_id,))
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+def _request_store():
+    """flask.g's snapshot dict, or None outside a request context."""
+    try:
+        from flask import g
+        store = getattr(g, _G_ATTR, None)
+        if store is None:
+            store = {}
+            setattr(g, _G_ATTR, store)
+        return store
+    except RuntimeError:
+        return None
+
+
+def get_entitlements(user_id, fresh=False):
+    """The user's snapshot dict (None if the user doesn't exist). Treat it as
+    read-only — it is shared by every gate in the request. Raises on DB error."""
+    store = _request_store()
+    if store is not None and user_id in store:
+        snapshot, was_fresh = store[user_id]
+        if was_fresh or not fresh:
+            return snapshot
+
+    snapshot = None
+    now = time.monotonic()
+    if not fresh:
+        with _lock:
+            hit = _cache.get(user_id)
+        if hit and hit[0] > now:
+            snapshot = hit[1]
+            loaded_fresh = False
+
+    if snapshot is None:
+        snapshot = _load(user_id)
+        loaded_fresh = True
+        with _lock:
+            if len(_cache) >= CACHE_MAX_USERS:
+                _cache.clear()
+            if snapshot is not None:
+                _cache[user_id] = (now + CACHE_TTL_S, snapshot)
+            else:
+                _cache.pop(user_id, None)
+
+    if store is not None:
+        store[user_id] = (snapshot, loaded_fresh)
+    return snapshot
+
+
+def invalidate(user_id):
+    """Forget the user's snapshot in this worker and this request."""
+    with _lock:
+        _cache.pop(user_id, None)
+    store = _request_store()
+    if store is not None:
+        store.pop(user_id, None)
+
+
+def clear():
+    """Drop every cached snapshot in this worker (tests / admin bulk edits)."""
+    with _lock:
+        _cache.clear()
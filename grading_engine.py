@@ -7,13 +7,16 @@ Approach:
 2. Weighted average → raw score
 3. Raw score → snapped to nearest valid CGC grade
 4. Multi-run: run N times, average category scores, then compute grade
+   (adaptive: at N=3, stop after two runs that already agree)
 
 This eliminates subjective "holistic" grading and produces consistent results.
 """
 
 import json
+import re
 import statistics
-from typing import Dict, List, Optional, Tuple
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 
 # ──────────────────────────────────────────────
@@ -173,15 +176,20 @@ def average_multi_run(runs: List[Dict[str, float]]) -> Dict[str, float]:
 # The Grading Prompt
 # ──────────────────────────────────────────────
 
-STRUCTURED_GRADING_PROMPT = """You are a professional CGC-equivalent comic book grader. You must evaluate this comic using a STRUCTURED SCORING SYSTEM.
+# The rubric is split into a STATIC part (GRADING_RUBRIC — sent as the system
+# prompt, byte-identical on every call) and a small per-comic context
+# (GRADING_CONTEXT_TEMPLATE). Only the static part can carry a prompt-cache
+# breakpoint: the API caches an exact prefix, and the old single template put
+# the title/issue on line 5, so no two comics ever shared a prefix.
+# Bump GRADING_PROMPT_VERSION on ANY wording change to the rubric or context —
+# it is what tells a stored result apart from one the new prompt would produce.
+GRADING_PROMPT_VERSION = "2026-10-19.1"
 
-IMPORTANT: You are evaluating the PHYSICAL CONDITION of this comic book, not its content or value.
+_RUBRIC_INTRO = """You are a professional CGC-equivalent comic book grader. You must evaluate this comic using a STRUCTURED SCORING SYSTEM.
 
-The comic has been identified as: {title} #{issue}
-Publisher: {publisher}
-Photos provided: {photo_labels}
+IMPORTANT: You are evaluating the PHYSICAL CONDITION of this comic book, not its content or value."""
 
-SCORING INSTRUCTIONS:
+_RUBRIC_BODY = """SCORING INSTRUCTIONS:
 Score each of the following 8 categories from 0.0 to 10.0 (one decimal place).
 Use the reference scale below for EACH category:
 
@@ -260,8 +268,8 @@ ADDITIONAL OBSERVATIONS:
   and note which areas you could NOT directly observe
 
 RESPONSE FORMAT — Return ONLY this JSON, no markdown:
-{{
-  "category_scores": {{
+{
+  "category_scores": {
     "cover_front": 0.0,
     "spine": 0.0,
     "corners": 0.0,
@@ -270,20 +278,20 @@ RESPONSE FORMAT — Return ONLY this JSON, no markdown:
     "color_gloss": 0.0,
     "structural": 0.0,
     "interior": 0.0
-  }},
-  "defects": {{
+  },
+  "defects": {
     "front": ["specific defect 1", "specific defect 2"],
     "spine": [],
     "back": [],
     "interior": [],
     "other": []
-  }},
+  },
   "observations": "Brief overall assessment noting key condition factors",
-  "photos_evaluated": ["{photo_labels}"],
+  "photos_evaluated": ["the photo labels listed under Photos provided"],
   "areas_not_visible": ["any areas you could not directly assess"],
   "signature_detected": false,
   "signature_info": null
-}}
+}
 
 CRITICAL RULES:
 1. Score EACH category independently — don't let one bad area drag all scores down
@@ -294,6 +302,31 @@ CRITICAL RULES:
 6. If you can see only the front cover photo, still provide your best estimates for other categories but list them in areas_not_visible"""
 
 
+GRADING_RUBRIC = _RUBRIC_INTRO + "\n\n" + _RUBRIC_BODY
+
+GRADING_CONTEXT_TEMPLATE = """The comic has been identified as: {title} #{issue}
+Publisher: {publisher}
+Photos provided: {photo_labels}
+
+Grade this comic using the structured scoring system in your instructions."""
+
+# Single-string form (rubric + context in one user turn). Kept for the offline
+# harnesses (test_haiku_vs_sonnet.py formats it directly); /api/grade uses
+# build_grading_request so the rubric stays cacheable.
+STRUCTURED_GRADING_PROMPT = (
+    _RUBRIC_INTRO + "\n\n"
+    + "The comic has been identified as: {title} #{issue}\n"
+    + "Publisher: {publisher}\n"
+    + "Photos provided: {photo_labels}\n\n"
+    + _RUBRIC_BODY.replace("{", "{{").replace("}", "}}")
+)
+
+# Anthropic prompt-cache breakpoint. 5-minute ephemeral TTL — long enough to
+# span a multi-run grade and back-to-back grades at a booth, and the write
+# premium (1.25x input) is repaid by a single read (0.1x).
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+
+
 def build_grading_prompt(title: str, issue: str, publisher: str, photo_labels: list) -> str:
     """Build the structured grading prompt with comic info filled in."""
     labels_str = ", ".join(photo_labels)
@@ -305,6 +338,36 @@ def build_grading_prompt(title: str, issue: str, publisher: str, photo_labels: l
     )
 
 
+def build_grading_request(title: str, issue: str, publisher: str,
+                          photo_labels: list, image_content: list) -> Tuple[list, list]:
+    """
+    Build (system, messages) for one grading call, laid out for prompt caching.
+
+    Prefix order is system → images → context, with two breakpoints:
+      1. end of the static rubric (system) — shared by EVERY grade, any comic
+      2. end of the user turn — shared by every run of the SAME grade, so
+         multi-run tie-breakers and retries read the images from cache
+    Every run of one grade must be built by this function from the same inputs;
+    a single differing byte anywhere before a breakpoint is a cache miss.
+    """
+    context = GRADING_CONTEXT_TEMPLATE.format(
+        title=title,
+        issue=issue,
+        publisher=publisher,
+        photo_labels=", ".join(photo_labels),
+    )
+    system = [{"type": "text", "text": GRADING_RUBRIC,
+               "cache_control": CACHE_BREAKPOINT}]
+    messages = [{
+        "role": "user",
+        "content": [
+            *image_content,
+            {"type": "text", "text": context, "cache_control": CACHE_BREAKPOINT},
+        ],
+    }]
+    return system, messages
+
+
 # ──────────────────────────────────────────────
 # Parse AI Response
 # ──────────────────────────────────────────────
@@ -394,6 +457,123 @@ def parse_multi_run_responses(responses: List[str]) -> dict:
     return result
 
 
+# ──────────────────────────────────────────────
+# Adaptive Multi-Run (early agreement stop)
+# ──────────────────────────────────────────────
+# A 3-run grade used to fire all three calls and wait for the slowest. Most of
+# the time the first two already agree, and the third only moves the median by
+# a tenth. Adaptive mode fires two, and only pays for the tie-breaker when they
+# disagree. "Agree" is deliberately strict: the same CGC step AND every category
+# within ADAPTIVE_SCORE_TOLERANCE — two runs that land on 8.0 via very different
+# category profiles still get a third opinion.
+
+ADAPTIVE_SCORE_TOLERANCE = 0.5
+
+
+def _scores_from_response(response_text: str) -> Dict[str, float]:
+    text = response_text.strip().replace("```json", "").replace("```", "").strip()
+    return json.loads(text).get("category_scores", {})
+
+
+def runs_agree(responses: List[str], tolerance: float = ADAPTIVE_SCORE_TOLERANCE) -> bool:
+    """
+    True when every response snaps to the same CGC grade and no category score
+    differs by more than `tolerance` between any two runs.
+    An unparseable or incomplete response never agrees — the tie-breaker runs
+    and parse_multi_run_responses surfaces the error exactly as before.
+    """
+    if len(responses) < 2:
+        return False
+    try:
+        scores = [_scores_from_response(r) for r in responses]
+        grades = [compute_grade(s) for s in scores]
+    except (ValueError, TypeError, AttributeError):
+        # json.JSONDecodeError is a ValueError; compute_grade raises ValueError
+        # on missing categories.
+        return False
+
+    if len({snap_to_cgc_grade(gr["final_grade"])[0] for gr in grades}) != 1:
+        return False
+
+    for cat in CATEGORY_WEIGHTS:
+        values = [gr["category_scores"][cat] for gr in grades]
+        if max(values) - min(values) > tolerance:
+            return False
+    return True
+
+
+def run_adaptive_multi_run(run_once: Callable[[], Any],
+                           max_runs: int = 3,
+                           text_of: Callable[[Any], str] = lambda r: r,
+                           tolerance: float = ADAPTIVE_SCORE_TOLERANCE) -> Tuple[List[Any], bool]:
+    """
+    Run the first two grading calls concurrently; run the remaining
+    (max_runs - 2) tie-breakers only if those two do not agree.
+
+    Args:
+        run_once: makes one grading call and returns its response object
+        max_runs: the requested run count (adaptive only matters at 3)
+        text_of:  extracts the response text from a run_once result
+
+    Returns:
+        (responses, early_stopped) — responses in completion order.
+
+    The tie-breaker runs AFTER the pair, not beside it, so it reads the prompt
+    cache the pair wrote (build_grading_request) instead of writing its own.
+    """
+    first_wave = min(max_runs, 2)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=first_wave) as executor:
+        futures = [executor.submit(run_once) for _ in range(first_wave)]
+        responses = [f.result() for f in concurrent.futures.as_completed(futures)]
+
+    if max_runs <= 2:
+        return responses, False
+    if runs_agree([text_of(r) for r in responses], tolerance):
+        return responses, True
+
+    for _ in range(max_runs - first_wave):
+        responses.append(run_once())
+    return responses, False
+
+
+# ──────────────────────────────────────────────
+# Incremental category scores (SSE streaming)
+# ──────────────────────────────────────────────
+# The streamed /api/grade mode forwards each category score as soon as the
+# model has written it, well before the JSON is complete. The response format
+# puts category_scores first, so the first ~150 output tokens already carry the
+# whole score table. These are PREVIEW values only — the final grade is always
+# parse_grading_response / parse_multi_run_responses over the finished text.
+
+_CATEGORY_SCORE_RE = re.compile(
+    r'"(' + "|".join(CATEGORY_WEIGHTS) + r')"\s*:\s*(-?\d+(?:\.\d+)?)\s*[,}\s]')
+
+
+class CategoryScoreScanner:
+    """
+    Feed streamed text deltas; get back the (category, score) pairs that became
+    complete with that delta. Each category is reported once, on first sight.
+    A number is only taken once the character after it has arrived, so "8" is
+    never reported for a score that finishes streaming as "8.5".
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._seen = set()
+
+    def feed(self, delta: str) -> List[Tuple[str, float]]:
+        if len(self._seen) == len(CATEGORY_WEIGHTS):
+            return []
+        self._text += delta
+        found = []
+        for m in _CATEGORY_SCORE_RE.finditer(self._text):
+            cat = m.group(1)
+            if cat not in self._seen:
+                self._seen.add(cat)
+                found.append((cat, float(m.group(2))))
+        return found
+
+
 # ──────────────────────────────────────────────
 # Grade label compatibility (for valuation_model.py)
 # ──────────────────────────────────────────────
@@ -279,14 +279,17 @@ async function uploadPhotosToEbay() {
         return true; // Allow listing to proceed; ebay_listing.py uses placeholder
     }
 
-    for (let i = 0; i < photos.length; i++) {
-        const photo = photos[i];
+    // Upload all photos in parallel — each is an eBay-side fetch of ~1-3s, so
+    // sequential uploads made a 4-photo listing wait for all four in a row.
+    // Results are collected by index so eBay gets the photos in Front, Spine,
+    // Back, Center order regardless of which upload finishes first.
+    const results = await Promise.all(photos.map(async (photo, i) => {
         const statusItem = statusItems[i];
 
         if (!photo.url) {
             statusItem.textContent = `${photo.name}: ⚠️ Missing`;
             statusItem.classList.add('error');
-            continue;
+            return null;
         }
 
         statusItem.textContent = `${photo.name}: ⏳`;
@@ -306,20 +309,21 @@ async function uploadPhotosToEbay() {
             const data = await uploadResponse.json();
 
             if (data.success && data.image_url) {
-                uploadedImageUrls.push(data.image_url);
                 statusItem.textContent = `${photo.name}: ✓`;
                 statusItem.classList.remove('uploading');
                 statusItem.classList.add('success');
-            } else {
-                throw new Error(data.error || 'Upload failed');
+                return data.image_url;
             }
+            throw new Error(data.error || 'Upload failed');
         } catch (error) {
             console.error(`Error uploading ${photo.name}:`, error);
             statusItem.textContent = `${photo.name}: ✗`;
             statusItem.classList.remove('uploading');
             statusItem.classList.add('error');
+            return null;
         }
-    }
+    }));
+    uploadedImageUrls = results.filter(Boolean);
 
     return uploadedImageUrls.length > 0;
 }
@@ -0,0 +1,236 @@
+"""
+Generated-content cache for marketplace_prep.
+
+Opening the marketplace prep screen for a comic ran one full Sonnet call per
+platform, every time — even when the same book at the same grade and price had
+been prepped minutes earlier (by this seller or any other). This module stores
+the AI-written pieces (description + show notes) per platform and serves them
+back until they expire.
+
+Key = digest of:
+  - the NORMALIZED comic identity: title / publisher lower-cased and
+    whitespace-collapsed, issue without '#' and leading zeros, year as digits
+  - platform key
+  - grade, normalized numerically ('9.80' == '9.8', 'nm 9.4' == 'NM 9.4')
+  - FMV bucket (fmv_bucket below) — the prompt is given the bucket's range,
+    never the exact FMV, so a cached show note is true for every price in it
+  - CONTENT_PROMPT_VERSION — bump it whenever the prompt changes and every old
+    entry stops matching
+
+Only the AI text is cached. Listing title and pricing are cheap and derived
+from the request every time, so a cached hit never carries a stale price.
+
+The cache is shared across users (the text describes the comic, not the
+seller), expires after MARKETPLACE_CACHE_TTL_HOURS, and honours two opt-outs:
+  - per request: "fresh": true (regenerate + overwrite the entry)
+  - per user:   users.marketplace_cache_opt_out — such a user never reads NOR
+    writes shared entries (PUT /api/marketplace/content-cache)
+
+Stored in Postgres (migrations/add_marketplace_content_cache.sql) so every
+gunicorn worker shares it. Nothing in here may fail a request: every DB error
+degrades to a miss / a skipped store.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+
+import db as _dbpool
+
+MARKETPLACE_CACHE_ENABLED = os.environ.get('MARKETPLACE_CACHE_ENABLED', '1') == '1'
+MARKETPLACE_CACHE_TTL_HOURS = int(os.environ.get('MARKETPLACE_CACHE_TTL_HOURS', '168'))
+CONTENT_PROMPT_VERSION = 'mp-content-v2'
+
+# Expired rows are swept at most this often per worker (on a store).
+SWEEP_INTERVAL_S = 600
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+# FMV ladder: 1-2-5 steps per decade ($1, $2, $5, $10, $20, $50 …). Listing
+# copy reads the same for a $42 and a $48 book; it should not for $8 vs $800.
+_LADDER = (1, 2, 5)
+
+
+def fmv_bucket(fmv):
+    """(low, high) dollar range containing fmv on the 1-2-5 ladder.
+    Anything under $1 (or missing) is the (0, 1) bucket."""
+    try:
+        fmv = float(fmv or 0)
+    except (TypeError, ValueError):
+        fmv = 0.0
+    if fmv < 1:
+        return (0, 1)
+    decade = 10 ** int(math.floor(math.log10(fmv)))
+    steps = [decade * s for s in _LADDER] + [decade * 10]
+    for low, high in zip(steps, steps[1:]):
+        if fmv < high:
+            return (low, high)
+    return (decade * 5, decade * 10)       # float edge at the top of a decade
+
+
+def _norm_text(value):
+    return re.sub(r'\s+', ' ', str(value or '')).strip().lower()
+
+
+def _norm_issue(value):
+    issue = _norm_text(value).lstrip('#').strip()
+    return issue.lstrip('0') or ('0' if issue else '')
+
+
+def _norm_grade(value):
+    grade = _norm_text(value)
+    match = re.search(r'\d+(?:\.\d+)?', grade)
+    if not match:
+        return grade
+    number = f"{float(match.group()):g}"
+    return (grade[:match.start()] + number + grade[match.end():]).strip()
+
+
+def content_key(platform_key, title, issue, grade, fmv,
+                publisher=None, year=None):
+    """Cache key for one platform's content. Normalization lives here so
+    'The Amazing Spider-Man ', '#0300', '9.80' and 'the amazing spider-man',
+    '300', '9.8' share an entry."""
+    low, high = fmv_bucket(fmv)
+    norm = {
+        'title': _norm_text(title),
+        'issue': _norm_issue(issue),
+        'publisher': _norm_text(publisher),
+        'year': re.sub(r'\D', '', str(year or '')),
+        'platform': platform_key,
+        'grade': _norm_grade(grade),
+        'fmv_bucket': f'{low}-{high}',
+        'prompt_version': CONTENT_PROMPT_VERSION,
+    }
+    return hashlib.sha256(json.dumps(norm, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def user_opted_out(user_id):
+    """True when the user has turned the shared cache off. Read errors → False
+    (the default is on; a DB hiccup must not silently change that)."""
+    if user_id is None:
+        return False
+    conn = None
+    try:
+        conn = _dbpool.get_db(dict_rows=True)
+        cur = conn.cursor()
+        cur.execute("SELECT marketplace_cache_opt_out FROM users WHERE id = %s", (user_id,))
+        row = cur.fetchone()
+        cur.close()
+        return bool(row and row['marketplace_cache_opt_out'])
+    except Exception as e:
+        print(f"[MarketplaceCache] opt-out read failed (treated as opted in): {e}")
+        return False
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def set_user_opt_out(user_id, opted_out):
+    """Persist the per-user opt-out. Raises on DB error (the settings route
+    reports it)."""
+    conn = _dbpool.get_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("UPDATE users SET marketplace_cache_opt_out = %s WHERE id = %s",
+                    (bool(opted_out), user_id))
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def lookup(keys):
+    """Fetch live entries for a set of keys in one query.
+    Returns {key: {'description', 'show_notes'}} for the hits only."""
+    if not MARKETPLACE_CACHE_ENABLED or not keys:
+        return {}
+    conn = None
+    try:
+        conn = _dbpool.get_db(dict_rows=True)
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT cache_key, content FROM marketplace_content_cache
+            WHERE cache_key = ANY(%s) AND expires_at > NOW()
+        """, (list(keys),))
+        rows = cur.fetchall()
+        cur.close()
+        return {row['cache_key']: row['content'] for row in rows}
+    except Exception as e:
+        print(f"[MarketplaceCache] lookup failed (treated as miss): {e}")
+        return {}
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def store(entries):
+    """Upsert {key: (platform_key, content)} in one transaction. Never raises."""
+    global _last_sweep
+    if not MARKETPLACE_CACHE_ENABLED or not entries:
+        return
+    conn = None
+    try:
+        conn = _dbpool.get_db()
+        cur = conn.cursor()
+        for key, (platform_key, content) in entries.items():
+            cur.execute("""
+                INSERT INTO marketplace_content_cache
+                    (cache_key, platform, content, prompt_version, created_at, expires_at)
+                VALUES (%s, %s, %s, %s, NOW(), NOW() + make_interval(hours => %s))
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    content = EXCLUDED.content,
+                    created_at = EXCLUDED.created_at,
+                    expires_at = EXCLUDED.expires_at
+            """, (key, platform_key, json.dumps(content), CONTENT_PROMPT_VERSION,
+                  MARKETPLACE_CACHE_TTL_HOURS))
+        # Opportunistic sweep keeps the table bounded without a scheduled job;
+        # rate-limited because, unlike the per-user vision cache, this table is
+        # shared and the DELETE would otherwise run on every prep.
+        with _sweep_lock:
+            sweep = time.monotonic() - _last_sweep >= SWEEP_INTERVAL_S
+            if sweep:
+                _last_sweep = time.monotonic()
+        if sweep:
+            cur.execute("DELETE FROM marketplace_content_cache WHERE expires_at <= NOW()")
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        print(f"[MarketplaceCache] store failed (non-fatal): {e}")
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def invalidate(platform_key=None):
+    """Admin invalidation. No filter = drop everything. Returns rows deleted."""
+    conn = _dbpool.get_db()
+    try:
+        cur = conn.cursor()
+        if platform_key:
+            cur.execute("DELETE FROM marketplace_content_cache WHERE platform = %s", (platform_key,))
+        else:
+            cur.execute("DELETE FROM marketplace_content_cache")
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
+    finally:
+        conn.close()
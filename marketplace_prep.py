@@ -6,8 +6,21 @@ ComicConnect, MyComicShop, COMC, Hip Comics
 """
 
 import os
-import anthropic
+import re
+import threading
+
 from models import SONNET
+import marketplace_content_cache as content_cache
+
+try:
+    import anthropic
+except ImportError:
+    anthropic = None
+
+# Shared client (see _get_client)
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
 
 
 # Platform configurations
@@ -133,8 +146,24 @@ def get_all_platforms():
             for k, v in PLATFORMS.items()}
 
 
+def _get_client():
+    """Shared Anthropic client, built once per worker (and rebuilt only if the
+    key changes). A client per call paid connection setup on every prep.
+    None when there is no key or the SDK is missing → template content."""
+    global _client, _client_key
+    api_key = os.environ.get('ANTHROPIC_API_KEY')
+    if not api_key or anthropic is None:
+        return None
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            _client = anthropic.Anthropic(api_key=api_key, timeout=60.0, max_retries=1)
+            _client_key = api_key
+        return _client
+
+
 def generate_platform_content(platform_key, title, issue, grade, price,
-                              publisher=None, year=None) -> dict:
+                              publisher=None, year=None,
+                              use_cache=True, fresh=False) -> dict:
     """
     Generate platform-optimized listing content.
 
@@ -146,14 +175,41 @@ def generate_platform_content(platform_key, title, issue, grade, price,
         price: Fair market value in USD
         publisher: Publisher name (optional)
         year: Publication year (optional)
+        use_cache: Read/write the shared content cache (False = user opted out)
+        fresh: Skip the cache read and regenerate (the new text is still stored)
 
     Returns:
         Dict with success, listing_title, description, show_notes (if applicable),
         pricing suggestions, and platform metadata
     """
-    platform = PLATFORMS.get(platform_key)
-    if not platform:
-        return {'success': False, 'error': f'Unknown platform: {platform_key}'}
+    batch = generate_platforms_content([platform_key], title, issue, grade, price,
+                                       publisher=publisher, year=year,
+                                       use_cache=use_cache, fresh=fresh)
+    if not batch['success']:
+        return batch
+    return batch['platforms'][platform_key]
+
+
+def generate_platforms_content(platform_keys, title, issue, grade, price,
+                               publisher=None, year=None,
+                               use_cache=True, fresh=False) -> dict:
+    """
+    Generate listing content for several platforms at once.
+
+    Cached platforms are served from marketplace_content_cache; every platform
+    still missing is written by ONE model call, so bulk prep costs at most one
+    call per comic instead of one per platform.
+
+    Returns:
+        Dict with success, platforms ({platform_key: same dict as
+        generate_platform_content}), model_calls (0 or 1) and cache_hits
+    """
+    keys = list(dict.fromkeys(platform_keys or []))
+    if not keys:
+        return {'success': False, 'error': 'At least one platform is required'}
+    for platform_key in keys:
+        if platform_key not in PLATFORMS:
+            return {'success': False, 'error': f'Unknown platform: {platform_key}'}
 
     fmv = float(price) if price else 9.99
     grade_str = str(grade).strip() if grade else ''
@@ -164,38 +220,89 @@ def generate_platform_content(platform_key, title, issue, grade, price,
         listing_title += f" {grade_str}"
     listing_title = listing_title[:80]
 
-    # Pricing based on platform type
+    # 1. Cache: one query for every requested platform.
+    cache_keys = {pk: content_cache.content_key(pk, title, issue, grade_str, fmv,
+                                                publisher=publisher, year=year)
+                  for pk in keys}
+    cached = {}
+    if use_cache and not fresh:
+        cached = content_cache.lookup(cache_keys.values())
+
+    # 2. One model call for everything the cache did not have.
+    missing = [pk for pk in keys if cache_keys[pk] not in cached]
+    generated, ai_error, model_calls = {}, None, 0
+    client = _get_client() if missing else None
+    if client:
+        model_calls = 1
+        try:
+            generated = _generate_ai(client, missing, title, issue, grade_str, fmv,
+                                     publisher, year)
+        except Exception as e:
+            names = ', '.join(PLATFORMS[pk]['name'] for pk in missing)
+            print(f"{names} AI content generation failed: {e}")
+            ai_error = str(e)
+        if generated and use_cache:
+            content_cache.store({cache_keys[pk]: (pk, content)
+                                 for pk, content in generated.items()})
+
+    # 3. Per-platform response. Pricing is never cached — it follows the
+    #    request's FMV exactly.
+    results = {}
+    for pk in keys:
+        platform = PLATFORMS[pk]
+        suggested_start, suggested_buy_now = _suggested_pricing(platform, fmv)
+        content = cached.get(cache_keys[pk]) or generated.get(pk)
+        if content is None:
+            error = ai_error
+            if client and error is None:
+                error = 'Platform missing from batched AI response'
+            results[pk] = _build_response(platform, pk, listing_title, grade_str,
+                                          title, issue, fmv, publisher, year,
+                                          suggested_start, suggested_buy_now,
+                                          source='template', ai_error=error)
+            continue
+        result = {
+            'success': True,
+            'platform': pk,
+            'platform_name': platform['name'],
+            'listing_title': listing_title,
+            'description': content.get('description', ''),
+            'suggested_start': suggested_start,
+            'suggested_buy_now': suggested_buy_now,
+            'source': 'ai'
+        }
+        if platform['has_show_notes']:
+            result['show_notes'] = content.get('show_notes', '')
+        if cache_keys[pk] in cached:
+            result['cached'] = True
+        results[pk] = result
+
+    return {'success': True, 'platforms': results,
+            'model_calls': model_calls, 'cache_hits': len(keys) - len(missing)}
+
+
+def _suggested_pricing(platform, fmv):
+    """(suggested_start, suggested_buy_now) for the platform type."""
     if platform['suggested_start'] is not None:
         suggested_start = platform['suggested_start']
     elif platform['type'] in ('consignment_auction', 'consignment'):
         suggested_start = round(fmv * 0.8, 2)  # 80% of FMV as estimate
     else:
         suggested_start = None
+    return suggested_start, round(fmv, 2)
 
-    suggested_buy_now = round(fmv, 2)
-
-    # Try AI generation
-    api_key = os.environ.get('ANTHROPIC_API_KEY')
-    if not api_key:
-        return _build_response(platform, platform_key, listing_title, grade_str,
-                               title, issue, fmv, publisher, year,
-                               suggested_start, suggested_buy_now, source='template')
-
-    try:
-        client = anthropic.Anthropic(api_key=api_key)
-
-        comic_info = f"{title} #{issue}"
-        if publisher:
-            comic_info += f" ({publisher})"
-        if year:
-            comic_info += f" - {year}"
-
-        # Build platform-specific prompt
-        show_notes_section = ""
-        response_format = "DESCRIPTION: [your description]"
 
-        if platform['has_show_notes']:
-            show_notes_section = f"""
+def _platform_pieces(platform):
+    """PIECE 1/2 instructions for one platform, plus its response format."""
+    pieces = f"""PIECE 1 — LISTING DESCRIPTION (target {platform['desc_target']}):
+{platform['desc_tone']}
+Include: KEY ISSUE status if applicable, era, why it's collectible.
+Exclude: grade, price, title (shown separately), shipping info.
+Plain text only, no HTML.
+"""
+    response_format = "DESCRIPTION: [your description]"
+    if platform['has_show_notes']:
+        pieces += """
 PIECE 2 — PREP NOTES (target 200-300 characters):
 Talking points for the seller. Written as bullet-style notes starting with "•".
 Include:
@@ -203,71 +310,107 @@ Include:
 - Recent sales context
 - One-liner hook
 """
-            response_format = """DESCRIPTION: [your description]
+        response_format = """DESCRIPTION: [your description]
 SHOW_NOTES:
 [your notes]"""
+    return pieces, response_format
+
 
-        prompt = f"""Generate listing content for {platform['name']} for this comic book.
+def _build_prompt(platform_keys, title, issue, grade_str, fmv, publisher, year):
+    """Prompt for one or several platforms.
 
-Comic: {comic_info}
+    The FMV is given as its cache bucket range (never the exact value): the
+    text is cached per bucket, so it must read true for any price inside it.
+    """
+    comic_info = f"{title} #{issue}"
+    if publisher:
+        comic_info += f" ({publisher})"
+    if year:
+        comic_info += f" - {year}"
+    low, high = content_cache.fmv_bucket(fmv)
+    comic_block = f"""Comic: {comic_info}
 Grade: {grade_str or 'Unknown'}
-FMV: ${fmv:.2f}
+FMV range: ${low:,}-${high:,}"""
+
+    if len(platform_keys) == 1:
+        platform = PLATFORMS[platform_keys[0]]
+        pieces, response_format = _platform_pieces(platform)
+        return f"""Generate listing content for {platform['name']} for this comic book.
+
+{comic_block}
 Platform type: {platform['type']}
 
-PIECE 1 — LISTING DESCRIPTION (target {platform['desc_target']}):
-{platform['desc_tone']}
-Include: KEY ISSUE status if applicable, era, why it's collectible.
-Exclude: grade, price, title (shown separately), shipping info.
-Plain text only, no HTML.
-{show_notes_section}
+{pieces}
 Respond in this exact format:
 {response_format}"""
 
-        response = client.messages.create(
-            model=SONNET,
-            max_tokens=500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-
-        text = response.content[0].text.strip()
-
-        # Parse response
-        description = ''
-        show_notes = ''
-
-        if platform['has_show_notes'] and 'SHOW_NOTES:' in text:
-            parts = text.split('SHOW_NOTES:')
-            description = parts[0].replace('DESCRIPTION:', '').strip()
-            show_notes = parts[1].strip() if len(parts) > 1 else ''
-        elif 'DESCRIPTION:' in text:
-            description = text.replace('DESCRIPTION:', '').strip()
-        else:
-            description = text[:300]
+    sections, formats = [], []
+    for pk in platform_keys:
+        platform = PLATFORMS[pk]
+        pieces, response_format = _platform_pieces(platform)
+        sections.append(f"=== {pk} === {platform['name']} (platform type: {platform['type']})\n{pieces}")
+        formats.append(f"=== {pk} ===\n{response_format}")
+    sections_text = '\n'.join(sections)
+    formats_text = '\n'.join(formats)
+    return f"""Generate listing content for this comic book on {len(platform_keys)} platforms.
+Write each platform's content separately, in that platform's own tone.
+
+{comic_block}
+
+{sections_text}
+Respond in this exact format, one block per platform, in the order given:
+{formats_text}"""
+
+
+def _parse_content(text, platform):
+    """DESCRIPTION / SHOW_NOTES pieces out of one platform's response text."""
+    description = ''
+    show_notes = ''
+
+    if platform['has_show_notes'] and 'SHOW_NOTES:' in text:
+        parts = text.split('SHOW_NOTES:')
+        description = parts[0].replace('DESCRIPTION:', '').strip()
+        show_notes = parts[1].strip() if len(parts) > 1 else ''
+    elif 'DESCRIPTION:' in text:
+        # Notes the platform doesn't use must not leak into the description
+        description = text.split('SHOW_NOTES:')[0].replace('DESCRIPTION:', '').strip()
+    else:
+        description = text[:300]
 
-        # Enforce max length
-        if len(description) > 500:
-            description = description[:497] + "..."
+    # Enforce max length
+    if len(description) > 500:
+        description = description[:497] + "..."
 
-        result = {
-            'success': True,
-            'platform': platform_key,
-            'platform_name': platform['name'],
-            'listing_title': listing_title,
-            'description': description,
-            'suggested_start': suggested_start,
-            'suggested_buy_now': suggested_buy_now,
-            'source': 'ai'
-        }
-        if platform['has_show_notes']:
-            result['show_notes'] = show_notes
-        return result
-
-    except Exception as e:
-        print(f"{platform['name']} AI content generation failed: {e}")
-        return _build_response(platform, platform_key, listing_title, grade_str,
-                               title, issue, fmv, publisher, year,
-                               suggested_start, suggested_buy_now,
-                               source='template', ai_error=str(e))
+    content = {'description': description}
+    if platform['has_show_notes']:
+        content['show_notes'] = show_notes
+    return content
+
+
+_SECTION_RE = re.compile(r'^\s*===\s*([a-z_]+)\s*===.*$', re.MULTILINE)
+
+
+def _generate_ai(client, platform_keys, title, issue, grade_str, fmv, publisher, year):
+    """ONE model call for every platform in platform_keys.
+    Returns {platform_key: content}; a platform the model skipped is absent."""
+    prompt = _build_prompt(platform_keys, title, issue, grade_str, fmv, publisher, year)
+    response = client.messages.create(
+        model=SONNET,
+        max_tokens=min(500 * len(platform_keys), 4000),
+        messages=[{"role": "user", "content": prompt}]
+    )
+    text = response.content[0].text.strip()
+
+    if len(platform_keys) == 1:
+        return {platform_keys[0]: _parse_content(text, PLATFORMS[platform_keys[0]])}
+
+    # re.split with one group → [preamble, key1, body1, key2, body2, ...]
+    parts = _SECTION_RE.split(text)
+    generated = {}
+    for pk, body in zip(parts[1::2], parts[2::2]):
+        if pk in platform_keys and pk not in generated and body.strip():
+            generated[pk] = _parse_content(body.strip(), PLATFORMS[pk])
+    return generated
 
 
 def _build_response(platform, platform_key, listing_title, grade_str,
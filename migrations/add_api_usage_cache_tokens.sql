@@ -0,0 +1,7 @@
+-- Migration: Record prompt-cache token counts on api_usage
+-- /api/grade and /api/signatures/v2/match now set cache_control. The API reports
+-- cache writes/reads SEPARATELY from input_tokens, so without these columns the
+-- cached share of every call is invisible to cost tracking.
+
+ALTER TABLE api_usage ADD COLUMN IF NOT EXISTS cache_creation_tokens INTEGER DEFAULT 0;
+ALTER TABLE api_usage ADD COLUMN IF NOT EXISTS cache_read_tokens INTEGER DEFAULT 0;
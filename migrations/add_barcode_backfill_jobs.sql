@@ -0,0 +1,43 @@
+-- Migration: resumable barcode backfill job (barcode_backfill.py)
+-- POST /api/admin/backfill-barcodes starts/resumes a job; a daemon thread in
+-- the owning worker walks market_sales in id order and checkpoints last_id +
+-- counters in the same transaction as each batch's UPDATEs.
+--
+-- barcode_scanned_at marks rows that were scanned and had no barcode, so later
+-- jobs skip them instead of re-downloading every image forever. Download
+-- failures are left unmarked and retried by the next job.
+
+ALTER TABLE market_sales ADD COLUMN IF NOT EXISTS barcode_scanned_at TIMESTAMPTZ;
+
+-- Keyset scan of the backfill candidates. ⚠️ The predicate must stay textually
+-- identical to barcode_backfill.CANDIDATE_WHERE (after psycopg2's %% → %).
+CREATE INDEX IF NOT EXISTS idx_market_sales_barcode_backfill
+    ON market_sales (id)
+    WHERE image_url LIKE '%.r2.dev%'
+      AND upc_main IS NULL
+      AND barcode_scanned_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS barcode_backfill_jobs (
+    id              SERIAL PRIMARY KEY,
+    status          VARCHAR(20) NOT NULL DEFAULT 'running',  -- running | completed | failed | cancelled
+    dry_run         BOOLEAN NOT NULL DEFAULT FALSE,
+    max_rows        INTEGER,                                  -- NULL = whole backlog
+    last_id         INTEGER NOT NULL DEFAULT 0,               -- keyset cursor: market_sales.id
+    total           INTEGER NOT NULL DEFAULT 0,               -- candidates when the job started
+    processed       INTEGER NOT NULL DEFAULT 0,
+    barcodes_found  INTEGER NOT NULL DEFAULT 0,
+    updated         INTEGER NOT NULL DEFAULT 0,
+    errors          INTEGER NOT NULL DEFAULT 0,
+    details         JSONB,                                    -- first few barcodes, for spot checks
+    run_seconds     DOUBLE PRECISION NOT NULL DEFAULT 0,      -- batch time only (throughput)
+    worker          VARCHAR(100),                             -- hostname:pid that owns it
+    error           TEXT,
+    started_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    heartbeat_at    TIMESTAMPTZ,
+    finished_at     TIMESTAMPTZ
+);
+
+-- At most one running job across all workers.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_barcode_backfill_one_running
+    ON barcode_backfill_jobs ((TRUE))
+    WHERE status = 'running';
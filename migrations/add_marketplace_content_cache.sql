@@ -0,0 +1,20 @@
+-- Migration: generated-content cache for marketplace prep
+-- See marketplace_content_cache.py. One row per (normalized comic identity,
+-- platform, grade, FMV bucket, prompt version) digest holding the AI-written
+-- description / show notes. Shared across users; rows expire (expires_at) and
+-- are swept opportunistically on write.
+
+CREATE TABLE IF NOT EXISTS marketplace_content_cache (
+    cache_key       VARCHAR(64) PRIMARY KEY,    -- marketplace_content_cache.content_key()
+    platform        VARCHAR(30) NOT NULL,       -- PLATFORMS key (admin invalidation by platform)
+    content         JSONB NOT NULL,             -- {"description": ..., "show_notes": ...}
+    prompt_version  VARCHAR(50) NOT NULL,
+    created_at      TIMESTAMPTZ DEFAULT NOW(),
+    expires_at      TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_marketplace_content_cache_expires
+    ON marketplace_content_cache(expires_at);
+
+-- Per-user opt-out: such users never read or write shared entries.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS marketplace_cache_opt_out BOOLEAN DEFAULT FALSE;
@@ -0,0 +1,17 @@
+-- Migration: moderation verdict cache
+-- See content_moderation.py. One row per distinct image (SHA-256 of the decoded
+-- bytes) per moderation policy, shared by every worker so a cover re-uploaded
+-- across extract/grade/registry/marketplace hits Rekognition once. Lives beside
+-- content_incidents (content_incidents.sql); expired and over-cap rows are swept
+-- opportunistically on write.
+
+CREATE TABLE IF NOT EXISTS moderation_verdicts (
+    digest      CHAR(64) NOT NULL,
+    policy_key  VARCHAR(16) NOT NULL,   -- MODERATION_POLICY_KEY (threshold + category lists)
+    result      JSONB NOT NULL,         -- moderate_image() result dict
+    created_at  TIMESTAMPTZ DEFAULT NOW(),
+    expires_at  TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (digest, policy_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_moderation_verdicts_expires ON moderation_verdicts(expires_at);
@@ -0,0 +1,14 @@
+-- Migration: shared input-token bucket for rate-limited model calls
+-- See opus_token_budget.py. One row per bucket (e.g. 'opus_itpm'); every
+-- gunicorn worker refills + debits it under SELECT ... FOR UPDATE, so the
+-- signature v2 passes of all workers share one view of the per-minute input
+-- token limit. blocked_until is set from a 429's retry-after and holds every
+-- worker back until then. Workers fall back to a per-process bucket if this
+-- table is missing.
+
+CREATE TABLE IF NOT EXISTS opus_token_budget (
+    name           VARCHAR(50) PRIMARY KEY,
+    tokens         DOUBLE PRECISION NOT NULL,
+    updated_at     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    blocked_until  TIMESTAMPTZ
+);
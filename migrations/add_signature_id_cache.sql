@@ -0,0 +1,24 @@
+-- Migration: signature identification result cache (v1 identify + v2 match)
+-- See signature_result_cache.py. One row per served identification, keyed by
+-- the cover's pHash + SHA-256 of its bytes + request context + reference-DB
+-- version. creator_stamps holds 'count:max image id' per ranked creator and is
+-- re-checked on every hit. Shared across users; rows expire (expires_at) and
+-- are swept opportunistically on write.
+
+CREATE TABLE IF NOT EXISTS signature_id_cache (
+    id              SERIAL PRIMARY KEY,
+    endpoint        VARCHAR(50) NOT NULL,       -- '/api/signatures/identify' | '/api/signatures/v2/match'
+    phash           VARCHAR(16) NOT NULL,       -- 64-bit cover pHash (hex)
+    content_sha256  CHAR(64) NOT NULL,          -- digest of the decoded image bytes
+    context_key     VARCHAR(64) NOT NULL,       -- identity_key() of the comic context
+    ref_version     VARCHAR(64) NOT NULL,       -- schema + pipeline + active creator roster
+    creator_stamps  JSONB NOT NULL,             -- {lower(creator_name): 'count:max_image_id'}
+    result          JSONB NOT NULL,
+    created_at      TIMESTAMPTZ DEFAULT NOW(),
+    expires_at      TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_signature_id_cache_lookup
+    ON signature_id_cache(endpoint, phash, content_sha256, context_key, ref_version);
+CREATE INDEX IF NOT EXISTS idx_signature_id_cache_expires
+    ON signature_id_cache(expires_at);
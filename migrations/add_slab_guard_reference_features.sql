@@ -0,0 +1,18 @@
+-- Migration: persisted SIFT features for registered Slab Guard photos
+-- See routes/reference_features.py. Written at registration
+-- (routes/registry.py process_registration_photo), read by compare_covers so the
+-- reference side of every SIFT alignment is detected once, not once per run.
+-- payload = compressed npz (keypoints + uint8 descriptors) in the compare_covers
+-- frame; feature_version changes whenever that frame or the SIFT params change.
+
+CREATE TABLE IF NOT EXISTS slab_guard_reference_features (
+    photo_url        TEXT NOT NULL,
+    feature_version  VARCHAR(50) NOT NULL,
+    comic_id         INTEGER,
+    payload          BYTEA NOT NULL,
+    created_at       TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (photo_url, feature_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sg_reference_features_comic
+    ON slab_guard_reference_features(comic_id);
@@ -0,0 +1,403 @@
+-- =============================================================================
+-- Migration: incrementally maintained dashboard rollups (stats_rollups.py)
+-- File: migrations/add_stats_rollups.sql
+--
+-- /api/admin/dashboard and /api/admin/slab-guard-stats used to COUNT(*) /
+-- GROUP BY the whole of users, request_logs, api_usage, market_sales,
+-- ebay_sales, comic_registry, sighting_reports and match_reports on every
+-- load. They now read these tables instead:
+--
+--   stats_counters          all-time counters      (metric → n, amount)
+--   stats_daily             per-UTC-day counters   (metric, day → n, amount)
+--   stats_daily_users       distinct request_logs users per day
+--   stats_sighting_serials  sighting reports per serial (top-reported list)
+--   stats_rollup_cursors    last id folded in, per aggregated source
+--
+-- Two maintenance paths, chosen per table:
+--
+--   TRIGGERS (this file) — users, comic_registry, sighting_reports,
+--   match_reports, market_sales. Low write volume, and their rows are
+--   UPDATEd (status, owner_notified, owner_response, is_approved, price on
+--   re-import) and DELETEd (collection delete, account delete), which an
+--   id-cursor aggregator cannot see. Triggers keep the counters exact in the
+--   same transaction as the write (row-level, except market_sales: one
+--   summed delta per statement, see its trigger).
+--
+--   AGGREGATOR (stats_rollups.refresh) — request_logs, api_usage, ebay_sales.
+--   Append-only and high volume (one request_logs row per API call): a
+--   trigger would put a hot-row UPDATE on every request. Instead the
+--   aggregator folds rows id > cursor into stats_daily in chunks, cursor and
+--   counters in one transaction.
+--
+-- Safe to run multiple times (IF NOT EXISTS / CREATE OR REPLACE / DROP TRIGGER
+-- IF EXISTS). The trigger counters are SEEDED at the end of this file, in the
+-- same transaction that installs the triggers: CREATE TRIGGER holds a SHARE ROW
+-- EXCLUSIVE lock on each table until COMMIT, so no write can land between
+-- the trigger going live and the seed aggregate. That is one full scan of each
+-- triggered table with writes blocked, once, at deploy time. Dashboards never
+-- seed (they report "not seeded"); the only other reseed path is the explicit
+-- POST /api/admin/stats-rollups/rebuild. Re-run this file after creating
+-- match_reports (db_migrate_match_reports.py) so it gets its trigger and seed.
+-- =============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS stats_counters (
+    metric      TEXT PRIMARY KEY,
+    n           BIGINT  NOT NULL DEFAULT 0,
+    amount      NUMERIC NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS stats_daily (
+    metric      TEXT    NOT NULL,
+    day         DATE    NOT NULL,     -- UTC day, see stats_day()
+    n           BIGINT  NOT NULL DEFAULT 0,
+    amount      NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, day)
+);
+
+CREATE TABLE IF NOT EXISTS stats_daily_users (
+    day         DATE    NOT NULL,
+    user_id     INTEGER NOT NULL,
+    PRIMARY KEY (day, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS stats_sighting_serials (
+    serial_number VARCHAR(20) PRIMARY KEY,
+    n             INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_stats_sighting_serials_n
+    ON stats_sighting_serials (n DESC);
+
+CREATE TABLE IF NOT EXISTS stats_rollup_cursors (
+    source      TEXT PRIMARY KEY,      -- aggregated table, or 'triggers' (seed marker)
+    last_id     BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+
+-- =============================================================================
+-- Helpers
+-- =============================================================================
+
+-- ⚠️ One definition of "day" for triggers, the aggregator and the dashboards.
+-- TIMESTAMP columns (users, sighting_reports, match_reports) are cast to
+-- TIMESTAMPTZ with the session TimeZone — UTC on Render, same as NOW().
+CREATE OR REPLACE FUNCTION stats_day(ts TIMESTAMPTZ) RETURNS DATE AS $$
+    SELECT (ts AT TIME ZONE 'UTC')::date
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION stats_bump(p_metric TEXT, p_n BIGINT, p_amount NUMERIC)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO stats_counters (metric, n, amount)
+    VALUES (p_metric, p_n, COALESCE(p_amount, 0))
+    ON CONFLICT (metric) DO UPDATE
+        SET n = stats_counters.n + EXCLUDED.n,
+            amount = stats_counters.amount + EXCLUDED.amount;
+END;
+$$ LANGUAGE plpgsql;
+
+-- NULL day (row without a timestamp) is not bucketed, matching the live
+-- "WHERE created_at > …" filters it replaces.
+CREATE OR REPLACE FUNCTION stats_bump_day(p_metric TEXT, p_day DATE, p_n BIGINT, p_amount NUMERIC)
+RETURNS void AS $$
+BEGIN
+    IF p_day IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO stats_daily (metric, day, n, amount)
+    VALUES (p_metric, p_day, p_n, COALESCE(p_amount, 0))
+    ON CONFLICT (metric, day) DO UPDATE
+        SET n = stats_daily.n + EXCLUDED.n,
+            amount = stats_daily.amount + EXCLUDED.amount;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- =============================================================================
+-- Triggers. Each function subtracts the OLD row's contribution and adds the
+-- NEW row's, so INSERT / UPDATE / DELETE share one body. ⚠️ Every metric here
+-- must match stats_rollups.LIVE_COUNTERS_SQL / LIVE_DAILY_SQL — that is what
+-- rebuild() seeds from and verify() compares against.
+-- =============================================================================
+
+-- users: total / approved / pending + new users per day
+CREATE OR REPLACE FUNCTION stats_users_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM stats_bump('users.total', -1, 0);
+        IF OLD.is_approved = TRUE THEN
+            PERFORM stats_bump('users.approved', -1, 0);
+        END IF;
+        IF OLD.is_approved = FALSE AND OLD.is_admin = FALSE THEN
+            PERFORM stats_bump('users.pending', -1, 0);
+        END IF;
+        PERFORM stats_bump_day('users.new', stats_day(OLD.created_at), -1, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM stats_bump('users.total', 1, 0);
+        IF NEW.is_approved = TRUE THEN
+            PERFORM stats_bump('users.approved', 1, 0);
+        END IF;
+        IF NEW.is_approved = FALSE AND NEW.is_admin = FALSE THEN
+            PERFORM stats_bump('users.pending', 1, 0);
+        END IF;
+        PERFORM stats_bump_day('users.new', stats_day(NEW.created_at), 1, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stats_users ON users;
+CREATE TRIGGER trg_stats_users
+    AFTER INSERT OR DELETE OR UPDATE OF is_approved, is_admin, created_at ON users
+    FOR EACH ROW EXECUTE FUNCTION stats_users_trg();
+
+
+-- comic_registry: registrations by status + registrations per day
+CREATE OR REPLACE FUNCTION stats_comic_registry_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM stats_bump('registry.status.' || COALESCE(OLD.status, 'none'), -1, 0);
+        PERFORM stats_bump_day('registry.new', stats_day(OLD.registration_date), -1, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM stats_bump('registry.status.' || COALESCE(NEW.status, 'none'), 1, 0);
+        PERFORM stats_bump_day('registry.new', stats_day(NEW.registration_date), 1, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stats_comic_registry ON comic_registry;
+CREATE TRIGGER trg_stats_comic_registry
+    AFTER INSERT OR DELETE OR UPDATE OF status, registration_date ON comic_registry
+    FOR EACH ROW EXECUTE FUNCTION stats_comic_registry_trg();
+
+
+-- sighting_reports: totals, owner notified / responses, per day, per serial
+CREATE OR REPLACE FUNCTION stats_sighting_reports_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM stats_bump('sightings.total', -1, 0);
+        IF OLD.owner_notified = TRUE THEN
+            PERFORM stats_bump('sightings.notified', -1, 0);
+        END IF;
+        IF OLD.owner_response IS NOT NULL THEN
+            PERFORM stats_bump('sightings.response.' || OLD.owner_response, -1, 0);
+        END IF;
+        PERFORM stats_bump_day('sightings.new', stats_day(OLD.created_at), -1, 0);
+        UPDATE stats_sighting_serials SET n = n - 1
+            WHERE serial_number = OLD.serial_number;
+        DELETE FROM stats_sighting_serials
+            WHERE serial_number = OLD.serial_number AND n <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM stats_bump('sightings.total', 1, 0);
+        IF NEW.owner_notified = TRUE THEN
+            PERFORM stats_bump('sightings.notified', 1, 0);
+        END IF;
+        IF NEW.owner_response IS NOT NULL THEN
+            PERFORM stats_bump('sightings.response.' || NEW.owner_response, 1, 0);
+        END IF;
+        PERFORM stats_bump_day('sightings.new', stats_day(NEW.created_at), 1, 0);
+        IF NEW.serial_number IS NOT NULL THEN
+            INSERT INTO stats_sighting_serials (serial_number, n)
+            VALUES (NEW.serial_number, 1)
+            ON CONFLICT (serial_number) DO UPDATE SET n = stats_sighting_serials.n + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stats_sighting_reports ON sighting_reports;
+CREATE TRIGGER trg_stats_sighting_reports
+    AFTER INSERT OR DELETE
+       OR UPDATE OF owner_notified, owner_response, created_at, serial_number ON sighting_reports
+    FOR EACH ROW EXECUTE FUNCTION stats_sighting_reports_trg();
+
+
+-- market_sales: total, price sum (avg price) + rows per day. Triggered rather
+-- than aggregated because the (source, source_id) upsert in sales_market
+-- rewrites price on re-import.
+--
+-- ⚠️ STATEMENT-level, unlike the tables above. Every sale bumps the same two
+-- stats_counters rows (market_sales.total / .priced); a row trigger would
+-- update them once per row — ~6 upserts per re-sent sale whose price changed —
+-- so one 1000-row /sales/record/batch upsert hit them thousands of times and
+-- every concurrent /sales/record and eBay writer queued behind that
+-- transaction. Here the transition tables are summed into ONE delta per
+-- statement. Transition tables need one trigger per event and cannot take an
+-- UPDATE OF column list, so the UPDATE trigger fires on any update and rows
+-- whose price / created_at did not change cancel out (zero deltas are skipped).
+CREATE OR REPLACE FUNCTION stats_market_sales_trg() RETURNS trigger AS $$
+DECLARE
+    signs   INT[];
+    prices  NUMERIC[];
+    days    DATE[];
+    d_total  BIGINT;
+    d_priced BIGINT;
+    d_amount NUMERIC;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(1), array_agg(price), array_agg(stats_day(created_at))
+          INTO signs, prices, days
+          FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(-1), array_agg(price), array_agg(stats_day(created_at))
+          INTO signs, prices, days
+          FROM old_rows;
+    ELSE
+        SELECT array_agg(s), array_agg(price), array_agg(day)
+          INTO signs, prices, days
+          FROM (SELECT 1 AS s, price, stats_day(created_at) AS day FROM new_rows
+                UNION ALL
+                SELECT -1, price, stats_day(created_at) FROM old_rows) changed;
+    END IF;
+
+    SELECT COALESCE(SUM(s), 0),
+           COALESCE(SUM(s) FILTER (WHERE price IS NOT NULL), 0),
+           COALESCE(SUM(s * price), 0)
+      INTO d_total, d_priced, d_amount
+      FROM unnest(signs, prices, days) AS d(s, price, day);
+
+    IF d_total <> 0 THEN
+        PERFORM stats_bump('market_sales.total', d_total, 0);
+    END IF;
+    IF d_priced <> 0 OR d_amount <> 0 THEN
+        PERFORM stats_bump('market_sales.priced', d_priced, d_amount);
+    END IF;
+
+    INSERT INTO stats_daily (metric, day, n, amount)
+    SELECT 'market_sales.new', day, SUM(s), 0
+      FROM unnest(signs, prices, days) AS d(s, price, day)
+     WHERE day IS NOT NULL
+     GROUP BY day
+    HAVING SUM(s) <> 0
+    ON CONFLICT (metric, day) DO UPDATE
+        SET n = stats_daily.n + EXCLUDED.n;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stats_market_sales ON market_sales;
+DROP TRIGGER IF EXISTS trg_stats_market_sales_ins ON market_sales;
+CREATE TRIGGER trg_stats_market_sales_ins
+    AFTER INSERT ON market_sales
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stats_market_sales_trg();
+
+DROP TRIGGER IF EXISTS trg_stats_market_sales_upd ON market_sales;
+CREATE TRIGGER trg_stats_market_sales_upd
+    AFTER UPDATE ON market_sales
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stats_market_sales_trg();
+
+DROP TRIGGER IF EXISTS trg_stats_market_sales_del ON market_sales;
+CREATE TRIGGER trg_stats_market_sales_del
+    AFTER DELETE ON market_sales
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION stats_market_sales_trg();
+
+
+-- match_reports: total + by status. The table is created by
+-- db_migrate_match_reports.py and may not exist yet.
+CREATE OR REPLACE FUNCTION stats_match_reports_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM stats_bump('match.total', -1, 0);
+        PERFORM stats_bump('match.status.' || COALESCE(OLD.status, 'none'), -1, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM stats_bump('match.total', 1, 0);
+        PERFORM stats_bump('match.status.' || COALESCE(NEW.status, 'none'), 1, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF to_regclass('match_reports') IS NOT NULL THEN
+        EXECUTE 'DROP TRIGGER IF EXISTS trg_stats_match_reports ON match_reports';
+        EXECUTE 'CREATE TRIGGER trg_stats_match_reports
+                     AFTER INSERT OR DELETE OR UPDATE OF status ON match_reports
+                     FOR EACH ROW EXECUTE FUNCTION stats_match_reports_trg()';
+    END IF;
+END $$;
+
+
+-- ─── Seed ───────────────────────────────────────────────────────────────────
+-- ⚠️ Same aggregates as stats_rollups.LIVE_*_SQL (rebuild_triggered / verify);
+-- keep them in step. Locks from the CREATE TRIGGERs above are still held.
+
+DELETE FROM stats_counters;
+DELETE FROM stats_daily
+ WHERE metric IN ('users.new', 'registry.new', 'sightings.new', 'market_sales.new');
+DELETE FROM stats_sighting_serials;
+
+INSERT INTO stats_counters (metric, n, amount)
+SELECT metric, n, amount FROM (
+    SELECT 'users.total' AS metric, COUNT(*)::bigint AS n, 0::numeric AS amount FROM users
+    UNION ALL
+    SELECT 'users.approved', COUNT(*) FILTER (WHERE is_approved = TRUE), 0 FROM users
+    UNION ALL
+    SELECT 'users.pending', COUNT(*) FILTER (WHERE is_approved = FALSE AND is_admin = FALSE), 0 FROM users
+    UNION ALL
+    SELECT 'registry.status.' || COALESCE(status, 'none'), COUNT(*), 0
+    FROM comic_registry GROUP BY status
+    UNION ALL
+    SELECT 'sightings.total', COUNT(*), 0 FROM sighting_reports
+    UNION ALL
+    SELECT 'sightings.notified', COUNT(*) FILTER (WHERE owner_notified = TRUE), 0 FROM sighting_reports
+    UNION ALL
+    SELECT 'sightings.response.' || owner_response, COUNT(*), 0
+    FROM sighting_reports WHERE owner_response IS NOT NULL GROUP BY owner_response
+    UNION ALL
+    SELECT 'market_sales.total', COUNT(*), 0 FROM market_sales
+    UNION ALL
+    SELECT 'market_sales.priced', COUNT(price), COALESCE(SUM(price), 0) FROM market_sales
+) live
+WHERE n <> 0 OR amount <> 0;
+
+DO $$
+BEGIN
+    IF to_regclass('match_reports') IS NOT NULL THEN
+        EXECUTE $seed$
+            INSERT INTO stats_counters (metric, n, amount)
+            SELECT metric, n, amount FROM (
+                SELECT 'match.total' AS metric, COUNT(*)::bigint AS n, 0::numeric AS amount
+                FROM match_reports
+                UNION ALL
+                SELECT 'match.status.' || COALESCE(status, 'none'), COUNT(*), 0
+                FROM match_reports GROUP BY status
+            ) live
+            WHERE n <> 0 OR amount <> 0
+        $seed$;
+    END IF;
+END $$;
+
+INSERT INTO stats_daily (metric, day, n, amount)
+SELECT 'users.new', stats_day(created_at), COUNT(*), 0
+FROM users WHERE created_at IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'registry.new', stats_day(registration_date), COUNT(*), 0
+FROM comic_registry WHERE registration_date IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'sightings.new', stats_day(created_at), COUNT(*), 0
+FROM sighting_reports WHERE created_at IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'market_sales.new', stats_day(created_at), COUNT(*), 0
+FROM market_sales WHERE created_at IS NOT NULL GROUP BY 2;
+
+INSERT INTO stats_sighting_serials (serial_number, n)
+SELECT serial_number, COUNT(*)::int
+FROM sighting_reports WHERE serial_number IS NOT NULL
+GROUP BY serial_number;
+
+INSERT INTO stats_rollup_cursors (source, last_id) VALUES ('triggers', 0)
+ON CONFLICT (source) DO UPDATE SET updated_at = NOW();
+
+COMMIT;
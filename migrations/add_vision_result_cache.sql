@@ -0,0 +1,22 @@
+-- Migration: vision result cache for /api/grade and /api/extract retries
+-- See vision_result_cache.py. One row per successful vision result, keyed by the
+-- per-photo pHashes of the normalized images + comic identity + prompt version.
+-- Scoped per user; rows expire (expires_at) and are swept opportunistically on write.
+
+CREATE TABLE IF NOT EXISTS vision_result_cache (
+    id              SERIAL PRIMARY KEY,
+    user_id         INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    endpoint        VARCHAR(50) NOT NULL,       -- '/api/grade' | '/api/extract'
+    identity_key    VARCHAR(64) NOT NULL,       -- digest of title/issue/labels/runs (grade) or photo_type (extract)
+    prompt_version  VARCHAR(50) NOT NULL,       -- GRADING_PROMPT_VERSION / EXTRACTION_PROMPT_VERSION
+    phash_key       TEXT NOT NULL,              -- '|'-joined per-photo 64-bit pHash hex (exact-hit key)
+    phashes         JSONB NOT NULL,             -- same hashes as an array (near-dup Hamming scan)
+    result          JSONB NOT NULL,
+    created_at      TIMESTAMPTZ DEFAULT NOW(),
+    expires_at      TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_vision_result_cache_lookup
+    ON vision_result_cache(user_id, endpoint, identity_key, prompt_version, expires_at);
+CREATE INDEX IF NOT EXISTS idx_vision_result_cache_expires
+    ON vision_result_cache(expires_at);
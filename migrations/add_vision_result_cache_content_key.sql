@@ -0,0 +1,16 @@
+-- Migration: key vision_result_cache exact hits on content digests, not pHash
+-- See vision_result_cache.py. A pHash match (0 bits) is not "the same photo":
+-- two copies of the same issue hash alike after the gray/blur/256² preprocessing.
+-- content_key is the '|'-joined SHA-256 of each normalized photo's bytes; pHash
+-- columns stay for the opt-in /api/grade near scan.
+
+ALTER TABLE vision_result_cache ADD COLUMN IF NOT EXISTS content_key TEXT;
+
+-- Rows written before this column can only be matched by pHash — drop them.
+DELETE FROM vision_result_cache WHERE content_key IS NULL;
+
+ALTER TABLE vision_result_cache ALTER COLUMN content_key SET NOT NULL;
+
+DROP INDEX IF EXISTS idx_vision_result_cache_lookup;
+CREATE INDEX IF NOT EXISTS idx_vision_result_cache_lookup
+    ON vision_result_cache(user_id, endpoint, identity_key, prompt_version, content_key, expires_at);
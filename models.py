@@ -124,6 +124,50 @@ def call_with_fallback(client, tier, **kwargs):
     raise last_error or ValueError(f"All {tier} fallbacks exhausted: {chain}")
 
 
+def stream_with_fallback(client, tier, on_text=None, **kwargs):
+    """
+    Streaming twin of call_with_fallback, for the SSE mode of /api/grade.
+
+    Same fallback chain and 404 handling, but drives client.messages.stream()
+    and hands every text delta to on_text(delta) as it arrives. Returns the
+    final Message — the same shape create() returns (content[0].text, usage
+    incl. cache_creation/cache_read tokens), so callers parse and log it
+    exactly as they would a non-streamed response.
+
+    ⚠️ A 404 can only be raised before the first event, so a fallback never
+    replays deltas: on_text sees exactly one model's output.
+    """
+    import anthropic
+
+    chain = MODEL_CHAINS.get(tier, [])
+    with _index_lock:
+        start_idx = _active_index.get(tier, 0)
+    last_error = None
+
+    for i in range(start_idx, len(chain)):
+        model = chain[i]
+        try:
+            with client.messages.stream(model=model, **kwargs) as stream:
+                for delta in stream.text_stream:
+                    if on_text:
+                        on_text(delta)
+                response = stream.get_final_message()
+            if i != start_idx:
+                print(f"[Models] {tier} tier now using: {model}")
+            return response
+        except anthropic.NotFoundError as e:
+            if 'model' in str(e).lower():
+                print(f"[Models] {model} returned 404 — trying next fallback")
+                with _index_lock:
+                    if _active_index.get(tier, 0) <= i:
+                        _active_index[tier] = i + 1
+                last_error = e
+                continue
+            raise
+
+    raise last_error or ValueError(f"All {tier} fallbacks exhausted: {chain}")
+
+
 # Convenience constants — these are properties that resolve at call time
 class _ModelProxy:
     def __init__(self, tier):
@@ -0,0 +1,268 @@
+"""
+Input-token budget for rate-limited model calls (signature v2 Opus passes).
+
+The v2 orchestrator used to run its passes strictly one after another because
+parallel calls tripped the Opus input-tokens-per-minute limit (30K ITPM) —
+60-90s per identification even when nothing else was using the budget — and
+retried failed passes blindly afterwards. This module is a token bucket that
+models that limit instead:
+
+- Capacity = one minute of SIG_OPUS_INPUT_TPM, refilled continuously.
+- acquire(n) admits a call as soon as n tokens are available (or the bucket is
+  full — a single request bigger than a minute's budget goes out and leaves
+  the bucket in debt, which is how the API's own bucket behaves), otherwise it
+  waits, up to SIG_OPUS_QUEUE_TIMEOUT seconds.
+- settle(estimate, actual) corrects the debit from the response's usage, so a
+  rough estimate does not drift: the bucket tracks what the API counted.
+- penalize(retry_after) after a 429: every caller waits until retry-after
+  (and the bucket restarts from empty — something else is spending it).
+
+Cross-worker: with DATABASE_URL set the bucket is one row in
+opus_token_budget (migrations/add_opus_token_budget.sql), refilled and
+debited under SELECT ... FOR UPDATE, so all gunicorn workers share it. A pass
+is ~20-30s, so two short queries per admission are noise. Any DB error falls
+back to a per-process bucket for DB_RETRY_S — a missing table or a DB blip
+never blocks an identification.
+
+Charged tokens: input_tokens + cache_creation_input_tokens. Prompt-cache
+READS do not count toward ITPM on current models; set
+SIG_OPUS_CACHE_READS_COUNT=1 if the account's limits say otherwise.
+"""
+import base64
+import email.utils
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import db as _dbpool
+
+logger = logging.getLogger(__name__)
+
+OPUS_INPUT_TPM = int(os.environ.get('SIG_OPUS_INPUT_TPM', '30000'))
+QUEUE_TIMEOUT_S = float(os.environ.get('SIG_OPUS_QUEUE_TIMEOUT', '120'))
+CACHE_READS_COUNT = os.environ.get('SIG_OPUS_CACHE_READS_COUNT', '0') == '1'
+DEFAULT_RETRY_AFTER_S = 10.0
+POLL_MAX_S = 2.0
+DB_RETRY_S = 60.0
+
+# Image token estimate (Anthropic vision docs): images are scaled to fit a
+# 1568px long edge / ~1.15MP, then cost about width*height/750 tokens.
+IMAGE_MAX_EDGE = 1568
+IMAGE_MAX_PIXELS = 1_150_000
+IMAGE_FALLBACK_TOKENS = 1600
+CHARS_PER_TOKEN = 3.5   # conservative for English prose + JSON
+
+
+def _image_tokens(b64):
+    try:
+        from PIL import Image
+        with Image.open(BytesIO(base64.b64decode(b64))) as img:
+            w, h = img.size   # header only — no pixel decode
+    except Exception:
+        return IMAGE_FALLBACK_TOKENS
+    s = min(1.0, IMAGE_MAX_EDGE / max(w, h), (IMAGE_MAX_PIXELS / float(w * h)) ** 0.5)
+    return int((w * s) * (h * s) / 750) + 1
+
+
+def estimate_input_tokens(system, messages):
+    """Rough input-token count for one messages.create call: text by
+    character count, images by their dimensions."""
+    chars = 0
+    images = 0
+    blocks = list(system) if isinstance(system, list) else [{"type": "text", "text": system or ""}]
+    for m in messages:
+        c = m.get("content")
+        blocks.extend(c if isinstance(c, list) else [{"type": "text", "text": c or ""}])
+    for b in blocks:
+        if b.get("type") == "image":
+            images += _image_tokens(b["source"]["data"])
+        else:
+            chars += len(b.get("text", ""))
+    return int(chars / CHARS_PER_TOKEN) + images
+
+
+def charged_tokens(usage):
+    """Tokens the API counts against ITPM for one response's usage dict."""
+    usage = usage or {}
+    n = usage.get("input_tokens", 0) + usage.get("cache_creation_input_tokens", 0)
+    if CACHE_READS_COUNT:
+        n += usage.get("cache_read_input_tokens", 0)
+    return n
+
+
+def is_rate_limited(exc):
+    """True for a 429 (rate limit) or 529 (overloaded) API error."""
+    return getattr(exc, "status_code", None) in (429, 529)
+
+
+def retry_after_seconds(exc, default=DEFAULT_RETRY_AFTER_S):
+    """Seconds to wait after a 429, from retry-after (seconds or HTTP date) or
+    anthropic-ratelimit-input-tokens-reset (RFC 3339)."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(value)
+                return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+            except Exception:
+                pass
+    reset = headers.get("anthropic-ratelimit-input-tokens-reset")
+    if reset:
+        try:
+            when = datetime.fromisoformat(reset.replace("Z", "+00:00"))
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+        except ValueError:
+            pass
+    return default
+
+
+class TokenBudget:
+    """Token bucket (see module docstring). Thread-safe; shared across workers
+    through Postgres when `shared` and DATABASE_URL are set."""
+
+    def __init__(self, name, tokens_per_minute, shared=True):
+        self.name = name
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._db_down_until = 0.0
+
+    # --- backends -----------------------------------------------------
+    def _use_db(self):
+        return (self.shared and os.environ.get('DATABASE_URL')
+                and time.monotonic() >= self._db_down_until)
+
+    def _db_failed(self, e):
+        logger.warning("[OpusBudget] shared bucket unavailable, using per-process bucket "
+                       "for %.0fs: %s", DB_RETRY_S, e)
+        self._db_down_until = time.monotonic() + DB_RETRY_S
+
+    def _decide(self, tokens, blocked_s, need):
+        """(admitted, new_tokens, wait_s) for a refilled bucket level."""
+        if blocked_s > 0:
+            return False, tokens, blocked_s
+        if tokens >= need or tokens >= self.capacity:
+            return True, tokens - need, 0.0
+        return False, tokens, (min(need, self.capacity) - tokens) / self.rate
+
+    def _try_local(self, need):
+        with self._lock:
+            now = time.monotonic()
+            # _updated may sit in the future after penalize(): no refill until then.
+            self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._updated) * self.rate)
+            self._updated = max(self._updated, now)
+            admitted, self._tokens, wait = self._decide(self._tokens, self._blocked_until - now, need)
+            return admitted, wait
+
+    def _try_db(self, need):
+        conn = _dbpool.get_db()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO opus_token_budget (name, tokens) VALUES (%s, %s)
+                ON CONFLICT (name) DO NOTHING
+            """, (self.name, self.capacity))
+            cur.execute("""
+                SELECT LEAST(%s, tokens + GREATEST(0, EXTRACT(EPOCH FROM (NOW() - updated_at))) * %s),
+                       COALESCE(EXTRACT(EPOCH FROM (blocked_until - NOW())), 0)
+                FROM opus_token_budget WHERE name = %s FOR UPDATE
+            """, (self.capacity, self.rate, self.name))
+            tokens, blocked_s = cur.fetchone()
+            admitted, new_tokens, wait = self._decide(float(tokens), float(blocked_s), need)
+            cur.execute("""
+                UPDATE opus_token_budget SET tokens = %s, updated_at = GREATEST(updated_at, NOW())
+                WHERE name = %s
+            """, (new_tokens, self.name))
+            conn.commit()
+            cur.close()
+            return admitted, wait
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _adjust_db(self, sql, params):
+        conn = _dbpool.get_db()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # --- public -------------------------------------------------------
+    def acquire(self, tokens, timeout=QUEUE_TIMEOUT_S):
+        """Block until `tokens` are admitted. Returns the seconds spent
+        queued, or None if `timeout` ran out first."""
+        need = max(0.0, float(tokens))
+        started = time.monotonic()
+        while True:
+            try:
+                admitted, wait = self._try_db(need) if self._use_db() else self._try_local(need)
+            except Exception as e:
+                self._db_failed(e)
+                admitted, wait = self._try_local(need)
+            waited = time.monotonic() - started
+            if admitted:
+                return waited
+            if waited + wait > timeout:
+                return None
+            time.sleep(min(max(wait, 0.05), POLL_MAX_S))
+
+    def settle(self, estimated, actual):
+        """Correct an admission once the real usage is known (refunds an
+        over-estimate, charges an under-estimate)."""
+        delta = float(actual) - float(estimated)
+        if not delta:
+            return
+        if self._use_db():
+            try:
+                self._adjust_db("""
+                    UPDATE opus_token_budget SET tokens = LEAST(%s, tokens - %s) WHERE name = %s
+                """, (self.capacity, delta, self.name))
+                return
+            except Exception as e:
+                self._db_failed(e)
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+    def penalize(self, retry_after_s):
+        """A 429 says the API's bucket is empty: hold every caller back for
+        retry_after_s and restart this bucket from zero."""
+        retry_after_s = max(0.0, float(retry_after_s))
+        if self._use_db():
+            try:
+                self._adjust_db("""
+                    UPDATE opus_token_budget
+                    SET tokens = LEAST(tokens, 0), updated_at = NOW() + make_interval(secs => %s),
+                        blocked_until = GREATEST(COALESCE(blocked_until, NOW()),
+                                                 NOW() + make_interval(secs => %s))
+                    WHERE name = %s
+                """, (retry_after_s, retry_after_s, self.name))
+                return
+            except Exception as e:
+                self._db_failed(e)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, now + retry_after_s)
+            self._blocked_until = max(self._blocked_until, now + retry_after_s)
+
+
+# Shared by every Opus caller in this process (and, via Postgres, every worker).
+OPUS_BUDGET = TokenBudget('opus_itpm', OPUS_INPUT_TPM)
@@ -29,6 +29,7 @@ from admin import (
     get_dashboard_stats, get_recent_errors, get_anthropic_usage_summary,
     natural_language_query
 )
+import signature_reference_cache as ref_cache
 
 # Moderation functions (will be passed in via init_modules if available)
 get_moderation_incidents = None
@@ -39,13 +40,15 @@ MODERATION_AVAILABLE = False
 BARCODE_AVAILABLE = False
 R2_AVAILABLE = False
 scan_barcode_from_base64 = None
+scan_barcode_from_bytes = None
 
 
 def init_modules(moderation_available, barcode_available, r2_available, scan_barcode_func,
-                 get_mod_incidents_func=None, get_mod_stats_func=None):
+                 get_mod_incidents_func=None, get_mod_stats_func=None,
+                 scan_barcode_bytes_func=None):
     """Initialize modules from wsgi.py"""
     global MODERATION_AVAILABLE, BARCODE_AVAILABLE, R2_AVAILABLE, scan_barcode_from_base64
-    global get_moderation_incidents, get_moderation_stats
+    global get_moderation_incidents, get_moderation_stats, scan_barcode_from_bytes
     
     MODERATION_AVAILABLE = moderation_available
     BARCODE_AVAILABLE = barcode_available
@@ -53,6 +56,7 @@ def init_modules(moderation_available, barcode_available, r2_available, scan_bar
     scan_barcode_from_base64 = scan_barcode_func
     get_moderation_incidents = get_mod_incidents_func
     get_moderation_stats = get_mod_stats_func
+    scan_barcode_from_bytes = scan_barcode_bytes_func
 
 
 @admin_bp.route('/dependency-status', methods=['GET'])
@@ -516,6 +520,8 @@ def api_add_signature_image(sig_id):
         
         new_id = cur.fetchone()['id']
         conn.commit()
+        # The creator's reference set changed — drop this worker's cached copy.
+        ref_cache.invalidate_creator(sig_id)
         
         return jsonify({'success': True, 'id': new_id, 'url': image_url})
     except Exception as e:
@@ -535,11 +541,14 @@ def api_delete_signature_image(image_id):
     cur = conn.cursor()
     
     try:
-        cur.execute("DELETE FROM signature_images WHERE id = %s RETURNING id", (image_id,))
+        cur.execute("DELETE FROM signature_images WHERE id = %s RETURNING id, creator_id, image_url",
+                    (image_id,))
         result = cur.fetchone()
         conn.commit()
         
         if result:
+            ref_cache.invalidate_url(result[2])
+            ref_cache.invalidate_creator(result[1])
             return jsonify({'success': True})
         else:
             return jsonify({'success': False, 'error': 'Image not found'}), 404
@@ -701,133 +710,78 @@ def api_verify_signature(sig_id):
 @require_admin_auth
 def api_backfill_barcodes():
     """
-    Backfill barcode data for existing market_sales images stored in R2.
-    Downloads each image, scans for barcode, updates database.
+    Start (or resume) the background barcode backfill for market_sales images
+    stored in R2. Returns immediately; poll GET /backfill-barcodes/status.
+    See barcode_backfill.py.
     
     Body: {
-        "limit": 100,      # Max records to process (default 100, max 500)
-        "dry_run": false   # If true, scan but don't update DB
+        "limit": null,     # Max records for a NEW job (default: whole backlog)
+        "dry_run": false,  # If true, scan but don't update DB (new job only)
+        "restart": false   # Cancel the unfinished job and start over
     }
     
-    Returns stats on processed/found/updated counts.
+    202 with the job status when this call started/resumed it; 200 with the
+    status when another worker is already running it.
     """
-    import requests
-    import base64
+    import barcode_backfill
     
-    if not BARCODE_AVAILABLE:
+    if not BARCODE_AVAILABLE or not scan_barcode_from_bytes:
         return jsonify({
             'success': False, 
             'error': 'Barcode scanning not available (requires Docker deployment)'
         }), 503
     
-    data = request.get_json() or {}
-    limit = min(data.get('limit', 100), 500)  # Cap at 500 to avoid timeout
-    dry_run = data.get('dry_run', False)
-    
-    database_url = os.environ.get('DATABASE_URL')
-    conn = None
-    
-    stats = {
-        'processed': 0,
-        'barcodes_found': 0,
-        'updated': 0,
-        'errors': 0,
-        'already_have_barcode': 0,
-        'remaining': 0,
-        'dry_run': dry_run,
-        'details': []  # First few results for verification
-    }
+    data = request.get_json(silent=True) or {}
+    limit = data.get('limit')
+    if limit is not None:
+        try:
+            limit = max(1, int(limit))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
     
     try:
-        conn = _dbpool.get_db(dict_rows=True)
-        cur = conn.cursor()
-        
-        # Find records with R2 images but no barcode data
-        cur.execute("""
-            SELECT id, title, issue, image_url
-            FROM market_sales
-            WHERE image_url LIKE '%%.r2.dev%%'
-              AND upc_main IS NULL
-            ORDER BY id
-            LIMIT %s
-        """, (limit,))
-        
-        records = cur.fetchall()
-        
-        # Count remaining for progress tracking
-        cur.execute("""
-            SELECT COUNT(*) as count
-            FROM market_sales
-            WHERE image_url LIKE '%%.r2.dev%%'
-              AND upc_main IS NULL
-        """)
-        total_remaining = cur.fetchone()['count']
-        stats['remaining'] = total_remaining - len(records)
-        
-        for record in records:
-            stats['processed'] += 1
-            sale_id = record['id']
-            image_url = record['image_url']
-            
-            try:
-                # Download image from R2
-                response = requests.get(image_url, timeout=10)
-                if response.status_code != 200:
-                    stats['errors'] += 1
-                    continue
-                
-                # Convert to base64
-                image_b64 = base64.b64encode(response.content).decode('utf-8')
-                
-                # Scan for barcode
-                barcode_result = scan_barcode_from_base64(image_b64)
-                
-                if barcode_result:
-                    stats['barcodes_found'] += 1
-                    upc_main = barcode_result.get('upc_main')
-                    upc_addon = barcode_result.get('upc_addon')
-                    is_reprint = barcode_result.get('is_reprint', False)
-                    
-                    # Add to details (first 10 only)
-                    if len(stats['details']) < 10:
-                        stats['details'].append({
-                            'id': sale_id,
-                            'title': record['title'],
-                            'issue': record['issue'],
-                            'upc_main': upc_main,
-                            'upc_addon': upc_addon,
-                            'is_reprint': is_reprint
-                        })
-                    
-                    if not dry_run:
-                        # Update database
-                        cur.execute("""
-                            UPDATE market_sales
-                            SET upc_main = %s,
-                                upc_addon = %s,
-                                is_reprint = %s
-                            WHERE id = %s
-                        """, (upc_main, upc_addon, is_reprint, sale_id))
-                        conn.commit()
-                        stats['updated'] += 1
-                    else:
-                        stats['updated'] += 1  # Would have updated
-                        
-            except Exception as e:
-                stats['errors'] += 1
-                print(f"[Backfill] Error processing sale {sale_id}: {e}")
-                continue
-        
+        job, started = barcode_backfill.start_job(
+            scan_barcode_from_bytes,
+            dry_run=bool(data.get('dry_run', False)),
+            max_rows=limit,
+            restart=bool(data.get('restart', False)),
+        )
         return jsonify({
             'success': True,
-            **stats
-        })
-        
+            'started': started,
+            'job': barcode_backfill.describe(job)
+        }), (202 if started else 200)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/backfill-barcodes/status', methods=['GET'])
+@require_admin_auth
+def api_backfill_barcodes_status():
+    """Progress, throughput and ETA of the latest (or ?job_id=) backfill job."""
+    import barcode_backfill
+    
+    try:
+        job = barcode_backfill.get_job(request.args.get('job_id', type=int))
+        if not job:
+            return jsonify({'success': False, 'error': 'No backfill job found'}), 404
+        return jsonify({'success': True, 'job': barcode_backfill.describe(job)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/backfill-barcodes/<int:job_id>/cancel', methods=['POST'])
+@require_admin_auth
+def api_backfill_barcodes_cancel(job_id):
+    """Stop a backfill job after its current batch (its cursor is kept)."""
+    import barcode_backfill
+    
+    try:
+        if barcode_backfill.cancel_job(job_id):
+            return jsonify({'success': True})
+        return jsonify({'success': False, 'error': 'Job not found or already finished'}), 404
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
 
 
 @admin_bp.route('/waitlist', methods=['GET'])
@@ -1017,7 +971,9 @@ def api_barcode_stats():
                 COUNT(*) FILTER (WHERE image_url LIKE '%%.r2.dev%%') as has_r2_image,
                 COUNT(*) FILTER (WHERE upc_main IS NOT NULL) as has_barcode,
                 COUNT(*) FILTER (WHERE is_reprint = true) as reprints_detected,
-                COUNT(*) FILTER (WHERE image_url LIKE '%%.r2.dev%%' AND upc_main IS NULL) as needs_scan
+                COUNT(*) FILTER (WHERE image_url LIKE '%%.r2.dev%%' AND upc_main IS NULL
+                                   AND barcode_scanned_at IS NULL) as needs_scan,
+                COUNT(*) FILTER (WHERE upc_main IS NULL AND barcode_scanned_at IS NOT NULL) as scanned_no_barcode
             FROM market_sales
         """)
         stats = dict(cur.fetchone())
@@ -1050,21 +1006,28 @@ def api_slab_guard_stats():
     Slab Guard operational dashboard — registrations, sightings, theft reports.
     Admin only.
     """
+    import stats_rollups
+    from datetime import timedelta
+    rollup_state = stats_rollups.maybe_refresh()
     conn = None
     try:
-        database_url = os.environ.get('DATABASE_URL')
         conn = _dbpool.get_db()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         stats = {}
 
+        # Totals and per-day series come from the trigger-maintained rollups
+        # (stats_rollups.py) — O(days) rows instead of GROUP BYs over
+        # comic_registry / sighting_reports / match_reports on every load.
+        # Day windows are whole UTC days including today.
+        today = stats_rollups.utc_today()
+        month_start = today - timedelta(days=29)
+        week_start = today - timedelta(days=6)
+        days = stats_rollups.daily(cur, ('registry.new', 'sightings.new'), since=month_start)
+
         # --- Registration totals by status ---
-        cur.execute("""
-            SELECT status, COUNT(*) as count
-            FROM comic_registry
-            GROUP BY status
-        """)
-        status_counts = {r['status']: r['count'] for r in cur.fetchall()}
+        status_counts = {m[len('registry.status.'):]: n for m, (n, _) in
+                         stats_rollups.counters(cur, 'registry.status.').items()}
         stats['registrations'] = {
             'total': sum(status_counts.values()),
             'active': status_counts.get('active', 0),
@@ -1073,67 +1036,37 @@ def api_slab_guard_stats():
         }
 
         # --- Registrations over time (last 30 days) ---
-        cur.execute("""
-            SELECT DATE(registration_date) as date, COUNT(*) as count
-            FROM comic_registry
-            WHERE registration_date > NOW() - INTERVAL '30 days'
-            GROUP BY DATE(registration_date)
-            ORDER BY date
-        """)
         stats['registrations_by_day'] = [
-            {'date': str(r['date']), 'count': r['count']} for r in cur.fetchall()
+            {'date': str(day), 'count': n}
+            for day, (n, _) in sorted(days.get('registry.new', {}).items()) if n
         ]
 
         # --- Sighting reports ---
-        cur.execute("SELECT COUNT(*) as total FROM sighting_reports")
-        total_sightings = cur.fetchone()['total']
-
-        cur.execute("""
-            SELECT COUNT(*) as count FROM sighting_reports
-            WHERE created_at > NOW() - INTERVAL '7 days'
-        """)
-        sightings_week = cur.fetchone()['count']
-
-        cur.execute("""
-            SELECT COUNT(*) as count FROM sighting_reports
-            WHERE created_at > NOW() - INTERVAL '30 days'
-        """)
-        sightings_month = cur.fetchone()['count']
-
-        cur.execute("""
-            SELECT COUNT(*) as count FROM sighting_reports
-            WHERE owner_notified = TRUE
-        """)
-        notified = cur.fetchone()['count']
-
+        sightings = stats_rollups.counters(cur, 'sightings.')
         stats['sightings'] = {
-            'total': total_sightings,
-            'last_7_days': sightings_week,
-            'last_30_days': sightings_month,
-            'owner_notified': notified,
+            'total': sightings.get('sightings.total', (0, 0))[0],
+            'last_7_days': stats_rollups.total(days, 'sightings.new', week_start)[0],
+            'last_30_days': stats_rollups.total(days, 'sightings.new')[0],
+            'owner_notified': sightings.get('sightings.notified', (0, 0))[0],
         }
 
         # --- Sightings by day (last 30 days) ---
-        cur.execute("""
-            SELECT DATE(created_at) as date, COUNT(*) as count
-            FROM sighting_reports
-            WHERE created_at > NOW() - INTERVAL '30 days'
-            GROUP BY DATE(created_at)
-            ORDER BY date
-        """)
         stats['sightings_by_day'] = [
-            {'date': str(r['date']), 'count': r['count']} for r in cur.fetchall()
+            {'date': str(day), 'count': n}
+            for day, (n, _) in sorted(days.get('sightings.new', {}).items()) if n
         ]
 
         # --- Top reported serials ---
+        # stats_sighting_serials is kept per serial by the sighting_reports
+        # trigger; the (n DESC) index walk stops after 10 joined rows.
         cur.execute("""
-            SELECT sr.serial_number, COUNT(*) as report_count,
+            SELECT s.serial_number, s.n as report_count,
                    c.title, c.issue, cr.status
-            FROM sighting_reports sr
-            JOIN comic_registry cr ON sr.serial_number = cr.serial_number
+            FROM stats_sighting_serials s
+            JOIN comic_registry cr ON s.serial_number = cr.serial_number
             JOIN collections c ON cr.comic_id = c.id
-            GROUP BY sr.serial_number, c.title, c.issue, cr.status
-            ORDER BY report_count DESC
+            WHERE s.n > 0
+            ORDER BY s.n DESC
             LIMIT 10
         """)
         stats['top_reported'] = [dict(r) for r in cur.fetchall()]
@@ -1162,36 +1095,28 @@ def api_slab_guard_stats():
         stats['blocked_ips'] = cur.fetchone()['count']
 
         # --- Owner response rates ---
-        cur.execute("""
-            SELECT owner_response, COUNT(*) as count
-            FROM sighting_reports
-            WHERE owner_response IS NOT NULL
-            GROUP BY owner_response
-        """)
-        stats['owner_responses'] = {r['owner_response']: r['count'] for r in cur.fetchall()}
+        stats['owner_responses'] = {
+            m[len('sightings.response.'):]: n
+            for m, (n, _) in sightings.items()
+            if m.startswith('sightings.response.') and n
+        }
 
         # --- Match reports (from extension/API) ---
-        try:
-            cur.execute("SELECT COUNT(*) as total FROM match_reports")
-            total_matches = cur.fetchone()['total']
-
-            cur.execute("""
-                SELECT status, COUNT(*) as count
-                FROM match_reports
-                GROUP BY status
-            """)
-            match_statuses = {r['status']: r['count'] for r in cur.fetchall()}
-
+        cur.execute("SELECT to_regclass('match_reports') IS NOT NULL as present")
+        if cur.fetchone()['present']:
+            matches = stats_rollups.counters(cur, 'match.')
             stats['match_reports'] = {
-                'total': total_matches,
-                'pending': match_statuses.get('pending', 0),
-                'confirmed': match_statuses.get('confirmed', 0),
-                'dismissed': match_statuses.get('dismissed', 0),
+                'total': matches.get('match.total', (0, 0))[0],
+                'pending': matches.get('match.status.pending', (0, 0))[0],
+                'confirmed': matches.get('match.status.confirmed', (0, 0))[0],
+                'dismissed': matches.get('match.status.dismissed', (0, 0))[0],
             }
-        except Exception:
+        else:
             # match_reports table may not exist yet
             stats['match_reports'] = {'total': 0, 'note': 'table not yet created'}
 
+        # False → counters read zero until POST /stats-rollups/rebuild.
+        stats['rollups_seeded'] = rollup_state['seeded']
         cur.close()
         return jsonify({'success': True, **stats})
 
@@ -1207,6 +1132,86 @@ def api_slab_guard_stats():
                 pass
 
 
+@admin_bp.route('/stats-rollups/verify', methods=['GET'])
+@require_admin_auth
+def api_admin_verify_stats_rollups():
+    """Recompute the dashboard rollups from the live tables and list any
+    mismatches (stats_rollups.verify). Full scans — run on demand, not on
+    every dashboard load."""
+    import stats_rollups
+    try:
+        return jsonify({'success': True, **stats_rollups.verify()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/stats-rollups/rebuild', methods=['POST'])
+@require_admin_auth
+def api_admin_rebuild_stats_rollups():
+    """Reseed the rollups from the live tables.
+
+    Optional JSON {"sources": ["triggers", "request_logs", "api_usage",
+    "ebay_sales"]} — default all. Aggregated sources refold for up to ~20s;
+    anything left is folded by later dashboard loads (readers stay exact via
+    the live tail meanwhile)."""
+    import stats_rollups
+    sources = (request.get_json(silent=True) or {}).get('sources')
+    try:
+        return jsonify({'success': True, **stats_rollups.rebuild(sources)})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/vision-cache', methods=['DELETE'])
+@require_admin_auth
+def api_admin_invalidate_vision_cache():
+    """Invalidate the /api/grade + /api/extract result cache (vision_result_cache.py).
+
+    Optional ?user_id= and/or ?endpoint=/api/grade|/api/extract; no filters drops
+    every entry (e.g. after a grading-engine change that did not bump the prompt
+    version)."""
+    from vision_result_cache import invalidate
+    try:
+        deleted = invalidate(user_id=request.args.get('user_id', type=int),
+                             endpoint=request.args.get('endpoint'))
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/marketplace-content-cache', methods=['DELETE'])
+@require_admin_auth
+def api_admin_invalidate_marketplace_content_cache():
+    """Invalidate the marketplace prep content cache (marketplace_content_cache.py).
+
+    Optional ?platform=<PLATFORMS key>; no filter drops every entry. Prompt
+    changes should bump CONTENT_PROMPT_VERSION instead."""
+    from marketplace_content_cache import invalidate
+    try:
+        deleted = invalidate(platform_key=request.args.get('platform'))
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route('/signature-id-cache', methods=['DELETE'])
+@require_admin_auth
+def api_admin_invalidate_signature_id_cache():
+    """Invalidate the signature identification result cache (signature_result_cache.py).
+
+    Optional ?endpoint=/api/signatures/identify|/api/signatures/v2/match. Entries
+    already go stale on their own when a ranked creator's reference images or
+    the creator roster change; this is for prompt/pipeline changes."""
+    from signature_result_cache import invalidate
+    try:
+        deleted = invalidate(endpoint=request.args.get('endpoint'))
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ──────────────────────────────────────────────
 # Grade-submission retention — find / view / delete (admin)
 # docs/technical/GRADE_RETENTION_SPEC.md §5. This is the diagnostic surface that was
@@ -22,6 +22,7 @@ import psycopg2
 from datetime import datetime
 from flask import Blueprint, jsonify, request, g
 from auth import require_auth, require_approved, verify_jwt, get_user_by_id
+import entitlements
 
 logger = logging.getLogger(__name__)
 
@@ -218,38 +219,27 @@ def get_db():
     return _dbpool.get_db()
 
 
-def get_user_plan(user_id):
-    """Get the user's current plan from the database"""
+def get_user_plan(user_id, fresh=False):
+    """Get the user's current plan from the entitlement snapshot (entitlements.py:
+    one users read per request, short-TTL cache across requests). Pass
+    fresh=True when the caller compares a usage counter against a cap."""
     try:
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT plan, stripe_customer_id, stripe_subscription_id,
-                       subscription_status, billing_period, current_period_end,
-                       valuations_this_month, valuations_reset_date,
-                       COALESCE(is_admin, FALSE)
-                FROM users
-                WHERE id = %s
-            """, (user_id,))
-            row = cur.fetchone()
-            cur.close()
-        finally:
-            conn.close()
+        row = entitlements.get_entitlements(user_id, fresh=fresh)
 
         if not row:
             return None
 
         return {
-            'plan': row[0] or 'free',
-            'stripe_customer_id': row[1],
-            'stripe_subscription_id': row[2],
-            'subscription_status': row[3] or 'none',
-            'billing_period': row[4] or 'monthly',
-            'current_period_end': row[5].isoformat() if row[5] else None,
-            'valuations_this_month': row[6] or 0,
-            'valuations_reset_date': row[7].isoformat() if row[7] else None,
-            'is_admin': bool(row[8]),
+            'plan': row['plan'] or 'free',
+            'stripe_customer_id': row['stripe_customer_id'],
+            'stripe_subscription_id': row['stripe_subscription_id'],
+            'subscription_status': row['subscription_status'] or 'none',
+            'billing_period': row['billing_period'] or 'monthly',
+            'current_period_end': row['current_period_end'].isoformat() if row['current_period_end'] else None,
+            'valuations_this_month': row['valuations_this_month'] or 0,
+            'valuations_reset_date': row['valuations_reset_date'].isoformat() if row['valuations_reset_date'] else None,
+            'is_admin': bool(row['is_admin']),
+            'registrations': row['registrations'] or 0,
         }
     except Exception as e:
         print(f"[Billing] Error getting user plan: {e}")
@@ -299,6 +289,9 @@ def update_user_subscription(user_id, plan, stripe_customer_id=None,
             cur.close()
         finally:
             conn.close()
+        # Every webhook handler lands here: drop the cached entitlement so the
+        # new tier applies on this worker's next request (others: within TTL).
+        entitlements.invalidate(user_id)
         return True
     except Exception as e:
         print(f"[Billing] Error updating subscription: {e}")
@@ -337,7 +330,9 @@ def check_feature_access(user_id, feature):
     below, which uses the same is_admin short-circuit. The two drifting apart
     (this one lacking the bypass) is exactly what caused the vision-gate bug.
     """
-    user_plan = get_user_plan(user_id)
+    # Counter-vs-cap features read the row fresh (another worker may have just
+    # incremented it); plan-only features may use the short-TTL snapshot.
+    user_plan = get_user_plan(user_id, fresh=feature in ('valuations', 'slab_guard_registrations'))
     if not user_plan:
         return False, "User not found"
 
@@ -382,24 +377,13 @@ def check_feature_access(user_id, feature):
         limit = plan['slab_guard_registrations']
         if limit == -1:
             return True, "Unlimited"
-        # Count current registrations
-        try:
-            conn = get_db()
-            try:
-                cur = conn.cursor()
-                cur.execute(
-                    "SELECT COUNT(*) FROM comic_registry WHERE user_id = %s AND status = 'active'",
-                    (user_id,)
-                )
-                count = cur.fetchone()[0]
-                cur.close()
-            finally:
-                conn.close()
-            if count >= limit:
-                return False, f"Registration limit reached ({limit})"
-            return True, f"{limit - count} remaining"
-        except:
-            return True, "Unknown"
+        # Active registration count comes with the snapshot (same query)
+        count = user_plan.get('registrations')
+        if count is None:
+            return True, "Unknown"      # snapshot read failed — as before, don't block
+        if count >= limit:
+            return False, f"Registration limit reached ({limit})"
+        return True, f"{limit - count} remaining"
 
     elif feature == 'extra_photos':
         limit = plan.get('extra_photos_limit', 0)
@@ -430,17 +414,7 @@ def get_signature_id_entitlement(user_id):
     the signature endpoint (it owns the sig_checks counter).
     """
     try:
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT plan, subscription_status, COALESCE(is_admin, FALSE) FROM users WHERE id = %s",
-                (user_id,)
-            )
-            row = cur.fetchone()
-            cur.close()
-        finally:
-            conn.close()
+        row = entitlements.get_entitlements(user_id)
     except Exception as e:
         print(f"[Billing] signature entitlement check failed (failing closed): {e}")
         return {'reason': 'error', 'limit': 0, 'plan': None, 'is_admin': False,
@@ -450,9 +424,9 @@ def get_signature_id_entitlement(user_id):
         return {'reason': 'error', 'limit': 0, 'plan': None, 'is_admin': False,
                 'message': 'User not found'}
 
-    plan_key = row[0] or 'free'
-    status = row[1] or 'none'
-    is_admin = bool(row[2])
+    plan_key = row['plan'] or 'free'
+    status = row['subscription_status'] or 'none'
+    is_admin = bool(row['is_admin'])
 
     # Mirrors the admin short-circuit in check_feature_access() above — keep the
     # two in sync (their drift is what caused the vision-gate bug).
@@ -513,21 +487,8 @@ def get_my_plan():
     plan_key = user_plan['plan']
     plan_config = PLANS.get(plan_key, PLANS['free'])
 
-    # Check registration count
-    try:
-        conn = get_db()
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT COUNT(*) FROM comic_registry WHERE user_id = %s AND status = 'active'",
-                (user_id,)
-            )
-            reg_count = cur.fetchone()[0]
-            cur.close()
-        finally:
-            conn.close()
-    except:
-        reg_count = 0
+    # Registration count comes with the snapshot
+    reg_count = user_plan.get('registrations', 0)
 
     return jsonify({
         'plan': plan_key,
@@ -1023,6 +984,7 @@ def record_valuation():
             cur.close()
         finally:
             conn.close()
+        entitlements.invalidate(user_id)
 
         return jsonify({'recorded': True})
     except Exception as e:
@@ -6,6 +6,8 @@ import os
 from flask import Blueprint, jsonify, request, g
 import psycopg2
 import db as _dbpool
+import watermark_cache
+import entitlements
 from psycopg2.extras import RealDictCursor
 import json
 
@@ -222,9 +224,13 @@ def api_delete_collection_item(item_id):
         except Exception:
             cur.execute("ROLLBACK TO SAVEPOINT sp_matches")
 
-        # 3. Comic registry entries
+        # 3. Comic registry entries (remember the serials: their cached
+        #    watermarked covers are dropped after the commit)
+        serials = []
         try:
             cur.execute("SAVEPOINT sp_registry")
+            cur.execute("SELECT serial_number FROM comic_registry WHERE comic_id = %s", (item_id,))
+            serials = [r['serial_number'] for r in cur.fetchall()]
             cur.execute("DELETE FROM comic_registry WHERE comic_id = %s", (item_id,))
             cur.execute("RELEASE SAVEPOINT sp_registry")
         except Exception:
@@ -234,6 +240,10 @@ def api_delete_collection_item(item_id):
         cur.execute("DELETE FROM collections WHERE id = %s AND user_id = %s RETURNING id", (item_id, g.user_id))
         deleted = cur.fetchone()
         conn.commit()
+        for serial in serials:
+            watermark_cache.invalidate(serial)
+        if serials:
+            entitlements.invalidate(g.user_id)   # active registration count changed
 
         if deleted:
             return jsonify({'success': True})
@@ -5,8 +5,11 @@ Routes: /api/valuate, /api/extract, /api/cache/check, /api/messages, /api/grade
 import os
 import json
 import time
+import queue
+import itertools
+import threading
 import concurrent.futures
-from flask import Blueprint, jsonify, request, g
+from flask import Blueprint, Response, jsonify, request, g, stream_with_context
 
 # Create blueprint
 grading_bp = Blueprint('grading', __name__, url_prefix='/api')
@@ -21,10 +24,17 @@ grading_bp = Blueprint('grading', __name__, url_prefix='/api')
 # comic_extraction.py — barcode-preserving). Env-overridable for booth tuning.
 GRADING_MAX_LONG_EDGE = int(os.environ.get('GRADING_MAX_LONG_EDGE', '2000'))
 
+# Adaptive multi-run (grading_engine.run_adaptive_multi_run): a runs=3 grade
+# fires two calls and skips the third when they agree. On by default; a request
+# can still force all runs with "adaptive": false (calibration/consistency tests).
+# GRADING_ADAPTIVE_RUNS=0 is the no-deploy rollback lever.
+GRADING_ADAPTIVE_RUNS = os.environ.get('GRADING_ADAPTIVE_RUNS', '1') == '1'
+_BOOL_STRINGS = {'true': True, '1': True, 'false': False, '0': False}
+
 # These will be imported from wsgi.py when needed
 from auth import require_auth, require_approved
 from admin import log_api_usage
-from models import SONNET, get_model, call_with_fallback
+from models import SONNET, get_model, call_with_fallback, stream_with_fallback
 
 # Module imports with fallbacks (set by wsgi.py)
 get_valuation_with_ebay = None
@@ -54,6 +64,110 @@ def init_modules(valuation_func, extraction_func, moderation_func,
     ANTHROPIC_AVAILABLE = anthropic_avail
 
 
+# ── Opt-in SSE mode for /api/grade and /api/extract ──
+# The browser gives up at 30s while a multi-photo grade routinely finishes at
+# 50–85s (routes/images.py), so the user sees a failure for a grade the server
+# completed and billed. With ?stream=1 (or Accept: text/event-stream) the
+# handler answers immediately with a text/event-stream and reports as it goes:
+#
+#   event: progress   {"phase": "normalize" | "barcode" | "quality" |
+#                      "moderation" | "vision" | "parse" | "post"}
+#   event: score      {"run": 1, "category": "spine", "score": 8.5}  (grade only;
+#                      preview values read off the streaming model output)
+#   event: result     the exact JSON body the non-streamed endpoint returns
+#   event: error      {"status": 400, "body": {...}} — any non-2xx outcome
+#   : keepalive       comment line every SSE_KEEPALIVE_SECONDS of silence
+#
+# Both handlers are written ONCE, as generators: they yield (event, payload)
+# tuples and `return` their usual jsonify(...) response. _respond() either
+# discards the events (classic mode — byte-identical to before) or frames them
+# as SSE. Everything after the model call — usage logging, the grading counter,
+# the result cache, retention — is the same code in both modes.
+# ⚠️ request_logs records 200 for every streamed request: the HTTP status is
+# sent before the outcome is known. The outcome is in the final event and in
+# the [GRADE-TIMING]/[EXTRACT-TIMING] line.
+SSE_KEEPALIVE_SECONDS = 10
+
+
+def _wants_stream():
+    return (request.args.get('stream') in ('1', 'true')
+            or 'text/event-stream' in (request.headers.get('Accept') or ''))
+
+
+def _sse(event, payload):
+    return 'event: %s\ndata: %s\n\n' % (event, json.dumps(payload, default=str))
+
+
+def _drain(steps):
+    """Run a handler generator to completion; return its response."""
+    try:
+        while True:
+            next(steps)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _respond(steps, streaming):
+    if not streaming:
+        return _drain(steps)
+
+    def events():
+        try:
+            while True:
+                try:
+                    event, payload = next(steps)
+                except StopIteration as stop:
+                    rv = stop.value
+                    break
+                yield ': keepalive\n\n' if event == 'keepalive' else _sse(event, payload)
+        except GeneratorExit:
+            # Client went away mid-grade. Finish the work anyway so the usage
+            # row, counter and retention record are written exactly as they
+            # would be for a classic request — the model call is already paid.
+            _drain(steps)
+            raise
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield _sse('error', {'status': 500, 'body': {'error': str(e)}})
+            return
+        resp, status = rv if isinstance(rv, tuple) else (rv, 200)
+        body = resp.get_json()
+        if status < 400:
+            yield _sse('result', body)
+        else:
+            yield _sse('error', {'status': status, 'body': body})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _pump(fn, events):
+    """Run fn() on a worker thread while relaying what it puts on `events`.
+
+    Used inside a handler generator as `result = yield from _pump(fn, q)`: the
+    generator stays on the request thread (g, request context intact) and only
+    the blocking model call moves off it. Emits a keepalive after
+    SSE_KEEPALIVE_SECONDS without an event so proxies don't idle the stream out.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fn)
+        last = time.monotonic()
+        while True:
+            try:
+                item = events.get(timeout=0.25)
+            except queue.Empty:
+                if future.done():
+                    break
+                if time.monotonic() - last >= SSE_KEEPALIVE_SECONDS:
+                    last = time.monotonic()
+                    yield ('keepalive', None)
+                continue
+            last = time.monotonic()
+            yield item
+        return future.result()
+
+
 class _GradeTimings:
     """Segment timer for /api/grade. Deliberately a SEPARATE, self-contained
     twin of _Timings in sales_valuation.py rather than a shared base class.
@@ -84,11 +198,21 @@ class _GradeTimings:
                    network round trip PER PHOTO, sequentially.
       vision       the Anthropic Sonnet call(s). runs=1 is one call; runs>1 fans
                    out across a thread pool, so elapsed is the SLOWEST call, not
-                   the sum — hence vision_calls is emitted beside it.
+                   the sum — hence vision_calls is emitted beside it. In
+                   adaptive mode it is the slower of the first pair PLUS the
+                   tie-breaker when one ran; early_stop=1 means it did not,
+                   saved_tok is the estimated in+out tokens of the skipped
+                   run(s), and early_stop_rate is stops/adaptive grades for
+                   this worker since boot.
       parse        parse_grading_response / parse_multi_run_responses.
       post         counter increment, usage read, snap, retention scheduling.
       total        handler entry → response.
 
+    cache= is the vision result cache outcome (vision_result_cache.py):
+    hit | near (opt-in) | miss | error | off, with cache_hit_rate = hits/lookups for
+    this worker since boot. On a hit the vision and parse marks are never set,
+    so those segments read -1 — the grade was served without a model call.
+
     ⚠️ WHAT THIS STILL CANNOT SEE (same blind spot as the valuation harness, and
     it must be stated rather than assumed away): time the request spent QUEUED IN
     GUNICORN before the handler ran, and TLS/upload time before gunicorn began
@@ -96,20 +220,41 @@ class _GradeTimings:
     materially below what the browser shows, the remainder is queueing, upload,
     or WSGI — not anything below.
     """
-    __slots__ = ('t0', 't0_wall', 'marks', 'extras')
+    __slots__ = ('t0', 't0_wall', 'marks', 'extras', 'listener')
+
+    # Per-worker adaptive-mode tally behind early_stop_rate. Class-level (not a
+    # slot) because the rate only means something across requests.
+    _adaptive_lock = threading.Lock()
+    _adaptive_counts = {'graded': 0, 'early_stop': 0}
 
     def __init__(self):
         self.t0 = time.perf_counter()
         self.t0_wall = time.time()
         self.marks = {}
         self.extras = {}
+        # Optional callable(mark_name), set by the SSE mode to turn marks made
+        # inside extract_from_base64 into progress events.
+        self.listener = None
 
     def mark(self, name):
         self.marks[name] = time.perf_counter()
+        if self.listener:
+            self.listener(name)
 
     def note(self, **kw):
         self.extras.update(kw)
 
+    def note_adaptive(self, early_stopped, saved_tokens):
+        cls = type(self)
+        with cls._adaptive_lock:
+            cls._adaptive_counts['graded'] += 1
+            if early_stopped:
+                cls._adaptive_counts['early_stop'] += 1
+            graded = cls._adaptive_counts['graded']
+            stopped = cls._adaptive_counts['early_stop']
+        self.note(early_stop=int(bool(early_stopped)), saved_tok=saved_tokens,
+                  early_stop_rate='%d/%d' % (stopped, graded))
+
     def emit(self, outcome, title=None, issue=None):
         """One greppable line, prefix [GRADE-TIMING]. print() for the same reason
         the valuation harness uses it: PYTHONUNBUFFERED=1 is set in the Dockerfile
@@ -140,8 +285,10 @@ class _GradeTimings:
                 'post=%.0fms' % span('parse_done', 'response'),
             ]
             for k in ('images', 'payload_kb', 'norm_kb', 'dims', 'runs',
-                      'vision_calls', 'moderation_calls', 'model',
-                      'in_tok', 'out_tok', 'cache_create', 'cache_read'):
+                      'vision_calls', 'adaptive', 'early_stop', 'saved_tok',
+                      'early_stop_rate', 'moderation_calls', 'model',
+                      'in_tok', 'out_tok', 'cache_create', 'cache_read',
+                      'cache', 'cache_hit_rate'):
                 if k in self.extras:
                     parts.append('%s=%s' % (k, self.extras[k]))
             parts.append('outcome=%s' % outcome)
@@ -214,7 +361,8 @@ class _ExtractTimings(_GradeTimings):
             ]
             for k in ('payload_kb', 'norm_kb', 'dims', 'mp', 'photo_type',
                       'barcode', 'vision_calls', 'reread', 'reread_reason',
-                      'model', 'in_tok', 'out_tok', 'outcome_detail'):
+                      'model', 'in_tok', 'out_tok', 'cache', 'cache_hit_rate',
+                      'outcome_detail'):
                 if k in self.extras:
                     parts.append('%s=%s' % (k, self.extras[k]))
             parts.append('outcome=%s' % outcome)
@@ -315,7 +463,18 @@ def api_cache_check():
 @require_auth
 @require_approved
 def api_extract():
-    """Extract comic information from image using AI"""
+    """Extract comic information from image using AI.
+    ?stream=1 / Accept: text/event-stream → SSE progress (see _respond)."""
+    streaming = _wants_stream()
+    return _respond(_extract_steps(streaming), streaming)
+
+
+# Marks made inside extract_from_base64 → the phase that starts there.
+_EXTRACT_PHASES = {'normalize_start': 'normalize', 'normalize_done': 'barcode',
+                   'barcode_done': 'vision', 'vision_done': 'post'}
+
+
+def _extract_steps(streaming):
     _t = _ExtractTimings()
     _t.mark('handler')
 
@@ -332,6 +491,7 @@ def api_extract():
         return jsonify({'success': False, 'error': 'Image data is required'}), 400
 
     _t.note(payload_kb=int(len(image_data) / 1024))
+    yield ('progress', {'phase': 'quality'})
 
     # Photo quality gate — catch tiny/blurry photos before Claude API call.
     # Batch 7: extraction only needs to READ the cover, so use the lenient
@@ -350,6 +510,7 @@ def api_extract():
             'error': quality['message']
         }), 400
     _t.mark('quality_done')
+    yield ('progress', {'phase': 'moderation'})
 
     # Content moderation check BEFORE processing
     if moderate_image:
@@ -373,9 +534,37 @@ def api_extract():
     # Defaults to 'front' — the app.html main extraction path is always the cover.
     photo_type = data.get('photo_type', 'front')
     _t.note(photo_type=photo_type)
-    result = extract_from_base64(image_data, media_type, photo_type, timings=_t)
 
-    if result.get('success'):
+    # Retry-after-timeout cache (vision_result_cache.py). Keyed on the photo
+    # type too: the same bytes normalize differently as front vs centerfold.
+    # Hits need byte-identical photos — never a near hit: a direct vs newsstand
+    # copy hashes alike and would get the other's UPC / variant / printing.
+    # "fresh": true bypasses it (admin re-checks, prompt experiments).
+    from comic_extraction import EXTRACTION_PROMPT_VERSION
+    from vision_result_cache import ResultCacheProbe, identity_key, hit_rate
+    cache = ResultCacheProbe(g.user_id, '/api/extract',
+                             identity_key(photo_type=photo_type),
+                             EXTRACTION_PROMPT_VERSION,
+                             enabled=not data.get('fresh'))
+    def _run_extract():
+        return extract_from_base64(image_data, media_type, photo_type,
+                                   timings=_t, cache=cache)
+
+    if streaming:
+        # Normalize/barcode/vision all happen inside extract_from_base64; its
+        # timing marks are the phase boundaries. The vision call itself stays a
+        # plain create() — extraction returns one small JSON with nothing worth
+        # previewing, so here the stream is about progress and keepalive.
+        events = queue.Queue()
+        _t.listener = lambda name: (name in _EXTRACT_PHASES and
+                                    events.put(('progress', {'phase': _EXTRACT_PHASES[name]})))
+        result = yield from _pump(_run_extract, events)
+        _t.listener = None
+    else:
+        result = _run_extract()
+    _t.note(cache=cache.outcome, cache_hit_rate=hit_rate())
+
+    if result.get('success') and not result.get('cached'):
         # Extraction runs on the sonnet tier (comic_extraction.call_with_fallback);
         # log the actual model so per-extract cost attribution stays accurate after
         # the 2026-06-16 haiku→sonnet identification flip.
@@ -513,10 +702,20 @@ def api_grade():
         issue: issue number
         publisher: publisher name
         runs: number of grading passes (1-3, default 1)
+        adaptive: at runs=3, skip the third pass when the first two agree
+                  (default GRADING_ADAPTIVE_RUNS; false forces every run)
+
+        stream: ?stream=1 or Accept: text/event-stream → SSE progress,
+                per-category score previews, then the result (see _respond)
 
     Returns:
         Computed grade with full category breakdown
     """
+    streaming = _wants_stream()
+    return _respond(_grade_steps(streaming), streaming)
+
+
+def _grade_steps(streaming):
     _t = _GradeTimings()
     _t.mark('handler')
 
@@ -541,14 +740,11 @@ def api_grade():
     database_url = os.environ.get('DATABASE_URL')
     cap_conn = None
     try:
-        cap_conn = _dbpool.get_db(dict_rows=True)
-        cap_cur = cap_conn.cursor()
-
-        cap_cur.execute(
-            "SELECT plan, is_admin, gradings_this_month, gradings_reset_date FROM users WHERE id = %s",
-            (g.user_id,)
-        )
-        cap_user = cap_cur.fetchone()
+        # Entitlement snapshot (entitlements.py), read fresh: the counter is
+        # compared against the cap and another worker may have just bumped it.
+        # The usage counter after the grade reuses plan/is_admin from it.
+        import entitlements
+        cap_user = entitlements.get_entitlements(g.user_id, fresh=True)
 
         if cap_user and not cap_user.get('is_admin', False):
             plan_key = (cap_user.get('plan') or 'free').strip().lower()
@@ -565,11 +761,15 @@ def api_grade():
                 else:
                     next_reset = datetime(now.year, now.month + 1, 1, tzinfo=timezone.utc)
 
+                cap_conn = _dbpool.get_db()
+                cap_cur = cap_conn.cursor()
                 cap_cur.execute(
                     "UPDATE users SET gradings_this_month = 0, gradings_reset_date = %s WHERE id = %s",
                     (next_reset, g.user_id)
                 )
                 cap_conn.commit()
+                cap_cur.close()
+                entitlements.invalidate(g.user_id)
                 gradings_used = 0
                 resets_at = next_reset.strftime('%b %d')
             else:
@@ -578,8 +778,6 @@ def api_grade():
 
             # Enforce cap
             if gradings_used >= monthly_limit:
-                cap_cur.close()
-                cap_conn.close()
                 _t.mark('cap_done')
                 _t.emit('monthly_limit')
 
@@ -606,7 +804,6 @@ def api_grade():
                     'upgrade': upgrade
                 }), 429
 
-        cap_cur.close()
     except Exception as e:
         print(f"[WARN] Grading cap check failed (allowing grading): {e}")
     finally:
@@ -628,7 +825,16 @@ def api_grade():
     issue = data.get('issue', '?')
     publisher = data.get('publisher', 'Unknown')
     num_runs = min(max(data.get('runs', 1), 1), 3)  # clamp 1-3
-    _t.note(images=len(images), runs=num_runs,
+    # A JSON boolean, or the strings true/false/1/0 (form-ish clients). bool()
+    # on the raw value made "false" truthy, so the client could not opt out.
+    adaptive = data.get('adaptive', GRADING_ADAPTIVE_RUNS)
+    if isinstance(adaptive, str) and adaptive.strip().lower() in _BOOL_STRINGS:
+        adaptive = _BOOL_STRINGS[adaptive.strip().lower()]
+    if not isinstance(adaptive, bool):
+        _t.emit('bad_adaptive', title, issue)
+        return jsonify({'error': 'adaptive must be true or false'}), 400
+    adaptive = adaptive and num_runs >= 3
+    _t.note(images=len(images), runs=num_runs, adaptive=int(adaptive),
             payload_kb=int(sum(len(i.get('base64') or '')
                                for i in images) / 1024))
 
@@ -657,6 +863,7 @@ def api_grade():
     #    instance twice on 2026-07-16. The Anthropic API downscales to ~1568px
     #    internally, so the model sees the same pixels either way.
     from comic_extraction import normalize_for_photo_type
+    yield ('progress', {'phase': 'normalize'})
     _t.mark('normalize_start')
     for img in images:
         if not img.get('base64'):
@@ -714,6 +921,7 @@ def api_grade():
     _t.mark('imgmeas_done')
 
     # Photo quality gate
+    yield ('progress', {'phase': 'quality'})
     from routes.fingerprint_utils import check_photo_quality_base64
     for img in images:
         b64 = img.get('base64', '')
@@ -738,6 +946,7 @@ def api_grade():
     # ⚠️ Note the absence of a `break` here, unlike the quality gate above: this
     # is one Rekognition network round trip PER PHOTO, sequentially. moderation_calls
     # is emitted so the count is a measurement rather than a reading of this loop.
+    yield ('progress', {'phase': 'moderation'})
     _mod_calls = 0
     if moderate_image:
         for img in images:
@@ -759,6 +968,31 @@ def api_grade():
     _t.note(moderation_calls=_mod_calls)
     _t.mark('moderation_done')
 
+    # ── Retry-after-timeout cache (vision_result_cache.py). Looked up only after
+    #    every gate above has passed, on the NORMALIZED photos, so a cached grade
+    #    is served under exactly the rules a fresh one would be. A hit is the
+    #    grade the user already paid for: no counter increment, no second
+    #    retention row, no usage row. "fresh": true bypasses it.
+    from grading_engine import GRADING_PROMPT_VERSION
+    from vision_result_cache import ResultCacheProbe, identity_key, hit_rate
+    result_cache = ResultCacheProbe(
+        g.user_id, '/api/grade',
+        identity_key(title=title, issue=issue, publisher=publisher, runs=num_runs,
+                     labels=','.join(img.get('label', 'Photo') for img in images)),
+        GRADING_PROMPT_VERSION,
+        enabled=not data.get('fresh'),
+        allow_near=True)     # still off unless VISION_CACHE_GRADE_NEAR=1
+    cached_result = result_cache.lookup([img.get('base64', '') for img in images])
+    _t.note(cache=result_cache.outcome, cache_hit_rate=hit_rate())
+    if cached_result is not None:
+        cached_result['usage'] = {'input_tokens': 0, 'output_tokens': 0,
+                                  'cache_creation_input_tokens': 0,
+                                  'cache_read_input_tokens': 0}
+        _t.note(vision_calls=0)
+        _t.mark('response')
+        _t.emit('cached', title, issue)
+        return jsonify(cached_result)
+
     # Build image content blocks for Anthropic API
     image_content = []
     photo_labels = []
@@ -773,42 +1007,86 @@ def api_grade():
         })
         photo_labels.append(img.get('label', 'Photo'))
 
-    # Build structured grading prompt
-    from grading_engine import build_grading_prompt, parse_grading_response, parse_multi_run_responses
-    prompt_text = build_grading_prompt(title, issue, publisher, photo_labels)
+    # Build structured grading prompt. The static rubric goes in `system` and the
+    # per-comic context after the images, both with cache breakpoints — see
+    # build_grading_request. Built ONCE and shared by every run so all runs of
+    # this grade present a byte-identical prefix.
+    from grading_engine import (build_grading_request, parse_grading_response,
+                                parse_multi_run_responses, run_adaptive_multi_run)
+    system_blocks, grading_messages = build_grading_request(
+        title, issue, publisher, photo_labels, image_content)
+
+    # In SSE mode each run streams its output; score previews are scanned off
+    # the deltas and queued for _pump to relay. The returned Message is the same
+    # shape either way, so everything below is mode-agnostic.
+    events = queue.Queue()
+    run_numbers = itertools.count(1)
 
     # Function to make one grading call
     def run_grading():
         client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+        if streaming:
+            from grading_engine import CategoryScoreScanner
+            run_no, scanner = next(run_numbers), CategoryScoreScanner()
+
+            def on_text(delta):
+                for cat, score in scanner.feed(delta):
+                    events.put(('score', {'run': run_no, 'category': cat, 'score': score}))
+
+            return stream_with_fallback(
+                client, 'sonnet', on_text=on_text,
+                max_tokens=2048,
+                temperature=0,
+                system=system_blocks,
+                messages=grading_messages,
+            )
         # Route through models.py sonnet tier with automatic fallback (was a
         # direct create(model=SONNET) with no fallback).
         response = call_with_fallback(
             client, 'sonnet',
             max_tokens=2048,
             temperature=0,
-            messages=[{
-                'role': 'user',
-                'content': [
-                    *image_content,
-                    {'type': 'text', 'text': prompt_text}
-                ]
-            }]
+            system=system_blocks,
+            messages=grading_messages,
         )
         return response
 
+    def run_all():
+        """All model calls for this grade → (responses, early_stopped)."""
+        if num_runs == 1:
+            # Single run — most common, fastest
+            return [run_grading()], False
+        if adaptive:
+            # Two concurrent runs; the tie-breaker only if they disagree.
+            return run_adaptive_multi_run(
+                run_grading, max_runs=num_runs,
+                text_of=lambda r: r.content[0].text)
+        # Multi-run with thread pool for parallel execution.
+        # ⚠️ These run CONCURRENTLY, so `vision` measures the slowest call,
+        # not the sum — vision_calls is what makes the cost visible.
+        responses = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_runs) as executor:
+            futures = [executor.submit(run_grading) for _ in range(num_runs)]
+            for future in concurrent.futures.as_completed(futures):
+                responses.append(future.result())
+        return responses, False
+
     try:
         total_input_tokens = 0
         total_output_tokens = 0
+        yield ('progress', {'phase': 'vision'})
         _t.mark('vision_start')
 
         # ⚠️ input_tokens does NOT include cached input. The API reports
         # cache_creation_input_tokens and cache_read_input_tokens as SEPARATE
         # fields, and summing only input_tokens silently undercounts whenever
-        # they are non-zero. No cache_control is set anywhere in this path, so
-        # both should read 0 — which is exactly why they are worth emitting:
-        # a non-zero here means the assumption stopped holding and api_usage
-        # started under-reporting, in the same shape as the /api/extract
-        # structural zero one path over. Prove the 0, do not assume it.
+        # they are non-zero. This path sets cache_control (rubric + user turn,
+        # build_grading_request), so both are summed across runs and passed to
+        # log_api_usage. Expected shape: a cold single run writes (cache_create>0),
+        # a grade within 5 min of another reads the rubric (cache_read>0).
+        # ⚠️ Concurrent runs of ONE grade do not read each other's write — a
+        # cache entry is only readable once the first response has begun — so
+        # parallel multi-run shows N writes; only later calls read.
         cache_create = cache_read = 0
 
         def _cache_of(resp):
@@ -816,49 +1094,51 @@ def api_grade():
             return ((getattr(u, 'cache_creation_input_tokens', 0) or 0),
                     (getattr(u, 'cache_read_input_tokens', 0) or 0))
 
+        if streaming:
+            responses, early_stopped = yield from _pump(run_all, events)
+        else:
+            responses, early_stopped = run_all()
+
+        raw_responses = []
+        for resp in responses:
+            total_input_tokens += resp.usage.input_tokens
+            total_output_tokens += resp.usage.output_tokens
+            _cc, _cr = _cache_of(resp)
+            cache_create += _cc
+            cache_read += _cr
+            raw_responses.append(resp.content[0].text)
+        _t.mark('vision_done')
+        _t.note(vision_calls=len(raw_responses))
+        yield ('progress', {'phase': 'parse'})
+
         if num_runs == 1:
-            # Single run — most common, fastest
-            response = run_grading()
-            total_input_tokens = response.usage.input_tokens
-            total_output_tokens = response.usage.output_tokens
-            cache_create, cache_read = _cache_of(response)
-            _t.mark('vision_done')
-            _t.note(vision_calls=1)
-
-            response_text = response.content[0].text
-            result = parse_grading_response(response_text)
+            result = parse_grading_response(raw_responses[0])
             result['run_count'] = 1
-
         else:
-            # Multi-run with thread pool for parallel execution.
-            # ⚠️ These run CONCURRENTLY, so `vision` measures the slowest call,
-            # not the sum — vision_calls is what makes the cost visible.
-            raw_responses = []
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_runs) as executor:
-                futures = [executor.submit(run_grading) for _ in range(num_runs)]
-                for future in concurrent.futures.as_completed(futures):
-                    resp = future.result()
-                    total_input_tokens += resp.usage.input_tokens
-                    total_output_tokens += resp.usage.output_tokens
-                    _cc, _cr = _cache_of(resp)
-                    cache_create += _cc
-                    cache_read += _cr
-                    raw_responses.append(resp.content[0].text)
-            _t.mark('vision_done')
-            _t.note(vision_calls=len(raw_responses))
+            if adaptive:
+                # Saved = the skipped run(s) priced at the mean of the runs that
+                # did happen (uncached + cached input + output).
+                skipped = num_runs - len(raw_responses)
+                per_run = (total_input_tokens + total_output_tokens
+                           + cache_create + cache_read) / max(len(raw_responses), 1)
+                _t.note_adaptive(early_stopped, int(per_run * skipped))
 
             result = parse_multi_run_responses(raw_responses)
 
         _t.mark('parse_done')
+        yield ('progress', {'phase': 'post'})
         _t.note(model=get_model('sonnet'),
                 in_tok=total_input_tokens, out_tok=total_output_tokens,
                 cache_create=cache_create, cache_read=cache_read)
 
         # Log total API usage (get_model reflects the active model, incl. fallback)
         log_api_usage(g.user_id, '/api/grade', get_model('sonnet'),
-                      total_input_tokens, total_output_tokens)
+                      total_input_tokens, total_output_tokens,
+                      cache_creation_tokens=cache_create, cache_read_tokens=cache_read)
 
-        # Increment grading counter for usage cap
+        # Increment grading counter for usage cap. RETURNING feeds the
+        # grading_usage counter below (no re-read of the users row).
+        gradings_after = None
         try:
             inc_conn = _dbpool.get_db()
             inc_cur = inc_conn.cursor()
@@ -867,9 +1147,12 @@ def api_grade():
                    SET gradings_this_month = COALESCE(gradings_this_month, 0) + 1,
                        gradings_reset_date = COALESCE(gradings_reset_date,
                            date_trunc('month', CURRENT_TIMESTAMP + INTERVAL '1 month'))
-                   WHERE id = %s""",
+                   WHERE id = %s
+                   RETURNING gradings_this_month""",
                 (g.user_id,)
             )
+            inc_row = inc_cur.fetchone()
+            gradings_after = inc_row[0] if inc_row else None
             inc_conn.commit()
             inc_cur.close()
             inc_conn.close()
@@ -884,7 +1167,9 @@ def api_grade():
         result['confidence'] = {1: 65, 2: 78, 3: 88, 4: 94}.get(len(images), 65)
         result['usage'] = {
             'input_tokens': total_input_tokens,
-            'output_tokens': total_output_tokens
+            'output_tokens': total_output_tokens,
+            'cache_creation_input_tokens': cache_create,
+            'cache_read_input_tokens': cache_read
         }
 
         # Map defects to flat arrays for backward compatibility with frontend
@@ -917,12 +1202,11 @@ def api_grade():
 
         # Include grading usage info for frontend counter
         try:
-            usage_conn = _dbpool.get_db(dict_rows=True)
-            usage_cur = usage_conn.cursor()
-            usage_cur.execute("SELECT gradings_this_month, is_admin, plan FROM users WHERE id = %s",
-                              (g.user_id,))
-            usage_row = usage_cur.fetchone()
-            if usage_row and not usage_row.get('is_admin'):
+            # plan / is_admin from the cap check's entitlement snapshot (re-read
+            # only if that failed); the count from the RETURNING above.
+            import entitlements
+            usage_row = entitlements.get_entitlements(g.user_id)
+            if usage_row and gradings_after is not None and not usage_row.get('is_admin'):
                 # `MONTHLY_GRADING_LIMIT` was deleted by bfd231c (2026-06-18)
                 # when the per-tier cap landed, and this reference survived it.
                 # The resulting NameError was swallowed by the bare `except`
@@ -933,16 +1217,24 @@ def api_grade():
                 # forewarning the product has was silently dead.
                 usage_plan = (usage_row.get('plan') or 'free').strip().lower()
                 result['grading_usage'] = {
-                    'used': usage_row.get('gradings_this_month', 0) or 0,
+                    'used': gradings_after,
                     'limit': PLANS.get(usage_plan, PLANS['free'])['valuations_per_month']
                 }
-            usage_cur.close()
-            usage_conn.close()
         except Exception as e:
             # Never fatal — the grade is already computed and must still be
             # served. But say so: a bare `pass` here is what hid the above.
             print(f'[WARN] grading_usage counter unavailable (grade unaffected): {e}')
 
+        # The counter moved: drop the snapshot (after the read above, which
+        # only needed plan/is_admin from it).
+        import entitlements
+        entitlements.invalidate(g.user_id)
+
+        # Stored before retention so a retry arriving while the retention thread
+        # is still uploading already hits. grading_usage is per-moment state and
+        # is not part of the reusable result.
+        result_cache.store({k: v for k, v in result.items() if k != 'grading_usage'})
+
         # --- Persist this grade submission for retention/diagnosis ---
         # Per docs/technical/GRADE_RETENTION_SPEC.md. Runs on a background thread so it
         # adds NO latency to the grade response. Captures request state explicitly (the
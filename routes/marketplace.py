@@ -4,6 +4,10 @@ Routes: /api/marketplace/*
 
 No OAuth or direct API integration for these platforms.
 Generates optimized content for sellers to copy into each platform's dashboard.
+
+Generated text is served from the shared content cache
+(marketplace_content_cache.py) unless the user opted out
+(PUT /content-cache) or the request says "fresh": true.
 """
 from flask import Blueprint, jsonify, request, g
 from auth import require_auth, require_approved
@@ -13,14 +17,23 @@ marketplace_bp = Blueprint('marketplace', __name__, url_prefix='/api/marketplace
 
 # Module references (set by init_modules)
 generate_platform_content = None
+generate_platforms_content = None
 get_all_platforms = None
 
 
-def init_modules(gen_content_func, get_platforms_func):
+def init_modules(gen_content_func, get_platforms_func, gen_batch_func=None):
     """Initialize modules from wsgi.py"""
-    global generate_platform_content, get_all_platforms
+    global generate_platform_content, get_all_platforms, generate_platforms_content
     generate_platform_content = gen_content_func
     get_all_platforms = get_platforms_func
+    generate_platforms_content = gen_batch_func
+
+
+def _cache_options(data):
+    """(use_cache, fresh) for this request: the per-user opt-out switches the
+    shared cache off entirely; "fresh" only skips the read."""
+    from marketplace_content_cache import user_opted_out
+    return not user_opted_out(g.user_id), bool(data.get('fresh'))
 
 
 @marketplace_bp.route('/platforms', methods=['GET'])
@@ -55,6 +68,7 @@ def api_marketplace_generate_content():
     if not title:
         return jsonify({'success': False, 'error': 'Comic title is required'}), 400
 
+    use_cache, fresh = _cache_options(data)
     result = generate_platform_content(
         platform_key=platform,
         title=title,
@@ -62,7 +76,68 @@ def api_marketplace_generate_content():
         grade=grade,
         price=price,
         publisher=publisher,
-        year=year
+        year=year,
+        use_cache=use_cache,
+        fresh=fresh
     )
 
     return jsonify(result)
+
+
+@marketplace_bp.route('/generate-content/batch', methods=['POST'])
+@require_auth
+@require_approved
+def api_marketplace_generate_content_batch():
+    """Generate content for several platforms of ONE comic with at most one
+    model call (bulk listing prep). Body: same fields as /generate-content,
+    with "platforms": [...] instead of "platform"."""
+    if not generate_platforms_content:
+        return jsonify({'success': False, 'error': 'Marketplace module not available'}), 503
+
+    data = request.get_json() or {}
+
+    platforms = data.get('platforms') or []
+    title = data.get('title', '')
+
+    if (not isinstance(platforms, list) or not platforms
+            or not all(isinstance(p, str) for p in platforms)):
+        return jsonify({'success': False,
+                        'error': 'platforms must be a non-empty list of platform keys'}), 400
+    if not title:
+        return jsonify({'success': False, 'error': 'Comic title is required'}), 400
+
+    use_cache, fresh = _cache_options(data)
+    result = generate_platforms_content(
+        platform_keys=platforms,
+        title=title,
+        issue=data.get('issue', ''),
+        grade=data.get('grade', ''),
+        price=data.get('price', 0),
+        publisher=data.get('publisher'),
+        year=data.get('year'),
+        use_cache=use_cache,
+        fresh=fresh
+    )
+    if not result['success']:
+        return jsonify(result), 400
+
+    return jsonify(result)
+
+
+@marketplace_bp.route('/content-cache', methods=['GET', 'PUT'])
+@require_auth
+def api_marketplace_content_cache():
+    """Per-user opt-out of the shared generated-content cache.
+    PUT {"enabled": false} opts out; {"enabled": true} opts back in."""
+    from marketplace_content_cache import user_opted_out, set_user_opt_out
+    if request.method == 'PUT':
+        data = request.get_json() or {}
+        if not isinstance(data.get('enabled'), bool):
+            return jsonify({'success': False, 'error': 'enabled (boolean) is required'}), 400
+        try:
+            set_user_opt_out(g.user_id, not data['enabled'])
+        except Exception as e:
+            print(f"[MarketplaceCache] opt-out update failed: {e}")
+            return jsonify({'success': False, 'error': 'Could not update setting'}), 500
+        return jsonify({'success': True, 'enabled': data['enabled']})
+    return jsonify({'success': True, 'enabled': not user_opted_out(g.user_id)})
@@ -0,0 +1,157 @@
+"""
+Reference Features — persisted SIFT features for registered Slab Guard photos
+==============================================================================
+
+compare_covers() aligns every query photo against a REGISTERED reference photo,
+and _sift_align_with_stable_border() runs up to BORDER_INLIER_RUNS times — each
+run re-detecting SIFT on the reference, which never changes. Registration
+already decodes the reference (routes/registry.py process_registration_photo),
+so it computes the features once, in the exact frame compare_covers uses, and
+stores them here. compare_covers then only runs SIFT on the query side.
+
+Frame contract: features are detected on
+    _resize_standard(auto-oriented BGR)  →  gray  →  SIFT_create(nfeatures=5000)
+i.e. precisely what _sift_align computes for `ref`. OpenCV SIFT is
+deterministic for identical input, so a stored set is interchangeable with a
+fresh detection — verdicts do not change. FEATURE_VERSION is part of the key:
+bump it whenever that pipeline (TARGET_SIZE, SIFT params, orientation) changes
+and stale rows are simply never read again.
+
+Storage: one row per photo URL in slab_guard_reference_features
+(migrations/add_slab_guard_reference_features.sql). Descriptors are stored as
+uint8 — OpenCV SIFT descriptors are float32 holding integers 0..255, so the
+round trip is lossless — roughly 0.6MB raw / ~0.3MB compressed for 5000
+keypoints. The reference's two LPQ histograms (full image + border strip,
+256 float64 each) ride along in the same payload — _compute_lpq_distance needs
+them on every comparison and they are as fixed as the keypoints. Rows stored
+before they were added simply load with 'lpq': None. A small per-worker LRU sits in front of the table because the
+monitor compares one reference against many listings in a row.
+
+Nothing in here may fail a comparison or a registration: every error degrades
+to "no stored features" and the caller detects as before.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import db as _dbpool
+
+FEATURE_VERSION = 'sift5000_std800x1200_v1'
+_LRU_MAX = 32
+
+_lock = threading.Lock()
+_lru = OrderedDict()   # photo_url -> features dict (hits only; absence is not cached)
+
+
+def pack_features(keypoints, descriptors, lpq=None):
+    """cv2 keypoints + float32 descriptors (+ optional (full, border) LPQ
+    histograms from slab_guard_cv.compute_reference_lpq) → compressed npz bytes."""
+    pts = np.float32([kp.pt for kp in keypoints]).reshape(-1, 2)
+    meta = np.float32([(kp.size, kp.angle, kp.response) for kp in keypoints]).reshape(-1, 3)
+    octave = np.int32([kp.octave for kp in keypoints])
+    des = (np.zeros((0, 128), np.uint8) if descriptors is None
+           else descriptors.astype(np.uint8))
+    buf = io.BytesIO()
+    extra = {} if lpq is None else {'lpq_full': lpq[0], 'lpq_border': lpq[1]}
+    np.savez_compressed(buf, pts=pts, meta=meta, octave=octave, des=des, **extra)
+    return buf.getvalue()
+
+
+def unpack_features(payload):
+    """npz bytes → {'keypoints': [cv2.KeyPoint], 'descriptors': float32 array,
+    'lpq': (full_hist, border_hist) or None for payloads stored without it}."""
+    import cv2
+    with np.load(io.BytesIO(payload)) as z:
+        pts, meta, octave, des = z['pts'], z['meta'], z['octave'], z['des']
+        lpq = (z['lpq_full'], z['lpq_border']) if 'lpq_full' in z.files else None
+    keypoints = [cv2.KeyPoint(float(x), float(y), float(m[0]), float(m[1]),
+                              float(m[2]), int(o))
+                 for (x, y), m, o in zip(pts, meta, octave)]
+    return {
+        'keypoints': keypoints,
+        'descriptors': des.astype(np.float32) if len(des) else None,
+        'lpq': lpq,
+    }
+
+
+def save_reference_features(photo_url, payload, comic_id=None, conn=None):
+    """Upsert one photo's packed features. Uses `conn` (no commit) when given,
+    otherwise its own pooled connection. Never raises."""
+    own = conn is None
+    try:
+        if own:
+            conn = _dbpool.get_db()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO slab_guard_reference_features
+                (photo_url, comic_id, feature_version, payload)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (photo_url, feature_version) DO UPDATE
+                SET payload = EXCLUDED.payload, comic_id = EXCLUDED.comic_id,
+                    created_at = NOW()
+        """, (photo_url, comic_id, FEATURE_VERSION, payload))
+        cur.close()
+        if own:
+            conn.commit()
+        with _lock:
+            _lru.pop(photo_url, None)
+        return True
+    except Exception as e:
+        print(f"[RefFeatures] save failed for {photo_url[:80]} (non-fatal): {e}")
+        if own and conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        return False
+    finally:
+        if own and conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def load_reference_features(photo_url):
+    """Stored features for a registered photo, or None (not registered under
+    this FEATURE_VERSION, DB unavailable, …)."""
+    if not photo_url:
+        return None
+    with _lock:
+        if photo_url in _lru:
+            _lru.move_to_end(photo_url)
+            return _lru[photo_url]
+
+    features = None
+    conn = None
+    try:
+        conn = _dbpool.get_db()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT payload FROM slab_guard_reference_features
+            WHERE photo_url = %s AND feature_version = %s
+        """, (photo_url, FEATURE_VERSION))
+        row = cur.fetchone()
+        cur.close()
+        if row:
+            features = unpack_features(bytes(row[0]))
+    except Exception as e:
+        print(f"[RefFeatures] load failed (detecting instead): {e}")
+        return None   # not cached — a transient DB error must not stick
+    finally:
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    if features is not None:
+        with _lock:
+            _lru[photo_url] = features
+            _lru.move_to_end(photo_url)
+            while len(_lru) > _LRU_MAX:
+                _lru.popitem(last=False)
+    return features
@@ -20,6 +20,8 @@ import os
 import json
 import psycopg2
 import db as _dbpool
+import watermark_cache
+import entitlements
 from datetime import datetime
 from flask import Blueprint, jsonify, request, g
 from auth import require_auth, require_approved
@@ -139,6 +141,177 @@ QUALITY_MIN_SIFT_KPS = 500        # Block: fewer than 500 SIFT keypoints (at 800
 QUALITY_WARN_SIFT_KPS = 1500      # Warn: fewer than 1500 SIFT keypoints
 
 
+def _fetch_and_orient(photo_url, timeout=10):
+    """Download once, decode once, orient once — the shared front half of every
+    registration-time computation.
+
+    Returns (img_bytes, img_raw, img_oriented): the raw decode is kept only for
+    its EXIF orientation tag (the quality report tells the user when a photo was
+    rotated). img_oriented is auto_orient_pil(img_raw) in the decoder's native
+    mode — NOT converted to RGB, because the hash pipelines convert straight
+    from the native mode and must keep producing the hashes already stored
+    for every registered comic.
+    """
+    import requests
+    from io import BytesIO
+
+    response = requests.get(photo_url, timeout=timeout)
+    response.raise_for_status()
+    img_bytes = response.content
+    img_raw = PIL_Image.open(BytesIO(img_bytes))
+    img_raw.load()
+    return img_bytes, img_raw, auto_orient_pil(img_raw)
+
+
+def _quality_report(img_raw, img_rgb):
+    """
+    Quality checks on an already decoded photo — see assess_photo_quality().
+
+    Args:
+        img_raw: the photo as decoded (for the EXIF orientation tag)
+        img_rgb: the same photo auto-oriented and converted to RGB
+    """
+    import numpy as np
+
+    try:
+        import cv2
+        cv_available = True
+    except ImportError:
+        cv_available = False
+
+    result = {
+        'overall': 'pass',
+        'checks': {},
+        'warnings': [],
+        'tips': [],
+        'exif_rotated': False,
+    }
+
+    # Check EXIF rotation
+    exif = img_raw.getexif() if hasattr(img_raw, 'getexif') else {}
+    orientation = exif.get(274, 1)  # 274 = Orientation tag, 1 = normal
+    if orientation and orientation != 1:
+        result['exif_rotated'] = True
+        result['warnings'].append(
+            'Photo was rotated — auto-corrected. For best results, hold your phone upright when photographing.'
+        )
+
+    width, height = img_rgb.size
+
+    # ── Resolution check ──
+    min_side = min(width, height)
+    result['checks']['resolution'] = {
+        'width': width,
+        'height': height,
+        'min_side': min_side,
+    }
+    if min_side < QUALITY_MIN_DIMENSION:
+        result['checks']['resolution']['status'] = 'fail'
+        result['overall'] = 'fail'
+        result['warnings'].append(
+            f'Image too small ({width}×{height}). Minimum {QUALITY_MIN_DIMENSION}px on shortest side required.'
+        )
+        result['tips'].append('Use your phone camera at full resolution — avoid screenshots or thumbnails.')
+    elif min_side < QUALITY_WARN_DIMENSION:
+        result['checks']['resolution']['status'] = 'warn'
+        if result['overall'] == 'pass':
+            result['overall'] = 'warn'
+        result['warnings'].append(
+            f'Image is small ({width}×{height}). Higher resolution improves fingerprint reliability.'
+        )
+        result['tips'].append('Move closer or use a higher resolution camera setting.')
+    else:
+        result['checks']['resolution']['status'] = 'pass'
+
+    # Skip CV-dependent checks if OpenCV not available
+    if not cv_available:
+        result['checks']['blur'] = {'status': 'skipped', 'reason': 'OpenCV not available'}
+        result['checks']['sift_keypoints'] = {'status': 'skipped', 'reason': 'OpenCV not available'}
+        return result
+
+    # Convert to CV2 for blur and SIFT checks
+    img_np = np.array(img_rgb)
+    img_cv = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
+
+    # Resize to standard analysis size (800px max side)
+    h, w = img_cv.shape[:2]
+    scale = 800 / max(h, w)
+    resized = cv2.resize(img_cv, (int(w * scale), int(h * scale)))
+    gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+
+    # ── Blur check (Laplacian variance) ──
+    blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
+    result['checks']['blur'] = {
+        'score': round(blur_score, 1),
+    }
+    if blur_score < QUALITY_MIN_BLUR:
+        result['checks']['blur']['status'] = 'fail'
+        result['overall'] = 'fail'
+        result['warnings'].append(
+            f'Image is too blurry (sharpness score: {blur_score:.0f}, minimum: {QUALITY_MIN_BLUR}).'
+        )
+        result['tips'].append('Hold your phone steady and make sure the comic is in focus. Tap the screen to focus before shooting.')
+    elif blur_score < QUALITY_WARN_BLUR:
+        result['checks']['blur']['status'] = 'warn'
+        if result['overall'] == 'pass':
+            result['overall'] = 'warn'
+        result['warnings'].append(
+            f'Image could be sharper (score: {blur_score:.0f}). Sharper photos produce stronger fingerprints.'
+        )
+        result['tips'].append('Try better lighting and hold your phone steady.')
+    else:
+        result['checks']['blur']['status'] = 'pass'
+
+    # ── SIFT keypoints check ──
+    # ⚠️ Counted at 800px long side — the frame the thresholds were calibrated
+    # in. The features persisted for compare_covers are detected separately in
+    # its 800×1200 frame (process_registration_photo); the two are not
+    # interchangeable.
+    sift = cv2.SIFT_create(nfeatures=5000)
+    keypoints = sift.detect(gray, None)
+    kp_count = len(keypoints)
+
+    result['checks']['sift_keypoints'] = {
+        'count': kp_count,
+    }
+    if kp_count < QUALITY_MIN_SIFT_KPS:
+        result['checks']['sift_keypoints']['status'] = 'fail'
+        result['overall'] = 'fail'
+        result['warnings'].append(
+            f'Not enough visual detail detected ({kp_count} features, minimum: {QUALITY_MIN_SIFT_KPS}). '
+            'This photo cannot be reliably matched.'
+        )
+        result['tips'].append(
+            'Make sure the full comic cover is visible, well-lit, and against a clean background.'
+        )
+    elif kp_count < QUALITY_WARN_SIFT_KPS:
+        result['checks']['sift_keypoints']['status'] = 'warn'
+        if result['overall'] == 'pass':
+            result['overall'] = 'warn'
+        result['warnings'].append(
+            f'Low visual detail ({kp_count} features). Fingerprint may be less reliable for copy matching.'
+        )
+        result['tips'].append('Improve lighting and ensure the comic cover fills most of the frame.')
+    else:
+        result['checks']['sift_keypoints']['status'] = 'pass'
+
+    # Add general tips if any warnings
+    if result['overall'] == 'warn' and not result['tips']:
+        result['tips'].append('Retake with better lighting for a stronger fingerprint.')
+
+    return result
+
+
+def _quality_error(message, tips=None):
+    return {
+        'overall': 'error',
+        'checks': {},
+        'warnings': [message],
+        'tips': tips or [],
+        'exif_rotated': False,
+    }
+
+
 def assess_photo_quality(photo_url, timeout=10):
     """
     Assess photo quality for Slab Guard registration.
@@ -149,6 +322,10 @@ def assess_photo_quality(photo_url, timeout=10):
     Session 56: Added to prevent registration of photos too poor for
     reliable SIFT copy matching. Block truly bad photos, warn on marginal.
 
+    Registration itself goes through process_registration_photo(), which
+    computes this report on the same decode as the hashes and SIFT features;
+    this URL entry point is for standalone checks.
+
     Args:
         photo_url: URL of the photo to assess
         timeout: Download timeout in seconds
@@ -160,159 +337,56 @@ def assess_photo_quality(photo_url, timeout=10):
         tips: list of actionable improvement suggestions
     """
     import requests
-    from io import BytesIO
-    import numpy as np
 
     try:
-        import cv2
-        cv_available = True
-    except ImportError:
-        cv_available = False
+        _, img_raw, img_oriented = _fetch_and_orient(photo_url, timeout)
+        return _quality_report(img_raw, img_oriented.convert('RGB'))
+    except requests.RequestException as e:
+        return _quality_error(f'Could not download photo: {str(e)}',
+                              ['Check that the photo URL is accessible.'])
+    except Exception as e:
+        return _quality_error(f'Photo quality check failed: {str(e)}')
 
-    result = {
-        'overall': 'pass',
-        'checks': {},
-        'warnings': [],
-        'tips': [],
-        'exif_rotated': False,
-    }
 
-    try:
-        response = requests.get(photo_url, timeout=timeout)
-        response.raise_for_status()
-        img_bytes = response.content
-
-        img_pil = PIL_Image.open(BytesIO(img_bytes))
-
-        # Check EXIF rotation
-        exif = img_pil.getexif() if hasattr(img_pil, 'getexif') else {}
-        orientation = exif.get(274, 1)  # 274 = Orientation tag, 1 = normal
-        if orientation and orientation != 1:
-            result['exif_rotated'] = True
-            result['warnings'].append(
-                'Photo was rotated — auto-corrected. For best results, hold your phone upright when photographing.'
-            )
-
-        # Auto-orient
-        img_pil = auto_orient_pil(img_pil).convert('RGB')
-        width, height = img_pil.size
-
-        # ── Resolution check ──
-        min_side = min(width, height)
-        result['checks']['resolution'] = {
-            'width': width,
-            'height': height,
-            'min_side': min_side,
-        }
-        if min_side < QUALITY_MIN_DIMENSION:
-            result['checks']['resolution']['status'] = 'fail'
-            result['overall'] = 'fail'
-            result['warnings'].append(
-                f'Image too small ({width}×{height}). Minimum {QUALITY_MIN_DIMENSION}px on shortest side required.'
-            )
-            result['tips'].append('Use your phone camera at full resolution — avoid screenshots or thumbnails.')
-        elif min_side < QUALITY_WARN_DIMENSION:
-            result['checks']['resolution']['status'] = 'warn'
-            if result['overall'] == 'pass':
-                result['overall'] = 'warn'
-            result['warnings'].append(
-                f'Image is small ({width}×{height}). Higher resolution improves fingerprint reliability.'
-            )
-            result['tips'].append('Move closer or use a higher resolution camera setting.')
-        else:
-            result['checks']['resolution']['status'] = 'pass'
-
-        # Skip CV-dependent checks if OpenCV not available
-        if not cv_available:
-            result['checks']['blur'] = {'status': 'skipped', 'reason': 'OpenCV not available'}
-            result['checks']['sift_keypoints'] = {'status': 'skipped', 'reason': 'OpenCV not available'}
-            return result
-
-        # Convert to CV2 for blur and SIFT checks
-        img_np = np.array(img_pil)
-        img_cv = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-
-        # Resize to standard analysis size (800px max side)
-        h, w = img_cv.shape[:2]
-        scale = 800 / max(h, w)
-        resized = cv2.resize(img_cv, (int(w * scale), int(h * scale)))
-        gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
-
-        # ── Blur check (Laplacian variance) ──
-        blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
-        result['checks']['blur'] = {
-            'score': round(blur_score, 1),
-        }
-        if blur_score < QUALITY_MIN_BLUR:
-            result['checks']['blur']['status'] = 'fail'
-            result['overall'] = 'fail'
-            result['warnings'].append(
-                f'Image is too blurry (sharpness score: {blur_score:.0f}, minimum: {QUALITY_MIN_BLUR}).'
-            )
-            result['tips'].append('Hold your phone steady and make sure the comic is in focus. Tap the screen to focus before shooting.')
-        elif blur_score < QUALITY_WARN_BLUR:
-            result['checks']['blur']['status'] = 'warn'
-            if result['overall'] == 'pass':
-                result['overall'] = 'warn'
-            result['warnings'].append(
-                f'Image could be sharper (score: {blur_score:.0f}). Sharper photos produce stronger fingerprints.'
-            )
-            result['tips'].append('Try better lighting and hold your phone steady.')
-        else:
-            result['checks']['blur']['status'] = 'pass'
+def _edge_strip_hashes_from_image(img, strip_pct=5, hash_size=16):
+    """Edge strip hashes of a decoded PIL image — see generate_edge_strip_hashes()."""
+    from PIL import ImageOps
 
-        # ── SIFT keypoints check ──
-        sift = cv2.SIFT_create(nfeatures=5000)
-        keypoints = sift.detect(gray, None)
-        kp_count = len(keypoints)
+    # Auto-orient before any processing (Session 51). A no-op when the caller
+    # already oriented it (process_registration_photo).
+    img = auto_orient_pil(img)
 
-        result['checks']['sift_keypoints'] = {
-            'count': kp_count,
-        }
-        if kp_count < QUALITY_MIN_SIFT_KPS:
-            result['checks']['sift_keypoints']['status'] = 'fail'
-            result['overall'] = 'fail'
-            result['warnings'].append(
-                f'Not enough visual detail detected ({kp_count} features, minimum: {QUALITY_MIN_SIFT_KPS}). '
-                'This photo cannot be reliably matched.'
-            )
-            result['tips'].append(
-                'Make sure the full comic cover is visible, well-lit, and against a clean background.'
-            )
-        elif kp_count < QUALITY_WARN_SIFT_KPS:
-            result['checks']['sift_keypoints']['status'] = 'warn'
-            if result['overall'] == 'pass':
-                result['overall'] = 'warn'
-            result['warnings'].append(
-                f'Low visual detail ({kp_count} features). Fingerprint may be less reliable for copy matching.'
-            )
-            result['tips'].append('Improve lighting and ensure the comic cover fills most of the frame.')
-        else:
-            result['checks']['sift_keypoints']['status'] = 'pass'
+    w, h = img.size
 
-        # Add general tips if any warnings
-        if result['overall'] == 'warn' and not result['tips']:
-            result['tips'].append('Retake with better lighting for a stronger fingerprint.')
+    # Convert to grayscale and normalize
+    img = img.convert('L')
+    img = ImageOps.autocontrast(img, cutoff=2)
 
-        return result
+    strip_w = max(int(w * strip_pct / 100), 20)
+    strip_h = max(int(h * strip_pct / 100), 20)
 
-    except requests.RequestException as e:
-        return {
-            'overall': 'error',
-            'checks': {},
-            'warnings': [f'Could not download photo: {str(e)}'],
-            'tips': ['Check that the photo URL is accessible.'],
-            'exif_rotated': False,
-        }
-    except Exception as e:
-        return {
-            'overall': 'error',
-            'checks': {},
-            'warnings': [f'Photo quality check failed: {str(e)}'],
-            'tips': [],
-            'exif_rotated': False,
+    regions = {
+        'top': img.crop((0, 0, w, strip_h)),
+        'bottom': img.crop((0, h - strip_h, w, h)),
+        'left': img.crop((0, 0, strip_w, h)),
+        'right': img.crop((w - strip_w, 0, w, h)),
+        'top_left': img.crop((0, 0, strip_w * 2, strip_h * 2)),
+        'top_right': img.crop((w - strip_w * 2, 0, w, strip_h * 2)),
+        'bottom_left': img.crop((0, h - strip_h * 2, strip_w * 2, h)),
+        'bottom_right': img.crop((w - strip_w * 2, h - strip_h * 2, w, h)),
+    }
+
+    edge_hashes = {}
+    for region_name, region_img in regions.items():
+        edge_hashes[region_name] = {
+            'phash': str(imagehash.phash(region_img, hash_size=hash_size)),
+            'dhash': str(imagehash.dhash(region_img, hash_size=hash_size)),
+            'ahash': str(imagehash.average_hash(region_img, hash_size=hash_size)),
+            'whash': str(imagehash.whash(region_img, hash_size=hash_size)),
         }
 
+    return edge_hashes
+
 
 def generate_edge_strip_hashes(img_bytes, strip_pct=5, hash_size=16):
     """
@@ -339,49 +413,29 @@ def generate_edge_strip_hashes(img_bytes, strip_pct=5, hash_size=16):
           'bottom_left': {...}, 'bottom_right': {...} }
     """
     from io import BytesIO
-    from PIL import ImageOps
 
     try:
         img = PIL_Image.open(BytesIO(img_bytes))
-
-        # Auto-orient before any processing (Session 51)
-        img = auto_orient_pil(img)
-
-        w, h = img.size
-
-        # Convert to grayscale and normalize
-        img = img.convert('L')
-        img = ImageOps.autocontrast(img, cutoff=2)
-
-        strip_w = max(int(w * strip_pct / 100), 20)
-        strip_h = max(int(h * strip_pct / 100), 20)
-
-        regions = {
-            'top': img.crop((0, 0, w, strip_h)),
-            'bottom': img.crop((0, h - strip_h, w, h)),
-            'left': img.crop((0, 0, strip_w, h)),
-            'right': img.crop((w - strip_w, 0, w, h)),
-            'top_left': img.crop((0, 0, strip_w * 2, strip_h * 2)),
-            'top_right': img.crop((w - strip_w * 2, 0, w, strip_h * 2)),
-            'bottom_left': img.crop((0, h - strip_h * 2, strip_w * 2, h)),
-            'bottom_right': img.crop((w - strip_w * 2, h - strip_h * 2, w, h)),
-        }
-
-        edge_hashes = {}
-        for region_name, region_img in regions.items():
-            edge_hashes[region_name] = {
-                'phash': str(imagehash.phash(region_img, hash_size=hash_size)),
-                'dhash': str(imagehash.dhash(region_img, hash_size=hash_size)),
-                'ahash': str(imagehash.average_hash(region_img, hash_size=hash_size)),
-                'whash': str(imagehash.whash(region_img, hash_size=hash_size)),
-            }
-
-        return edge_hashes
+        return _edge_strip_hashes_from_image(img, strip_pct, hash_size)
     except Exception as e:
         print(f"Edge strip hash error: {e}")
         return None
 
 
+def _composite_hashes(img):
+    """pHash/dHash/aHash/wHash of a decoded PIL image — see generate_fingerprint()."""
+    # Preprocess: grayscale, auto-crop, resize, normalize contrast, blur
+    img = preprocess_for_fingerprint(img)
+
+    # Generate all 4 hash algorithms
+    return {
+        'phash': str(imagehash.phash(img)),
+        'dhash': str(imagehash.dhash(img)),
+        'ahash': str(imagehash.average_hash(img)),
+        'whash': str(imagehash.whash(img)),
+    }
+
+
 def generate_fingerprint(photo_url):
     """
     Generate multi-algorithm composite fingerprint from photo URL.
@@ -400,33 +454,124 @@ def generate_fingerprint(photo_url):
         return None
 
     try:
-        import requests
-        from io import BytesIO
-
-        # Download image
-        response = requests.get(photo_url, timeout=10)
-        img = PIL_Image.open(BytesIO(response.content))
-
-        # Preprocess: grayscale, auto-crop, resize, normalize contrast, blur
-        img = preprocess_for_fingerprint(img)
-
-        # Generate all 4 hash algorithms
-        fingerprints = {
-            'phash': str(imagehash.phash(img)),
-            'dhash': str(imagehash.dhash(img)),
-            'ahash': str(imagehash.average_hash(img)),
-            'whash': str(imagehash.whash(img)),
-        }
-        return fingerprints
+        _, _, img = _fetch_and_orient(photo_url)
+        return _composite_hashes(img)
     except Exception as e:
         print(f"Fingerprint generation error: {e}")
         return None
 
 
-def generate_all_fingerprints(photos_dict):
+def process_registration_photo(photo_url, angle, quality=False, hashes=True,
+                               edges=False, features=False, timeout=10):
+    """
+    One registration pass over one photo: fetch, decode and orient ONCE, then
+    compute every requested product from that single decode.
+
+    Registration used to download the front cover three times —
+    assess_photo_quality (which ran SIFT only to count keypoints, then threw the
+    features away), generate_fingerprint, and again via req.get for
+    generate_edge_strip_hashes — and decode/orient it three times.
+
+    Products (each one identical to what its standalone function returns):
+        quality   the assess_photo_quality() report
+        hashes    generate_fingerprint() composite hashes
+        edges     generate_edge_strip_hashes() strips
+        features  packed SIFT features + reference LPQ histograms in the
+                  compare_covers frame, for routes/reference_features.py
+                  (persisted by the caller once the registry row exists)
+
+    Returns dict {angle, quality, fingerprint, edge_strips, features, timings};
+    a product that failed or wasn't requested is None. A download/decode failure
+    sets quality to the usual 'error' report. One [REGISTER-TIMING] line per photo.
+    """
+    import time
+    t0 = time.perf_counter()
+    timings = {}
+    out = {'angle': angle, 'quality': None, 'fingerprint': None,
+           'edge_strips': None, 'features': None, 'timings': timings}
+
+    def lap(name, start):
+        timings[name] = round((time.perf_counter() - start) * 1000.0)
+
+    import requests
+    try:
+        s = time.perf_counter()
+        img_bytes, img_raw, img = _fetch_and_orient(photo_url, timeout)
+        lap('fetch_decode', s)
+        timings['kb'] = len(img_bytes) // 1024
+    except requests.RequestException as e:
+        print(f"Registration photo download failed ({angle}): {e}")
+        if quality:
+            out['quality'] = _quality_error(f'Could not download photo: {str(e)}',
+                                            ['Check that the photo URL is accessible.'])
+        return out
+    except Exception as e:
+        print(f"Registration photo decode failed ({angle}): {e}")
+        if quality:
+            out['quality'] = _quality_error(f'Photo quality check failed: {str(e)}')
+        return out
+
+    img_rgb = None
+    if quality or features:
+        img_rgb = img.convert('RGB')
+
+    if quality:
+        s = time.perf_counter()
+        try:
+            out['quality'] = _quality_report(img_raw, img_rgb)
+        except Exception as e:
+            out['quality'] = _quality_error(f'Photo quality check failed: {str(e)}')
+        lap('quality', s)
+
+    if hashes and imagehash:
+        s = time.perf_counter()
+        try:
+            out['fingerprint'] = _composite_hashes(img)
+        except Exception as e:
+            print(f"Fingerprint generation error: {e}")
+        lap('hashes', s)
+
+    if edges and imagehash:
+        s = time.perf_counter()
+        try:
+            out['edge_strips'] = _edge_strip_hashes_from_image(img)
+        except Exception as e:
+            print(f"Edge strip generation failed for {angle}: {e}")
+        lap('edges', s)
+
+    if features:
+        s = time.perf_counter()
+        try:
+            import numpy as np
+            import cv2
+            from routes.slab_guard_cv import (detect_reference_features, _resize_standard,
+                                              compute_reference_lpq)
+            from routes.reference_features import pack_features
+            std = _resize_standard(cv2.cvtColor(np.array(img_rgb), cv2.COLOR_RGB2BGR))
+            kps, des = detect_reference_features(std)
+            out['features'] = pack_features(kps, des, lpq=compute_reference_lpq(std))
+            timings['kps'] = len(kps)
+        except ImportError:
+            pass  # OpenCV not available — compare_covers detects at compare time
+        except Exception as e:
+            print(f"Reference feature extraction failed for {angle}: {e}")
+        lap('sift', s)
+
+    lap('total', t0)
+    print('[REGISTER-TIMING] angle=%s %s' % (
+        angle, ' '.join('%s=%s%s' % (k, v, '' if k in ('kb', 'kps') else 'ms')
+                        for k, v in timings.items())))
+    return out
+
+
+def generate_all_fingerprints(photos_dict, front_bundle=None):
     """
     Generate composite fingerprints + edge strip hashes for all photo angles.
 
+    Each photo is fetched and decoded once (process_registration_photo). Pass
+    the front cover's bundle as `front_bundle` when the caller already
+    processed it (register_comic does, for the quality gate) and it is reused.
+
     Returns dict:
     {
       'front': {phash, dhash, ahash, whash},       # full-image composite
@@ -438,8 +583,6 @@ def generate_all_fingerprints(photos_dict):
       'edge_version': 'v3_5pct'                      # version tag for compat
     }
     """
-    import requests as req
-
     all_fingerprints = {}
     edge_strips = {}
 
@@ -453,21 +596,19 @@ def generate_all_fingerprints(photos_dict):
     for angle_key, angle_name in angle_map.items():
         url = photos_dict.get(angle_key)
         if url:
-            # Generate full-image composite fingerprint (existing approach)
-            fp = generate_fingerprint(url)
-            if fp:
-                all_fingerprints[angle_name] = fp
-
-            # Generate edge strip hashes for front and back only
-            # (spine and centerfold are too variable per our testing)
-            if angle_key in ('front', 'back'):
-                try:
-                    response = req.get(url, timeout=10)
-                    edge_fp = generate_edge_strip_hashes(response.content)
-                    if edge_fp:
-                        edge_strips[angle_name] = edge_fp
-                except Exception as e:
-                    print(f"Edge strip generation failed for {angle_name}: {e}")
+            if angle_key == 'front' and front_bundle is not None:
+                bundle = front_bundle
+            else:
+                # Edge strip hashes for front and back only
+                # (spine and centerfold are too variable per our testing)
+                bundle = process_registration_photo(
+                    url, angle_name, edges=angle_key in ('front', 'back'))
+
+            # Full-image composite fingerprint (existing approach)
+            if bundle['fingerprint']:
+                all_fingerprints[angle_name] = bundle['fingerprint']
+            if bundle['edge_strips']:
+                edge_strips[angle_name] = bundle['edge_strips']
 
     if edge_strips:
         all_fingerprints['edge_strips'] = edge_strips
@@ -492,13 +633,10 @@ def generate_all_fingerprints(photos_dict):
             # Fingerprint alternate front/back covers (useful for SIFT fallback)
             if ptype in ('alternate_front', 'alternate_back'):
                 angle = 'front' if 'front' in ptype else 'back'
-                try:
-                    response = req.get(url, timeout=10)
-                    edge_fp = generate_edge_strip_hashes(response.content)
-                    if edge_fp:
-                        alt_edge_strips[f'{angle}_alt_{i}'] = edge_fp
-                except Exception as e:
-                    print(f"Edge strip generation failed for extra {i} ({ptype}): {e}")
+                bundle = process_registration_photo(
+                    url, f'{angle}_alt_{i}', hashes=False, edges=True)
+                if bundle['edge_strips']:
+                    alt_edge_strips[f'{angle}_alt_{i}'] = bundle['edge_strips']
 
             # Store all extra photo URLs for the CV engine
             extra_urls.append({
@@ -589,13 +727,18 @@ def register_comic():
             })
 
         # ── Photo Quality Gate (Session 56) ──
-        # Check front cover quality before spending time on fingerprint generation.
-        # Block truly bad photos, warn on marginal, pass good ones.
+        # Check front cover quality before spending time on the other photos.
+        # Block truly bad photos, warn on marginal, pass good ones. The front
+        # is processed ONCE here — quality, hashes, edge strips and the SIFT
+        # reference features all come from this single fetch/decode.
         photo_quality = None
+        front_bundle = None
         if photos and isinstance(photos, dict):
             front_url = photos.get('front')
             if front_url:
-                photo_quality = assess_photo_quality(front_url)
+                front_bundle = process_registration_photo(
+                    front_url, 'front', quality=True, edges=True, features=True)
+                photo_quality = front_bundle['quality']
 
                 if photo_quality['overall'] == 'fail':
                     return jsonify({
@@ -611,7 +754,7 @@ def register_comic():
 
         if photos and isinstance(photos, dict):
             # Generate multi-algorithm fingerprints for all angles
-            all_fingerprints = generate_all_fingerprints(photos)
+            all_fingerprints = generate_all_fingerprints(photos, front_bundle=front_bundle)
 
             # Also generate legacy pHash from front cover
             front_url = photos.get('front')
@@ -677,6 +820,20 @@ def register_comic():
 
         registry_id, registration_date = cur.fetchone()
         conn.commit()
+        entitlements.invalidate(g.user_id)    # active registration count changed
+
+        # Persist the front cover's SIFT features as the compare_covers
+        # reference (routes/reference_features.py). After the commit and on its
+        # own connection: a failure here only costs compare-time detection.
+        if front_bundle and front_bundle.get('features'):
+            from routes.reference_features import save_reference_features
+            save_reference_features(photos.get('front'), front_bundle['features'],
+                                    comic_id=comic_id)
+
+        # Pre-render the verify page's watermarked cover (background thread) so
+        # the first public lookup is a cache hit (watermark_cache.py).
+        from routes.verify import warm_watermark
+        warm_watermark(serial_number, photos.get('front') if isinstance(photos, dict) else None)
 
         response_data = {
             'success': True,
@@ -951,6 +1108,8 @@ def report_comic_stolen(comic_id):
 
         updated = cur.fetchone()
         conn.commit()
+        watermark_cache.invalidate(serial_number)   # status is part of the derivative key
+        entitlements.invalidate(g.user_id)          # active registration count changed
 
         return jsonify({
             'success': True,
@@ -1014,6 +1173,8 @@ def mark_comic_recovered(comic_id):
 
         updated = cur.fetchone()
         conn.commit()
+        watermark_cache.invalidate(serial_number)   # status is part of the derivative key
+        entitlements.invalidate(g.user_id)          # active registration count changed
 
         return jsonify({
             'success': True,
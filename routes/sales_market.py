@@ -1,12 +1,14 @@
 """
 Market Sales Blueprint - Whatnot/marketplace sale recording and queries
-Routes: /api/sales/record, /api/sales/count, /api/sales/recent
+Routes: /api/sales/record, /api/sales/record/batch, /api/sales/count, /api/sales/recent
 """
 import os
+import queue
+import threading
 from flask import Blueprint, jsonify, request
 import psycopg2
 import db as _dbpool
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
 # NORMALIZATION IMPORT
 from title_normalizer import normalize_title
@@ -30,6 +32,183 @@ def init_modules(r2_available, upload_sale_func, upload_image_func, scan_barcode
     scan_barcode_from_base64 = scan_barcode_func
 
 
+# Columns written by both /sales/record and /sales/record/batch, and the ONE
+# conflict rule they share — a re-sent sale (same source + source_id) updates
+# price/sold_at and the normalized fields, and never blanks a stored barcode.
+INSERT_COLUMNS = (
+    'source', 'title', 'series', 'issue', 'grade', 'grade_source', 'slab_type',
+    'variant', 'is_key', 'is_facsimile', 'price', 'sold_at', 'raw_title', 'seller', 'bids', 'viewers',
+    'image_url', 'source_id', 'upc_main', 'upc_addon', 'is_reprint',
+    'canonical_title', 'normalized_issue_number', 'grade_from_title', 'grading_company',
+    'is_variant', 'is_signed', 'is_lot', 'is_key_issue', 'key_issue_claim', 'creators', 'title_notes',
+)
+_COL_SQL = ', '.join(INSERT_COLUMNS)
+_ON_CONFLICT_SQL = """
+            ON CONFLICT (source, source_id) DO UPDATE SET
+                price = EXCLUDED.price,
+                sold_at = EXCLUDED.sold_at,
+                upc_main = COALESCE(EXCLUDED.upc_main, market_sales.upc_main),
+                upc_addon = COALESCE(EXCLUDED.upc_addon, market_sales.upc_addon),
+                is_reprint = COALESCE(EXCLUDED.is_reprint, market_sales.is_reprint),
+                canonical_title = EXCLUDED.canonical_title,
+                normalized_issue_number = EXCLUDED.normalized_issue_number,
+                grade_from_title = EXCLUDED.grade_from_title,
+                grading_company = EXCLUDED.grading_company,
+                is_variant = EXCLUDED.is_variant,
+                is_signed = EXCLUDED.is_signed,
+                is_lot = EXCLUDED.is_lot,
+                is_key_issue = EXCLUDED.is_key_issue,
+                key_issue_claim = EXCLUDED.key_issue_claim,
+                creators = EXCLUDED.creators,
+                title_notes = EXCLUDED.title_notes"""
+
+
+def _sale_values(data, image_url, upc_main, upc_addon, is_reprint):
+    """Positional values for INSERT_COLUMNS. Same fields/defaults for both routes."""
+    return (data.get('source', 'whatnot'), data.get('title'), data.get('series'), data.get('issue'),
+            data.get('grade'), data.get('grade_source'), data.get('slab_type'), data.get('variant'),
+            data.get('is_key', False), data.get('is_facsimile', False), data.get('price'), data.get('sold_at'),
+            data.get('raw_title'), data.get('seller'), data.get('bids'), data.get('viewers'),
+            image_url, data.get('source_id'), upc_main, upc_addon, is_reprint,
+            # Normalized fields
+            data.get('canonical_title'), data.get('normalized_issue_number'),
+            data.get('grade_from_title'), data.get('grading_company'),
+            data.get('is_variant', False), data.get('is_signed', False),
+            data.get('is_lot', False), data.get('is_key_issue', False),
+            data.get('key_issue_claim'), data.get('creators'), data.get('title_notes'))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Background image stage for /sales/record/batch
+#
+# WHY: /sales/record does the R2 upload AND scan_barcode_from_base64 (up to four
+# rotations through pyzbar) inline, per sale. Fine for one sale as it closes;
+# an end-of-show dump of hundreds of sales through that path is hundreds of
+# serial scans + uploads inside one request. The batch route commits the rows
+# first, then hands each base64 image to this stage, which uploads it, scans it
+# when the sale arrived without a barcode, and fills image_url / upc_* on the row.
+#
+# ⚠️ BOUNDED, AND IT REJECTS RATHER THAN QUEUES FOREVER. Unlike the eBay cover
+# backup (sales_ebay.py), the image here exists ONLY in memory — there is no
+# source URL to re-fetch later. Each pending job holds a base64 photo, so the
+# queue is capped (_IMAGE_QUEUE_MAX) to keep worker memory bounded
+# (L-SW-2026-012). Images that do not fit are NOT silently dropped: the batch
+# response lists their sale ids in `images_rejected`, and re-sending those sales
+# through /sales/record (same source_id → upsert) attaches the image inline.
+#
+# Lost on restart: jobs still queued when a worker dies are gone, and the rows
+# keep image_url / upc_main NULL — same state as a sale sent without a photo.
+# ─────────────────────────────────────────────────────────────────────────────
+
+_IMAGE_QUEUE_MAX = int(os.environ.get('MARKET_SALE_IMAGE_QUEUE', '200'))
+_IMAGE_WORKERS = int(os.environ.get('MARKET_SALE_IMAGE_WORKERS', '2'))
+
+_image_queue = queue.Queue(maxsize=_IMAGE_QUEUE_MAX)
+_image_lock = threading.Lock()
+_image_workers_started = 0
+_image_stats = {
+    'queued': 0,
+    'rejected': 0,
+    'processed': 0,
+    'uploaded': 0,
+    'scanned': 0,
+    'failed': 0,
+    'last_error': None,
+}
+
+
+def _image_note(kind, error=None):
+    with _image_lock:
+        _image_stats[kind] += 1
+        if error is not None:
+            _image_stats['last_error'] = str(error)[:200]
+
+
+def _ensure_image_workers():
+    """Start the worker threads on first use (lazily, so importing the
+    blueprint in scripts/tests spawns nothing)."""
+    global _image_workers_started
+    with _image_lock:
+        while _image_workers_started < _IMAGE_WORKERS:
+            threading.Thread(target=_image_worker, daemon=True,
+                             name=f'sale-img-{_image_workers_started}').start()
+            _image_workers_started += 1
+
+
+def enqueue_sale_images(jobs):
+    """Queue (sale_id, image_data, scan_barcode) jobs without blocking.
+    Returns the sale ids that did NOT fit (caller reports them)."""
+    if not jobs:
+        return []
+    _ensure_image_workers()
+    rejected = []
+    for job in jobs:
+        try:
+            _image_queue.put_nowait(job)
+            _image_note('queued')
+        except queue.Full:
+            _image_note('rejected')
+            rejected.append(job[0])
+    if rejected:
+        print(f"[SaleImages] queue full ({_image_queue.maxsize}) — rejected {len(rejected)} "
+              f"image(s); re-send via /api/sales/record to attach")
+    return rejected
+
+
+def _image_worker():
+    while True:
+        job = _image_queue.get()
+        try:
+            process_sale_image(*job)
+        except Exception as e:
+            _image_note('failed', e)
+            print(f"[SaleImages] sale {job[0]} failed (non-fatal): {e}")
+        finally:
+            _image_queue.task_done()
+
+
+def process_sale_image(sale_id, image_data, scan_barcode):
+    """Upload one sale photo to R2, scan it if the sale had no barcode, and
+    write whatever was found back onto the row. Raises on DB error (the worker
+    counts it)."""
+    barcode = None
+    if scan_barcode and scan_barcode_from_base64:
+        barcode = scan_barcode_from_base64(image_data)
+        if barcode:
+            _image_note('scanned')
+
+    new_url = None
+    if R2_AVAILABLE and upload_sale_image:
+        r2_result = upload_sale_image(sale_id, image_data, 'front')
+        if r2_result.get('success'):
+            new_url = r2_result['url']
+            _image_note('uploaded')
+
+    _image_note('processed')
+    if not barcode and not new_url:
+        return
+
+    barcode = barcode or {}
+    conn = _dbpool.get_db()
+    try:
+        cur = conn.cursor()
+        # Same precedence as the inline path: a scanned barcode wins, a stored
+        # one is never blanked by a scan that found nothing.
+        cur.execute("""
+            UPDATE market_sales SET
+                image_url = COALESCE(%s, image_url),
+                upc_main = COALESCE(%s, upc_main),
+                upc_addon = COALESCE(%s, upc_addon),
+                is_reprint = COALESCE(%s, is_reprint)
+            WHERE id = %s
+        """, (new_url, barcode.get('upc_main'), barcode.get('upc_addon'),
+              barcode.get('is_reprint'), sale_id))
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
 def normalize_market_sale(sale_dict):
     """
     Normalize a Whatnot/market sale dictionary in-place.
@@ -98,43 +277,11 @@ def api_record_sale():
         conn = _dbpool.get_db(dict_rows=True)
         cur = conn.cursor()
 
-        cur.execute("""
-            INSERT INTO market_sales (source, title, series, issue, grade, grade_source, slab_type,
-                variant, is_key, is_facsimile, price, sold_at, raw_title, seller, bids, viewers,
-                image_url, source_id, upc_main, upc_addon, is_reprint,
-                canonical_title, normalized_issue_number, grade_from_title, grading_company,
-                is_variant, is_signed, is_lot, is_key_issue, key_issue_claim, creators, title_notes)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (source, source_id) DO UPDATE SET
-                price = EXCLUDED.price,
-                sold_at = EXCLUDED.sold_at,
-                upc_main = COALESCE(EXCLUDED.upc_main, market_sales.upc_main),
-                upc_addon = COALESCE(EXCLUDED.upc_addon, market_sales.upc_addon),
-                is_reprint = COALESCE(EXCLUDED.is_reprint, market_sales.is_reprint),
-                canonical_title = EXCLUDED.canonical_title,
-                normalized_issue_number = EXCLUDED.normalized_issue_number,
-                grade_from_title = EXCLUDED.grade_from_title,
-                grading_company = EXCLUDED.grading_company,
-                is_variant = EXCLUDED.is_variant,
-                is_signed = EXCLUDED.is_signed,
-                is_lot = EXCLUDED.is_lot,
-                is_key_issue = EXCLUDED.is_key_issue,
-                key_issue_claim = EXCLUDED.key_issue_claim,
-                creators = EXCLUDED.creators,
-                title_notes = EXCLUDED.title_notes
-            RETURNING id
-        """, (data.get('source', 'whatnot'), data.get('title'), data.get('series'), data.get('issue'),
-              data.get('grade'), data.get('grade_source'), data.get('slab_type'), data.get('variant'),
-              data.get('is_key', False), data.get('is_facsimile', False), data.get('price'), data.get('sold_at'),
-              data.get('raw_title'), data.get('seller'), data.get('bids'), data.get('viewers'),
-              image_url, data.get('source_id'), upc_main, upc_addon, is_reprint,
-              # Normalized fields
-              data.get('canonical_title'), data.get('normalized_issue_number'),
-              data.get('grade_from_title'), data.get('grading_company'),
-              data.get('is_variant', False), data.get('is_signed', False),
-              data.get('is_lot', False), data.get('is_key_issue', False),
-              data.get('key_issue_claim'), data.get('creators'), data.get('title_notes')))
+        cur.execute(
+            f"INSERT INTO market_sales ({_COL_SQL}) "
+            f"VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))}) "
+            f"{_ON_CONFLICT_SQL} RETURNING id",
+            _sale_values(data, image_url, upc_main, upc_addon, is_reprint))
 
         sale_id = cur.fetchone()['id']
         conn.commit()
@@ -164,6 +311,166 @@ def api_record_sale():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+MAX_BATCH_SALES = 1000
+
+
+def _upsert_key(sale):
+    """(source, source_id) as the conflict target sees it — source_id as text,
+    so 123 and '123' are one row — or None when the sale has no source_id."""
+    if sale.get('source_id') is None:
+        return None
+    return (sale.get('source', 'whatnot'), str(sale['source_id']))
+
+
+@market_sales_bp.route('/sales/record/batch', methods=['POST'])
+def api_record_sales_batch():
+    """
+    Record many sales in one request (end-of-show dump from the extension).
+    Body: {"sales": [<same fields as /sales/record>, ...]}
+
+    Response time is normalization + ONE execute_values upsert + ONE commit
+    (sales without a source_id are inserted one statement each).
+    Base64 images are uploaded and barcode-scanned afterwards by the background
+    stage above, which fills image_url / upc_* on the rows. `ids` is aligned
+    with the request's `sales` (null for a row that failed).
+    """
+    data = request.get_json(silent=True) or {}
+    sales = data.get('sales')
+
+    if not isinstance(sales, list) or not sales:
+        return jsonify({'success': False, 'error': 'No sales provided'}), 400
+    if len(sales) > MAX_BATCH_SALES:
+        return jsonify({'success': False,
+                        'error': f'At most {MAX_BATCH_SALES} sales per batch'}), 400
+    if not all(isinstance(sale, dict) for sale in sales):
+        return jsonify({'success': False, 'error': 'Each sale must be an object'}), 400
+
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        return jsonify({'success': False, 'error': 'Database not configured'}), 500
+
+    # NORMALIZE EACH SALE BEFORE INSERT
+    sales = [normalize_market_sale(sale) for sale in sales]
+
+    # ⚠️ Collapse repeats of the same (source, source_id) to the LAST one before
+    # the upsert: ON CONFLICT DO UPDATE cannot touch the same row twice in one
+    # statement ("command cannot affect row a second time") and would abort the
+    # whole batch. Last-wins is what sending them one by one would have stored.
+    # Sales without a source_id never conflict and are all kept.
+    slot_of = {}         # request index → index into `rows`
+    rows = []
+    by_key = {}
+    for i, sale in enumerate(sales):
+        key = _upsert_key(sale)
+        if key is not None and key in by_key:
+            rows[by_key[key]] = sale
+            slot_of[i] = by_key[key]
+            continue
+        if key is not None:
+            by_key[key] = len(rows)
+        slot_of[i] = len(rows)
+        rows.append(sale)
+
+    # The inline barcode scan is deferred, so rows go in with the barcode the
+    # client sent (or NULL) and image_url only when the client sent a URL.
+    def _row_values(sale):
+        return _sale_values(sale, sale.get('image_url'), sale.get('upc_main'),
+                            sale.get('upc_addon'), sale.get('is_reprint', False))
+
+    conn = None
+    try:
+        conn = _dbpool.get_db()
+        cur = conn.cursor()
+        ids = [None] * len(rows)
+        row_errors = 0
+        last_row_error = None
+
+        # ⚠️ Postgres does NOT promise RETURNING rows in VALUES order, so the
+        # bulk statement returns (id, source, source_id) and ids are matched
+        # back by that key. Sales without a source_id have no key to match on
+        # and always take the per-row statement below.
+        keyed = [n for n, sale in enumerate(rows) if _upsert_key(sale) is not None]
+        per_row = [n for n, sale in enumerate(rows) if _upsert_key(sale) is None]
+
+        # Same shape as /ebay-sales/batch: optimistic bulk statement inside a
+        # savepoint, per-row fallback (each in its own savepoint) if it raises,
+        # so one malformed sale cannot sink the other few hundred.
+        if keyed:
+            try:
+                cur.execute("SAVEPOINT sw_market_bulk")
+                returned = execute_values(
+                    cur,
+                    f"INSERT INTO market_sales ({_COL_SQL}) VALUES %s {_ON_CONFLICT_SQL} "
+                    f"RETURNING id, source, source_id",
+                    [_row_values(rows[n]) for n in keyed],
+                    page_size=500,
+                    fetch=True,
+                )
+                cur.execute("RELEASE SAVEPOINT sw_market_bulk")
+                id_of = {(source, str(source_id)): sale_id
+                         for sale_id, source, source_id in returned}
+                for n in keyed:
+                    ids[n] = id_of.get(_upsert_key(rows[n]))
+            except Exception as bulk_err:
+                print(f"[MarketBatch] bulk upsert failed ({bulk_err}) — "
+                      f"falling back to per-row for this batch of {len(keyed)}")
+                cur.execute("ROLLBACK TO SAVEPOINT sw_market_bulk")
+                cur.execute("RELEASE SAVEPOINT sw_market_bulk")
+                per_row = sorted(per_row + keyed)
+
+        for n in per_row:
+            try:
+                cur.execute("SAVEPOINT sw_market_row")
+                cur.execute(
+                    f"INSERT INTO market_sales ({_COL_SQL}) "
+                    f"VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))}) "
+                    f"{_ON_CONFLICT_SQL} RETURNING id",
+                    _row_values(rows[n]))
+                ids[n] = cur.fetchone()[0]
+                cur.execute("RELEASE SAVEPOINT sw_market_row")
+            except Exception as e:
+                row_errors += 1
+                last_row_error = str(e)[:200]
+                cur.execute("ROLLBACK TO SAVEPOINT sw_market_row")
+                cur.execute("RELEASE SAVEPOINT sw_market_row")
+
+        conn.commit()
+        cur.close()
+
+        if row_errors:
+            print(f"[MarketBatch] {row_errors} of {len(rows)} rows failed in the per-row "
+                  f"path. Last error: {last_row_error}")
+
+        # Images go to the background stage only AFTER commit, so its UPDATE
+        # can see the rows.
+        jobs = [(ids[n], sale['image'], not sale.get('upc_main'))
+                for n, sale in enumerate(rows)
+                if ids[n] is not None and sale.get('image')]
+        rejected = enqueue_sale_images(jobs)
+
+        return jsonify({
+            'success': True,
+            'saved': sum(1 for sale_id in ids if sale_id is not None),
+            'total': len(sales),
+            'duplicates_in_batch': len(sales) - len(rows),
+            'row_errors': row_errors,
+            'ids': [ids[slot_of[i]] for i in range(len(sales))],
+            # Outcome is not known yet — this is what was handed to the stage.
+            'images_queued': len(jobs) - len(rejected),
+            'images_rejected': rejected,
+        })
+    except Exception as e:
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @market_sales_bp.route('/sales/count', methods=['GET'])
 def api_sales_count():
     """Get total count of sales in database"""
@@ -21,19 +21,24 @@ import logging
 import os
 import re
 import time
-# ThreadPoolExecutor removed — sequential passes needed due to Opus 4.6
-# rate limit (30K input tokens/min). Parallel calls trigger 429 errors.
+# Passes are admitted by opus_token_budget (30K input tokens/min on Opus 4.6)
+# rather than run strictly one after another — see run_orchestrated_identification.
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Optional
 
 import psycopg2
 import db as _dbpool
-import requests as http_requests
 from flask import Blueprint, jsonify, request, g
 from psycopg2.extras import RealDictCursor
 
+from admin import log_api_usage
 from auth import require_auth, require_approved
 from models import OPUS
+import signature_reference_cache as ref_cache
+import signature_visual_index as visual_index
+import opus_token_budget
+from signature_result_cache import SignatureCacheProbe
 
 logger = logging.getLogger(__name__)
 
@@ -77,7 +82,19 @@ PASS_TEMPERATURES = [0.2, 0.5, 0.7]
 # PROVISIONAL — calibrate at the signature-v2 accuracy re-measurement (87% target).
 LOW_CONFIDENCE_THRESHOLD = float(os.environ.get('SIG_LOW_CONFIDENCE_THRESHOLD', '0.50'))
 CONFUSION_PAIR_DELTA = 0.10  # rank1 vs rank2 within this → flag
-# MAX_WORKERS removed — passes run sequentially now (rate limit constraint)
+# Local visual pre-filter (signature_visual_index): after the metadata
+# pre-filter, rank the pool by HOG similarity to the unknown signature and keep
+# only the top N for the Opus passes. 0 = rank and log only (shadow mode) —
+# local recall is 93% at N=8 of 15, so trimming stays opt-in until the logged
+# production ranks back it up.
+VISUAL_PREFILTER_KEEP = int(os.environ.get('SIG_VISUAL_PREFILTER_KEEP', '0'))
+# Anthropic prompt-cache breakpoint (5-minute ephemeral). Placed on the system
+# prompt, the end of the reference-image block and the end of the user turn —
+# see build_identification_messages for why that order.
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+# 429s / 529s on a pass are retried inside run_single_pass after retry-after,
+# at most this many times, before the pass counts as failed.
+RATE_LIMIT_RETRIES = 3
 
 
 # ---------------------------------------------------------------------------
@@ -96,6 +113,8 @@ class CreatorCandidate:
     style_source: str = "ai_assigned"  # 'ai_assigned' or 'admin' (Mike verified)
     image_urls: list[str] = field(default_factory=list)
     reference_images_b64: list[str] = field(default_factory=list)
+    reference_image_urls: list[str] = field(default_factory=list)  # parallel to reference_images_b64
+    visual_score: Optional[float] = None   # set by visual_prefilter
 
 
 @dataclass
@@ -105,6 +124,9 @@ class PassResult:
     analysis: dict
     flags: dict
     raw_response: str
+    # usage: input_tokens / output_tokens / cache_creation_input_tokens /
+    # cache_read_input_tokens for this call (zeros when the call errored).
+    usage: dict = field(default_factory=dict)
 
 
 @dataclass
@@ -116,6 +138,7 @@ class AggregatedResult:
     pass_count: int
     passes_attempted: int
     latency_ms: int
+    usage: dict = field(default_factory=dict)  # summed across every pass incl. retries
 
 
 # ---------------------------------------------------------------------------
@@ -199,7 +222,7 @@ def prefilter_candidates(
                          cs.career_end, cs.publisher_affiliations, cs.signature_style,
                          cs.style_confidence, cs.style_source
                 HAVING COUNT(si.id) >= 2
-                ORDER BY cs.reference_image_count DESC
+                ORDER BY cs.reference_image_count DESC, cs.id
                 LIMIT %s
             """, params + [limit])
 
@@ -229,7 +252,7 @@ def prefilter_candidates(
                     GROUP BY cs.id, cs.creator_name, cs.career_start,
                              cs.career_end, cs.publisher_affiliations, cs.signature_style,
                              cs.style_confidence, cs.style_source
-                    ORDER BY cs.reference_image_count DESC
+                    ORDER BY cs.reference_image_count DESC, cs.id
                     LIMIT %s
                 """, [limit])
                 rows = cur.fetchall()
@@ -307,35 +330,85 @@ def log_result_to_db(
 # R2 Image Retrieval (via public HTTP — matches v1 pattern)
 # ---------------------------------------------------------------------------
 
-def _fetch_and_encode_image(image_url: str) -> Optional[str]:
-    """Fetch an image from its public URL and return base64-encoded string."""
-    try:
-        resp = http_requests.get(image_url, timeout=15)
-        resp.raise_for_status()
-        return base64.b64encode(resp.content).decode('utf-8')
-    except Exception as e:
-        logger.warning("Failed to fetch image %s: %s", image_url, e)
-        return None
-
-
 def fetch_reference_images(candidates: list[CreatorCandidate]) -> list[CreatorCandidate]:
     """
     Fetch reference images via HTTP for all candidates.
     Returns candidates with reference_images_b64 populated.
     Drops candidates with no usable images.
+
+    Served from the per-worker reference cache (signature_reference_cache):
+    payloads are downscaled/re-encoded once and kept in memory, and misses for
+    the whole pool are fetched concurrently rather than one GET at a time.
+    Payloads are deterministic per URL, so the cached reference block stays
+    byte-identical across requests — the prompt-cache prefix still matches.
     """
+    urls = [url for c in candidates for url in c.image_urls]
+    owners = [c.creator_id for c in candidates for _ in c.image_urls]
+    payloads = iter(ref_cache.url_images(urls, owners))
     for candidate in candidates:
-        images_b64 = []
+        images_b64, loaded_urls = [], []
         for url in candidate.image_urls:
-            b64 = _fetch_and_encode_image(url)
-            if b64:
-                images_b64.append(b64)
+            payload = next(payloads)
+            if payload:
+                images_b64.append(payload[0])
+                loaded_urls.append(url)
+            else:
+                logger.warning("Failed to fetch image %s", url)
         candidate.reference_images_b64 = images_b64
+        candidate.reference_image_urls = loaded_urls
 
     # Drop candidates with no usable images
     return [c for c in candidates if c.reference_images_b64]
 
 
+def visual_prefilter(
+    unknown_image_b64: str,
+    candidates: list[CreatorCandidate],
+    keep: int = None,
+) -> list[CreatorCandidate]:
+    """
+    Rank candidates by local visual similarity (signature_visual_index) and,
+    when keep > 0, return only the `keep` most similar, best first. With
+    keep == 0 the pool is returned unchanged — same members, same order, so
+    the prompt-cache prefix is untouched — but every candidate's visual_score
+    is still set for the shadow log. Never raises: if the unknown image can't
+    be described the pool passes through as-is.
+    """
+    keep = VISUAL_PREFILTER_KEEP if keep is None else keep
+    started = time.time()
+    query = visual_index.describe_b64(unknown_image_b64)
+    if query is None:
+        return candidates
+
+    for c in candidates:
+        for url, b64 in zip(c.reference_image_urls, c.reference_images_b64):
+            visual_index.INDEX.add(url, c.creator_id, b64)
+    keys = [url for c in candidates for url in c.reference_image_urls]
+    scores = dict(visual_index.INDEX.rank(query, keys=keys))
+    for c in candidates:
+        c.visual_score = scores.get(c.creator_id)
+
+    ranked = sorted(candidates, key=lambda c: -(c.visual_score if c.visual_score is not None else -2.0))
+    logger.info(
+        "[SigVisual] ranked %d candidates in %.0fms (keep=%d): %s",
+        len(candidates), (time.time() - started) * 1000, keep,
+        ", ".join(f"{c.name}={c.visual_score:.3f}" for c in ranked[:5] if c.visual_score is not None),
+    )
+    if keep > 0 and len(ranked) > keep:
+        return ranked[:keep]
+    return candidates
+
+
+def _visual_rank_of(name: str, candidates: list[CreatorCandidate]) -> Optional[int]:
+    """1-based visual rank of a creator within the pool (None if unscored)."""
+    scored = sorted((c for c in candidates if c.visual_score is not None),
+                    key=lambda c: -c.visual_score)
+    for i, c in enumerate(scored, 1):
+        if c.name == name:
+            return i
+    return None
+
+
 # ---------------------------------------------------------------------------
 # Prompt Builder
 # ---------------------------------------------------------------------------
@@ -345,26 +418,27 @@ def build_identification_messages(
     candidates: list[CreatorCandidate],
     comic_context: dict,
     system_prompt: str,
-) -> tuple[str, list[dict]]:
+) -> tuple[list[dict], list[dict]]:
     """
-    Build the system prompt and messages array for one Opus call.
+    Build the system blocks and messages array for one Opus call.
     Injects context metadata and attaches all reference + unknown images.
+
+    Laid out for prompt caching — the API caches exact prefixes, so content is
+    ordered from most to least stable:
+      system prompt                      [breakpoint] same for every request
+      reference images per candidate     [breakpoint] same for a candidate pool
+      comic context + target image       [breakpoint] same for all passes
+    The reference block used to sit AFTER the per-request context text, which
+    made it unshareable across requests. Passes differ only in temperature,
+    which is not part of the cache key, so passes 2..N read the whole prompt.
     """
     candidate_names = ", ".join(c.name for c in candidates)
 
-    context_block = f"""COMIC CONTEXT:
-- Publisher: {comic_context.get('publisher', 'unknown')}
-- Era: {comic_context.get('era_decade', 'unknown')}
-- Title: {comic_context.get('title', 'unknown')}
-- Signature location: {comic_context.get('signature_location', 'unknown')}
-- Slab grade label: {comic_context.get('slab_label', 'unknown')}
-
-CANDIDATE POOL: {candidate_names}
-
-REFERENCE IMAGES FOLLOW (grouped by creator, {REFERENCE_IMAGES_PER_CREATOR} per creator max):"""
-
-    # Build content array: text intro + reference images + unknown image
-    content = [{"type": "text", "text": context_block}]
+    content = [{
+        "type": "text",
+        "text": f"REFERENCE IMAGES FOLLOW (grouped by creator, "
+                f"{REFERENCE_IMAGES_PER_CREATOR} per creator max):",
+    }]
 
     for candidate in candidates:
         # Build style hint with confidence annotation
@@ -393,6 +467,21 @@ REFERENCE IMAGES FOLLOW (grouped by creator, {REFERENCE_IMAGES_PER_CREATOR} per
                 },
             })
 
+    # Breakpoint on the last reference block: everything up to here depends only
+    # on the candidate pool, never on the unknown signature.
+    content[-1]["cache_control"] = CACHE_BREAKPOINT
+
+    context_block = f"""
+COMIC CONTEXT:
+- Publisher: {comic_context.get('publisher', 'unknown')}
+- Era: {comic_context.get('era_decade', 'unknown')}
+- Title: {comic_context.get('title', 'unknown')}
+- Signature location: {comic_context.get('signature_location', 'unknown')}
+- Slab grade label: {comic_context.get('slab_label', 'unknown')}
+
+CANDIDATE POOL: {candidate_names}"""
+    content.append({"type": "text", "text": context_block})
+
     content.append({
         "type": "text",
         "text": "\n--- TARGET SIGNATURE (unknown) ---\nIdentify this signature:"
@@ -407,17 +496,70 @@ REFERENCE IMAGES FOLLOW (grouped by creator, {REFERENCE_IMAGES_PER_CREATOR} per
     })
     content.append({
         "type": "text",
-        "text": "\nReturn ONLY the JSON object as specified. No preamble."
+        "text": "\nReturn ONLY the JSON object as specified. No preamble.",
+        "cache_control": CACHE_BREAKPOINT,
     })
 
+    system = [{"type": "text", "text": system_prompt, "cache_control": CACHE_BREAKPOINT}]
     messages = [{"role": "user", "content": content}]
-    return system_prompt, messages
+    return system, messages
+
+
+def _usage_of(response) -> dict:
+    """Token counts off one API response. Cached input is reported separately
+    from input_tokens and must be carried alongside it (see log_api_usage)."""
+    u = getattr(response, "usage", None)
+    return {
+        "input_tokens": getattr(u, "input_tokens", 0) or 0,
+        "output_tokens": getattr(u, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(u, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(u, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+def _sum_usage(usages) -> dict:
+    total: dict = {}
+    for u in usages:
+        for k, v in (u or {}).items():
+            total[k] = total.get(k, 0) + v
+    return total
 
 
 # ---------------------------------------------------------------------------
 # Single Opus Pass
 # ---------------------------------------------------------------------------
 
+def _create_with_budget(client, budget, est_tokens: int, **kwargs):
+    """
+    messages.create() admitted through the shared token budget: wait for
+    est_tokens, call, settle the budget with the real usage. A 429/529 refunds
+    the admission, holds every caller back for its retry-after and retries (up
+    to RATE_LIMIT_RETRIES). Raises like messages.create once retries run out
+    or the queue wait exceeds opus_token_budget.QUEUE_TIMEOUT_S.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        waited = budget.acquire(est_tokens)
+        if waited is None:
+            raise RuntimeError(f"Opus token budget queue timeout (~{est_tokens} tokens)")
+        if waited >= 1:
+            logger.info("[OpusBudget] pass temp=%.1f queued %.1fs for ~%d tokens",
+                        kwargs.get("temperature", 0), waited, est_tokens)
+        try:
+            response = client.messages.create(**kwargs)
+        except Exception as e:
+            budget.settle(est_tokens, 0)
+            if not opus_token_budget.is_rate_limited(e) or attempt == RATE_LIMIT_RETRIES:
+                raise
+            retry_after = opus_token_budget.retry_after_seconds(e)
+            logger.warning("[OpusBudget] %s on pass temp=%.1f — retry-after %.1fs (attempt %d/%d)",
+                           getattr(e, "status_code", "?"), kwargs.get("temperature", 0),
+                           retry_after, attempt + 1, RATE_LIMIT_RETRIES)
+            budget.penalize(retry_after)
+            continue
+        budget.settle(est_tokens, opus_token_budget.charged_tokens(_usage_of(response)))
+        return response
+
+
 def run_single_pass(
     temperature: float,
     unknown_image_b64: str,
@@ -425,20 +567,36 @@ def run_single_pass(
     comic_context: dict,
     system_prompt: str,
     client,
+    budget=None,
+    est_tokens: Optional[int] = None,
 ) -> PassResult:
-    """Execute one Opus vision call and parse the JSON response."""
-    _, messages = build_identification_messages(
+    """
+    Execute one Opus vision call and parse the JSON response.
+
+    With a budget (opus_token_budget.TokenBudget) the call is admitted through
+    it; est_tokens overrides the size-based estimate (e.g. a pass whose prompt
+    is already in the prompt cache).
+    """
+    system, messages = build_identification_messages(
         unknown_image_b64, candidates, comic_context, system_prompt
     )
 
+    usage: dict = {}
     try:
-        response = client.messages.create(
+        request_kwargs = dict(
             model=OPUS_MODEL,
             max_tokens=1500,
             temperature=temperature,
-            system=system_prompt,
+            system=system,
             messages=messages,
         )
+        if budget is None:
+            response = client.messages.create(**request_kwargs)
+        else:
+            if est_tokens is None:
+                est_tokens = opus_token_budget.estimate_input_tokens(system, messages)
+            response = _create_with_budget(client, budget, est_tokens, **request_kwargs)
+        usage = _usage_of(response)
         raw = response.content[0].text.strip()
 
         # Strip markdown fences if model adds them despite instructions
@@ -456,6 +614,7 @@ def run_single_pass(
             analysis=parsed.get("analysis", {}),
             flags=parsed.get("flags", {}),
             raw_response=raw,
+            usage=usage,
         )
 
     except json.JSONDecodeError as e:
@@ -466,6 +625,7 @@ def run_single_pass(
             analysis={},
             flags={"parse_error": True},
             raw_response="",
+            usage=usage,
         )
     except Exception as e:
         logger.error("Opus call failed on pass temp=%.1f: %s", temperature, e)
@@ -475,6 +635,7 @@ def run_single_pass(
             analysis={},
             flags={"api_error": True, "error": str(e)},
             raw_response="",
+            usage=usage,
         )
 
 
@@ -622,7 +783,9 @@ def run_orchestrated_identification(
     Full orchestration pipeline:
     1. Pre-filter candidates via PostgreSQL metadata
     2. Fetch reference images from R2 (via public URL)
-    3. Fire 3 parallel Opus passes
+    2b. Rank by local visual similarity (trim to VISUAL_PREFILTER_KEEP if set)
+    3. Run the Opus passes through the shared token budget (first pass primes
+       the prompt cache, the rest fan out)
     4. Aggregate and return results
     """
     start_ms = int(time.time() * 1000)
@@ -630,7 +793,9 @@ def run_orchestrated_identification(
     if not ANTHROPIC_AVAILABLE:
         raise RuntimeError("Anthropic API not configured")
 
-    client = _anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    # max_retries=0: 429s must reach _create_with_budget so the shared budget
+    # learns about them (the SDK would otherwise sleep them out invisibly).
+    client = _anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
 
     # Step 1: Pre-filter
     candidates = prefilter_candidates(
@@ -647,16 +812,45 @@ def run_orchestrated_identification(
     if not candidates:
         raise ValueError("No candidates with reference images available")
 
-    # Step 3: Sequential Opus passes (not parallel — 30K input tokens/min rate limit
-    # on Opus 4.6 means parallel calls trigger 429 errors). Each pass takes ~20-30s,
-    # so sequential execution naturally spaces requests within the rate limit window.
+    # Step 2b: Local visual ranking — trims the pool only when
+    # VISUAL_PREFILTER_KEEP > 0; the full pool is kept for the shadow log.
+    pool = candidates
+    candidates = visual_prefilter(unknown_image_b64, candidates)
+
+    # Step 3: Opus passes, admitted by the shared input-token budget
+    # (opus_token_budget.OPUS_BUDGET — 30K input tokens/min on Opus 4.6) rather
+    # than strictly one after another. The first pass runs alone: it writes the
+    # prompt cache (system + references + target all sit before breakpoints).
+    # The remaining passes differ only in temperature, so they read the whole
+    # prompt from cache — cache reads don't count toward ITPM — and fan out
+    # concurrently, charged at the first pass's uncached input. If the first
+    # pass showed no cache activity they are charged at full size and the
+    # budget queues them as needed. 429s are waited out per retry-after inside
+    # run_single_pass.
+    budget = opus_token_budget.OPUS_BUDGET
     pass_results: list[PassResult] = []
     failed_temps: list[float] = []
-
-    for temp in PASS_TEMPERATURES:
-        result = run_single_pass(
-            temp, unknown_image_b64, candidates, comic_context, system_prompt, client,
-        )
+    pass_usages: list[dict] = []
+
+    def _run_passes(temps, est_tokens=None):
+        if len(temps) <= 1:
+            return [run_single_pass(t, unknown_image_b64, candidates, comic_context,
+                                    system_prompt, client, budget, est_tokens) for t in temps]
+        with ThreadPoolExecutor(max_workers=len(temps)) as executor:
+            return list(executor.map(
+                lambda t: run_single_pass(t, unknown_image_b64, candidates, comic_context,
+                                          system_prompt, client, budget, est_tokens),
+                temps))
+
+    first = _run_passes(PASS_TEMPERATURES[:1])
+    primed = first[0].usage if first else {}
+    fanout_est = None
+    if not opus_token_budget.CACHE_READS_COUNT and (
+            primed.get("cache_creation_input_tokens") or primed.get("cache_read_input_tokens")):
+        fanout_est = max(1, primed.get("input_tokens", 0))
+
+    for result in first + _run_passes(PASS_TEMPERATURES[1:], fanout_est):
+        pass_usages.append(result.usage)
         if result.rankings:
             pass_results.append(result)
             logger.info(
@@ -666,19 +860,18 @@ def run_orchestrated_identification(
                 result.rankings[0].get("confidence", 0),
             )
         else:
-            failed_temps.append(temp)
+            failed_temps.append(result.temperature)
             logger.warning(
                 "Pass temp=%.1f FAILED — flags: %s",
                 result.temperature, result.flags,
             )
 
-    # Retry failed passes once (rate limit may have cleared by now)
+    # Retry failed passes once — parse errors and non-rate-limit API errors;
+    # rate limits were already waited out against retry-after.
     if failed_temps:
         logger.info("Retrying %d failed pass(es)...", len(failed_temps))
-        for temp in failed_temps:
-            result = run_single_pass(
-                temp, unknown_image_b64, candidates, comic_context, system_prompt, client,
-            )
+        for result in _run_passes(failed_temps, fanout_est):
+            pass_usages.append(result.usage)
             if result.rankings:
                 pass_results.append(result)
                 logger.info(
@@ -705,14 +898,27 @@ def run_orchestrated_identification(
     # Step 4: Aggregate
     result = aggregate_passes(pass_results, passes_attempted=len(PASS_TEMPERATURES))
     result.latency_ms = int(time.time() * 1000) - start_ms
+    result.usage = _sum_usage(pass_usages)
+
+    if result.top5:
+        # Shadow metric for the visual pre-filter: where did the Opus winner
+        # sit in the local ranking of the FULL pool? Grep [SigVisual] to
+        # estimate recall@N before setting SIG_VISUAL_PREFILTER_KEEP.
+        logger.info("[SigVisual] winner %s visual_rank=%s of %d",
+                    result.top5[0].get("creator"),
+                    _visual_rank_of(result.top5[0].get("creator"), pool), len(pool))
 
     logger.info(
-        "Orchestration complete — top: %s (%.2f), latency: %dms, passes: %d/%d",
+        "Orchestration complete — top: %s (%.2f), latency: %dms, passes: %d/%d, "
+        "in_tok: %d, cache_create: %d, cache_read: %d",
         result.top5[0]["creator"] if result.top5 else "none",
         result.top5[0]["confidence"] if result.top5 else 0,
         result.latency_ms,
         result.pass_count,
         result.passes_attempted,
+        result.usage.get("input_tokens", 0),
+        result.usage.get("cache_creation_input_tokens", 0),
+        result.usage.get("cache_read_input_tokens", 0),
     )
 
     return result
@@ -779,6 +985,7 @@ def match_signature():
       - title: optional string
       - signature_location: optional string (cover|interior|unknown)
       - slab_label: optional string
+      - fresh: optional — true bypasses the result cache (admin re-checks)
 
     Returns:
       {
@@ -787,7 +994,8 @@ def match_signature():
         "analysis": {...},
         "stability_scores": {...},
         "latency_ms": int,
-        "pass_count": int
+        "pass_count": int,
+        "cached": true        # only when served from signature_result_cache
       }
     """
     # --- Signature ID entitlement + usage cap (server-side, FAIL CLOSED) ---
@@ -798,6 +1006,7 @@ def match_signature():
     # match runs — no silent processing, no billing of blocked calls.
     from datetime import datetime, timezone
     from routes.billing import get_signature_id_entitlement
+    import entitlements
 
     ent = get_signature_id_entitlement(g.user_id)
     if ent['reason'] == 'error':
@@ -815,14 +1024,10 @@ def match_signature():
 
     if sig_limit != -1:
         # Capped plan (guard): check monthly usage. FAIL CLOSED on any error.
+        cap_conn = None
         try:
-            cap_conn = _dbpool.get_db(dict_rows=True)
-            cap_cur = cap_conn.cursor()
-            cap_cur.execute(
-                "SELECT sig_checks_this_month, sig_checks_reset_date FROM users WHERE id = %s",
-                (g.user_id,)
-            )
-            cap_user = cap_cur.fetchone()
+            # Counter vs cap → fresh entitlement snapshot (entitlements.py)
+            cap_user = entitlements.get_entitlements(g.user_id, fresh=True)
             now = datetime.now(timezone.utc)
             reset_date = cap_user.get('sig_checks_reset_date') if cap_user else None
 
@@ -831,23 +1036,30 @@ def match_signature():
                     next_reset = datetime(now.year + 1, 1, 1, tzinfo=timezone.utc)
                 else:
                     next_reset = datetime(now.year, now.month + 1, 1, tzinfo=timezone.utc)
+                cap_conn = _dbpool.get_db()
+                cap_cur = cap_conn.cursor()
                 cap_cur.execute(
                     "UPDATE users SET sig_checks_this_month = 0, sig_checks_reset_date = %s WHERE id = %s",
                     (next_reset, g.user_id)
                 )
                 cap_conn.commit()
+                cap_cur.close()
+                entitlements.invalidate(g.user_id)
                 sig_used = 0
                 resets_at = next_reset.strftime('%b %d')
             else:
                 sig_used = cap_user.get('sig_checks_this_month', 0) or 0
                 resets_at = reset_date.strftime('%b %d') if reset_date else 'next month'
-
-            cap_cur.close()
-            cap_conn.close()
         except Exception as e:
             logger.error("Sig cap check failed — failing CLOSED: %s", e)
             return jsonify({'error': 'entitlement_unavailable',
                             'message': 'Could not verify signature ID usage. Please try again.'}), 503
+        finally:
+            if cap_conn:
+                try:
+                    cap_conn.close()
+                except Exception:
+                    pass
 
         if sig_used >= sig_limit:
             return jsonify({'error': 'sig_limit',
@@ -875,6 +1087,7 @@ def match_signature():
             "signature_location": request.form.get("signature_location", "unknown"),
             "slab_label": request.form.get("slab_label", "unknown"),
         }
+        fresh = request.form.get("fresh", "").lower() in ("1", "true")
     else:
         data = request.get_json(force=True) or {}
         image_b64 = data.get("image_b64")
@@ -887,6 +1100,33 @@ def match_signature():
             "signature_location": data.get("signature_location", "unknown"),
             "slab_label": data.get("slab_label", "unknown"),
         }
+        fresh = bool(data.get("fresh"))
+
+    # --- Result cache (signature_result_cache.py) ---
+    # Same image bytes + same context + same reference DB → the prior result,
+    # with no Opus passes. A hit costs nothing, so it is not counted against
+    # the monthly cap and is not re-queued for review (log_result_to_db already
+    # holds the original). "fresh": true bypasses it for admin re-checks.
+    cache = SignatureCacheProbe(
+        '/api/signatures/v2/match',
+        f"{OPUS_MODEL}|{PASS_TEMPERATURES}|{MAX_CANDIDATES}|{VISUAL_PREFILTER_KEEP}",
+        context=comic_context,
+        enabled=not fresh,
+    )
+    cached = cache.lookup(image_b64)
+    if cached is not None:
+        top = cached["top5"][0] if cached.get("top5") else None
+        top_confidence = float(top.get("confidence", 0.0)) if top else 0.0
+        is_confident_match = top is not None and top_confidence >= LOW_CONFIDENCE_THRESHOLD
+        logger.info("[SigID] match served from cache: user=%s plan=%s matched=%s "
+                    "confidence=%.2f cap_counted=False",
+                    g.user_id, ent.get('plan'), is_confident_match, top_confidence)
+        return jsonify(dict(cached, **{
+            "matched": is_confident_match,
+            "message": (None if is_confident_match
+                        else "Signature not in our reference set (no confident match)"),
+            "top_confidence": round(top_confidence, 3),
+        }))
 
     # --- Run orchestration ---
     try:
@@ -923,6 +1163,14 @@ def match_signature():
     except Exception as e:
         logger.warning("DB logging failed (non-fatal): %s", e)
 
+    # Token usage for every pass (incl. retries), with cache writes/reads kept
+    # separate from uncached input. log_api_usage swallows its own errors.
+    log_api_usage(g.user_id, '/api/signatures/v2/match', str(OPUS_MODEL),
+                  result.usage.get("input_tokens", 0),
+                  result.usage.get("output_tokens", 0),
+                  cache_creation_tokens=result.usage.get("cache_creation_input_tokens", 0),
+                  cache_read_tokens=result.usage.get("cache_read_input_tokens", 0))
+
     # --- Cap accounting: a confident match counts ONLY on capped plans (guard).
     #     Increment AFTER the result is known; no-match/below-floor/error never
     #     count. Unlimited plans (dealer/admin) do NOT touch the cap column — that
@@ -948,6 +1196,7 @@ def match_signature():
             inc_conn.commit()
             inc_cur.close()
             inc_conn.close()
+            entitlements.invalidate(g.user_id)
         except Exception as e:
             logger.warning("Failed to increment sig check counter: %s", e)
 
@@ -961,6 +1210,20 @@ def match_signature():
                 new_count if new_count is not None else 'n/a',
                 ('unlimited' if sig_limit == -1 else sig_limit))
 
+    payload = {
+        "top5": result.top5,
+        "flags": result.flags,
+        "analysis": result.analysis,
+        "stability_scores": result.stability_scores,
+        "latency_ms": result.latency_ms,
+        "pass_count": result.pass_count,
+        "passes_attempted": result.passes_attempted,
+    }
+    # Degraded results (passes lost) are not worth replaying. `matched` is
+    # recomputed on a hit so a threshold change applies to cached entries too.
+    if not result.flags.get("degraded_result"):
+        cache.store(payload, [c.get("creator") for c in result.top5])
+
     return jsonify({
         # Honest no-match: below the floor we do NOT attribute the nearest
         # neighbour. `matched` is the authoritative signal; top5 is retained as
@@ -969,13 +1232,7 @@ def match_signature():
         "message": (None if is_confident_match
                     else "Signature not in our reference set (no confident match)"),
         "top_confidence": round(top_confidence, 3),
-        "top5": result.top5,
-        "flags": result.flags,
-        "analysis": result.analysis,
-        "stability_scores": result.stability_scores,
-        "latency_ms": result.latency_ms,
-        "pass_count": result.pass_count,
-        "passes_attempted": result.passes_attempted,
+        **payload,
     })
 
 
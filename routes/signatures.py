@@ -5,7 +5,6 @@ Routes: /api/signatures/match, /api/signatures/identify, /api/signatures/db-stat
 import os
 import json
 import base64
-import requests as http_requests
 from pathlib import Path
 from flask import Blueprint, jsonify, request, g
 import psycopg2
@@ -14,6 +13,8 @@ from psycopg2.extras import RealDictCursor
 
 from auth import require_auth, require_approved
 from models import SONNET_NEW, HAIKU
+import signature_reference_cache as ref_cache
+from signature_result_cache import SignatureCacheProbe
 
 # Create blueprint
 signatures_bp = Blueprint('signatures', __name__, url_prefix='/api/signatures')
@@ -174,9 +175,7 @@ def api_match_signature():
         if ref_images:
             content.append({"type": "text", "text": f"\nREFERENCE {ref_index} — {artist['name']}:"})
             for img_file in ref_images:
-                img_path = SIGNATURES_DIR / img_file
-                img_b64 = image_to_base64(img_path)
-                img_media = get_media_type(img_file)
+                img_b64, img_media = ref_cache.local_image(img_file, creator=artist['name'])
                 content.append({
                     "type": "image",
                     "source": {"type": "base64", "media_type": img_media, "data": img_b64}
@@ -297,13 +296,18 @@ def _save_match_result(sale_id, result):
 # Helpers: Two-step signature identification from full cover photos
 # -------------------------------------------------------------------
 
-def _fetch_and_encode_r2_image(image_url):
-    """Fetch an image from R2 URL and return (base64_string, media_type)."""
-    resp = http_requests.get(image_url, timeout=15)
-    resp.raise_for_status()
-    content_type = resp.headers.get('content-type', 'image/jpeg')
-    b64 = base64.b64encode(resp.content).decode('utf-8')
-    return b64, content_type
+def warm_reference_cache():
+    """Preload the reference-signature cache in the background (wsgi.py
+    startup): v1's selected local references + every active creator's R2
+    images. Never raises."""
+    try:
+        db = load_signature_db()
+        local_sets = {a['name']: select_reference_images(a, max_images=2)
+                      for a in db.get('artists', [])}
+    except Exception as e:
+        print(f"[SigRefCache] signatures_db.json unavailable for warm-up: {e}")
+        local_sets = {}
+    return ref_cache.warm_in_background(local_sets)
 
 
 def _get_wildcard_artist_ids(cur, limit=10):
@@ -508,22 +512,29 @@ def _step2_match_signatures(cover_b64, media_type, detected_sigs, references):
     MAX_REFS_PER_CANDIDATE = 3
     ref_index = 1
     artist_names_in_prompt = []
-    for artist_name, ref_data in references.items():
-        images_to_send = ref_data['images'][:MAX_REFS_PER_CANDIDATE]
+    # Fetch every candidate's images in one batch — cached, and concurrent on
+    # a miss, instead of one serial GET per image.
+    selected = [(artist_name, ref_data, ref_data['images'][:MAX_REFS_PER_CANDIDATE])
+                for artist_name, ref_data in references.items()]
+    urls = [img['image_url'] for _, _, imgs in selected for img in imgs]
+    owners = [ref_data['id'] for _, ref_data, imgs in selected for _ in imgs]
+    payloads = iter(ref_cache.url_images(urls, owners))
+
+    for artist_name, ref_data, images_to_send in selected:
         loaded_any = False
         label_content = {"type": "text", "text": f"\nREFERENCE {ref_index} — {artist_name}:"}
         content.append(label_content)
-        for img_record in images_to_send:
-            img_url = img_record['image_url']
-            try:
-                img_b64, img_media = _fetch_and_encode_r2_image(img_url)
-                content.append({
-                    "type": "image",
-                    "source": {"type": "base64", "media_type": img_media, "data": img_b64}
-                })
-                loaded_any = True
-            except Exception as e:
-                print(f"[signatures/identify] Failed to fetch reference image for {artist_name}: {e}")
+        for _ in images_to_send:
+            payload = next(payloads)
+            if payload is None:
+                print(f"[signatures/identify] Failed to fetch reference image for {artist_name}")
+                continue
+            img_b64, img_media = payload
+            content.append({
+                "type": "image",
+                "source": {"type": "base64", "media_type": img_media, "data": img_b64}
+            })
+            loaded_any = True
         if loaded_any:
             artist_names_in_prompt.append(artist_name)
             ref_index += 1
@@ -652,11 +663,13 @@ def api_identify_signatures():
         image: base64-encoded full cover photo
         media_type: MIME type (default image/jpeg)
         comic_id: optional — link results to a comic in the collection
+        fresh: optional — true bypasses the result cache (admin re-checks)
 
     Returns:
         signatures_found: number of signatures detected
         signatures: array of identified signatures with confidence scores
         tokens_used: breakdown of API token usage
+        cached: true when served from signature_result_cache (no API calls)
     """
     if not ANTHROPIC_AVAILABLE or not ANTHROPIC_API_KEY:
         return jsonify({'error': 'Anthropic API not available'}), 503
@@ -669,6 +682,22 @@ def api_identify_signatures():
     if not cover_b64:
         return jsonify({'error': 'No cover image provided'}), 400
 
+    # Resubmitted cover (re-save, collection edit, admin re-check): serve the
+    # prior identification while the ranked creators' references are unchanged
+    # (signature_result_cache.py). Fallback results below are never stored.
+    cache = SignatureCacheProbe('/api/signatures/identify', f'{HAIKU}|{SONNET_NEW}',
+                                enabled=not data.get('fresh'))
+    cached = cache.lookup(cover_b64)
+    if cached is not None:
+        print(f"[signatures/identify] cache hit ({cached.get('signatures_found', 0)} signatures)")
+        cached['tokens_used'] = {}
+        if comic_id:
+            try:
+                _record_identification(comic_id, {'signatures': cached.get('signatures', [])})
+            except Exception as e:
+                print(f"[signatures/identify] Error saving results: {e}")
+        return jsonify(cached)
+
     total_tokens = {}
 
     # ── Step 1: Haiku detection ──
@@ -683,14 +712,16 @@ def api_identify_signatures():
 
     # No signatures? Return early — skip Step 2
     if not detected_sigs:
-        return jsonify({
+        response = {
             'success': True,
             'signatures_found': 0,
             'signatures': [],
             'haiku_notes': haiku_result.get('notes', ''),
             'tokens_used': total_tokens,
             'authentication_note': 'No signatures detected on this cover.'
-        })
+        }
+        cache.store(response, [])
+        return jsonify(response)
 
     # ── Gather candidate artist names from Haiku's guesses ──
     candidate_names = []
@@ -828,7 +859,7 @@ def api_identify_signatures():
         except Exception as e:
             print(f"[signatures/identify] Error saving results: {e}")
 
-    return jsonify({
+    response = {
         'success': True,
         'signatures_found': len(final_signatures),
         'signatures': final_signatures,
@@ -836,7 +867,11 @@ def api_identify_signatures():
         'tokens_used': total_tokens,
         'references_used': len(references),
         'authentication_note': 'For definitive verification, submit to CGC Signature Series or CBCS Verified Signature.'
-    })
+    }
+    # Every reference artist Sonnet ranked against, not just the winners: a
+    # new image for any of them could change the outcome.
+    cache.store(response, list(references.keys()))
+    return jsonify(response)
 
 
 # -------------------------------------------------------------------
@@ -383,6 +383,19 @@ BORDER_INLIER_RUNS = 3         # Run SIFT align N times, take max border inliers
 EDGE_WIDTH_PX = 50             # Edge strip width for IoU computation
 TARGET_SIZE = (800, 1200)      # Standard comparison size
 
+# ── COARSE-TO-FINE SIFT (opt-in) ──
+# Homography from a half-resolution level, refined with full-resolution
+# features detected only in the border band — see _sift_align_coarse_to_fine.
+# OFF by default: flip it only after scripts/slabguard_cv_benchmark.py
+# --sift-mode both (and the cross-camera harness with --sift-mode) show no
+# verdict changes on the current test set.
+SIFT_COARSE_TO_FINE = os.environ.get('SLAB_GUARD_SIFT_COARSE_TO_FINE', '0') == '1'
+SIFT_COARSE_SCALE = 0.5        # 800×1200 → 400×600
+SIFT_COARSE_FEATURES = 1500
+SIFT_FINE_BAND_PX = 96         # full-res detection band (≥ BORDER_INLIER_EDGE_WIDTH + SIFT margin)
+SIFT_FINE_FEATURES = 600       # per border strip
+SIFT_FINE_GUIDE_PX = 8.0       # fine match must land within this of the coarse prediction
+
 # ── LPQ THRESHOLDS (Session 54-55, validated on Iron Man #200 test set) ──
 # LPQ (Local Phase Quantization) uses STFT phase — blur-invariant, works cross-camera.
 # KEY INSIGHT: Signal lives in BORDER WEAR, not paper fiber/halftone.
@@ -428,7 +441,16 @@ def _resize_standard(img, size=TARGET_SIZE):
     return cv2.resize(img, size)
 
 
-def _sift_align(ref, test, edge_width=EDGE_WIDTH_PX):
+def detect_reference_features(ref):
+    """SIFT keypoints + descriptors for a _resize_standard() BGR image — the
+    exact detection _sift_align runs on `ref`. Registration persists these
+    (routes/reference_features.py) so compare_covers can skip it."""
+    gray_r = cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY)
+    sift = cv2.SIFT_create(nfeatures=5000)
+    return sift.detectAndCompute(gray_r, None)
+
+
+def _sift_align(ref, test, edge_width=EDGE_WIDTH_PX, ref_features=None, test_features=None):
     """
     SIFT-align test image to reference image.
 
@@ -441,16 +463,26 @@ def _sift_align(ref, test, edge_width=EDGE_WIDTH_PX):
 
     In testing: SAME pairs had 3-4 border inliers, DIFF pairs had exactly 0.
 
+    ref_features: optional {'keypoints', 'descriptors'} previously detected on
+        this same ref (registration-time, routes/reference_features.py).
+        Skips the ref-side detection; identical input gives identical features.
+    test_features: optional (keypoints, descriptors) from detect_reference_features(test),
+        reused across the runs of _sift_align_with_stable_border — the detection
+        is deterministic, only FLANN/RANSAC vary between runs.
+
     Returns:
         aligned: Warped test image aligned to ref coordinate space
         stats: Dict with alignment quality metrics including border_inliers
     """
-    gray_r = cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY)
-    gray_t = cv2.cvtColor(test, cv2.COLOR_BGR2GRAY)
-
     sift = cv2.SIFT_create(nfeatures=5000)
-    kp1, des1 = sift.detectAndCompute(gray_r, None)
-    kp2, des2 = sift.detectAndCompute(gray_t, None)
+    if ref_features is not None:
+        kp1, des1 = ref_features['keypoints'], ref_features['descriptors']
+    else:
+        kp1, des1 = sift.detectAndCompute(cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY), None)
+    if test_features is not None:
+        kp2, des2 = test_features
+    else:
+        kp2, des2 = sift.detectAndCompute(cv2.cvtColor(test, cv2.COLOR_BGR2GRAY), None)
 
     stats = {
         'kp_ref': len(kp1) if kp1 else 0,
@@ -528,7 +560,166 @@ def _sift_align(ref, test, edge_width=EDGE_WIDTH_PX):
     return aligned, stats
 
 
-def _sift_align_with_stable_border(ref, test, runs=BORDER_INLIER_RUNS):
+def _border_band_features(gray, band, nfeatures):
+    """Full-resolution SIFT on the four border bands of a gray image, detected
+    per band crop (a masked full-image detection still builds the whole
+    pyramid). Returns (points Nx2 float32 in image coords, descriptors)."""
+    h, w = gray.shape[:2]
+    sift = cv2.SIFT_create(nfeatures=nfeatures)
+    crops = [(0, 0, w, band), (0, h - band, w, h),
+             (0, band, band, h - band), (w - band, band, w, h - band)]
+    pts, des = [], []
+    for x0, y0, x1, y1 in crops:
+        kp, d = sift.detectAndCompute(gray[y0:y1, x0:x1], None)
+        if d is None:
+            continue
+        pts.append(np.float32([k.pt for k in kp]) + np.float32([x0, y0]))
+        des.append(d)
+    if not des:
+        return np.zeros((0, 2), np.float32), None
+    return np.concatenate(pts), np.concatenate(des)
+
+
+def _sift_align_coarse_to_fine(ref, test, edge_width=EDGE_WIDTH_PX, ref_features=None,
+                               cache=None):
+    """
+    Coarse-to-fine variant of _sift_align (SIFT_COARSE_TO_FINE), same return shape.
+
+      1. COARSE: SIFT_COARSE_FEATURES on both images at SIFT_COARSE_SCALE,
+         FLANN + ratio test + RANSAC → homography, lifted to full resolution.
+      2. FINE: the test image is warped into the ref frame with it, and
+         full-resolution features are detected only in the SIFT_FINE_BAND_PX
+         border band of both (the ref side comes from the stored registration
+         features when present). A fine match counts only if it lands within
+         SIFT_FINE_GUIDE_PX of where the coarse homography puts it.
+      3. The final homography is one RANSAC over coarse + fine correspondences
+         in full-resolution coordinates.
+
+    border_inliers counts FINE (full-resolution) inliers in the ref border only,
+    so the Session 50 same-copy signal is still measured at the resolution it
+    was calibrated at. Coarse correspondences only steady the homography.
+
+    cache: dict shared by the runs of _sift_align_with_stable_border — holds
+    the deterministic detections (coarse both sides, fine ref side).
+    """
+    cache = cache if cache is not None else {}
+    h, w = ref.shape[:2]
+    scale = SIFT_COARSE_SCALE
+    band = SIFT_FINE_BAND_PX
+    flann = cv2.FlannBasedMatcher(dict(algorithm=1, trees=5), dict(checks=100))
+
+    if 'coarse' not in cache:
+        sift = cv2.SIFT_create(nfeatures=SIFT_COARSE_FEATURES)
+        small = (int(w * scale), int(h * scale))
+        cache['coarse'] = [
+            sift.detectAndCompute(cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), small,
+                                             interpolation=cv2.INTER_AREA), None)
+            for img in (ref, test)]
+    (kp1, des1), (kp2, des2) = cache['coarse']
+
+    stats = {
+        'mode': 'coarse_to_fine',
+        'kp_ref': len(kp1) if kp1 else 0,
+        'kp_test': len(kp2) if kp2 else 0,
+        'aligned': False,
+        'border_inliers': 0,
+        'interior_inliers': 0,
+    }
+    if des1 is None or des2 is None or len(kp1) < 10 or len(kp2) < 10:
+        stats['error'] = 'insufficient_keypoints'
+        return test, stats
+
+    good = [m for m, n in flann.knnMatch(des1, des2, k=2) if m.distance < 0.7 * n.distance]
+    stats['good_matches'] = len(good)
+    if len(good) < 10:
+        stats['error'] = 'insufficient_matches'
+        return test, stats
+
+    up = 1.0 / scale
+    coarse_ref = np.float32([kp1[m.queryIdx].pt for m in good]) * up
+    coarse_test = np.float32([kp2[m.trainIdx].pt for m in good]) * up
+    M0, mask0 = cv2.findHomography(coarse_test.reshape(-1, 1, 2), coarse_ref.reshape(-1, 1, 2),
+                                   cv2.RANSAC, 5.0)
+    if M0 is None:
+        stats['error'] = 'homography_failed'
+        return test, stats
+    # ⚠️ The fine matches are GUIDED by M0, so they cannot vouch for it: a
+    # wrong coarse homography still collects "consistent" fine matches on
+    # shared printed content. The coarse level alone must clear the alignment
+    # bar before any refinement.
+    stats['coarse_inliers'] = int(mask0.sum())
+    if stats['coarse_inliers'] < MIN_SIFT_INLIERS:
+        stats['inliers'] = stats['coarse_inliers']
+        stats['error'] = 'coarse_alignment_weak'
+        return test, stats
+
+    # ── Fine: full-resolution border features, guided by the coarse warp ──
+    if 'fine_ref' not in cache:
+        if ref_features is not None and ref_features.get('descriptors') is not None:
+            pts = np.float32([k.pt for k in ref_features['keypoints']])
+            in_band = ((pts[:, 0] < band) | (pts[:, 0] >= w - band) |
+                       (pts[:, 1] < band) | (pts[:, 1] >= h - band))
+            cache['fine_ref'] = (pts[in_band], ref_features['descriptors'][in_band])
+        else:
+            cache['fine_ref'] = _border_band_features(
+                cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY), band, SIFT_FINE_FEATURES)
+    ref_pts, ref_des = cache['fine_ref']
+    warped = cv2.warpPerspective(test, M0, (w, h))
+    test_pts, test_des = _border_band_features(
+        cv2.cvtColor(warped, cv2.COLOR_BGR2GRAY), band, SIFT_FINE_FEATURES)
+
+    fine = []
+    if ref_des is not None and test_des is not None and len(ref_des) >= 2 and len(test_des) >= 2:
+        for pair in flann.knnMatch(ref_des, test_des, k=2):
+            if len(pair) < 2:
+                continue
+            m, n = pair
+            if m.distance < 0.7 * n.distance and \
+                    np.hypot(*(ref_pts[m.queryIdx] - test_pts[m.trainIdx])) <= SIFT_FINE_GUIDE_PX:
+                fine.append(m)
+    stats['fine_matches'] = len(fine)
+
+    if fine:
+        fine_ref = np.float32([ref_pts[m.queryIdx] for m in fine])
+        # back from the warped frame into original test coordinates
+        fine_test = cv2.perspectiveTransform(
+            np.float32([test_pts[m.trainIdx] for m in fine]).reshape(-1, 1, 2),
+            np.linalg.inv(M0)).reshape(-1, 2)
+    else:
+        fine_ref = fine_test = np.zeros((0, 2), np.float32)
+
+    src = np.concatenate([coarse_ref, fine_ref]).reshape(-1, 1, 2)
+    dst = np.concatenate([coarse_test, fine_test]).reshape(-1, 1, 2)
+    M, mask = cv2.findHomography(dst, src, cv2.RANSAC, 5.0)
+    if M is None:
+        stats['error'] = 'homography_failed'
+        return test, stats
+
+    inlier_mask = mask.ravel().astype(bool)
+    inliers = int(inlier_mask.sum())
+    stats['inliers'] = inliers
+    stats['inlier_ratio'] = float(inliers / len(src))
+    stats['aligned'] = inliers >= MIN_SIFT_INLIERS
+
+    # ── Border inliers: full-resolution (fine) correspondences only ──
+    ew = edge_width
+    border_match_dists = []
+    for m, is_inlier, (x, y) in zip(fine, inlier_mask[len(coarse_ref):], fine_ref):
+        x, y = int(x), int(y)
+        if is_inlier and (y < ew or y >= h - ew or x < ew or x >= w - ew):
+            border_match_dists.append(m.distance)
+    border_count = len(border_match_dists)
+    stats['border_inliers'] = border_count
+    stats['interior_inliers'] = inliers - border_count
+    stats['border_inlier_pct'] = float(border_count / inliers) if inliers > 0 else 0
+    if border_match_dists:
+        stats['border_avg_distance'] = float(np.mean(border_match_dists))
+
+    return cv2.warpPerspective(test, M, (w, h)), stats
+
+
+def _sift_align_with_stable_border(ref, test, runs=BORDER_INLIER_RUNS, ref_features=None,
+                                   coarse_to_fine=None):
     """
     Run SIFT alignment multiple times and take the run with the highest
     border_inliers count. RANSAC is non-deterministic — same-copy pairs
@@ -548,13 +739,34 @@ def _sift_align_with_stable_border(ref, test, runs=BORDER_INLIER_RUNS):
     noise have high distance (~150+). However, the signal is not reliable enough for
     automated thresholding. In marketplace_mode, use Vision as primary verdict instead
     of trusting border inlier counts.
+
+    Both sides are detected at most once: ref_features (stored at registration)
+    or the first run's ref detection, and the query's features, are reused by
+    every run — SIFT is deterministic, the run-to-run variation is FLANN/RANSAC.
+    With SIFT_COARSE_TO_FINE (or coarse_to_fine=True) each run goes through
+    _sift_align_coarse_to_fine instead.
     """
     best_aligned = None
     best_stats = None
     best_border = -1
+    if coarse_to_fine is None:
+        coarse_to_fine = SIFT_COARSE_TO_FINE
+    cache = {}
+    if not coarse_to_fine:
+        if ref_features is None:
+            kp, des = detect_reference_features(ref)
+            ref_features = {'keypoints': kp, 'descriptors': des}
+        test_features = detect_reference_features(test)
 
     for _ in range(runs):
-        aligned, stats = _sift_align(ref, test, edge_width=BORDER_INLIER_EDGE_WIDTH)
+        if coarse_to_fine:
+            aligned, stats = _sift_align_coarse_to_fine(
+                ref, test, edge_width=BORDER_INLIER_EDGE_WIDTH,
+                ref_features=ref_features, cache=cache)
+        else:
+            aligned, stats = _sift_align(ref, test, edge_width=BORDER_INLIER_EDGE_WIDTH,
+                                         ref_features=ref_features,
+                                         test_features=test_features)
         bi = stats.get('border_inliers', 0)
         if bi > best_border or best_aligned is None:
             best_border = bi
@@ -567,7 +779,89 @@ def _sift_align_with_stable_border(ref, test, runs=BORDER_INLIER_RUNS):
     return best_aligned, best_stats
 
 
-def _compute_edge_iou(ref, aligned, edge_width=EDGE_WIDTH_PX, dilate_px=3):
+# ── Shared border analysis ──
+# _compute_edge_iou, _create_canny_overlay and _generate_residual_heatmap all
+# look at the same four border strips of the same (ref, aligned) pair. The
+# per-image work they used to repeat — grayscale conversion, the warp-void
+# mask, the full-image Canny for the visualizations, the strip mask — is done
+# once in _border_analysis() and handed to each of them.
+#
+# ⚠️ The IoU metrics keep their per-strip Canny on the COLOR strip: that is
+# what IOU_*/DILATED_IOU_* were calibrated on, and a full-image gray Canny
+# gives different edges (gradient = max over channels; hysteresis crosses the
+# strip boundary). The visualizations keep their full-image gray Canny. Both
+# are unchanged — only computed once each.
+_BORDER_NAMES = ('top', 'bottom', 'left', 'right')
+_SSIM_C1, _SSIM_C2 = 0.01 ** 2, 0.03 ** 2
+_DARKEN_25 = (np.arange(256) * 0.25).astype(np.uint8)   # == (img * 0.25).astype(uint8)
+_DARKEN_30 = (np.arange(256) * 0.3).astype(np.uint8)
+
+
+def _border_analysis(ref, aligned, edge_width=EDGE_WIDTH_PX):
+    """Buffers shared by the border-strip metrics and the Canny visualizations.
+
+    Returns dict:
+        slices:        {'top'|'bottom'|'left'|'right': numpy slice}
+        edge_mask:     uint8 255 inside any border strip
+        ref_gray, aligned_gray
+        black:         uint8 255 where every aligned channel < 10 (warp void)
+    The full-image gray Canny pair is added lazily by _border_canny().
+    """
+    h, w = ref.shape[:2]
+    ew = edge_width
+    slices = {
+        'top': np.s_[:ew, :],
+        'bottom': np.s_[-ew:, :],
+        'left': np.s_[:, :ew],
+        'right': np.s_[:, -ew:],
+    }
+    edge_mask = np.zeros((h, w), dtype=np.uint8)
+    for sl in slices.values():
+        edge_mask[sl] = 255
+    return {
+        'slices': slices,
+        'edge_mask': edge_mask,
+        'ref_gray': cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY),
+        'aligned_gray': cv2.cvtColor(aligned, cv2.COLOR_BGR2GRAY),
+        'black': cv2.inRange(aligned, (0, 0, 0), (9, 9, 9)),
+    }
+
+
+def _border_canny(ba):
+    """Full-image gray Canny (ref, aligned) for the visualizations, once per analysis."""
+    if 'canny' not in ba:
+        ba['canny'] = (cv2.Canny(ba['ref_gray'], 50, 150),
+                       cv2.Canny(ba['aligned_gray'], 50, 150))
+    return ba['canny']
+
+
+def _strip_ssim(r_gray, a_gray):
+    """Mean SSIM of two uint8 gray strips (11×11 Gaussian, σ=1.5), float32.
+
+    The five moments go through ONE 5-channel GaussianBlur. Both strips are
+    centered on their own means first: variance = E[x²] − μ² cancels badly in
+    float32 on flat paper, centering keeps it within ~3e-6 of the float64
+    result (SSIM is reported, never thresholded).
+    """
+    x = r_gray.astype(np.float32) * np.float32(1 / 255.0)
+    y = a_gray.astype(np.float32) * np.float32(1 / 255.0)
+    cx, cy = np.float32(x.mean()), np.float32(y.mean())
+    x -= cx
+    y -= cy
+    dx, dy, exx, eyy, exy = cv2.split(
+        cv2.GaussianBlur(cv2.merge([x, y, x * x, y * y, x * y]), (11, 11), 1.5))
+    s1 = exx - dx * dx
+    s2 = eyy - dy * dy
+    s12 = exy - dx * dy
+    mu1 = dx + cx
+    mu2 = dy + cy
+    ssim_map = (((2 * mu1 * mu2 + _SSIM_C1) * (2 * s12 + _SSIM_C2)) /
+                ((mu1 * mu1 + mu2 * mu2 + _SSIM_C1) * (s1 + s2 + _SSIM_C2)))
+    return float(np.mean(ssim_map, dtype=np.float64))
+
+
+def _compute_edge_iou(ref, aligned, edge_width=EDGE_WIDTH_PX, dilate_px=3,
+                      analysis=None):
     """
     Compute Canny edge IoU for each edge region after alignment.
 
@@ -588,22 +882,16 @@ def _compute_edge_iou(ref, aligned, edge_width=EDGE_WIDTH_PX, dilate_px=3):
     edges dominate after SIFT alignment, and those match across ALL copies of the
     same issue. In marketplace_mode, use Vision as primary verdict.
 
+    analysis: optional _border_analysis(ref, aligned, edge_width) to share with
+        _create_canny_overlay.
+
     Returns:
         avg_iou: Average strict IoU across valid (non-void) edges
         per_edge: Dict with per-edge strict iou, dilated iou, ssim, and void flag
         avg_ssim: Average SSIM across valid edges
         avg_dilated_iou: Average dilated IoU across valid edges
     """
-    h, w = ref.shape[:2]
-    ew = edge_width
-
-    edges = {
-        'top': (ref[:ew, :], aligned[:ew, :]),
-        'bottom': (ref[-ew:, :], aligned[-ew:, :]),
-        'left': (ref[:, :ew], aligned[:, :ew]),
-        'right': (ref[:, -ew:], aligned[:, -ew:]),
-    }
-
+    ba = analysis or _border_analysis(ref, aligned, edge_width)
     dilate_kernel = np.ones((dilate_px * 2 + 1, dilate_px * 2 + 1), np.uint8)
 
     per_edge = {}
@@ -611,9 +899,14 @@ def _compute_edge_iou(ref, aligned, edge_width=EDGE_WIDTH_PX, dilate_px=3):
     all_dilated_ious = []
     all_ssims = []
 
-    for name, (r_region, a_region) in edges.items():
-        # Check for warp void (mostly black aligned region)
-        is_void = _region_is_black(a_region, threshold=10, min_pct=0.6)
+    for name in _BORDER_NAMES:
+        sl = ba['slices'][name]
+        r_region, a_region = ref[sl], aligned[sl]
+
+        # Check for warp void (mostly black aligned region) — same test as
+        # _region_is_black(a_region, threshold=10, min_pct=0.6)
+        void_px = ba['black'][sl]
+        is_void = void_px.size == 0 or float(np.count_nonzero(void_px) / void_px.size) > 0.6
 
         # Canny edge detection
         r_canny = cv2.Canny(r_region, 50, 150)
@@ -634,16 +927,7 @@ def _compute_edge_iou(ref, aligned, edge_width=EDGE_WIDTH_PX, dilate_px=3):
         per_edge[name]['dilated_iou'] = d_iou
 
         # SSIM
-        r_gray = cv2.cvtColor(r_region, cv2.COLOR_BGR2GRAY).astype(float) / 255.0
-        a_gray = cv2.cvtColor(a_region, cv2.COLOR_BGR2GRAY).astype(float) / 255.0
-        mu1 = cv2.GaussianBlur(r_gray, (11, 11), 1.5)
-        mu2 = cv2.GaussianBlur(a_gray, (11, 11), 1.5)
-        s1 = cv2.GaussianBlur(r_gray**2, (11, 11), 1.5) - mu1**2
-        s2 = cv2.GaussianBlur(a_gray**2, (11, 11), 1.5) - mu2**2
-        s12 = cv2.GaussianBlur(r_gray * a_gray, (11, 11), 1.5) - mu1 * mu2
-        C1, C2 = 0.01**2, 0.03**2
-        ssim_map = ((2*mu1*mu2+C1)*(2*s12+C2)) / ((mu1**2+mu2**2+C1)*(s1+s2+C2))
-        ssim = float(np.mean(ssim_map))
+        ssim = _strip_ssim(ba['ref_gray'][sl], ba['aligned_gray'][sl])
         per_edge[name]['ssim'] = ssim
 
         # Only include non-void edges in averages
@@ -662,7 +946,7 @@ def _compute_edge_iou(ref, aligned, edge_width=EDGE_WIDTH_PX, dilate_px=3):
             float(np.mean(all_dilated_ious)))
 
 
-def _generate_residual_heatmap(ref, aligned, edge_width=EDGE_WIDTH_PX):
+def _generate_residual_heatmap(ref, aligned, edge_width=EDGE_WIDTH_PX, analysis=None):
     """
     Generate Canny edge comparison heatmap as JPEG bytes for Claude Vision.
 
@@ -672,24 +956,16 @@ def _generate_residual_heatmap(ref, aligned, edge_width=EDGE_WIDTH_PX):
       DARK  = No edges detected in either (background paper)
 
     Only the border strip regions are shown (where physical wear lives).
+    analysis: optional shared _border_analysis(ref, aligned, edge_width).
     """
     import base64
 
     h, w = ref.shape[:2]
-    ew = edge_width
+    ba = analysis or _border_analysis(ref, aligned, edge_width)
 
-    # Build edge mask for border strips only
-    edge_mask = np.zeros((h, w), dtype=np.uint8)
-    edge_mask[:ew, :] = 255
-    edge_mask[-ew:, :] = 255
-    edge_mask[:, :ew] = 255
-    edge_mask[:, -ew:] = 255
-
-    # Compute Canny edges on the full images
-    ref_gray = cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY)
-    aligned_gray = cv2.cvtColor(aligned, cv2.COLOR_BGR2GRAY)
-    canny_ref = cv2.Canny(ref_gray, 50, 150)
-    canny_aligned = cv2.Canny(aligned_gray, 50, 150)
+    # Border strip mask; Canny edges on the full gray images
+    edge_mask = ba['edge_mask']
+    canny_ref, canny_aligned = _border_canny(ba)
 
     # Mask to border strips only
     canny_ref = cv2.bitwise_and(canny_ref, edge_mask)
@@ -712,12 +988,10 @@ def _generate_residual_heatmap(ref, aligned, edge_width=EDGE_WIDTH_PX):
     overlay[:, :, 2] = cv2.dilate(overlay[:, :, 2], kernel, iterations=1)
 
     # Composite: darkened reference + edge overlay in border strips
-    ref_dark = (ref.astype(float) * 0.3).astype(np.uint8)
-    # Only apply overlay in border strip regions
-    mask_3ch = cv2.merge([edge_mask, edge_mask, edge_mask])
-    result = np.where(mask_3ch > 0,
-                      cv2.addWeighted(ref_dark, 1.0, overlay, 1.0, 0),
-                      ref_dark)
+    ref_dark = cv2.LUT(ref, _DARKEN_30)
+    # Only apply overlay in border strip regions (saturating add, masked)
+    result = ref_dark.copy()
+    cv2.add(ref_dark, overlay, dst=result, mask=edge_mask)
 
     # Count pixels for annotation
     green_px = int(np.sum(intersection > 0))
@@ -763,6 +1037,63 @@ def _region_is_black(region, threshold=10, min_pct=0.35):
     return float(np.mean(dark_mask)) > min_pct
 
 
+# ── LPQ fast path ──
+# The four STFT kernels are separable: exp(-j2π(fx·x + fy·y)/W) = e(x)·e(y). So
+# the eight 5×5 responses come from THREE row passes (box, cos, sin) and eight
+# 5-tap column passes over them, in float32, instead of eight 2D float64 passes:
+#   (1,0) = rowC∘box, rowS∘box       (0,1) = box∘colC, box∘colS
+#   (1,±1): cos(a±b) = CC ∓ SS,  sin(a±b) = SC ± CS
+#
+# ⚠️ PARITY WITH THE CALIBRATED float64 CODES. The LPQ thresholds above were
+# set on the original float64 filter2D implementation, and its sign bit is NOT
+# well defined wherever the true response is zero: flat windows, and windows
+# whose variation the kernel cancels exactly, come out as ±1e-13 rounding noise
+# whose sign depends on the summation order. That is 1–6% of pixels on real
+# covers — enough to move chi² by far more than the threshold margins if
+# float32 decided them. So every pixel whose float32 response is within
+# _LPQ_AMBIGUOUS of zero (comfortably above float32 error for 8-bit input,
+# |response| ≤ 25·255) is recomputed exactly as the float64 path did — same
+# coefficients, same row-major order of nonzero taps, same REFLECT_101 border —
+# which reproduces its bits exactly (flat windows via a per-gray-level table;
+# a kernel with more than _LPQ_EXACT_FULL_FRACTION ambiguous pixels just reruns
+# its original float64 filter2D). Everything else has an unambiguous sign.
+# Measured on CCImages covers (1 core): 58–98ms vs 83–135ms per histogram.
+# tests/test_lpq_fast_path.py holds chi² parity ≤ 1e-6 against the original.
+_LPQ_FREQS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+_LPQ_AMBIGUOUS = 0.05
+_LPQ_EXACT_FULL_FRACTION = 0.02   # above this share of pixels, redo the kernel in float64
+_lpq_kernel_cache = {}
+
+
+def _lpq_kernels(win_size):
+    """(2D float64 kernels in code-bit order, float32 1D cos/sin taps,
+    flat-window code per gray level)."""
+    cached = _lpq_kernel_cache.get(win_size)
+    if cached is None:
+        r = np.arange(-(win_size // 2), win_size // 2 + 1)
+        xx, yy = np.meshgrid(r, r)
+        k64 = []
+        for fx, fy in _LPQ_FREQS:
+            phase = 2 * np.pi * (fx / win_size * xx + fy / win_size * yy)
+            k64 += [np.cos(phase), np.sin(phase)]
+        w = 2 * np.pi * r / win_size
+        # Flat windows (all 25 pixels equal) are the bulk of the ambiguous
+        # pixels on scans with a plain background. Their exact float64 bit
+        # depends only on the gray level, so it is tabulated once per kernel.
+        levels = np.arange(256, dtype=np.float64)
+        flat_bits = np.zeros(256, np.uint8)
+        for i, kernel in enumerate(k64):
+            exact = np.zeros(256)
+            for coef in kernel.ravel():
+                if coef != 0:
+                    exact = exact + coef * levels
+            flat_bits |= (exact >= 0).astype(np.uint8) << i
+        cached = (k64, np.cos(w).astype(np.float32), np.sin(w).astype(np.float32),
+                  flat_bits)
+        _lpq_kernel_cache[win_size] = cached
+    return cached
+
+
 def _compute_lpq_histogram(img_gray, win_size=LPQ_WIN_SIZE):
     """
     Compute Local Phase Quantization (LPQ) histogram for a grayscale image.
@@ -779,6 +1110,9 @@ def _compute_lpq_histogram(img_gray, win_size=LPQ_WIN_SIZE):
       - Full-image LPQ captures border wear because wear features have distinctive
         phase signatures at the image boundaries
 
+    Separable float32 implementation — see the LPQ fast path notes above for
+    how its codes stay identical to the original float64 filter2D version.
+
     Args:
         img_gray: Grayscale uint8 image
         win_size: STFT window size (default 5, from Session 54 testing)
@@ -786,38 +1120,98 @@ def _compute_lpq_histogram(img_gray, win_size=LPQ_WIN_SIZE):
     Returns:
         Normalized 256-bin histogram (np.float64 array)
     """
+    k64, c, s, flat_bits = _lpq_kernels(win_size)
+    img_f = img_gray.astype(np.float32)
+    box = np.ones(win_size, np.float32)
+    unit = np.ones(1, np.float32)
+
+    def rows(kx, src=img_f):
+        return cv2.sepFilter2D(src, cv2.CV_32F, kx, unit)
+
+    def cols(src, ky):
+        return cv2.sepFilter2D(src, cv2.CV_32F, unit, ky)
+
+    row_box, row_c, row_s = rows(box), rows(c), rows(s)
+    cc, ss = cols(row_c, c), cols(row_s, s)
+    sc, cs = cols(row_s, c), cols(row_c, s)
+    responses = (cols(row_c, box), cols(row_s, box),     # (1, 0)
+                 cols(row_box, c), cols(row_box, s),     # (0, 1)
+                 cc - ss, sc + cs,                       # (1, 1)
+                 cc + ss, sc - cs)                       # (1, -1)
+
+    # Flat windows: every response is exactly zero, so all 8 bits come from
+    # the per-level table (applied after the loop, in one pass).
+    window = np.ones((win_size, win_size), np.uint8)
+    flat = (cv2.erode(img_gray, window, borderType=cv2.BORDER_REFLECT_101) ==
+            cv2.dilate(img_gray, window, borderType=cv2.BORDER_REFLECT_101))
+    not_flat = ~flat
+
+    # Pack the 8-bit code in place: bool → uint8 view, shift, OR.
+    code = np.zeros(img_gray.shape, dtype=np.uint8)
+    img64 = padded = None
+    pad = win_size // 2
     h, w = img_gray.shape
-    img_f = img_gray.astype(np.float64)
-
-    # 4 frequency direction pairs for STFT
-    freqs = [(1, 0), (0, 1), (1, 1), (1, -1)]
-    responses = []
-
-    for fx, fy in freqs:
-        x_r = np.arange(-(win_size // 2), win_size // 2 + 1)
-        y_r = np.arange(-(win_size // 2), win_size // 2 + 1)
-        xx, yy = np.meshgrid(x_r, y_r)
-        fnx, fny = fx / win_size, fy / win_size
-        # Real and imaginary STFT kernels
-        kr = np.cos(2 * np.pi * (fnx * xx + fny * yy))
-        ki = np.sin(2 * np.pi * (fnx * xx + fny * yy))
-        responses.append(cv2.filter2D(img_f, cv2.CV_64F, kr))
-        responses.append(cv2.filter2D(img_f, cv2.CV_64F, ki))
-
-    # Encode 8 responses into 8-bit code per pixel
-    code = np.zeros((h, w), dtype=np.uint8)
     for i, resp in enumerate(responses):
-        code += ((resp >= 0).astype(np.uint8) << i)
+        bit = (resp >= 0).view(np.uint8)
+        idx = np.flatnonzero((np.abs(resp) < _LPQ_AMBIGUOUS) & not_flat)
+        if idx.size > _LPQ_EXACT_FULL_FRACTION * resp.size:
+            # Many cancelling windows (smooth gradients, scanned backgrounds):
+            # one float64 pass for this kernel is cheaper than the gather.
+            if img64 is None:
+                img64 = img_gray.astype(np.float64)
+            bit.ravel()[idx] = cv2.filter2D(img64, cv2.CV_64F, k64[i]).ravel()[idx] >= 0
+        elif idx.size:
+            if padded is None:
+                padded = cv2.copyMakeBorder(img_gray, pad, pad, pad, pad,
+                                            cv2.BORDER_REFLECT_101).astype(np.float64).ravel()
+            ys, xs = np.divmod(idx, w)
+            base = ys * (w + 2 * pad) + xs
+            kernel = k64[i]
+            exact = np.zeros(idx.size)
+            for ky in range(win_size):
+                for kx in range(win_size):
+                    if kernel[ky, kx] != 0:
+                        exact = exact + kernel[ky, kx] * padded.take(base + ky * (w + 2 * pad) + kx)
+            bit.ravel()[idx] = exact >= 0
+        bit <<= i
+        code |= bit
+    if flat.any():
+        np.copyto(code, flat_bits[img_gray], where=flat)
 
     # Build normalized histogram
-    hist, _ = np.histogram(code.ravel(), bins=256, range=(0, 256))
-    hist = hist.astype(np.float64)
+    hist = np.bincount(code.ravel(), minlength=256).astype(np.float64)
     hist /= (hist.sum() + 1e-10)
     return hist
 
 
+def _lpq_border_strip(gray, win_size=LPQ_WIN_SIZE, edge_width=EDGE_WIDTH_PX):
+    """The 4 border strips of a gray image concatenated into one wide 2D strip
+    (Session 54 insight — the wear signal lives in the border)."""
+    ew = edge_width
+    borders = np.concatenate([
+        gray[:ew, :].ravel(),          # top
+        gray[-ew:, :].ravel(),         # bottom
+        gray[ew:-ew, :ew].ravel(),     # left (excluding corners already in top/bottom)
+        gray[ew:-ew, -ew:].ravel(),    # right
+    ])
+    # Reshape to 2D for LPQ (make it a wide strip)
+    strip_h = max(win_size + 2, 10)  # minimum height for LPQ kernels
+    strip_w = borders.shape[0] // strip_h
+    # Trim to exact multiple
+    return borders[:strip_h * strip_w].reshape(strip_h, strip_w)
+
+
+def compute_reference_lpq(ref_img):
+    """(full_hist, border_hist) for a _resize_standard() BGR reference at the
+    default window/edge width — what _compute_lpq_distance computes for its
+    ref side. Registration stores these with the SIFT features."""
+    ref_gray = cv2.cvtColor(ref_img, cv2.COLOR_BGR2GRAY)
+    return (_compute_lpq_histogram(ref_gray),
+            _compute_lpq_histogram(_lpq_border_strip(ref_gray)))
+
+
 def _compute_lpq_distance(ref_img, aligned_img, win_size=LPQ_WIN_SIZE,
-                           edge_width=EDGE_WIDTH_PX):
+                           edge_width=EDGE_WIDTH_PX, ref_hists=None):
     """
     Compute LPQ chi-squared distance between reference and aligned images.
 
@@ -834,51 +1228,34 @@ def _compute_lpq_distance(ref_img, aligned_img, win_size=LPQ_WIN_SIZE,
         aligned_img: SIFT-aligned test BGR image
         win_size: LPQ window size
         edge_width: Border strip width for border-only computation
+        ref_hists: optional (full_hist, border_hist) stored for this exact
+            ref at registration (compute_reference_lpq). Only honoured at the
+            default win_size/edge_width.
 
     Returns dict:
         lpq_chi2: Border-only chi-squared distance (PRIMARY metric, Session 55)
         lpq_full_chi2: Full-image chi-squared distance (kept for diagnostics)
         lpq_verdict_hint: 'same_copy' | 'different_copy' | 'uncertain'
     """
-    ref_gray = cv2.cvtColor(ref_img, cv2.COLOR_BGR2GRAY)
+    if ref_hists is not None and (win_size, edge_width) != (LPQ_WIN_SIZE, EDGE_WIDTH_PX):
+        ref_hists = None
     aligned_gray = cv2.cvtColor(aligned_img, cv2.COLOR_BGR2GRAY)
+    if ref_hists is None:
+        ref_gray = cv2.cvtColor(ref_img, cv2.COLOR_BGR2GRAY)
+        ref_hist = _compute_lpq_histogram(ref_gray, win_size)
+        ref_border_hist = _compute_lpq_histogram(
+            _lpq_border_strip(ref_gray, win_size, edge_width), win_size)
+    else:
+        ref_hist, ref_border_hist = ref_hists
 
     # ── Full-image LPQ ──
-    ref_hist = _compute_lpq_histogram(ref_gray, win_size)
     aligned_hist = _compute_lpq_histogram(aligned_gray, win_size)
     chi2_full = float(np.sum((ref_hist - aligned_hist) ** 2 /
                               (ref_hist + aligned_hist + 1e-10)))
 
     # ── Border-only LPQ (experimental — Session 54 insight) ──
-    # Extract 4 border strips, concatenate into a single image for LPQ
-    h, w = ref_gray.shape
-    ew = edge_width
-
-    # Build border strip images (concatenate all 4 strips)
-    ref_borders = np.concatenate([
-        ref_gray[:ew, :].ravel(),          # top
-        ref_gray[-ew:, :].ravel(),         # bottom
-        ref_gray[ew:-ew, :ew].ravel(),     # left (excluding corners already in top/bottom)
-        ref_gray[ew:-ew, -ew:].ravel(),    # right
-    ])
-    aligned_borders = np.concatenate([
-        aligned_gray[:ew, :].ravel(),
-        aligned_gray[-ew:, :].ravel(),
-        aligned_gray[ew:-ew, :ew].ravel(),
-        aligned_gray[ew:-ew, -ew:].ravel(),
-    ])
-
-    # Reshape to 2D for LPQ (make it a wide strip)
-    border_len = ref_borders.shape[0]
-    strip_h = max(win_size + 2, 10)  # minimum height for LPQ kernels
-    strip_w = border_len // strip_h
-    # Trim to exact multiple
-    usable = strip_h * strip_w
-    ref_border_2d = ref_borders[:usable].reshape(strip_h, strip_w)
-    aligned_border_2d = aligned_borders[:usable].reshape(strip_h, strip_w)
-
-    ref_border_hist = _compute_lpq_histogram(ref_border_2d, win_size)
-    aligned_border_hist = _compute_lpq_histogram(aligned_border_2d, win_size)
+    aligned_border_hist = _compute_lpq_histogram(
+        _lpq_border_strip(aligned_gray, win_size, edge_width), win_size)
     chi2_border = float(np.sum((ref_border_hist - aligned_border_hist) ** 2 /
                                 (ref_border_hist + aligned_border_hist + 1e-10)))
 
@@ -897,7 +1274,7 @@ def _compute_lpq_distance(ref_img, aligned_img, win_size=LPQ_WIN_SIZE,
     }
 
 
-def _create_canny_overlay(ref, aligned, edge_width=EDGE_WIDTH_PX):
+def _create_canny_overlay(ref, aligned, edge_width=EDGE_WIDTH_PX, analysis=None):
     """
     Create a Canny edge comparison overlay focused on border strips.
 
@@ -918,31 +1295,22 @@ def _create_canny_overlay(ref, aligned, edge_width=EDGE_WIDTH_PX):
     The green was from PRINTED artwork edges, not physical defect edges.
     In marketplace_mode, this function is skipped entirely — do not re-enable it
     without solving the printed-content-edge-dominance problem.
+
+    analysis: optional shared _border_analysis(ref, aligned, edge_width).
     """
     import base64
 
-    h, w = ref.shape[:2]
-    ew = edge_width
-
-    ref_gray = cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY)
-    aligned_gray = cv2.cvtColor(aligned, cv2.COLOR_BGR2GRAY)
+    ba = analysis or _border_analysis(ref, aligned, edge_width)
 
-    # Detect warp black regions in aligned image
-    black_mask = np.all(aligned < 10, axis=2).astype(np.uint8) * 255
-
-    # Canny edges
-    canny_ref = cv2.Canny(ref_gray, 50, 150)
-    canny_aligned = cv2.Canny(aligned_gray, 50, 150)
+    # Warp black regions in aligned image; full-image gray Canny edges
+    black_mask = ba['black']
+    canny_ref, canny_aligned = _border_canny(ba)
 
     # Mask out black warp regions from aligned edges
     canny_aligned = cv2.bitwise_and(canny_aligned, cv2.bitwise_not(black_mask))
 
     # Border strip mask
-    edge_mask = np.zeros((h, w), dtype=np.uint8)
-    edge_mask[:ew, :] = 255
-    edge_mask[-ew:, :] = 255
-    edge_mask[:, :ew] = 255
-    edge_mask[:, -ew:] = 255
+    edge_mask = ba['edge_mask']
 
     canny_ref = cv2.bitwise_and(canny_ref, edge_mask)
     canny_aligned = cv2.bitwise_and(canny_aligned, edge_mask)
@@ -959,14 +1327,15 @@ def _create_canny_overlay(ref, aligned, edge_width=EDGE_WIDTH_PX):
     test_only = cv2.dilate(test_only, kernel)
 
     # Build overlay on darkened reference
-    overlay = (ref.astype(float) * 0.25).astype(np.uint8)
-    overlay[both > 0] = [0, 255, 0]          # Green = matching
-    overlay[ref_only > 0] = [0, 0, 255]      # Red = REF only
-    overlay[test_only > 0] = [255, 100, 0]   # Blue = TEST only
+    # (masks are sparse — index the hits instead of a full boolean pass each)
+    overlay = cv2.LUT(ref, _DARKEN_25)
+    pixels = overlay.reshape(-1, 3)
+    pixels[np.flatnonzero(both)] = [0, 255, 0]          # Green = matching
+    pixels[np.flatnonzero(ref_only)] = [0, 0, 255]      # Red = REF only
+    pixels[np.flatnonzero(test_only)] = [255, 100, 0]   # Blue = TEST only
 
     # Mark black warp regions
-    black_3ch = cv2.merge([black_mask, black_mask, black_mask])
-    overlay = np.where(black_3ch > 0, np.array([40, 40, 40], dtype=np.uint8), overlay)
+    pixels[np.flatnonzero(black_mask)] = 40
 
     # Legend
     cv2.putText(overlay, "Canny Edge Overlay — Border Strips", (10, 22),
@@ -1157,8 +1526,12 @@ def compare_covers(ref_url, test_url, extra_ref_photos=None, timeout=15):
         ref_img = _resize_standard(_download_image(ref_url, timeout))
         test_img = _resize_standard(_download_image(test_url, timeout))
 
-        # SIFT align (multi-run for stable border inlier count)
-        aligned, align_stats = _sift_align_with_stable_border(ref_img, test_img)
+        # SIFT align (multi-run for stable border inlier count). A registered
+        # reference carries its features from registration time.
+        from routes.reference_features import load_reference_features
+        ref_features = load_reference_features(ref_url)
+        aligned, align_stats = _sift_align_with_stable_border(
+            ref_img, test_img, ref_features=ref_features)
 
         # If alignment fails, try alternate front photos as fallback
         used_alternate = False
@@ -1195,10 +1568,15 @@ def compare_covers(ref_url, test_url, extra_ref_photos=None, timeout=15):
             }
 
         # Compute edge IoU (strict and dilated)
-        avg_iou, per_edge, avg_ssim, avg_dilated_iou = _compute_edge_iou(ref_img, aligned)
-
-        # Compute LPQ distance (Session 54 — blur-invariant texture metric)
-        lpq_result = _compute_lpq_distance(ref_img, aligned)
+        border = _border_analysis(ref_img, aligned)
+        avg_iou, per_edge, avg_ssim, avg_dilated_iou = _compute_edge_iou(
+            ref_img, aligned, analysis=border)
+
+        # Compute LPQ distance (Session 54 — blur-invariant texture metric).
+        # Stored ref histograms only describe the registered front, not an alternate.
+        lpq_result = _compute_lpq_distance(
+            ref_img, aligned,
+            ref_hists=None if used_alternate else (ref_features or {}).get('lpq'))
         lpq_chi2 = lpq_result['lpq_chi2']
 
         # Determine verdict using dilated IoU, strict IoU, border inliers, AND LPQ.
@@ -1412,7 +1790,10 @@ def compare_covers_with_vision(ref_url, test_url,
         test_img = _resize_standard(_download_image(test_url, timeout))
 
         # SIFT align (multi-run for stable border inlier count, with alternate fallback)
-        aligned, align_stats = _sift_align_with_stable_border(ref_img, test_img)
+        from routes.reference_features import load_reference_features
+        ref_features = load_reference_features(ref_url)
+        aligned, align_stats = _sift_align_with_stable_border(
+            ref_img, test_img, ref_features=ref_features)
 
         if not align_stats.get('aligned') and extra_ref_photos:
             alt_fronts = [p for p in extra_ref_photos
@@ -1426,6 +1807,7 @@ def compare_covers_with_vision(ref_url, test_url,
                         aligned = alt_aligned
                         align_stats = alt_stats
                         align_stats['used_alternate'] = alt.get('label', alt['url'])
+                        ref_features = None
                         break
                 except Exception:
                     continue
@@ -1442,10 +1824,13 @@ def compare_covers_with_vision(ref_url, test_url,
             }
 
         # Compute edge IoU (strict and dilated)
-        avg_iou, per_edge, avg_ssim, avg_dilated_iou = _compute_edge_iou(ref_img, aligned)
+        border = _border_analysis(ref_img, aligned)
+        avg_iou, per_edge, avg_ssim, avg_dilated_iou = _compute_edge_iou(
+            ref_img, aligned, analysis=border)
 
-        # Compute LPQ distance (Session 54)
-        lpq_result = _compute_lpq_distance(ref_img, aligned)
+        # Compute LPQ distance (Session 54); ref side from registration when stored
+        lpq_result = _compute_lpq_distance(
+            ref_img, aligned, ref_hists=(ref_features or {}).get('lpq'))
         lpq_chi2 = lpq_result['lpq_chi2']
 
         # Quantitative verdict (dilated IoU + strict IoU + border inlier count + LPQ)
@@ -1480,7 +1865,8 @@ def compare_covers_with_vision(ref_url, test_url,
         corner_crops, skipped_corners = _create_corner_crop_comparisons(ref_img, aligned)
         edge_crops, skipped_edges = _create_edge_crop_comparisons(ref_img, aligned)
         if not marketplace_mode:
-            canny_b64, canny_match_pct = _create_canny_overlay(ref_img, aligned)
+            canny_b64, canny_match_pct = _create_canny_overlay(ref_img, aligned,
+                                                               analysis=border)
         else:
             canny_b64, canny_match_pct = None, 0.0
         sbs_b64 = _create_side_by_side(ref_img, test_img)
@@ -28,6 +28,7 @@ import db as _dbpool
 from psycopg2.extras import RealDictCursor
 
 from auth import require_auth, require_admin_auth
+from slabguard_phash_index import FLAGGED_INDEX
 
 # ── pHash implementation (pure Python, no OpenCV dep) ──────────────────────
 # Using PIL + DCT-based perceptual hash (same algorithm as imagehash.phash)
@@ -261,13 +262,11 @@ def check_listing():
                 resp = http_requests.get(image_url, timeout=3)
                 if resp.status_code == 200:
                     incoming_hash = _compute_phash(resp.content)
-                    if incoming_hash:
-                        cur.execute("SELECT phash FROM slabguard_flagged_images")
-                        for row in cur.fetchall():
-                            if _hamming_distance(incoming_hash, row['phash']) <= PHASH_MATCH_THRESHOLD:
-                                match_types.append('phash')
-                                total_boost += 40
-                                break
+                    # Multi-index hash over the flagged table (slabguard_phash_index.py)
+                    # — sub-linear, instead of a Hamming loop over every row.
+                    if incoming_hash and FLAGGED_INDEX.query(cur, incoming_hash, PHASH_MATCH_THRESHOLD):
+                        match_types.append('phash')
+                        total_boost += 40
             except Exception as e:
                 print(f"[SlabGuard] pHash check error: {e}")
 
@@ -480,6 +479,9 @@ def approve_submission(submission_id):
         """, (g.admin_id, note, phash_value, submission_id))
 
         conn.commit()
+        # This worker sees the new hash immediately; the others within
+        # slabguard_phash_index.REFRESH_S.
+        FLAGGED_INDEX.add(flagged_id, phash_value)
 
         return jsonify({
             'success': True,
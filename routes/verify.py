@@ -9,9 +9,10 @@ import json
 import requests as http_requests
 import psycopg2
 import resend
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request, send_file, make_response
 from datetime import datetime, timedelta
 from auth import verify_jwt
+import watermark_cache
 
 TURNSTILE_SECRET = os.environ.get('TURNSTILE_SECRET_KEY', '')
 RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
@@ -71,8 +72,12 @@ def hash_email(email):
 
     return f"{local_obscured}@{domain_obscured}.{'.'.join(domain_parts[1:])}"
 
-def watermark_image(image_url, serial_number):
-    """Add visible watermark to cover photo"""
+def watermark_image(image_url, serial_number, max_edge=None):
+    """Add visible watermark to cover photo.
+
+    max_edge: shrink (never enlarge) so the long edge is at most this many
+    pixels BEFORE drawing, so the overlay stays proportional on every tier.
+    """
     import requests
     from io import BytesIO
     from PIL import ImageOps
@@ -80,10 +85,16 @@ def watermark_image(image_url, serial_number):
     # Download image
     response = requests.get(image_url, timeout=10)
     img = PIL_Image.open(BytesIO(response.content))
+    if max_edge:
+        # JPEG DCT-domain downscale: decodes at 1/2..1/8 when the tier is small
+        img.draft('RGB', (max_edge, max_edge))
 
     # Auto-orient based on EXIF rotation tag (fixes rotated phone photos)
     img = ImageOps.exif_transpose(img)
 
+    if max_edge and max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), PIL_Image.LANCZOS)
+
     img = img.convert('RGBA')
 
     # Create overlay layer
@@ -141,6 +152,29 @@ def watermark_image(image_url, serial_number):
 
     return watermarked.convert('RGB')
 
+
+def render_watermark_jpeg(image_url, serial_number, max_edge=None):
+    """watermark_image() encoded as the JPEG bytes watermark_cache stores."""
+    img_io = io.BytesIO()
+    watermark_image(image_url, serial_number, max_edge).save(img_io, 'JPEG', quality=85)
+    return img_io.getvalue()
+
+
+def warm_watermark(serial_number, cover_url, status='active'):
+    """Pre-render the verify page's derivative (called right after registration)."""
+    if PIL_Image and PIL_ImageDraw:
+        watermark_cache.warm_async(serial_number, cover_url, status, render_watermark_jpeg)
+
+
+def _watermark_urls(serial_number, cover_url, status):
+    """Versioned per-tier URLs: ?v= is the derivative key, so these can be
+    cached for a year and change whenever the photo or status does."""
+    return {
+        tier: (f'/api/verify/watermark/{serial_number}?size={tier}&v='
+               f'{watermark_cache.derivative_key(serial_number, cover_url, status, tier)}')
+        for tier in watermark_cache.TIERS
+    }
+
 @verify_bp.route('/lookup/<serial_number>', methods=['GET', 'POST'])
 def lookup_serial(serial_number):
     """
@@ -232,6 +266,7 @@ def lookup_serial(serial_number):
         import json
         photos_data = json.loads(photos) if isinstance(photos, str) else photos
         cover_url = photos_data.get('front') if photos_data else None
+        watermarked_urls = _watermark_urls(serial, cover_url, status) if cover_url else None
 
         # Build response with privacy protections
         response = {
@@ -246,7 +281,8 @@ def lookup_serial(serial_number):
                 'publication_year': pub_year,
                 'grade': grade,
                 'cover_url': cover_url,
-                'watermarked_url': f'/api/verify/watermark/{serial_number}' if cover_url else None
+                'watermarked_url': watermarked_urls[watermark_cache.PAGE_TIER] if cover_url else None,
+                'watermarked_urls': watermarked_urls
             },
             'owner': {
                 'display_name': hash_email(email) if email else "Anonymous"
@@ -295,6 +331,11 @@ def lookup_serial(serial_number):
 def get_watermarked_image(serial_number):
     """
     Return watermarked cover image for a serial number
+
+    Query: size = sm | md | lg | full (default full), v = derivative key from
+    lookup_serial. Rendered once per (photo, status, size) and served from
+    watermark_cache; strong ETag + If-None-Match → 304. A matching ?v= gets a
+    one-year immutable Cache-Control, anything else a short one.
     """
     try:
         if not PIL_Image or not PIL_ImageDraw:
@@ -303,12 +344,19 @@ def get_watermarked_image(serial_number):
                 'error': 'Image processing not available'
             }), 503
 
+        tier = request.args.get('size', watermark_cache.DEFAULT_TIER)
+        if tier not in watermark_cache.TIERS:
+            return jsonify({
+                'success': False,
+                'error': f"Invalid size. Expected one of: {', '.join(watermark_cache.TIERS)}"
+            }), 400
+
         conn = get_db()
         cur = conn.cursor()
 
-        # Get cover photo URL
+        # Get cover photo URL + status (both part of the derivative key)
         cur.execute("""
-            SELECT c.photos
+            SELECT c.photos, cr.status
             FROM comic_registry cr
             JOIN collections c ON cr.comic_id = c.id
             WHERE cr.serial_number = %s
@@ -325,19 +373,32 @@ def get_watermarked_image(serial_number):
         import json
         photos_data = json.loads(result[0]) if isinstance(result[0], str) else result[0]
         cover_url = photos_data.get('front') if photos_data else None
+        status = result[1]
 
         if not cover_url:
             return jsonify({'success': False, 'error': 'No cover image available'}), 404
 
-        # Generate watermarked image
-        watermarked_img = watermark_image(cover_url, serial_number)
-
-        # Convert to bytes
-        img_io = io.BytesIO()
-        watermarked_img.save(img_io, 'JPEG', quality=85)
-        img_io.seek(0)
-
-        return send_file(img_io, mimetype='image/jpeg')
+        key = watermark_cache.derivative_key(serial_number, cover_url, status, tier)
+        cache_control = (watermark_cache.IMMUTABLE_CACHE_CONTROL
+                         if request.args.get('v') == key
+                         else watermark_cache.REVALIDATE_CACHE_CONTROL)
+
+        # Browser/CDN already holds this exact derivative
+        if request.if_none_match.contains(key):
+            response = make_response('', 304)
+            response.set_etag(key)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        # Cached derivative, or render + store it
+        data, key, source = watermark_cache.get_or_render(
+            serial_number, cover_url, status, tier, render_watermark_jpeg)
+
+        response = send_file(io.BytesIO(data), mimetype='image/jpeg')
+        response.set_etag(key)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['X-Watermark-Cache'] = source
+        return response
 
     except Exception as e:
         print(f"Error in get_watermarked_image: {str(e)}")
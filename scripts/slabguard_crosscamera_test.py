@@ -74,6 +74,9 @@ Run
     # optional: A/B a different vision model for the arbiter (default is Opus 4.8)
     python scripts/slabguard_crosscamera_test.py --phone1 ... --phone2 ... --model claude-sonnet-4-6
 
+    # optional: same set under the coarse-to-fine SIFT switch (diff the two CSVs)
+    python scripts/slabguard_crosscamera_test.py --phone1 ... --phone2 ... --sift-mode coarse_to_fine --csv c2f.csv
+
     # optional: test back covers too, and write the per-pair table to CSV for the record
     python scripts/slabguard_crosscamera_test.py --phone1 ... --phone2 ... --side both --csv results.csv
 
@@ -242,6 +245,9 @@ def main():
                          "one different copy per phone; yields same-issue cross-camera FP pairs only.")
     ap.add_argument("--model", default=None, help="Optional vision model override for the arbiter call.")
     ap.add_argument("--csv", default=None, help="Optional path to write the per-pair table as CSV.")
+    ap.add_argument("--sift-mode", choices=["full", "coarse_to_fine"], default=None,
+                    help="Override SIFT_COARSE_TO_FINE for this run (default: the env/config "
+                         "setting). Run once per mode and diff the tables before flipping it.")
     args = ap.parse_args()
 
     dir1 = os.path.abspath(args.phone1)
@@ -271,6 +277,10 @@ def main():
     if not CV2_AVAILABLE:
         print("✗ OpenCV not available — SIFT copy matching disabled. Install opencv-python-headless.")
         sys.exit(1)
+    import routes.slab_guard_cv as _sg
+    if args.sift_mode:
+        _sg.SIFT_COARSE_TO_FINE = args.sift_mode == "coarse_to_fine"
+    print(f"SIFT mode: {'coarse_to_fine' if _sg.SIFT_COARSE_TO_FINE else 'full'}")
     arbiter_ok = bool(ANTHROPIC_AVAILABLE and os.environ.get("ANTHROPIC_API_KEY"))
     if not arbiter_ok:
         print("⚠  ANTHROPIC_API_KEY not set / anthropic missing. marketplace_mode needs Vision as the")
@@ -0,0 +1,465 @@
+"""
+Slab Guard — CV Engine Benchmark + Regression Suite  (OFFLINE / not wired into prod)
+=====================================================================================
+
+Purpose
+-------
+scripts/slabguard_crosscamera_test.py answers "is the verdict RIGHT?". This answers
+"how FAST is the CV engine, and did a change move any verdict?" — for the stages the
+monitor actually pays for on every listing:
+
+    compare_covers                   end to end (decode → align → IoU → LPQ → verdict)
+      _download_image                decode + auto-orient (served from memory, see below)
+      _sift_align_with_stable_border multi-run SIFT alignment
+      _border_analysis               shared border buffers (gray, void mask, strip mask)
+      _compute_edge_iou              strict/dilated IoU + SSIM
+      _compute_lpq_distance          LPQ texture chi² (full + border)
+    find_matches                     composite + edge-strip hash scan over N registrations
+
+Per stage it reports p50 / p95 (ms) over all calls, plus the process's peak RSS and
+VERDICT STABILITY: every pair is compared --runs times and any pair whose verdict
+changes between runs is listed. (SIFT is deterministic but RANSAC is not; a pair that
+flips is one a user could see flip.)
+
+Nothing touches the network or the DB
+-------------------------------------
+- compare_covers() takes URLs. The harness gives every image a bench://<name> URL and
+  swaps requests.get for an in-memory lookup, so the real _download_image decode/orient
+  path still runs — only the HTTP fetch is gone.
+- load_reference_features() (routes/reference_features.py) is answered from memory:
+  empty by default (compare-time detection, i.e. an unregistered/legacy reference), or
+  precomputed with --stored-features (the path a freshly registered comic takes).
+- find_matches() gets a fake connection whose registry rows carry real composite and
+  edge-strip fingerprints computed from the fixtures (routes/registry.py helpers).
+
+Fixtures
+--------
+Every decodable .jpg/.jpeg/.png in CCImages/ and FBCoverrImages/ (or --images DIR ...),
+short side ≥ MIN_SHORT_SIDE. For each fixture the harness builds two pairs:
+
+    same : fixture  vs  a synthetic RE-CAPTURE of it (perspective jitter, small
+           rotation, exposure shift, blur, JPEG re-encode — deterministic per name)
+    diff : fixture  vs  the re-capture of the NEXT fixture (a different cover)
+
+Baseline + regression check
+---------------------------
+    python scripts/slabguard_cv_benchmark.py                      # run + compare to baseline
+    python scripts/slabguard_cv_benchmark.py --write-baseline     # refresh the baseline
+    python scripts/slabguard_cv_benchmark.py --check              # exit 1 on regression
+    python scripts/slabguard_cv_benchmark.py --stored-features --runs 5 --limit 6
+    python scripts/slabguard_cv_benchmark.py --sift-mode both     # full vs coarse-to-fine
+
+The baseline (scripts/slabguard_cv_baseline.json) stores per-stage p50/p95, peak RSS,
+every pair's verdict and the machine it was taken on. A stage whose p50 grows by more
+than --tolerance (default 25%) or any verdict that differs from the baseline is a
+regression. --sift-mode both runs every pair in both SIFT modes (SIFT_COARSE_TO_FINE)
+and lists the pairs whose verdicts differ. ⚠️ Timings only compare on the SAME machine class — refresh the baseline
+in the PR that changes hardware, and say so in the PR description.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+# Make the repo root importable so `routes.slab_guard_cv` resolves regardless of CWD.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+import cv2
+import numpy as np
+
+from routes import slab_guard_cv as sg
+
+VALID_EXT = (".jpg", ".jpeg", ".png")
+DEFAULT_DIRS = ("CCImages", "FBCoverrImages")
+MIN_SHORT_SIDE = 400
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "slabguard_cv_baseline.json")
+DEFAULT_TOLERANCE = 0.25
+# compare_covers internals timed per call (module attributes, wrapped for the run).
+TIMED_STAGES = ("_download_image", "_sift_align_with_stable_border", "_border_analysis",
+                "_compute_edge_iou", "_compute_lpq_distance")
+
+
+# ─────────────────────────────────────────────
+# Fixtures
+# ─────────────────────────────────────────────
+
+def load_fixtures(dirs, limit=None):
+    """[(name, jpeg/png bytes)] for every usable image in `dirs`, sorted by name."""
+    fixtures = []
+    for d in dirs:
+        path = d if os.path.isabs(d) else os.path.join(_REPO_ROOT, d)
+        if not os.path.isdir(path):
+            continue
+        for fn in sorted(os.listdir(path)):
+            if not fn.lower().endswith(VALID_EXT):
+                continue
+            with open(os.path.join(path, fn), "rb") as f:
+                data = f.read()
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if img is None or min(img.shape[:2]) < MIN_SHORT_SIDE:
+                continue
+            fixtures.append((fn, data))
+    return fixtures[:limit] if limit else fixtures
+
+
+def synthetic_recapture(data, name):
+    """A deterministic 're-photographed' version of an image, as JPEG bytes."""
+    rng = np.random.RandomState(sum(name.encode()) % (2 ** 31))
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    h, w = img.shape[:2]
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    dst = src + rng.uniform(-0.02, 0.02, (4, 2)).astype(np.float32) * np.float32([w, h])
+    img = cv2.warpPerspective(img, cv2.getPerspectiveTransform(src, dst), (w, h),
+                              borderMode=cv2.BORDER_REPLICATE)
+    rot = cv2.getRotationMatrix2D((w / 2, h / 2), rng.uniform(-1.5, 1.5), 1.0)
+    img = cv2.warpAffine(img, rot, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    img = cv2.convertScaleAbs(img, alpha=rng.uniform(0.9, 1.1), beta=rng.uniform(-12, 12))
+    img = cv2.GaussianBlur(img, (3, 3), rng.uniform(0.4, 1.0))
+    _, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return buf.tobytes()
+
+
+def build_pairs(fixtures):
+    """(blobs {url: bytes}, pairs [{label, kind, ref_url, test_url}])."""
+    blobs = {}
+    for name, data in fixtures:
+        blobs[f"bench://{name}"] = data
+        blobs[f"bench://recapture/{name}"] = synthetic_recapture(data, name)
+    pairs = []
+    for i, (name, _) in enumerate(fixtures):
+        pairs.append({"label": f"same {name}", "kind": "same",
+                      "ref_url": f"bench://{name}", "test_url": f"bench://recapture/{name}"})
+        if len(fixtures) > 1:
+            other = fixtures[(i + 1) % len(fixtures)][0]
+            pairs.append({"label": f"diff {name} -> {other}", "kind": "diff",
+                          "ref_url": f"bench://{name}", "test_url": f"bench://recapture/{other}"})
+    return blobs, pairs
+
+
+# ─────────────────────────────────────────────
+# Offline plumbing
+# ─────────────────────────────────────────────
+
+class _MemoryResponse:
+    def __init__(self, content):
+        self.content = content
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+@contextmanager
+def offline(blobs, stored_features=None):
+    """Serve bench:// URLs from memory and reference features from a dict."""
+    import requests
+    import routes.reference_features as ref_features
+
+    real_get = requests.get
+    real_load = ref_features.load_reference_features
+
+    def memory_get(url, *args, **kwargs):
+        if url in blobs:
+            return _MemoryResponse(blobs[url])
+        raise RuntimeError(f"benchmark is offline — no fixture for {url}")
+
+    requests.get = memory_get
+    ref_features.load_reference_features = lambda url: (stored_features or {}).get(url)
+    try:
+        yield
+    finally:
+        requests.get = real_get
+        ref_features.load_reference_features = real_load
+
+
+@contextmanager
+def stage_timers(samples):
+    """Wrap TIMED_STAGES in slab_guard_cv so every call appends its ms to samples[stage]."""
+    originals = {name: getattr(sg, name) for name in TIMED_STAGES}
+
+    def wrap(name, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples.setdefault(name, []).append((time.perf_counter() - t0) * 1000)
+        return timed
+
+    for name, fn in originals.items():
+        setattr(sg, name, wrap(name, fn))
+    try:
+        yield
+    finally:
+        for name, fn in originals.items():
+            setattr(sg, name, fn)
+
+
+def precompute_reference_features(blobs, pairs):
+    """{ref_url: unpacked features} exactly as registration would store them."""
+    from routes.reference_features import pack_features, unpack_features
+    stored = {}
+    for url in sorted({p["ref_url"] for p in pairs}):
+        img = sg._resize_standard(cv2.imdecode(np.frombuffer(blobs[url], np.uint8),
+                                               cv2.IMREAD_COLOR))
+        kps, des = sg.detect_reference_features(img)
+        stored[url] = unpack_features(
+            pack_features(kps, des, lpq=sg.compute_reference_lpq(img)))
+    return stored
+
+
+# ─────────────────────────────────────────────
+# Benchmarks
+# ─────────────────────────────────────────────
+
+def bench_compare_covers(blobs, pairs, runs, stored_features=None, coarse_to_fine=False):
+    """Run every pair `runs` times. Returns (samples {stage: [ms]}, verdicts {label: [..]}).
+
+    coarse_to_fine sets slab_guard_cv.SIFT_COARSE_TO_FINE for the duration."""
+    samples, verdicts = {}, {}
+    real_mode = sg.SIFT_COARSE_TO_FINE
+    sg.SIFT_COARSE_TO_FINE = coarse_to_fine
+    try:
+        with offline(blobs, stored_features), stage_timers(samples):
+            for run in range(runs):
+                for pair in pairs:
+                    t0 = time.perf_counter()
+                    result = sg.compare_covers(pair["ref_url"], pair["test_url"])
+                    samples.setdefault("compare_covers", []).append(
+                        (time.perf_counter() - t0) * 1000)
+                    verdicts.setdefault(pair["label"], []).append(result.get("verdict"))
+                print(f"  [BENCH] compare_covers ({'coarse_to_fine' if coarse_to_fine else 'full'})"
+                      f" run {run + 1}/{runs} done")
+    finally:
+        sg.SIFT_COARSE_TO_FINE = real_mode
+    return samples, verdicts
+
+
+class _RegistryCursor:
+    """Just enough cursor for find_matches(): the column probe, then the registry scan."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._last = None
+
+    def execute(self, sql, params=None):
+        self._last = sql
+
+    def fetchone(self):
+        return ("fingerprint_composite",)
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
+
+
+class _RegistryConn:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def cursor(self):
+        return _RegistryCursor(self._rows)
+
+    def close(self):
+        pass
+
+
+def bench_find_matches(fixtures, registered, repeat):
+    """Time find_matches() over `registered` rows built from real fixture fingerprints."""
+    import imagehash
+    from PIL import Image
+    from routes import monitor, registry
+
+    if registry.imagehash is None:   # normally wired by app.py
+        registry.init_modules(imagehash, Image)
+
+    def fingerprints(data):
+        img = Image.open(io.BytesIO(data))
+        return registry._composite_hashes(img), registry._edge_strip_hashes_from_image(img)
+
+    prints = [fingerprints(data) for _, data in fixtures]
+    rows = []
+    for i in range(registered):
+        composite, strips = prints[i % len(prints)]
+        rows.append((i + 1, f"SG-BENCH-{i:06d}", composite["phash"], "active", None, None,
+                     fixtures[i % len(fixtures)][0], "1", "Bench", 9.4,
+                     json.dumps({"front": f"bench://{fixtures[i % len(fixtures)][0]}"}),
+                     "bench@example.com",
+                     json.dumps({"front": composite, "edge_strips": {"front": strips}})))
+
+    name, data = fixtures[0]
+    q_composite, q_strips = fingerprints(synthetic_recapture(data, name))
+    real_get_db = monitor.get_db
+    monitor.get_db = lambda: _RegistryConn(rows)
+    samples = []
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            matches = monitor.find_matches(q_composite["phash"], query_composite=q_composite,
+                                           query_edge_strips=q_strips, marketplace_mode=True)
+            samples.append((time.perf_counter() - t0) * 1000)
+    finally:
+        monitor.get_db = real_get_db
+    return samples, len(matches)
+
+
+# ─────────────────────────────────────────────
+# Report + baseline
+# ─────────────────────────────────────────────
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples):
+    return {stage: {"calls": len(v),
+                    "p50_ms": round(statistics.median(v), 2),
+                    "p95_ms": round(percentile(v, 95), 2)}
+            for stage, v in samples.items() if v}
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def machine():
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "opencv": cv2.__version__, "cpus": os.cpu_count()}
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """List of human-readable regressions (empty = clean)."""
+    problems = []
+    for stage, now in report["stages"].items():
+        then = baseline.get("stages", {}).get(stage)
+        if then and then["p50_ms"] and now["p50_ms"] > then["p50_ms"] * (1 + tolerance):
+            problems.append(f"{stage}: p50 {then['p50_ms']}ms → {now['p50_ms']}ms "
+                            f"(+{(now['p50_ms'] / then['p50_ms'] - 1) * 100:.0f}%)")
+    for label, verdict in report["verdicts"].items():
+        was = baseline.get("verdicts", {}).get(label)
+        if was is not None and was != verdict:
+            problems.append(f"verdict changed: {label}: {was} → {verdict}")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--images", nargs="*", default=list(DEFAULT_DIRS),
+                    help="fixture directories (default: CCImages FBCoverrImages)")
+    ap.add_argument("--limit", type=int, default=8, help="max fixtures (default 8)")
+    ap.add_argument("--runs", type=int, default=3, help="compare_covers runs per pair")
+    ap.add_argument("--registered", type=int, default=500,
+                    help="registry rows for find_matches (default 500)")
+    ap.add_argument("--stored-features", action="store_true",
+                    help="serve registration-time SIFT/LPQ reference features")
+    ap.add_argument("--sift-mode", choices=("full", "coarse_to_fine", "both"), default="full",
+                    help="SIFT alignment mode; 'both' also reports verdicts that differ")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--write-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    ap.add_argument("--check", action="store_true", help="exit 1 on any regression")
+    ap.add_argument("--json", help="also write this run's report here")
+    args = ap.parse_args()
+
+    if not sg.CV2_AVAILABLE:
+        sys.exit("OpenCV is not available — nothing to benchmark")
+    fixtures = load_fixtures(args.images, args.limit)
+    if not fixtures:
+        sys.exit(f"No usable fixtures in {args.images}")
+    blobs, pairs = build_pairs(fixtures)
+    print(f"[BENCH] {len(fixtures)} fixtures, {len(pairs)} pairs x {args.runs} runs"
+          f"{' (stored reference features)' if args.stored_features else ''}")
+
+    stored = precompute_reference_features(blobs, pairs) if args.stored_features else None
+    samples, verdicts = bench_compare_covers(blobs, pairs, args.runs, stored,
+                                             coarse_to_fine=args.sift_mode == "coarse_to_fine")
+    mode_diffs = {}
+    if args.sift_mode == "both":
+        c2f_samples, c2f_verdicts = bench_compare_covers(blobs, pairs, args.runs, stored,
+                                                         coarse_to_fine=True)
+        samples.update({f"{stage} [c2f]": v for stage, v in c2f_samples.items()})
+        mode_diffs = {label: {"full": verdicts[label], "coarse_to_fine": v}
+                      for label, v in c2f_verdicts.items()
+                      if set(v) != set(verdicts[label])}
+    fm_samples, fm_matches = bench_find_matches(fixtures, args.registered, 20)
+    samples["find_matches"] = fm_samples
+
+    unstable = {label: v for label, v in verdicts.items() if len(set(v)) > 1}
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine(),
+        "config": {"fixtures": [n for n, _ in fixtures], "runs": args.runs,
+                   "registered": args.registered, "stored_features": args.stored_features,
+                   "sift_mode": args.sift_mode},
+        "stages": summarize(samples),
+        "peak_rss_mb": peak_rss_mb(),
+        "verdicts": {label: v[0] for label, v in verdicts.items()},
+        "unstable_pairs": unstable,
+        "find_matches_hits": fm_matches,
+    }
+    if args.sift_mode == "both":
+        report["sift_mode_disagreements"] = mode_diffs
+
+    print(f"\n{'stage':38s} {'calls':>6s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:38s} {s['calls']:6d} {s['p50_ms']:9.1f} {s['p95_ms']:9.1f}")
+    print(f"\npeak RSS: {report['peak_rss_mb']} MB   find_matches hits: {fm_matches}")
+    print(f"verdict stability: {len(verdicts) - len(unstable)}/{len(verdicts)} pairs stable")
+    for label, v in unstable.items():
+        print(f"  ✗ unstable: {label}: {v}")
+    if args.sift_mode == "both":
+        print(f"sift modes: {len(verdicts) - len(mode_diffs)}/{len(verdicts)} pairs agree")
+        for label, v in mode_diffs.items():
+            print(f"  ✗ full vs coarse_to_fine: {label}: {v['full']} vs {v['coarse_to_fine']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\n[BENCH] baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n[BENCH] no baseline at {args.baseline} — run with --write-baseline")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine", {}).get("cpus") != report["machine"]["cpus"]:
+        print("\n⚠️  baseline was taken on a different machine class — timings are indicative only")
+    if baseline.get("config") != report["config"]:
+        print("⚠️  baseline used a different fixture set / run config — compare with the same flags")
+    problems = compare_to_baseline(report, baseline, args.tolerance)
+    if problems:
+        print(f"\n[BENCH] {len(problems)} regression(s) vs baseline:")
+        for p in problems:
+            print(f"  ✗ {p}")
+    else:
+        print(f"\n[BENCH] no regressions vs baseline (tolerance {args.tolerance:.0%})")
+    return 1 if (problems or unstable or mode_diffs) and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Slab Guard — flagged-phash lookup benchmark  (OFFLINE / not wired into prod)
+===========================================================================
+
+check_listing answers "is any flagged phash within PHASH_MATCH_THRESHOLD (10)
+bits of this listing image?" for every listing the extension sees. This times
+three ways of answering it at --sizes flagged hashes (default 10k, 100k, 1M):
+
+    linear     the old path: Hamming distance to every row (int popcount —
+               already faster than the old hex-string compare, so a lower bound)
+    bktree     BK-tree (Burkhard–Keller), metric-tree pruning by |d - r|
+    mih        slabguard_phash_index.MultiIndexHash (what check_listing uses)
+
+Hashes are uniform random 64-bit values. Queries are half near-duplicates of
+an indexed hash (1..8 bits flipped — a re-upload of a flagged photo) and half
+unrelated hashes (the common case: a clean listing). Every index's answer is
+checked against the linear scan.
+
+Per structure: build time, query p50 / p95 (ms), mean rows verified per query.
+
+Usage:
+    python scripts/slabguard_phash_index_benchmark.py
+    python scripts/slabguard_phash_index_benchmark.py --sizes 10000 100000 --queries 500
+    python scripts/slabguard_phash_index_benchmark.py --bktree-max 100000   # skip the slow 1M BK-tree build
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from slabguard_phash_index import MultiIndexHash
+
+RADIUS = 10
+
+
+class BKTree:
+    """Minimal BK-tree over int hashes (comparison baseline only)."""
+
+    def __init__(self):
+        self.root = None      # [value, {distance: child}]
+        self.visited = 0
+
+    def add(self, value):
+        if self.root is None:
+            self.root = [value, {}]
+            return
+        node = self.root
+        while True:
+            d = (node[0] ^ value).bit_count()
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [value, {}]
+                return
+            node = child
+
+    def query(self, value, radius):
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            self.visited += 1
+            d = (node[0] ^ value).bit_count()
+            if d <= radius:
+                found.append(d)
+            for cd, child in node[1].items():
+                if d - radius <= cd <= d + radius:
+                    stack.append(child)
+        return sorted(found)
+
+
+def _queries(hashes, n, rng):
+    out = []
+    for i in range(n):
+        if i % 2 == 0:
+            base = hashes[rng.randrange(len(hashes))]
+            out.append(base ^ sum(1 << b for b in rng.sample(range(64), rng.randint(1, 8))))
+        else:
+            out.append(rng.getrandbits(64))
+    return out
+
+
+def _pct(samples, p):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))] * 1000
+
+
+def bench(size, n_queries, bktree_max, rng):
+    hashes = [rng.getrandbits(64) for _ in range(size)]
+    queries = _queries(hashes, n_queries, rng)
+
+    truth, linear_t = [], []
+    for q in queries:
+        t = time.perf_counter()
+        truth.append(sorted(d for d in ((h ^ q).bit_count() for h in hashes) if d <= RADIUS))
+        linear_t.append(time.perf_counter() - t)
+    rows = [('linear', 0.0, linear_t, float(size))]
+
+    if size <= bktree_max:
+        t = time.perf_counter()
+        tree = BKTree()
+        for h in hashes:
+            tree.add(h)
+        build = time.perf_counter() - t
+        times = []
+        for q, want in zip(queries, truth):
+            t = time.perf_counter()
+            got = tree.query(q, RADIUS)
+            times.append(time.perf_counter() - t)
+            assert got == want, 'bktree mismatch'
+        rows.append(('bktree', build, times, tree.visited / len(queries)))
+
+    t = time.perf_counter()
+    mih = MultiIndexHash()
+    for i, h in enumerate(hashes):
+        mih.add(i, h)
+    build = time.perf_counter() - t
+    times, verified = [], 0
+    for q, want in zip(queries, truth):
+        t = time.perf_counter()
+        got = mih.query(q, RADIUS)
+        times.append(time.perf_counter() - t)
+        assert [d for d, _ in got] == want, 'mih mismatch'
+    # Rows verified = ids found in the probed buckets (re-walk, untimed).
+    from slabguard_phash_index import _flip_masks, CHUNKS
+    for q in queries:
+        seen = set()
+        for table, c in zip(mih._tables, mih._chunks(q)):
+            for m in _flip_masks(RADIUS // CHUNKS):
+                seen.update(table.get(c ^ m, ()))
+        verified += len(seen)
+    rows.append(('mih', build, times, verified / len(queries)))
+
+    print(f"\nN = {size:,}  ({n_queries} queries, radius {RADIUS})")
+    print(f"  {'index':<8} {'build s':>8} {'p50 ms':>9} {'p95 ms':>9} {'rows/query':>11}")
+    for name, build_s, times, per_q in rows:
+        print(f"  {name:<8} {build_s:>8.2f} {_pct(times, 0.5):>9.3f} {_pct(times, 0.95):>9.3f} "
+              f"{per_q:>11,.0f}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Flagged-phash lookup benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--bktree-max', type=int, default=1_000_000,
+                        help='Skip the BK-tree above this many hashes')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        bench(size, args.queries, args.bktree_max, rng)
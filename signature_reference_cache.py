@@ -0,0 +1,286 @@
+"""
+Reference-signature cache for /api/signatures/match, /identify and /v2/match.
+
+Every signature match rebuilt its reference set from scratch: v1 read ~46 JPEGs
+from signatures/ and base64-encoded them (select_reference_images → 2 per
+artist), /identify and the v2 orchestrator downloaded every candidate's R2
+images over HTTP one after another (fetch_reference_images: up to 15 creators
+× 4 images, each a 15s-timeout GET) before the first model call could start.
+The reference images only change when an admin adds or deletes one, so this
+module keeps them in memory, per worker, ready to drop into a content block:
+
+- Payloads are base64 strings + media type, prepared once. Images whose long
+  edge exceeds REF_MAX_LONG_EDGE (or whose file exceeds REF_REENCODE_BYTES)
+  are downscaled and re-encoded as JPEG q=REF_JPEG_QUALITY. The vision API
+  resizes anything above ~1568px itself, so the default edge does not change
+  what the model sees — it only stops us shipping 4MB phone photos around.
+  Everything else (all of signatures/ today) passes through byte-identical.
+- Keys: local files by (filename, mtime, size); R2 images by URL. Admin
+  uploads get a fresh uuid filename, so a URL's bytes never change — another
+  gunicorn worker holding an entry for a deleted image simply never asks for
+  it again, and a new image is a plain miss. invalidate_creator() /
+  invalidate_url() (called from the admin add/delete image routes) drop the
+  entries in the worker that served the edit.
+- Byte budget: SIG_REF_CACHE_MB (default 48) of base64 per worker, LRU.
+- warm() preloads signatures_db.json's selected references plus the first
+  REF_WARM_PER_CREATOR images of every active creator in creator_signatures /
+  signature_images. wsgi.py runs it in a daemon thread so boot is not delayed.
+- Misses on the URL path are fetched concurrently (REF_FETCH_WORKERS). These
+  are plain R2 GETs — the Opus rate limit that keeps the orchestrator's passes
+  sequential does not apply to them.
+
+Nothing in here may fail a match: a failed fetch or decode behaves exactly as
+the uncached code did (the image is skipped, or the raw bytes are sent).
+"""
+import base64
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import requests as http_requests
+
+import db as _dbpool
+
+SIGNATURES_DIR = Path(__file__).parent / 'signatures'
+
+REF_CACHE_ENABLED = os.environ.get('SIG_REF_CACHE_ENABLED', '1') == '1'
+REF_CACHE_MAX_BYTES = int(float(os.environ.get('SIG_REF_CACHE_MB', '48')) * 1024 * 1024)
+REF_MAX_LONG_EDGE = int(os.environ.get('SIG_REF_MAX_EDGE', '1568'))
+REF_REENCODE_BYTES = 512 * 1024
+REF_JPEG_QUALITY = 90
+REF_FETCH_WORKERS = int(os.environ.get('SIG_REF_FETCH_WORKERS', '4'))
+REF_FETCH_TIMEOUT = 15
+REF_WARM_PER_CREATOR = 4   # = signature_orchestrator.REFERENCE_IMAGES_PER_CREATOR
+
+_lock = threading.Lock()
+_lru = OrderedDict()     # key -> (b64, media_type, creator)
+_bytes = 0
+_stats = {'lookups': 0, 'hits': 0}
+
+
+def get_media_type(filename):
+    """Get MIME type from filename."""
+    ext = filename.lower().split('.')[-1]
+    return {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif'}.get(ext, 'image/jpeg')
+
+
+def prepare_payload(raw, media_type):
+    """Raw image bytes → (base64, media_type), downscaled/re-encoded when the
+    image is larger than the model will use. Undecodable input passes through."""
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(BytesIO(raw)) as img:
+            if max(img.size) <= REF_MAX_LONG_EDGE and len(raw) <= REF_REENCODE_BYTES:
+                return base64.b64encode(raw).decode('utf-8'), media_type
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+                # Signatures on transparent PNGs: flatten onto white, not black.
+                rgba = img.convert('RGBA')
+                img = Image.new('RGB', rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.split()[-1])
+            else:
+                img = img.convert('RGB')
+            img.thumbnail((REF_MAX_LONG_EDGE, REF_MAX_LONG_EDGE), Image.LANCZOS)
+            buf = BytesIO()
+            img.save(buf, 'JPEG', quality=REF_JPEG_QUALITY, optimize=True)
+        out = buf.getvalue()
+        if len(out) < len(raw):
+            return base64.b64encode(out).decode('utf-8'), 'image/jpeg'
+    except Exception as e:
+        print(f"[SigRefCache] re-encode skipped ({e}) — sending original bytes")
+    return base64.b64encode(raw).decode('utf-8'), media_type
+
+
+def _get(key):
+    with _lock:
+        _stats['lookups'] += 1
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        _stats['hits'] += 1
+        _lru.move_to_end(key)
+        return entry
+
+
+def _put(key, b64, media_type, creator):
+    global _bytes
+    size = len(b64)
+    if not REF_CACHE_ENABLED or size > REF_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        old = _lru.pop(key, None)
+        if old is not None:
+            _bytes -= len(old[0])
+        _lru[key] = (b64, media_type, creator)
+        _bytes += size
+        while _bytes > REF_CACHE_MAX_BYTES and _lru:
+            _, evicted = _lru.popitem(last=False)
+            _bytes -= len(evicted[0])
+
+
+def local_image(filename, creator=None):
+    """(base64, media_type) for a file in signatures/. Raises like open() when
+    the file is missing — same contract as the old image_to_base64()."""
+    path = SIGNATURES_DIR / filename
+    st = path.stat()
+    key = ('local', filename, st.st_mtime_ns, st.st_size)
+    entry = _get(key)
+    if entry is not None:
+        return entry[0], entry[1]
+    with open(path, 'rb') as f:
+        b64, media_type = prepare_payload(f.read(), get_media_type(filename))
+    _put(key, b64, media_type, creator)
+    return b64, media_type
+
+
+def _fetch(url):
+    resp = http_requests.get(url, timeout=REF_FETCH_TIMEOUT)
+    resp.raise_for_status()
+    return prepare_payload(resp.content, resp.headers.get('content-type', 'image/jpeg'))
+
+
+def _load_url(url, creator):
+    b64, media_type = _fetch(url)
+    _put(('url', url), b64, media_type, creator)
+    return b64, media_type
+
+
+def url_image(url, creator=None):
+    """(base64, media_type) for an R2 reference image URL. Raises on a failed
+    fetch (requests exceptions) — same contract as a bare GET."""
+    entry = _get(('url', url))
+    if entry is not None:
+        return entry[0], entry[1]
+    return _load_url(url, creator)
+
+
+def url_images(urls, creators=None):
+    """Payloads for several URLs, in order; None for any that failed.
+    `creators` is an optional list parallel to `urls` (the owner recorded for
+    invalidate_creator). Cache misses are fetched concurrently."""
+    creators = creators or [None] * len(urls)
+    results = {}
+    misses = {}
+    for url, creator in zip(urls, creators):
+        entry = _get(('url', url))
+        if entry is not None:
+            results[url] = (entry[0], entry[1])
+        else:
+            misses.setdefault(url, creator)
+
+    def _one(item):
+        url, creator = item
+        try:
+            return url, _load_url(url, creator)
+        except Exception as e:
+            print(f"[SigRefCache] fetch failed for {url[:80]}: {e}")
+            return url, None
+
+    if len(misses) == 1:
+        results.update([_one(next(iter(misses.items())))])
+    elif misses:
+        with ThreadPoolExecutor(max_workers=min(REF_FETCH_WORKERS, len(misses))) as pool:
+            results.update(pool.map(_one, misses.items()))
+    return [results.get(url) for url in urls]
+
+
+def invalidate_creator(creator):
+    """Drop every cached image of one creator (creator_signatures.id or local
+    artist name). Returns the number of entries removed."""
+    global _bytes
+    with _lock:
+        keys = [k for k, v in _lru.items() if v[2] == creator]
+        for k in keys:
+            _bytes -= len(_lru.pop(k)[0])
+    return len(keys)
+
+
+def invalidate_url(url):
+    """Drop one R2 image (e.g. after it was deleted)."""
+    global _bytes
+    with _lock:
+        entry = _lru.pop(('url', url), None)
+        if entry is not None:
+            _bytes -= len(entry[0])
+    return entry is not None
+
+
+def clear():
+    global _bytes
+    with _lock:
+        _lru.clear()
+        _bytes = 0
+        _stats['lookups'] = _stats['hits'] = 0
+
+
+def stats():
+    """Per-worker counters: entries, bytes, budget, hits/lookups."""
+    with _lock:
+        return {'entries': len(_lru), 'bytes': _bytes, 'max_bytes': REF_CACHE_MAX_BYTES,
+                'hits': _stats['hits'], 'lookups': _stats['lookups']}
+
+
+def warm(local_sets=None, include_db=True):
+    """Preload reference payloads.
+
+    local_sets: {artist_name: [filename, …]} from signatures_db.json (what
+        select_reference_images picks). include_db: also load the first
+        REF_WARM_PER_CREATOR images of every active creator from Postgres.
+    Returns the number of images loaded. Never raises."""
+    if not REF_CACHE_ENABLED:
+        return 0
+    loaded = 0
+    for artist, files in (local_sets or {}).items():
+        for filename in files:
+            try:
+                local_image(filename, creator=artist)
+                loaded += 1
+            except Exception as e:
+                print(f"[SigRefCache] warm skipped {filename}: {e}")
+
+    if include_db and os.environ.get('DATABASE_URL'):
+        conn = None
+        rows = []
+        try:
+            conn = _dbpool.get_db()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT cs.id,
+                       array_agg(si.image_url ORDER BY si.sort_order NULLS LAST, si.created_at DESC)
+                FROM creator_signatures cs
+                JOIN signature_images si ON si.creator_id = cs.id
+                WHERE cs.archived_at IS NULL
+                GROUP BY cs.id
+                ORDER BY cs.id
+            """)
+            rows = cur.fetchall()
+            cur.close()
+        except Exception as e:
+            print(f"[SigRefCache] warm query failed (non-fatal): {e}")
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        for creator_id, urls in rows:
+            urls = [u for u in (urls or []) if u][:REF_WARM_PER_CREATOR]
+            loaded += sum(1 for p in url_images(urls, [creator_id] * len(urls)) if p)
+            if stats()['bytes'] >= REF_CACHE_MAX_BYTES * 0.9:
+                break   # budget full — the rest would only evict what we just loaded
+
+    s = stats()
+    print(f"[SigRefCache] warmed {loaded} reference images "
+          f"({s['bytes'] / 1024 / 1024:.1f}MB of {s['max_bytes'] / 1024 / 1024:.0f}MB)")
+    return loaded
+
+
+def warm_in_background(local_sets=None, include_db=True):
+    """Run warm() in a daemon thread (wsgi.py startup)."""
+    t = threading.Thread(target=warm, args=(local_sets, include_db),
+                         daemon=True, name="sig-ref-cache-warm")
+    t.start()
+    return t
@@ -0,0 +1,214 @@
+"""
+Signature identification result cache for /api/signatures/identify (v1) and
+/api/signatures/v2/match.
+
+The same cover comes back again and again — re-saves, collection edits, admin
+re-checks — and every time both endpoints re-ran detection and the full
+matching pipeline (v1: Haiku + Sonnet; v2: 3 Opus passes, ~60s). This module
+returns the prior identification instead, as long as nothing it depended on
+has changed.
+
+Key (all must match):
+- endpoint ('/api/signatures/identify' | '/api/signatures/v2/match')
+- cover pHash — vision_result_cache.image_phash, i.e. the shared
+  fingerprint_utils preprocessing. Indexed lookup column.
+- content digest — SHA-256 of the decoded image bytes. ⚠️ A perceptual hash
+  alone is NOT a safe key here: the same cover signed by a different creator
+  (or unsigned) is within a few bits of it — a signature is a small stroke on a
+  big image. Measured on tile pHashes (8×8 grid, 512×768): re-encodes of one
+  photo moved 2–31 bits, differently signed copies 6–32 bits; the ranges
+  overlap, so any near-dup radius would serve another copy's signatures. A hit
+  therefore needs the same bytes — exactly what a resubmission sends.
+- context key — identity_key() of the request context (v2 comic_context:
+  publisher/era/location drive the candidate pre-filter).
+- reference-DB version — digest of CACHE_SCHEMA + the caller's pipeline tag
+  (model ids / pass temperatures) + the active creator roster (count, max id).
+  A creator added or archived changes it, so every entry goes stale at once.
+
+Per-creator stamps: store() records, for every creator the result RANKED,
+'count:max image id' from signature_images. lookup() recomputes them and
+treats any difference as a miss — adding, replacing or deleting a reference
+image for any ranked creator invalidates the entry with no explicit hook in
+the admin routes.
+
+Shared across users (a hit needs byte-identical input, so it reveals nothing
+the caller did not already send). Rows expire after SIG_ID_CACHE_TTL_DAYS and
+are swept opportunistically on write. Stored in Postgres
+(migrations/add_signature_id_cache.sql) so every gunicorn worker shares it.
+
+Nothing in here may fail a request: every DB or decode error degrades to a miss.
+"""
+import base64
+import hashlib
+import json
+import os
+
+import db as _dbpool
+from vision_result_cache import identity_key, image_phash
+
+SIG_ID_CACHE_ENABLED = os.environ.get('SIG_ID_CACHE_ENABLED', '1') == '1'
+SIG_ID_CACHE_TTL_DAYS = int(os.environ.get('SIG_ID_CACHE_TTL_DAYS', '30'))
+CACHE_SCHEMA = 'sigid-1'   # bump to drop every entry (result shape change)
+
+
+def content_digest(b64):
+    """SHA-256 hex of the decoded image bytes (data: prefix tolerated)."""
+    if ',' in b64[:100]:
+        b64 = b64.split(',', 1)[1]
+    return hashlib.sha256(base64.b64decode(b64)).hexdigest()
+
+
+def reference_db_version(cur, pipeline):
+    """Digest of the cache schema, the pipeline tag and the active creator roster."""
+    cur.execute("""
+        SELECT COUNT(*) AS n, COALESCE(MAX(id), 0) AS max_id FROM creator_signatures
+        WHERE archived_at IS NULL
+    """)
+    row = cur.fetchone()
+    raw = json.dumps([CACHE_SCHEMA, pipeline, int(row['n']), int(row['max_id'])])
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def creator_stamps(cur, creator_names):
+    """{lower(name): 'count:max image id'} for each name; 'none' if unknown."""
+    names = sorted({(n or '').strip().lower() for n in creator_names if n})
+    if not names:
+        return {}
+    cur.execute("""
+        SELECT LOWER(cs.creator_name) AS name, COUNT(si.id) AS n, COALESCE(MAX(si.id), 0) AS max_id
+        FROM creator_signatures cs
+        LEFT JOIN signature_images si ON si.creator_id = cs.id
+        WHERE LOWER(cs.creator_name) = ANY(%s)
+        GROUP BY LOWER(cs.creator_name)
+    """, (names,))
+    stamps = {n: 'none' for n in names}
+    for row in cur.fetchall():
+        stamps[row['name']] = f"{int(row['n'])}:{int(row['max_id'])}"
+    return stamps
+
+
+class SignatureCacheProbe:
+    """One request's view of the cache.
+
+    lookup() fingerprints the cover and reads the reference-DB version once,
+    so the store() after a miss writes the same key without recomputing.
+    `outcome` is one of off | hit | stale | miss | error, for the log line.
+    """
+
+    def __init__(self, endpoint, pipeline, context=None, enabled=True):
+        self.endpoint = endpoint
+        self.pipeline = pipeline
+        self.context = identity_key(**(context or {}))
+        self.enabled = enabled and SIG_ID_CACHE_ENABLED and bool(os.environ.get('DATABASE_URL'))
+        self.phash = None
+        self.digest = None
+        self.ref_version = None
+        self.outcome = 'off'
+
+    def lookup(self, cover_b64):
+        """Return a copy of the stored result (flagged cached=True) or None."""
+        if not self.enabled:
+            return None
+        try:
+            self.phash = image_phash(cover_b64)
+            self.digest = content_digest(cover_b64)
+        except Exception as e:
+            print(f"[SigCache] fingerprint failed (treated as miss): {e}")
+            self.outcome = 'error'
+            return None
+
+        conn = None
+        try:
+            conn = _dbpool.get_db(dict_rows=True)
+            cur = conn.cursor()
+            self.ref_version = reference_db_version(cur, self.pipeline)
+            cur.execute("""
+                SELECT id, creator_stamps, result FROM signature_id_cache
+                WHERE endpoint = %s AND phash = %s AND content_sha256 = %s
+                  AND context_key = %s AND ref_version = %s AND expires_at > NOW()
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (self.endpoint, self.phash, self.digest, self.context, self.ref_version))
+            row = cur.fetchone()
+            if row is None:
+                self.outcome = 'miss'
+                cur.close()
+                return None
+            stored = row['creator_stamps'] or {}
+            current = creator_stamps(cur, stored.keys())
+            if current != stored:
+                changed = sorted(k for k in stored if current.get(k) != stored[k])
+                print(f"[SigCache] stale entry {row['id']}: reference images changed for {changed}")
+                cur.execute("DELETE FROM signature_id_cache WHERE id = %s", (row['id'],))
+                conn.commit()
+                self.outcome = 'stale'
+                cur.close()
+                return None
+            cur.close()
+        except Exception as e:
+            print(f"[SigCache] lookup failed (treated as miss): {e}")
+            self.outcome = 'error'
+            return None
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+        self.outcome = 'hit'
+        result = dict(row['result'])
+        result['cached'] = True
+        return result
+
+    def store(self, result, ranked_creators):
+        """Persist a result under the key from lookup(), stamped with the
+        current reference images of `ranked_creators`. Never raises."""
+        if not self.enabled or not self.digest or not self.ref_version:
+            return
+        conn = None
+        try:
+            conn = _dbpool.get_db(dict_rows=True)
+            cur = conn.cursor()
+            stamps = creator_stamps(cur, ranked_creators)
+            cur.execute("""
+                INSERT INTO signature_id_cache
+                    (endpoint, phash, content_sha256, context_key, ref_version,
+                     creator_stamps, result, expires_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW() + make_interval(days => %s))
+            """, (self.endpoint, self.phash, self.digest, self.context, self.ref_version,
+                  json.dumps(stamps), json.dumps(result, default=str), SIG_ID_CACHE_TTL_DAYS))
+            # Opportunistic sweep keeps the table bounded without a scheduled job.
+            cur.execute("DELETE FROM signature_id_cache WHERE expires_at <= NOW()")
+            conn.commit()
+            cur.close()
+        except Exception as e:
+            print(f"[SigCache] store failed (non-fatal): {e}")
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def invalidate(endpoint=None):
+    """Delete cached identifications (optionally one endpoint). Returns rows deleted."""
+    conn = _dbpool.get_db()
+    try:
+        cur = conn.cursor()
+        if endpoint:
+            cur.execute("DELETE FROM signature_id_cache WHERE endpoint = %s", (endpoint,))
+        else:
+            cur.execute("DELETE FROM signature_id_cache")
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
+    finally:
+        conn.close()
@@ -0,0 +1,320 @@
+"""
+Signature matcher — parallel cross-validation runner.
+
+signature_matcher.cross_validate() walks the artists one at a time, one vision
+call per held-out image, and starts from scratch every run — so checking a
+reference-set change took hours of wall time and a full API bill. This runner
+evaluates the same matcher (signature_matcher.match_signature, unchanged) but:
+
+- runs the held-out cases concurrently (--workers, default 4 — each case is
+  one API call, so this is bounded by the account's rate limit, not the CPU);
+- evaluates several configurations in one go (--visual-keep 0 8 5 → the full
+  prompt vs the visual pre-filter at 8 and 5 artists) on the SAME cases;
+- RESUMES: every finished case is appended to cv_runs/<label>-<config>.jsonl
+  as it completes; a rerun skips cases already there (errors are retried),
+  so an interrupted run or an added configuration costs only what is missing;
+- takes a pluggable client: the real API, LocalStubClient (--stub), or a
+  ReplayClient over a recorded-response store (--replay FILE) that answers
+  identical requests from disk — offline, free and deterministic.
+  --replay FILE --record fills the store from the live client on a miss.
+
+Per configuration it reports accuracy, errors, the confusion pairs
+(expected → predicted), input/output tokens, wall time and per-call latency,
+and writes the same as <label>-<config>.summary.json (full confusion matrix).
+
+Cases are chosen by --seed (default 0, so resumes see the same cases):
+--samples N held-out images per artist, or --all for leave-one-out over every
+image. Artists with fewer than 2 images are skipped, as in cross_validate().
+
+Usage (from the repo root):
+    python signatures/cv_runner.py --stub --visual-keep 0 8 5
+    python signatures/cv_runner.py --replay signatures/cv_runs/replay.jsonl --record --all
+    python signatures/cv_runner.py --replay signatures/cv_runs/replay.jsonl --visual-keep 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from signatures import signature_matcher as sm
+
+RUNS_DIR = sm.SIGNATURES_DIR / "cv_runs"
+DEFAULT_WORKERS = 4
+
+
+class ReplayMiss(Exception):
+    """A request with no recorded response and no live client to ask."""
+
+
+class ReplayClient:
+    """
+    Anthropic-compatible client backed by a recorded-response store (JSONL,
+    one {"key", "model", "text", "usage"} per line). The key is a digest of the
+    whole request (model, system, max_tokens, messages — images included), so a
+    response is only replayed for a byte-identical prompt: any change to the
+    reference set or prompt builder is a miss, never a stale answer.
+
+    inner=None → replay only (a miss raises ReplayMiss, recorded as an error
+    case). With an inner client, misses are forwarded and recorded.
+    """
+
+    def __init__(self, path, inner=None):
+        self.messages = self
+        self.path = Path(path)
+        self.inner = inner
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._store = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        self._store[rec["key"]] = rec
+
+    def __len__(self):
+        return len(self._store)
+
+    @staticmethod
+    def request_key(**kwargs):
+        return hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()
+
+    def create(self, **kwargs):
+        key = self.request_key(**kwargs)
+        with self._lock:
+            rec = self._store.get(key)
+            if rec is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if rec is not None:
+            return SimpleNamespace(content=[SimpleNamespace(text=rec["text"])],
+                                   usage=SimpleNamespace(**rec["usage"]))
+        if self.inner is None:
+            raise ReplayMiss(f"no recorded response for request {key[:12]}")
+
+        response = self.inner.messages.create(**kwargs)
+        usage = getattr(response, "usage", None)
+        rec = {"key": key, "model": kwargs.get("model"), "text": response.content[0].text,
+               "usage": {"input_tokens": getattr(usage, "input_tokens", 0) or 0,
+                         "output_tokens": getattr(usage, "output_tokens", 0) or 0}}
+        with self._lock:
+            self._store[key] = rec
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(rec) + "\n")
+        return response
+
+
+def build_cases(db=None, samples_per_artist=1, seed=0, leave_one_out=False):
+    """[{'artist', 'test_image'}] — held-out images, repeatable for a seed."""
+    db = db or sm.load_db()
+    rng = random.Random(seed)
+    cases = []
+    for artist in db["artists"]:
+        images = [f for f in artist["images"] if (sm.SIGNATURES_DIR / f).exists()]
+        if len(images) < 2:
+            continue
+        chosen = images if leave_one_out else rng.sample(images, min(samples_per_artist, len(images)))
+        cases.extend({"artist": artist["name"], "test_image": f} for f in chosen)
+    return cases
+
+
+def config_name(visual_keep):
+    return f"keep{visual_keep}" if visual_keep else "full"
+
+
+def load_results(path):
+    """{test_image: row} from a results file; error rows are left out so a
+    resume retries them. Later lines win."""
+    done = {}
+    if Path(path).exists():
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row.get("error"):
+                    done.pop(row["test_image"], None)
+                else:
+                    done[row["test_image"]] = row
+    return done
+
+
+def score_case(case, result, elapsed_s):
+    """One results row from a match_signature() result (None/error → ERROR row)."""
+    row = {"artist": case["artist"], "test_image": case["test_image"],
+           "elapsed_s": round(elapsed_s, 3)}
+    if result and "best_match" in result:
+        predicted = result["best_match"]
+        row.update({
+            "predicted": predicted,
+            "confidence": result.get("best_confidence", 0),
+            "correct": predicted.lower().strip() == case["artist"].lower().strip(),
+            "usage": result.get("usage", {}),
+            "top_matches": result.get("matches", [])[:3],
+        })
+        if "visual_shortlist" in result:
+            row["in_shortlist"] = case["artist"] in result["visual_shortlist"]
+    else:
+        row.update({"predicted": "ERROR", "confidence": 0, "correct": False,
+                    "error": str((result or {}).get("error", result))})
+    return row
+
+
+def summarize(rows, wall_s):
+    """Accuracy / confusion / tokens / timing for a list of rows."""
+    total = len(rows)
+    correct = sum(1 for r in rows if r["correct"])
+    confusion = {}
+    for r in rows:
+        by_pred = confusion.setdefault(r["artist"], {})
+        by_pred[r["predicted"]] = by_pred.get(r["predicted"], 0) + 1
+    latencies = sorted(r["elapsed_s"] for r in rows if not r.get("error"))
+    shortlisted = [r for r in rows if "in_shortlist" in r]
+    return {
+        "total": total,
+        "correct": correct,
+        "accuracy": (correct / total * 100) if total else 0.0,
+        "errors": sum(1 for r in rows if r.get("error")),
+        "confusion": confusion,
+        "input_tokens": sum(r.get("usage", {}).get("input_tokens", 0) for r in rows),
+        "output_tokens": sum(r.get("usage", {}).get("output_tokens", 0) for r in rows),
+        "wall_s": round(wall_s, 2),
+        "call_p50_s": latencies[len(latencies) // 2] if latencies else None,
+        "shortlist_recall": (sum(1 for r in shortlisted if r["in_shortlist"]) / len(shortlisted) * 100
+                             if shortlisted else None),
+    }
+
+
+def run_config(cases, client, visual_keep, results_path, workers=DEFAULT_WORKERS, verbose=True):
+    """Run every case not already in results_path, `workers` at a time, and
+    return the summary over ALL cases (resumed + new)."""
+    results_path = Path(results_path)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    done = load_results(results_path)
+    todo = [c for c in cases if c["test_image"] not in done]
+    write_lock = threading.Lock()
+
+    def one(case):
+        t = time.monotonic()
+        try:
+            result = sm.match_signature(sm.SIGNATURES_DIR / case["test_image"], verbose=False,
+                                        exclude_image=case["test_image"], client=client,
+                                        visual_keep=visual_keep or None)
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        row = score_case(case, result, time.monotonic() - t)
+        with write_lock:
+            with open(results_path, "a") as f:
+                f.write(json.dumps(row) + "\n")
+        return row
+
+    if verbose:
+        print(f"[CV] {config_name(visual_keep)}: {len(cases)} cases, "
+              f"{len(cases) - len(todo)} resumed, {len(todo)} to run ({workers} workers)")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(one, c) for c in todo]
+        for n, fut in enumerate(as_completed(futures), 1):
+            row = fut.result()
+            done[row["test_image"]] = row
+            if verbose:
+                status = "✅" if row["correct"] else "❌"
+                print(f"  [{n}/{len(todo)}] {status} {row['artist']} → {row['predicted']} "
+                      f"({row['elapsed_s']:.1f}s)")
+    wall = time.monotonic() - started
+
+    summary = summarize([done[c["test_image"]] for c in cases if c["test_image"] in done], wall)
+    summary.update({"config": config_name(visual_keep), "visual_keep": visual_keep or None,
+                    "resumed": len(cases) - len(todo)})
+    with open(results_path.with_suffix(".summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def print_report(summary):
+    print(f"\n{'=' * 60}")
+    print(f"CONFIG {summary['config']}")
+    print(f"{'=' * 60}")
+    print(f"Accuracy:   {summary['correct']}/{summary['total']} = {summary['accuracy']:.1f}%"
+          f"  (errors: {summary['errors']})")
+    if summary["shortlist_recall"] is not None:
+        print(f"Shortlist recall@{summary['visual_keep']}: {summary['shortlist_recall']:.1f}%")
+    print(f"Tokens:     {summary['input_tokens']} in / {summary['output_tokens']} out")
+    p50 = summary["call_p50_s"]
+    print(f"Wall time:  {summary['wall_s']:.1f}s this run ({summary['resumed']} cases resumed)"
+          + (f", call p50 {p50:.1f}s" if p50 is not None else ""))
+    pairs = sorted(((exp, pred, n) for exp, preds in summary["confusion"].items()
+                    for pred, n in preds.items() if pred != exp), key=lambda x: -x[2])
+    if pairs:
+        print("Confusions (expected → predicted):")
+        for exp, pred, n in pairs:
+            print(f"  {exp} → {pred}  ×{n}")
+
+
+def make_client(args):
+    """The client for a CLI run: stub, replay store (optionally recording), or the API."""
+    if args.stub:
+        inner = sm.LocalStubClient()
+    elif args.replay and not args.record:
+        inner = None
+    else:
+        try:
+            import anthropic
+        except ImportError:
+            print("❌ anthropic package not installed. Run: pip install anthropic")
+            sys.exit(1)
+        api_key = args.api_key or os.environ.get("ANTHROPIC_API_KEY")
+        if not api_key:
+            print("❌ ANTHROPIC_API_KEY not set")
+            sys.exit(1)
+        inner = anthropic.Anthropic(api_key=api_key)
+    return ReplayClient(args.replay, inner=inner) if args.replay else inner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel, resumable signature cross-validation")
+    parser.add_argument("--visual-keep", type=int, nargs="+", default=[0],
+                        help="Configurations: artists sent per call (0 = all). E.g. 0 8 5")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent cases")
+    parser.add_argument("--samples", type=int, default=1, help="Held-out images per artist")
+    parser.add_argument("--all", action="store_true", help="Leave-one-out over every image")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the held-out choice")
+    parser.add_argument("--stub", action="store_true", help="LocalStubClient (offline)")
+    parser.add_argument("--replay", help="Recorded-response store (JSONL)")
+    parser.add_argument("--record", action="store_true",
+                        help="With --replay: ask the live client on a miss and record it")
+    parser.add_argument("--label", help="Results file prefix (default: stub | replay | api)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore previous results")
+    parser.add_argument("--api-key", help="Anthropic API key (or set ANTHROPIC_API_KEY env var)")
+    args = parser.parse_args()
+
+    client = make_client(args)
+    label = args.label or ("stub" if args.stub else "replay" if args.replay else "api")
+    cases = build_cases(samples_per_artist=args.samples, seed=args.seed, leave_one_out=args.all)
+
+    summaries = []
+    for keep in args.visual_keep:
+        path = RUNS_DIR / f"{label}-{config_name(keep)}.jsonl"
+        if args.fresh and path.exists():
+            path.unlink()
+        summaries.append(run_config(cases, client, keep, path, workers=args.workers))
+        print_report(summaries[-1])
+
+    print(f"\n{'config':<10} {'cases':>5} {'acc %':>6} {'err':>4} {'tokens in':>10} {'out':>7} {'wall s':>7}")
+    for s in summaries:
+        print(f"{s['config']:<10} {s['total']:>5} {s['accuracy']:>6.1f} {s['errors']:>4} "
+              f"{s['input_tokens']:>10} {s['output_tokens']:>7} {s['wall_s']:>7.1f}")
+    if isinstance(client, ReplayClient):
+        print(f"\nReplay store: {len(client)} responses, {client.hits} hits / {client.misses} misses")
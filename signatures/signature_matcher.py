@@ -14,6 +14,14 @@ Usage:
     # Run full cross-validation (each sig vs all others)
     python signature_matcher.py --cross-validate
 
+    # Cross-validate the local visual pre-filter offline (no API calls):
+    # the stub "model" picks the top visual candidate; recall = true artist
+    # survived the shortlist
+    python signature_matcher.py --cross-validate --stub --visual-keep 8 --seed 1
+
+    # Parallel / resumable / replayable cross-validation across configurations
+    python signatures/cv_runner.py --help
+
     # Run against eBay signed comics (requires API access)
     python signature_matcher.py --ebay-test
 """
@@ -25,10 +33,13 @@ import base64
 import argparse
 import random
 from pathlib import Path
-from models import SONNET_NEW
+from types import SimpleNamespace
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
+from models import SONNET_NEW
+import signature_reference_cache as ref_cache
+import signature_visual_index as visual_index
 
 SIGNATURES_DIR = Path(__file__).parent
 DB_PATH = SIGNATURES_DIR / "signatures_db.json"
@@ -117,7 +128,7 @@ When comparing signatures:
 - When multiple reference images are provided for an artist, use them to understand the range of natural variation in that artist's signature"""
 
 
-def build_reference_collage_prompt(db, unknown_b64, unknown_media_type, exclude_image=None):
+def build_reference_collage_prompt(db, unknown_b64, unknown_media_type, exclude_image=None, artists=None):
     """
     Build a Claude Vision prompt that shows the unknown signature alongside
     reference samples from each artist. Returns a list of messages for the API.
@@ -127,6 +138,8 @@ def build_reference_collage_prompt(db, unknown_b64, unknown_media_type, exclude_
 
     Args:
         exclude_image: filename to exclude from references (for cross-validation)
+        artists: subset of db["artists"] to show, in order (e.g. visual_shortlist);
+            default all
     """
     content = []
 
@@ -147,7 +160,7 @@ def build_reference_collage_prompt(db, unknown_b64, unknown_media_type, exclude_
     # Add up to 2 reference images per artist (preferred first, then largest)
     ref_index = 2
 
-    for artist in db["artists"]:
+    for artist in (db["artists"] if artists is None else artists):
         ref_images = select_reference_images(artist, max_images=2, exclude_image=exclude_image)
 
         if ref_images:
@@ -156,9 +169,9 @@ def build_reference_collage_prompt(db, unknown_b64, unknown_media_type, exclude_
                 "text": f"\nREFERENCE {ref_index} — {artist['name']}:"
             })
             for img_file in ref_images:
-                img_path = SIGNATURES_DIR / img_file
-                img_b64 = image_to_base64(img_path)
-                media_type = get_media_type(img_file)
+                # Cached per process — cross-validation rebuilds this prompt
+                # once per signature, with the same ~46 references each time.
+                img_b64, media_type = ref_cache.local_image(img_file, creator=artist['name'])
                 content.append({
                     "type": "image",
                     "source": {
@@ -209,7 +222,64 @@ Rules:
     return content
 
 
-def match_signature(unknown_image_path, api_key=None, verbose=True, exclude_image=None):
+_LOCAL_INDEX = visual_index.SignatureIndex()   # rows keyed by filename, labelled by artist name
+
+
+def visual_shortlist(db, unknown_b64, keep, exclude_image=None):
+    """
+    Rank db["artists"] by local visual similarity to the unknown signature
+    (signature_visual_index — the same descriptor the v2 orchestrator uses)
+    and return the `keep` most similar artist dicts, best first.
+    exclude_image is left out of the ranking (cross-validation).
+    """
+    keys = []
+    for artist in db["artists"]:
+        for img in artist["images"]:
+            if img == exclude_image or not (SIGNATURES_DIR / img).exists():
+                continue
+            if _LOCAL_INDEX.add(img, artist["name"], ref_cache.local_image(img, creator=artist["name"])[0]):
+                keys.append(img)
+    query = visual_index.describe_b64(unknown_b64)
+    if query is None:
+        return list(db["artists"])
+    by_name = {a["name"]: a for a in db["artists"]}
+    return [by_name[name] for name, _ in _LOCAL_INDEX.rank(query, keys=keys)[:keep]]
+
+
+class LocalStubClient:
+    """
+    Offline stand-in for anthropic.Anthropic in cross_validate(): "identifies"
+    the signature as the FIRST reference artist in the prompt. Combined with
+    visual_shortlist (which orders the prompt best-first) this measures the
+    visual pre-filter on its own — top-1 accuracy, plus shortlist recall — at
+    zero API cost.
+    """
+
+    def __init__(self):
+        self.messages = self
+        self.calls = 0
+
+    def create(self, model=None, system=None, max_tokens=None, messages=None, **kwargs):
+        self.calls += 1
+        first = None
+        for block in messages[0]["content"]:
+            text = block.get("text", "") if block.get("type") == "text" else ""
+            if text.strip().startswith("REFERENCE "):
+                first = text.split("—", 1)[1].strip().rstrip(":")
+                break
+        result = {
+            "matches": [{"artist": first, "confidence": 0.75, "reasoning": "local stub"}] if first else [],
+            "best_match": first or "UNKNOWN",
+            "best_confidence": 0.75 if first else 0.0,
+            "is_confident_match": bool(first),
+            "notes": "LocalStubClient",
+        }
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(result))],
+                               usage=SimpleNamespace(input_tokens=0, output_tokens=0))
+
+
+def match_signature(unknown_image_path, api_key=None, verbose=True, exclude_image=None,
+                    client=None, visual_keep=None):
     """
     Match an unknown signature against the reference database.
 
@@ -218,20 +288,27 @@ def match_signature(unknown_image_path, api_key=None, verbose=True, exclude_imag
         api_key: Anthropic API key (falls back to env var)
         verbose: Print progress
         exclude_image: filename to exclude from references (for cross-validation)
+        client: Anthropic-compatible client (e.g. LocalStubClient); default
+            anthropic.Anthropic(api_key)
+        visual_keep: if set, only the visual_shortlist top-N artists are sent
 
     Returns:
-        dict with matches, best_match, confidence, etc.
+        dict with matches, best_match, confidence, etc., 'usage' (input/output
+        tokens of the call), plus 'visual_shortlist' — artist names sent —
+        when visual_keep is set
     """
-    try:
-        import anthropic
-    except ImportError:
-        print("❌ anthropic package not installed. Run: pip install anthropic")
-        return None
-
-    api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
-    if not api_key:
-        print("❌ ANTHROPIC_API_KEY not set")
-        return None
+    if client is None:
+        try:
+            import anthropic
+        except ImportError:
+            print("❌ anthropic package not installed. Run: pip install anthropic")
+            return None
+
+        api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
+        if not api_key:
+            print("❌ ANTHROPIC_API_KEY not set")
+            return None
+        client = anthropic.Anthropic(api_key=api_key)
 
     db = load_db()
 
@@ -251,11 +328,16 @@ def match_signature(unknown_image_path, api_key=None, verbose=True, exclude_imag
     if verbose:
         print(f"Comparing against {len(db['artists'])} reference artists...")
 
-    content = build_reference_collage_prompt(db, unknown_b64, unknown_media_type, exclude_image=exclude_image)
+    shortlist = None
+    if visual_keep:
+        shortlist = visual_shortlist(db, unknown_b64, visual_keep, exclude_image=exclude_image)
+        if verbose:
+            print(f"Visual pre-filter kept {len(shortlist)}: {', '.join(a['name'] for a in shortlist)}")
 
-    # Call Claude Vision
-    client = anthropic.Anthropic(api_key=api_key)
+    content = build_reference_collage_prompt(db, unknown_b64, unknown_media_type,
+                                             exclude_image=exclude_image, artists=shortlist)
 
+    # Call Claude Vision
     if verbose:
         print("Calling Claude Vision API...")
 
@@ -286,18 +368,29 @@ def match_signature(unknown_image_path, api_key=None, verbose=True, exclude_imag
     except json.JSONDecodeError:
         result = {"error": "Failed to parse JSON", "raw": response_text}
 
+    if shortlist is not None:
+        result["visual_shortlist"] = [a["name"] for a in shortlist]
+    usage = getattr(response, "usage", None)
+    result["usage"] = {"input_tokens": getattr(usage, "input_tokens", 0) or 0,
+                       "output_tokens": getattr(usage, "output_tokens", 0) or 0}
     return result
 
 
-def cross_validate(api_key=None, samples_per_artist=1):
+def cross_validate(api_key=None, samples_per_artist=1, client=None, visual_keep=None,
+                   seed=None, save=True):
     """
     Cross-validation test: Take one signature from each artist,
     use it as the "unknown", and see if the matcher correctly identifies it.
 
     This is the key accuracy metric for the system.
+
+    client / visual_keep are passed to match_signature (LocalStubClient +
+    visual_keep measures the visual pre-filter offline). seed makes the test
+    image choice repeatable; save=False skips cross_validation_results.json.
     """
     db = load_db()
     results = []
+    rng = random.Random(seed) if seed is not None else random
 
     for artist in db["artists"]:
         if len(artist["images"]) < 2:
@@ -305,7 +398,7 @@ def cross_validate(api_key=None, samples_per_artist=1):
             continue
 
         # Use a random image as the "unknown" test
-        test_image = random.choice(artist["images"])
+        test_image = rng.choice(artist["images"])
         test_path = SIGNATURES_DIR / test_image
 
         if not test_path.exists():
@@ -316,7 +409,8 @@ def cross_validate(api_key=None, samples_per_artist=1):
         print(f"Testing: {artist['name']} (using {test_image})")
 
         # Exclude the test image from the reference set to avoid data leakage
-        result = match_signature(test_path, api_key=api_key, verbose=False, exclude_image=test_image)
+        result = match_signature(test_path, api_key=api_key, verbose=False, exclude_image=test_image,
+                                 client=client, visual_keep=visual_keep)
 
         if result and "best_match" in result:
             correct = result["best_match"].lower().strip() == artist["name"].lower().strip()
@@ -338,6 +432,8 @@ def cross_validate(api_key=None, samples_per_artist=1):
                 "correct": correct,
                 "top_matches": result.get("matches", [])[:3]
             })
+            if "visual_shortlist" in result:
+                results[-1]["in_shortlist"] = artist["name"] in result["visual_shortlist"]
         else:
             print(f"  ❌ API error: {result}")
             results.append({
@@ -361,6 +457,11 @@ def cross_validate(api_key=None, samples_per_artist=1):
     print(f"Total tested: {total}")
     print(f"Correct:      {correct}")
     print(f"Accuracy:     {accuracy:.1f}%")
+    shortlisted = [r for r in results if "in_shortlist" in r]
+    if shortlisted:
+        recall = sum(1 for r in shortlisted if r["in_shortlist"]) / len(shortlisted) * 100
+        print(f"Visual pre-filter recall@{visual_keep}: {recall:.1f}% "
+              f"(true artist among the {visual_keep} sent)")
 
     # Confidence breakdown
     high_conf = [r for r in results if r["confidence"] >= 0.8]
@@ -379,6 +480,9 @@ def cross_validate(api_key=None, samples_per_artist=1):
         for r in wrong:
             print(f"  - {r['artist']} → predicted {r['predicted']} ({r['confidence']})")
 
+    if not save:
+        return results
+
     # Save results
     results_path = SIGNATURES_DIR / "cross_validation_results.json"
     with open(results_path, 'w') as f:
@@ -446,13 +550,18 @@ if __name__ == "__main__":
     parser.add_argument("--artist", help="Artist name for --test mode")
     parser.add_argument("--cross-validate", action="store_true", help="Run full cross-validation")
     parser.add_argument("--api-key", help="Anthropic API key (or set ANTHROPIC_API_KEY env var)")
+    parser.add_argument("--visual-keep", type=int, help="Send only the top-N visually similar artists")
+    parser.add_argument("--stub", action="store_true",
+                        help="Use LocalStubClient (offline; results are not saved)")
+    parser.add_argument("--seed", type=int, help="Seed for the cross-validation image choice")
 
     args = parser.parse_args()
 
     api_key = args.api_key or os.environ.get('ANTHROPIC_API_KEY')
 
     if args.cross_validate:
-        cross_validate(api_key=api_key)
+        cross_validate(api_key=api_key, client=LocalStubClient() if args.stub else None,
+                       visual_keep=args.visual_keep, seed=args.seed, save=not args.stub)
     elif args.test and args.artist:
         test_known_artist(args.artist, api_key=api_key)
     elif args.image:
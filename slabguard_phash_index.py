@@ -0,0 +1,203 @@
+"""
+In-process index over slabguard_flagged_images phashes for /api/slabguard/check.
+
+check_listing used to SELECT every flagged row and compute the Hamming
+distance in a Python loop — O(N) per call, and the browser extension calls it
+for every marketplace listing a user views. This answers the same
+"any flagged hash within PHASH_MATCH_THRESHOLD bits?" question sub-linearly.
+
+Structure: multi-index hashing (Norouzi et al.). The 64-bit hash is split into
+CHUNKS = 4 chunks of 16 bits, each with its own table chunk value → row ids.
+Pigeonhole: if two hashes differ in ≤ r bits, at least one chunk differs in
+≤ r // 4 bits (4 × (r//4 + 1) > r). A query therefore probes, per chunk, every
+value within r // 4 bits of its own chunk (r = 10 → 1 + 16 + 120 = 137 probes
+per chunk, 548 dict lookups) and verifies only the rows found there. With N
+roughly-uniform hashes each probe returns ~N / 65536 rows, so the work is
+~548 · N/65536 verifications instead of N.
+
+scripts/slabguard_phash_index_benchmark.py (uniform hashes, r = 10, p50):
+
+                 10k        100k       1M
+    linear       1.2 ms     12 ms      99 ms     (int popcount per row)
+    BK-tree      4.6 ms     80 ms      786 ms    (visits ~63% of nodes)
+    this         0.10 ms    0.90 ms    8.7 ms    (~0.8% of rows verified)
+
+A BK-tree is the textbook answer but loses to the plain scan here: at r = 10
+of 64 bits its |d - r| pruning keeps most subtrees.
+
+Freshness (one index per gunicorn worker):
+- Loaded lazily on the first check.
+- approve_submission() adds its row to this worker's index right after commit.
+- Other workers pick new rows up incrementally: at most every REFRESH_S a
+  check runs SELECT COUNT(*), MAX(id); new ids are fetched with id > max_id,
+  and a count that doesn't add up (rows deleted) triggers a full reload.
+
+Rows whose phash is not a hex hash (the 'manual_<submission>' placeholder
+approve_submission writes when the image fetch failed) are counted but never
+indexed — they could never match, exactly as before.
+"""
+import os
+import threading
+import time
+from functools import lru_cache
+from itertools import combinations
+
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+REFRESH_S = float(os.environ.get('SLABGUARD_INDEX_REFRESH_S', '30'))
+
+
+def parse_hash(phash):
+    """Hex phash → int, or None for placeholders / anything > 64 bits."""
+    try:
+        value = int(phash, 16)
+    except (TypeError, ValueError):
+        return None
+    return value if value < (1 << 64) else None
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(radius):
+    """Every CHUNK_BITS-bit XOR mask with ≤ radius bits set."""
+    return tuple(sum(1 << b for b in bits)
+                 for k in range(radius + 1)
+                 for bits in combinations(range(CHUNK_BITS), k))
+
+
+class MultiIndexHash:
+    """64-bit hashes keyed by row id, searchable by Hamming radius. Not
+    thread-safe on its own — FlaggedPhashIndex holds the lock."""
+
+    def __init__(self):
+        self._hashes = {}                                  # id → int hash
+        self._tables = [dict() for _ in range(CHUNKS)]     # chunk value → [ids]
+
+    def __len__(self):
+        return len(self._hashes)
+
+    @staticmethod
+    def _chunks(value):
+        return [(value >> (CHUNK_BITS * i)) & CHUNK_MASK for i in range(CHUNKS)]
+
+    def add(self, row_id, value):
+        if row_id in self._hashes:
+            self.remove(row_id)
+        self._hashes[row_id] = value
+        for table, c in zip(self._tables, self._chunks(value)):
+            table.setdefault(c, []).append(row_id)
+
+    def remove(self, row_id):
+        value = self._hashes.pop(row_id, None)
+        if value is None:
+            return
+        for table, c in zip(self._tables, self._chunks(value)):
+            bucket = table.get(c)
+            if bucket:
+                bucket.remove(row_id)
+                if not bucket:
+                    del table[c]
+
+    def query(self, value, radius):
+        """[(distance, id)] for every hash within `radius` bits, nearest first."""
+        masks = _flip_masks(radius // CHUNKS)
+        hashes = self._hashes
+        seen = set()
+        found = []
+        for table, c in zip(self._tables, self._chunks(value)):
+            for m in masks:
+                bucket = table.get(c ^ m)
+                if not bucket:
+                    continue
+                for row_id in bucket:
+                    if row_id in seen:
+                        continue
+                    seen.add(row_id)
+                    d = (hashes[row_id] ^ value).bit_count()
+                    if d <= radius:
+                        found.append((d, row_id))
+        found.sort()
+        return found
+
+
+class FlaggedPhashIndex:
+    """MultiIndexHash over slabguard_flagged_images, kept fresh per worker
+    (see module docstring). Thread-safe."""
+
+    def __init__(self, refresh_s=REFRESH_S):
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+        self._mih = MultiIndexHash()
+        self._loaded = False
+        self._max_id = 0
+        self._rows = 0          # rows seen in the table, indexed or not
+        self._checked = 0.0
+
+    def __len__(self):
+        return len(self._mih)
+
+    def _ingest(self, rows):
+        for row in rows:
+            value = parse_hash(row['phash'])
+            if value is not None:
+                self._mih.add(row['id'], value)
+            self._max_id = max(self._max_id, row['id'])
+            self._rows += 1
+
+    def _reload(self, cur):
+        cur.execute("SELECT id, phash FROM slabguard_flagged_images")
+        self._mih = MultiIndexHash()
+        self._max_id = 0
+        self._rows = 0
+        self._ingest(cur.fetchall())
+        self._loaded = True
+        print(f"[SlabGuard] flagged phash index loaded: {len(self._mih)} hashes ({self._rows} rows)")
+
+    def refresh(self, cur, force=False):
+        """Bring the index up to date with the table (rate-limited to REFRESH_S
+        unless `force`). `cur` is a dict-row cursor."""
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded and not force and now - self._checked < self.refresh_s:
+                return
+            self._checked = now
+            if not self._loaded:
+                self._reload(cur)
+                return
+            cur.execute("SELECT COUNT(*) AS n, COALESCE(MAX(id), 0) AS max_id "
+                        "FROM slabguard_flagged_images")
+            stats = cur.fetchone()
+            if stats['max_id'] > self._max_id:
+                cur.execute("SELECT id, phash FROM slabguard_flagged_images WHERE id > %s",
+                            (self._max_id,))
+                self._ingest(cur.fetchall())
+            if stats['n'] != self._rows:
+                self._reload(cur)   # rows were deleted (or an add raced the count)
+
+    def add(self, row_id, phash):
+        """Index a row this worker just committed (approve_submission). Raises
+        the id watermark so refresh() does not fetch (and count) it again; a
+        lower id committed meanwhile by another worker shows up as a count
+        mismatch and forces a reload."""
+        value = parse_hash(phash)
+        with self._lock:
+            if not self._loaded or row_id is None:
+                return
+            if row_id > self._max_id:
+                self._max_id = row_id
+                self._rows += 1
+            if value is not None:
+                self._mih.add(row_id, value)
+
+    def query(self, cur, phash, radius):
+        """[(distance, flagged id)] within `radius` bits of a hex phash."""
+        self.refresh(cur)
+        value = parse_hash(phash)
+        if value is None:
+            return []
+        with self._lock:
+            return self._mih.query(value, radius)
+
+
+# Shared by every check_listing call in this worker.
+FLAGGED_INDEX = FlaggedPhashIndex()
@@ -0,0 +1,562 @@
+"""
+Incrementally maintained rollups behind the admin dashboards.
+
+/api/admin/dashboard (admin.get_dashboard_stats) and /api/admin/slab-guard-stats
+used to run a dozen COUNT(*) / GROUP BY / AVG queries over the whole of users,
+request_logs, api_usage, market_sales, ebay_sales, comic_registry,
+sighting_reports and match_reports on every admin page load — request_logs
+alone grows by one row per API call. They now read O(days) rows from the
+rollup tables in migrations/add_stats_rollups.sql:
+
+    stats_counters          all-time counters        metric → (n, amount)
+    stats_daily             per-UTC-day counters     (metric, day) → (n, amount)
+    stats_daily_users       distinct request_logs users per day
+    stats_sighting_serials  sighting reports per serial
+    stats_rollup_cursors    last id folded in, per aggregated source
+
+Two maintenance paths:
+
+- TRIGGERS (in the migration) for users, comic_registry, sighting_reports,
+  match_reports, market_sales: their rows are UPDATEd and DELETEd, which an id
+  cursor cannot see. Metrics: users.*, registry.*, sightings.*, match.*,
+  market_sales.*. Exact, same transaction as the write. market_sales's are
+  statement-level (one summed delta per batch upsert, not one hot-row
+  update per sale).
+- AGGREGATOR (refresh() below) for request_logs, api_usage, ebay_sales:
+  append-only and high volume, so no per-row trigger. Each chunk folds
+  rows lo < id <= hi into stats_daily and advances the cursor in ONE
+  transaction (exactly once). Metrics: requests*, api.*, ebay_sales.new.
+
+⚠️ Commit order ≠ id order: a transaction can commit a LOWER id after a higher
+one is visible, and a cursor that already passed it would skip it forever.
+refresh() therefore only folds rows older than ROLLUP_LAG_S (the inserts are
+single-statement / short transactions), and readers add the TAIL — rows
+id > cursor, aggregated live through the same SQL, an index range scan over
+minutes of rows — so dashboard numbers are exact and current either way.
+
+Seeding: the migration seeds the trigger counters in the transaction that
+installs the triggers (see its header). ⚠️ Nothing on a GET path seeds: a seed
+needs the source tables locked against writes for a full scan, which would
+stall /api/sales/record, signups and grading behind a dashboard load. If the
+'triggers' marker is missing (tables emptied, migration not run),
+maybe_refresh() reports seeded=False, the dashboards surface it, and an admin
+runs POST /api/admin/stats-rollups/rebuild. maybe_refresh() (called by both
+dashboards, rate-limited to once per ROLLUP_REFRESH_S per worker) only folds
+aggregator backlog, within a time budget.
+
+verify() recomputes every rollup from the live tables in one REPEATABLE READ
+snapshot and lists mismatches (GET /api/admin/stats-rollups/verify);
+rebuild() repairs (POST /api/admin/stats-rollups/rebuild).
+
+Days are UTC (SQL stats_day()). The dashboards' former rolling windows
+("last 24 hours", "> NOW() - 7 days") are now whole UTC days including
+today: "24h" = today, "7 days" = today and the 6 days before.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import db as _dbpool
+
+ROLLUP_LAG_S = int(os.environ.get('STATS_ROLLUP_LAG_S', '300'))
+ROLLUP_CHUNK = int(os.environ.get('STATS_ROLLUP_CHUNK', '50000'))
+ROLLUP_REFRESH_S = float(os.environ.get('STATS_ROLLUP_REFRESH_S', '60'))
+REFRESH_BUDGET_S = float(os.environ.get('STATS_ROLLUP_BUDGET_S', '5'))
+
+_TAIL_HI = 2 ** 62          # "no upper bound" for tail aggregation
+
+# ─── Aggregated sources ────────────────────────────────────────────────────
+# Each SQL returns (metric, day, n, amount) for rows lo < id <= hi. The same
+# SQL folds chunks (refresh), aggregates the live tail (readers) and
+# recomputes history (verify), so the three cannot drift apart.
+
+AGGREGATED = {
+    'request_logs': {
+        'metrics': ('requests', 'requests.failed', 'requests.timed'),
+        'sql': """
+            SELECT m.metric, stats_day(r.created_at) AS day,
+                   SUM(m.n)::bigint AS n, SUM(m.amount) AS amount
+            FROM request_logs r
+            CROSS JOIN LATERAL (VALUES
+                ('requests', 1, 0::numeric),
+                ('requests.failed', (r.error_message IS NOT NULL)::int, 0::numeric),
+                ('requests.timed', (r.response_time_ms IS NOT NULL)::int,
+                 COALESCE(r.response_time_ms, 0)::numeric)
+            ) AS m(metric, n, amount)
+            WHERE r.id > %(lo)s AND r.id <= %(hi)s AND r.created_at IS NOT NULL
+            GROUP BY 1, 2
+            HAVING SUM(m.n) <> 0 OR SUM(m.amount) <> 0
+        """,
+    },
+    'api_usage': {
+        'metrics': ('api.calls', 'api.input_tokens', 'api.output_tokens'),
+        'sql': """
+            SELECT m.metric, stats_day(a.created_at) AS day,
+                   SUM(m.n)::bigint AS n, SUM(m.amount) AS amount
+            FROM api_usage a
+            CROSS JOIN LATERAL (VALUES
+                ('api.calls', 1, COALESCE(a.estimated_cost_usd, 0)::numeric),
+                ('api.input_tokens', 0, COALESCE(a.input_tokens, 0)::numeric),
+                ('api.output_tokens', 0, COALESCE(a.output_tokens, 0)::numeric)
+            ) AS m(metric, n, amount)
+            WHERE a.id > %(lo)s AND a.id <= %(hi)s AND a.created_at IS NOT NULL
+            GROUP BY 1, 2
+            HAVING SUM(m.n) <> 0 OR SUM(m.amount) <> 0
+        """,
+    },
+    'ebay_sales': {
+        'metrics': ('ebay_sales.new',),
+        'sql': """
+            SELECT 'ebay_sales.new' AS metric, stats_day(e.created_at) AS day,
+                   COUNT(*)::bigint AS n, 0::numeric AS amount
+            FROM ebay_sales e
+            WHERE e.id > %(lo)s AND e.id <= %(hi)s AND e.created_at IS NOT NULL
+            GROUP BY 2
+        """,
+    },
+}
+
+DAILY_USERS_SQL = """
+    SELECT DISTINCT stats_day(created_at) AS day, user_id
+    FROM request_logs
+    WHERE id > %(lo)s AND id <= %(hi)s
+      AND user_id IS NOT NULL AND created_at IS NOT NULL
+"""
+
+# ─── Trigger-maintained metrics ────────────────────────────────────────────
+# ⚠️ Must match the trigger functions in add_stats_rollups.sql metric for
+# metric: rebuild_triggered() seeds from these and verify() compares to them.
+
+TRIGGERED_DAILY = ('users.new', 'registry.new', 'sightings.new', 'market_sales.new')
+
+LIVE_COUNTERS_SQL = """
+    SELECT 'users.total' AS metric, COUNT(*)::bigint AS n, 0::numeric AS amount FROM users
+    UNION ALL
+    SELECT 'users.approved', COUNT(*) FILTER (WHERE is_approved = TRUE), 0 FROM users
+    UNION ALL
+    SELECT 'users.pending', COUNT(*) FILTER (WHERE is_approved = FALSE AND is_admin = FALSE), 0 FROM users
+    UNION ALL
+    SELECT 'registry.status.' || COALESCE(status, 'none'), COUNT(*), 0
+    FROM comic_registry GROUP BY status
+    UNION ALL
+    SELECT 'sightings.total', COUNT(*), 0 FROM sighting_reports
+    UNION ALL
+    SELECT 'sightings.notified', COUNT(*) FILTER (WHERE owner_notified = TRUE), 0 FROM sighting_reports
+    UNION ALL
+    SELECT 'sightings.response.' || owner_response, COUNT(*), 0
+    FROM sighting_reports WHERE owner_response IS NOT NULL GROUP BY owner_response
+    UNION ALL
+    SELECT 'market_sales.total', COUNT(*), 0 FROM market_sales
+    UNION ALL
+    SELECT 'market_sales.priced', COUNT(price), COALESCE(SUM(price), 0) FROM market_sales
+"""
+
+LIVE_MATCH_COUNTERS_SQL = """
+    SELECT 'match.total' AS metric, COUNT(*)::bigint AS n, 0::numeric AS amount FROM match_reports
+    UNION ALL
+    SELECT 'match.status.' || COALESCE(status, 'none'), COUNT(*), 0
+    FROM match_reports GROUP BY status
+"""
+
+LIVE_DAILY_SQL = """
+    SELECT 'users.new' AS metric, stats_day(created_at) AS day,
+           COUNT(*)::bigint AS n, 0::numeric AS amount
+    FROM users WHERE created_at IS NOT NULL GROUP BY 2
+    UNION ALL
+    SELECT 'registry.new', stats_day(registration_date), COUNT(*), 0
+    FROM comic_registry WHERE registration_date IS NOT NULL GROUP BY 2
+    UNION ALL
+    SELECT 'sightings.new', stats_day(created_at), COUNT(*), 0
+    FROM sighting_reports WHERE created_at IS NOT NULL GROUP BY 2
+    UNION ALL
+    SELECT 'market_sales.new', stats_day(created_at), COUNT(*), 0
+    FROM market_sales WHERE created_at IS NOT NULL GROUP BY 2
+"""
+
+LIVE_SIGHTING_SERIALS_SQL = """
+    SELECT serial_number, COUNT(*)::int AS n
+    FROM sighting_reports WHERE serial_number IS NOT NULL
+    GROUP BY serial_number
+"""
+
+TRIGGERED_TABLES = ('users', 'comic_registry', 'sighting_reports', 'market_sales')
+
+
+def utc_today():
+    return datetime.now(timezone.utc).date()
+
+
+def _like_prefix(prefix):
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _has_match_reports(cur):
+    cur.execute("SELECT to_regclass('match_reports') IS NOT NULL AS present")
+    return bool(cur.fetchone()['present'])
+
+
+# ─── Aggregator ────────────────────────────────────────────────────────────
+
+def _claim_cursor(cur, source):
+    """Lock the source's cursor row; None if another refresher holds it."""
+    cur.execute("""
+        SELECT last_id FROM stats_rollup_cursors
+        WHERE source = %s FOR UPDATE SKIP LOCKED
+    """, (source,))
+    row = cur.fetchone()
+    if row is not None:
+        return row['last_id']
+    cur.execute("""
+        INSERT INTO stats_rollup_cursors (source, last_id) VALUES (%s, 0)
+        ON CONFLICT (source) DO NOTHING
+    """, (source,))
+    return 0 if cur.rowcount == 1 else None
+
+
+def _fold_chunk(conn, source):
+    """Fold the next chunk of `source` into stats_daily. Returns the number
+    of ids advanced past (0 = caught up, None = locked by another worker)."""
+    spec = AGGREGATED[source]
+    cur = conn.cursor()
+    try:
+        lo = _claim_cursor(cur, source)
+        if lo is None:
+            conn.rollback()
+            return None
+        # Only rows older than the lag — see the commit-order note above.
+        cur.execute(f"""
+            SELECT MAX(id) AS hi FROM (
+                SELECT id FROM {source}
+                WHERE id > %s AND created_at < NOW() - make_interval(secs => %s)
+                ORDER BY id LIMIT %s
+            ) chunk
+        """, (lo, ROLLUP_LAG_S, ROLLUP_CHUNK))
+        hi = cur.fetchone()['hi']
+        if hi is None:
+            conn.rollback()
+            return 0
+        params = {'lo': lo, 'hi': hi}
+        cur.execute(f"""
+            INSERT INTO stats_daily (metric, day, n, amount)
+            SELECT metric, day, n, amount FROM ({spec['sql']}) agg
+            ON CONFLICT (metric, day) DO UPDATE
+                SET n = stats_daily.n + EXCLUDED.n,
+                    amount = stats_daily.amount + EXCLUDED.amount
+        """, params)
+        if source == 'request_logs':
+            cur.execute(f"""
+                INSERT INTO stats_daily_users (day, user_id)
+                {DAILY_USERS_SQL}
+                ON CONFLICT DO NOTHING
+            """, params)
+        cur.execute("""
+            UPDATE stats_rollup_cursors SET last_id = %s, updated_at = NOW()
+            WHERE source = %s
+        """, (hi, source))
+        conn.commit()
+        return hi - lo
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def refresh(budget_s=REFRESH_BUDGET_S, sources=None):
+    """Fold aggregator backlog chunk by chunk until caught up or budget_s
+    elapses. Returns {source: ids advanced}. Safe to run concurrently: a
+    source another worker is folding is skipped (its tail is still read live)."""
+    deadline = time.monotonic() + budget_s
+    advanced = {}
+    conn = _dbpool.get_db(dict_rows=True)
+    try:
+        for source in (sources or AGGREGATED):
+            advanced[source] = 0
+            while time.monotonic() < deadline:
+                step = _fold_chunk(conn, source)
+                if not step:
+                    break
+                advanced[source] += step
+    finally:
+        conn.close()
+    return advanced
+
+
+_refresh_lock = threading.Lock()
+_last_refresh = 0.0
+_seeded = None          # last seen state of the 'triggers' marker (None = unknown)
+
+
+def maybe_refresh():
+    """Fold aggregator backlog, at most once per ROLLUP_REFRESH_S per worker,
+    and return {'seeded': bool | None} — False means the trigger counters were
+    never seeded (or were emptied) and read as zero until an admin rebuild.
+    Never seeds, never raises — readers still get exact aggregated numbers
+    from the tail, only slower."""
+    global _last_refresh, _seeded
+    if time.monotonic() - _last_refresh < ROLLUP_REFRESH_S:
+        return {'seeded': _seeded}
+    if not _refresh_lock.acquire(blocking=False):
+        return {'seeded': _seeded}
+    try:
+        _last_refresh = time.monotonic()
+        conn = _dbpool.get_db(dict_rows=True)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1 FROM stats_rollup_cursors WHERE source = 'triggers'")
+            seeded = cur.fetchone() is not None
+            cur.close()
+            conn.rollback()
+        finally:
+            conn.close()
+        if not seeded and _seeded is not False:
+            print("[StatsRollup] trigger counters NOT seeded — run "
+                  "POST /api/admin/stats-rollups/rebuild")
+        _seeded = seeded
+        advanced = refresh()
+        if any(advanced.values()):
+            print(f"[StatsRollup] folded {advanced}")
+    except Exception as e:
+        print(f"[StatsRollup] refresh failed: {e}")
+    finally:
+        _refresh_lock.release()
+    return {'seeded': _seeded}
+
+
+# ─── Readers ───────────────────────────────────────────────────────────────
+
+def _cursors(cur):
+    cur.execute("SELECT source, last_id FROM stats_rollup_cursors")
+    return {r['source']: r['last_id'] for r in cur.fetchall()}
+
+
+def _tail_sources(prefixes):
+    return [s for s, spec in AGGREGATED.items()
+            if any(m.startswith(p) for m in spec['metrics'] for p in prefixes)]
+
+
+def daily(cur, prefixes, since=None):
+    """{metric: {day: [n, amount]}} for metrics starting with any of
+    `prefixes` (str or tuple), days >= since (None = all history). Aggregated
+    metrics include the live tail past the cursor."""
+    if isinstance(prefixes, str):
+        prefixes = (prefixes,)
+    out = {}
+
+    def add(metric, day, n, amount):
+        if since is not None and day < since:
+            return
+        cell = out.setdefault(metric, {}).setdefault(day, [0, 0.0])
+        cell[0] += int(n)
+        cell[1] += float(amount)
+
+    cur.execute("""
+        SELECT metric, day, n, amount FROM stats_daily
+        WHERE metric LIKE ANY(%s) AND (%s::date IS NULL OR day >= %s::date)
+    """, ([_like_prefix(p) for p in prefixes], since, since))
+    for r in cur.fetchall():
+        add(r['metric'], r['day'], r['n'], r['amount'])
+
+    sources = _tail_sources(prefixes)
+    if sources:
+        cursors = _cursors(cur)
+        for source in sources:
+            cur.execute(AGGREGATED[source]['sql'],
+                        {'lo': cursors.get(source, 0), 'hi': _TAIL_HI})
+            for r in cur.fetchall():
+                if any(r['metric'].startswith(p) for p in prefixes):
+                    add(r['metric'], r['day'], r['n'], r['amount'])
+    return out
+
+
+def total(days, metric, since=None):
+    """(n, amount) summed over a daily() result for one metric."""
+    n, amount = 0, 0.0
+    for day, (dn, damount) in days.get(metric, {}).items():
+        if since is None or day >= since:
+            n += dn
+            amount += damount
+    return n, amount
+
+
+def counters(cur, prefix):
+    """{metric: (n, amount)} from the trigger-maintained all-time counters."""
+    cur.execute("SELECT metric, n, amount FROM stats_counters WHERE metric LIKE %s",
+                (_like_prefix(prefix),))
+    return {r['metric']: (int(r['n']), float(r['amount'])) for r in cur.fetchall()}
+
+
+def active_users(cur, day):
+    """Distinct request_logs users on `day` (rollup + live tail)."""
+    cur.execute("SELECT user_id FROM stats_daily_users WHERE day = %s", (day,))
+    users = {r['user_id'] for r in cur.fetchall()}
+    cur.execute(DAILY_USERS_SQL, {'lo': _cursors(cur).get('request_logs', 0), 'hi': _TAIL_HI})
+    users.update(r['user_id'] for r in cur.fetchall() if r['day'] == day)
+    return len(users)
+
+
+# ─── Rebuild / verify ──────────────────────────────────────────────────────
+
+def rebuild_triggered(conn):
+    """Reseed the trigger-maintained tables from the live aggregates. The
+    source tables are locked against writes (SHARE: reads continue) so no
+    trigger bump can land between the aggregate and the swap. Admin rebuild
+    only — never call this from a request a dashboard makes."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('stats_rollups'))")
+        has_match = _has_match_reports(cur)
+        tables = TRIGGERED_TABLES + (('match_reports',) if has_match else ())
+        cur.execute(f"LOCK TABLE {', '.join(tables)} IN SHARE MODE")
+        live_counters = LIVE_COUNTERS_SQL + (
+            f" UNION ALL {LIVE_MATCH_COUNTERS_SQL}" if has_match else '')
+
+        cur.execute("DELETE FROM stats_counters")
+        cur.execute("DELETE FROM stats_daily WHERE metric = ANY(%s)", (list(TRIGGERED_DAILY),))
+        cur.execute("DELETE FROM stats_sighting_serials")
+        cur.execute(f"""
+            INSERT INTO stats_counters (metric, n, amount)
+            SELECT metric, n, amount FROM ({live_counters}) live
+            WHERE n <> 0 OR amount <> 0
+        """)
+        cur.execute(f"""
+            INSERT INTO stats_daily (metric, day, n, amount)
+            SELECT metric, day, n, amount FROM ({LIVE_DAILY_SQL}) live
+        """)
+        cur.execute(f"""
+            INSERT INTO stats_sighting_serials (serial_number, n)
+            {LIVE_SIGHTING_SERIALS_SQL}
+        """)
+        cur.execute("""
+            INSERT INTO stats_rollup_cursors (source, last_id) VALUES ('triggers', 0)
+            ON CONFLICT (source) DO UPDATE SET updated_at = NOW()
+        """)
+        conn.commit()
+        print("[StatsRollup] trigger counters seeded from live tables")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def reset_aggregated(conn, source):
+    """Drop `source`'s daily rows and rewind its cursor to 0; refresh()
+    then refolds its history chunk by chunk."""
+    cur = conn.cursor()
+    try:
+        # Waits for an in-flight chunk on this source rather than skipping it.
+        cur.execute("""
+            INSERT INTO stats_rollup_cursors (source, last_id) VALUES (%s, 0)
+            ON CONFLICT (source) DO UPDATE SET last_id = 0, updated_at = NOW()
+        """, (source,))
+        cur.execute("DELETE FROM stats_daily WHERE metric = ANY(%s)",
+                    (list(AGGREGATED[source]['metrics']),))
+        if source == 'request_logs':
+            cur.execute("DELETE FROM stats_daily_users")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def rebuild(sources=None, budget_s=20.0):
+    """Reseed the trigger counters and refold the aggregated sources (all by
+    default; `sources` may name aggregated tables and/or 'triggers'). Folding
+    continues on later dashboard loads if budget_s runs out."""
+    sources = list(sources or ['triggers', *AGGREGATED])
+    unknown = [s for s in sources if s != 'triggers' and s not in AGGREGATED]
+    if unknown:
+        raise ValueError(f"unknown rollup source(s): {', '.join(unknown)}")
+    conn = _dbpool.get_db(dict_rows=True)
+    try:
+        if 'triggers' in sources:
+            rebuild_triggered(conn)
+        aggregated = [s for s in sources if s in AGGREGATED]
+        for source in aggregated:
+            reset_aggregated(conn, source)
+    finally:
+        conn.close()
+    advanced = refresh(budget_s=budget_s, sources=aggregated) if aggregated else {}
+    return {'rebuilt': sources, 'folded': advanced}
+
+
+def _diff(label, live, stored):
+    """Mismatches between two {key: (n, amount)} maps; missing = (0, 0)."""
+    out = []
+    for key in set(live) | set(stored):
+        ln, la = live.get(key, (0, 0.0))
+        sn, sa = stored.get(key, (0, 0.0))
+        if ln != sn or abs(float(la) - float(sa)) > 1e-6:
+            out.append({'check': label, 'key': key if isinstance(key, str) else '|'.join(key),
+                        'live': [ln, float(la)], 'rollup': [sn, float(sa)]})
+    return out
+
+
+def _rows_to_map(rows, key_cols):
+    out = {}
+    for r in rows:
+        key = str(r[key_cols[0]]) if len(key_cols) == 1 else tuple(str(r[c]) for c in key_cols)
+        n, amount = out.get(key, (0, 0.0))
+        out[key] = (n + int(r['n']), amount + float(r.get('amount') or 0))
+    return out
+
+
+def verify(max_mismatches=50):
+    """Recompute every rollup from the live tables and compare. One
+    REPEATABLE READ snapshot, so trigger counters, cursors and source rows
+    are mutually consistent even under concurrent writes. Full scans — an
+    admin check, not something to call per page load."""
+    conn = _dbpool.get_db(dict_rows=True)
+    cur = conn.cursor()
+    try:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        has_match = _has_match_reports(cur)
+        cursors = _cursors(cur)
+        mismatches = []
+
+        live_counters = LIVE_COUNTERS_SQL + (
+            f" UNION ALL {LIVE_MATCH_COUNTERS_SQL}" if has_match else '')
+        cur.execute(live_counters)
+        live = _rows_to_map(cur.fetchall(), ['metric'])
+        cur.execute("SELECT metric, n, amount FROM stats_counters")
+        mismatches += _diff('counters', live, _rows_to_map(cur.fetchall(), ['metric']))
+
+        cur.execute(LIVE_DAILY_SQL)
+        live = _rows_to_map(cur.fetchall(), ['metric', 'day'])
+        cur.execute("SELECT metric, day, n, amount FROM stats_daily WHERE metric = ANY(%s)",
+                    (list(TRIGGERED_DAILY),))
+        mismatches += _diff('daily:triggers', live, _rows_to_map(cur.fetchall(), ['metric', 'day']))
+
+        cur.execute(LIVE_SIGHTING_SERIALS_SQL)
+        live = _rows_to_map(cur.fetchall(), ['serial_number'])
+        cur.execute("SELECT serial_number, n FROM stats_sighting_serials")
+        mismatches += _diff('sighting_serials', live, _rows_to_map(cur.fetchall(), ['serial_number']))
+
+        for source, spec in AGGREGATED.items():
+            bounds = {'lo': 0, 'hi': cursors.get(source, 0)}
+            cur.execute(spec['sql'], bounds)
+            live = _rows_to_map(cur.fetchall(), ['metric', 'day'])
+            cur.execute("SELECT metric, day, n, amount FROM stats_daily WHERE metric = ANY(%s)",
+                        (list(spec['metrics']),))
+            mismatches += _diff(f'daily:{source}', live, _rows_to_map(cur.fetchall(), ['metric', 'day']))
+            if source == 'request_logs':
+                cur.execute(f"SELECT day, COUNT(*) AS n FROM ({DAILY_USERS_SQL}) u GROUP BY day", bounds)
+                live = _rows_to_map(cur.fetchall(), ['day'])
+                cur.execute("SELECT day, COUNT(*) AS n FROM stats_daily_users GROUP BY day")
+                mismatches += _diff('daily_users', live, _rows_to_map(cur.fetchall(), ['day']))
+
+        return {
+            'ok': not mismatches,
+            'mismatch_count': len(mismatches),
+            'mismatches': sorted(mismatches, key=lambda m: (m['check'], m['key']))[:max_mismatches],
+            'seeded': 'triggers' in cursors,
+            'cursors': {s: cursors.get(s, 0) for s in AGGREGATED},
+        }
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
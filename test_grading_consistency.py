@@ -21,7 +21,8 @@ from grading_engine import (
     compute_grade, snap_to_cgc_grade, average_multi_run,
     parse_grading_response, build_grading_prompt,
     CATEGORY_WEIGHTS, CGC_GRADES, VALID_GRADES,
-    grade_to_label, label_to_grade
+    grade_to_label, label_to_grade,
+    runs_agree, run_adaptive_multi_run, CategoryScoreScanner
 )
 
 
@@ -197,6 +198,66 @@ def test_all_grade_ranges():
     print("✅ All grade ranges verified")
 
 
+def _run_json(**overrides):
+    scores = {cat: 8.5 for cat in CATEGORY_WEIGHTS}
+    scores.update(overrides)
+    return json.dumps({"category_scores": scores, "defects": {}, "observations": ""})
+
+
+def test_adaptive_runs_agree():
+    """Agreement needs the same CGC step AND every category within tolerance"""
+    base = _run_json()
+    assert runs_agree([base, _run_json(spine=8.2)]), "small spread should agree"
+    assert not runs_agree([base, _run_json(spine=7.5)]), "1.0 spine spread must not agree"
+    assert not runs_agree([base, _run_json(**{c: 9.5 for c in CATEGORY_WEIGHTS})]), \
+        "different CGC step must not agree"
+    assert not runs_agree([base, "not json"]), "unparseable run must not agree"
+    assert not runs_agree([base]), "one run is never agreement"
+    print("✅ Adaptive agreement: tolerance, CGC step and parse failures")
+
+
+def test_adaptive_early_stop():
+    """Two agreeing runs skip the tie-breaker; disagreeing runs launch it"""
+    import itertools
+    import threading
+
+    def make_runner(responses):
+        it = itertools.cycle(responses)
+        lock = threading.Lock()
+        calls = []
+
+        def run_once():
+            with lock:
+                calls.append(1)
+                return next(it)
+        return run_once, calls
+
+    run_once, calls = make_runner([_run_json(), _run_json(edges=8.7)])
+    responses, stopped = run_adaptive_multi_run(run_once, max_runs=3)
+    assert stopped and len(responses) == 2 and len(calls) == 2
+
+    run_once, calls = make_runner([_run_json(), _run_json(spine=6.0)])
+    responses, stopped = run_adaptive_multi_run(run_once, max_runs=3)
+    assert not stopped and len(responses) == 3 and len(calls) == 3
+
+    run_once, calls = make_runner([_run_json()])
+    responses, stopped = run_adaptive_multi_run(run_once, max_runs=2)
+    assert not stopped and len(responses) == 2, "runs=2 is never adaptive"
+    print("✅ Adaptive early stop: 2 calls on agreement, 3 on disagreement")
+
+
+def test_streamed_score_preview():
+    """Scores scanned off streamed deltas match the parsed final scores"""
+    text = _run_json(spine=8.5)
+    scanner = CategoryScoreScanner()
+    seen = []
+    for i in range(0, len(text), 3):  # 3-char deltas split numbers mid-value
+        seen.extend(scanner.feed(text[i:i + 3]))
+    assert dict(seen) == parse_grading_response(text)["category_scores"]
+    assert len(seen) == len(CATEGORY_WEIGHTS), "each category reported once"
+    print("✅ Streamed score preview: every category, once, with its final value")
+
+
 # ──────────────────────────────────────────────
 # Calibration Comics (known CGC grades)
 # ──────────────────────────────────────────────
@@ -400,6 +461,9 @@ if __name__ == '__main__':
     test_grade_label_roundtrip()
     test_deterministic_compute()
     test_all_grade_ranges()
+    test_adaptive_runs_agree()
+    test_adaptive_early_stop()
+    test_streamed_score_preview()
 
     print("\n" + "=" * 60)
     print("ALL UNIT TESTS PASSED")
@@ -0,0 +1,220 @@
+"""
+barcode_backfill must walk the candidates in id order on a worker pool,
+commit results + cursor per batch, mark no-barcode rows scanned (not download
+failures), stop cleanly when cancelled or taken over, and resume from the
+cursor without re-scanning.
+
+Run:  python tests/test_barcode_backfill.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import psycopg2.extras
+
+import barcode_backfill as bb
+import db as _dbpool
+
+
+class _DB:
+    """In-memory market_sales + barcode_backfill_jobs with commit/rollback."""
+
+    def __init__(self, n_rows):
+        self.sales = {i: {'id': i, 'title': f'T{i}', 'issue': '1',
+                          'image_url': f'https://pub-x.r2.dev/{i}.jpg',
+                          'upc_main': None, 'upc_addon': None, 'is_reprint': False,
+                          'barcode_scanned_at': None}
+                      for i in range(1, n_rows + 1)}
+        self.job = {'id': 1, 'status': 'running', 'dry_run': False, 'max_rows': None,
+                    'last_id': 0, 'total': n_rows, 'processed': 0, 'barcodes_found': 0,
+                    'updated': 0, 'errors': 0, 'details': None, 'run_seconds': 0.0,
+                    'worker': bb.worker_id(), 'error': None, 'started_at': None,
+                    'heartbeat_at': None, 'finished_at': None}
+        self.batches = 0
+        self.on_batch = None    # hook run at the job UPDATE (simulates other workers)
+
+    def conn(self, dict_rows=False):
+        return _Conn(self)
+
+
+class _Conn:
+    def __init__(self, db):
+        self.db = db
+        self.pending = []
+
+    def cursor(self):
+        return _Cur(self)
+
+    def commit(self):
+        for fn in self.pending:
+            fn()
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class _Cur:
+    def __init__(self, conn):
+        self.conn = conn
+        self.db = conn.db
+        self.result = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        db = self.db
+        if sql.strip().startswith('SELECT') and 'barcode_backfill_jobs' in sql:
+            self.result = [dict(db.job)]
+        elif 'FROM market_sales' in sql:
+            last_id, limit = params
+            rows = [r for i, r in sorted(db.sales.items())
+                    if i > last_id and r['upc_main'] is None and r['barcode_scanned_at'] is None]
+            self.result = [dict(r) for r in rows[:limit]]
+        elif "SET status = 'completed'" in sql:
+            self.conn.pending.append(lambda: db.job.update(status='completed'))
+        elif 'SET barcode_scanned_at = NOW()' in sql:
+            ids = params[0]
+            self.conn.pending.append(lambda: [db.sales[i].update(barcode_scanned_at='now') for i in ids])
+        elif 'SET last_id' in sql:
+            if db.on_batch:
+                db.on_batch(db)
+            (last_id, n, found, updated, errors, details, secs, _job_id, worker) = params
+            self.rowcount = int(db.job['worker'] == worker and db.job['status'] == 'running')
+
+            def apply():
+                db.batches += 1
+                j = db.job
+                j.update(last_id=last_id, processed=j['processed'] + n,
+                         barcodes_found=j['barcodes_found'] + found,
+                         updated=j['updated'] + updated, errors=j['errors'] + errors,
+                         details=details.adapted, run_seconds=j['run_seconds'] + secs)
+            if self.rowcount:
+                self.conn.pending.append(apply)
+        else:
+            raise AssertionError(sql)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+def _fake_execute_values(cur, sql, rows, template=None):
+    assert 'UPDATE market_sales' in sql
+    db = cur.db
+
+    def apply():
+        for sid, upc_main, upc_addon, is_reprint in rows:
+            db.sales[sid].update(upc_main=upc_main, upc_addon=upc_addon,
+                                 is_reprint=is_reprint, barcode_scanned_at='now')
+    cur.conn.pending.append(apply)
+
+
+class _Session:
+    """Fake R2: id % 7 == 0 → 404; otherwise the body is the id."""
+    DELAY_S = 0.02
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        sid = int(url.rsplit('/', 1)[1].split('.')[0])
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.DELAY_S)
+        with self.lock:
+            self.active -= 1
+
+        class R:
+            status_code = 404 if sid % 7 == 0 else 200
+            content = str(sid).encode()
+        return R()
+
+
+def _scan(content):
+    """Even ids have a barcode."""
+    sid = int(content)
+    return {'upc_main': f'{sid:012d}', 'upc_addon': None, 'is_reprint': False} if sid % 2 == 0 else None
+
+
+def _patched(db, fn):
+    session = _Session()
+    saved = (_dbpool.get_db, psycopg2.extras.execute_values, bb._session)
+    _dbpool.get_db = db.conn
+    psycopg2.extras.execute_values = _fake_execute_values
+    bb._session = lambda: session
+    try:
+        fn()
+    finally:
+        _dbpool.get_db, psycopg2.extras.execute_values, bb._session = saved
+    return session
+
+
+def test_full_run():
+    db = _DB(60)
+    session = _patched(db, lambda: bb.run_job(1, _scan, batch_size=16, workers=4))
+    errors = [i for i in db.sales if i % 7 == 0]
+    assert db.job['status'] == 'completed' and db.job['last_id'] == 60
+    assert db.job['processed'] == 60 and db.job['errors'] == len(errors)
+    assert db.batches == 4 and session.peak > 1
+    for i, r in db.sales.items():
+        if i % 7 == 0:
+            assert r['upc_main'] is None and r['barcode_scanned_at'] is None    # retried next job
+        elif i % 2 == 0:
+            assert r['upc_main'] == f'{i:012d}'
+        else:
+            assert r['upc_main'] is None and r['barcode_scanned_at'] == 'now'
+    assert db.job['barcodes_found'] == sum(1 for i in db.sales if i % 2 == 0 and i % 7)
+    assert len(db.job['details']) == bb.DETAILS_KEEP
+    desc = bb.describe(db.job)
+    assert desc['progress_pct'] == 100.0 and desc['remaining'] == 0 and desc['rows_per_second']
+
+
+def test_cancel_then_resume_from_cursor():
+    db = _DB(40)
+
+    def cancel_after_two(d):
+        if d.batches == 1:
+            d.job['status'] = 'cancelled'     # admin cancels during batch 2
+    db.on_batch = cancel_after_two
+    _patched(db, lambda: bb.run_job(1, _scan, batch_size=10, workers=2))
+    # Batch 2 was scanned but rolled back with the cancel: cursor after batch 1.
+    assert db.job['last_id'] == 10 and db.job['processed'] == 10
+    assert all(r['barcode_scanned_at'] is None for i, r in db.sales.items() if i > 10)
+
+    db.on_batch = None
+    db.job['status'] = 'running'              # start_job's takeover
+    _patched(db, lambda: bb.run_job(1, _scan, batch_size=10, workers=2))
+    assert db.job['status'] == 'completed' and db.job['processed'] == 40
+
+
+def test_taken_over_worker_stops():
+    db = _DB(20)
+    db.job['worker'] = 'otherhost:1'
+    _patched(db, lambda: bb.run_job(1, _scan, batch_size=10))
+    assert db.batches == 0 and db.job['processed'] == 0
+
+
+def test_max_rows():
+    db = _DB(30)
+    db.job['max_rows'] = 12
+    _patched(db, lambda: bb.run_job(1, _scan, batch_size=5))
+    assert db.job['processed'] == 12 and db.job['status'] == 'completed'
+
+
+if __name__ == '__main__':
+    test_full_run()
+    test_cancel_then_resume_from_cursor()
+    test_taken_over_worker_stops()
+    test_max_rows()
+    print("ALL BARCODE BACKFILL TESTS PASSED")
@@ -0,0 +1,112 @@
+"""
+The shared border-analysis stage (slab_guard_cv._border_analysis) must leave
+every border metric and visualization as it was: strict/dilated IoU, void
+flags and the Canny overlay bit-identical, float32 SSIM within 1e-5 of the
+original float64 computation.
+
+Run:  python tests/test_border_analysis.py
+"""
+import base64
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from routes import slab_guard_cv as sg
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def _pair():
+    ref = sg._resize_standard(cv2.imread(os.path.join(ROOT, 'CCImages', 'Avengers1ComicCoverTestFB.jpg')))
+    # Shifted right/up so the left strip is warp void, plus a little blur.
+    shift = np.float32([[1, 0.01, 30], [0, 1, -20]])
+    return ref, cv2.warpAffine(cv2.GaussianBlur(ref, (3, 3), 1), shift, sg.TARGET_SIZE)
+
+
+def _original_strip_metrics(r_region, a_region, dilate_px=3):
+    """Per-strip metrics as computed before the shared stage."""
+    is_void = sg._region_is_black(a_region, threshold=10, min_pct=0.6)
+    r_canny = cv2.Canny(r_region, 50, 150)
+    a_canny = cv2.Canny(a_region, 50, 150)
+    iou = float(cv2.bitwise_and(r_canny, a_canny).sum() /
+                (cv2.bitwise_or(r_canny, a_canny).sum() + 1e-8))
+    k = np.ones((dilate_px * 2 + 1, dilate_px * 2 + 1), np.uint8)
+    r_d, a_d = cv2.dilate(r_canny, k), cv2.dilate(a_canny, k)
+    d_iou = float(cv2.bitwise_and(r_d, a_d).sum() / (cv2.bitwise_or(r_d, a_d).sum() + 1e-8))
+    r_gray = cv2.cvtColor(r_region, cv2.COLOR_BGR2GRAY).astype(float) / 255.0
+    a_gray = cv2.cvtColor(a_region, cv2.COLOR_BGR2GRAY).astype(float) / 255.0
+    mu1 = cv2.GaussianBlur(r_gray, (11, 11), 1.5)
+    mu2 = cv2.GaussianBlur(a_gray, (11, 11), 1.5)
+    s1 = cv2.GaussianBlur(r_gray**2, (11, 11), 1.5) - mu1**2
+    s2 = cv2.GaussianBlur(a_gray**2, (11, 11), 1.5) - mu2**2
+    s12 = cv2.GaussianBlur(r_gray * a_gray, (11, 11), 1.5) - mu1 * mu2
+    C1, C2 = 0.01**2, 0.03**2
+    ssim = float(np.mean(((2*mu1*mu2+C1)*(2*s12+C2)) / ((mu1**2+mu2**2+C1)*(s1+s2+C2))))
+    return {'iou': iou, 'void': is_void, 'dilated_iou': d_iou, 'ssim': ssim}
+
+
+def _original_overlay_image(ref, aligned, ew=sg.EDGE_WIDTH_PX):
+    """The pre-refactor overlay composite (before legend text and JPEG)."""
+    h, w = ref.shape[:2]
+    black_mask = np.all(aligned < 10, axis=2).astype(np.uint8) * 255
+    canny_ref = cv2.Canny(cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY), 50, 150)
+    canny_aligned = cv2.Canny(cv2.cvtColor(aligned, cv2.COLOR_BGR2GRAY), 50, 150)
+    canny_aligned = cv2.bitwise_and(canny_aligned, cv2.bitwise_not(black_mask))
+    edge_mask = np.zeros((h, w), dtype=np.uint8)
+    edge_mask[:ew, :] = edge_mask[-ew:, :] = edge_mask[:, :ew] = edge_mask[:, -ew:] = 255
+    canny_ref = cv2.bitwise_and(canny_ref, edge_mask)
+    canny_aligned = cv2.bitwise_and(canny_aligned, edge_mask)
+    k = np.ones((2, 2), np.uint8)
+    both = cv2.dilate(cv2.bitwise_and(canny_ref, canny_aligned), k)
+    ref_only = cv2.dilate(cv2.bitwise_and(canny_ref, cv2.bitwise_not(canny_aligned)), k)
+    test_only = cv2.dilate(cv2.bitwise_and(canny_aligned, cv2.bitwise_not(canny_ref)), k)
+    overlay = (ref.astype(float) * 0.25).astype(np.uint8)
+    overlay[both > 0] = [0, 255, 0]
+    overlay[ref_only > 0] = [0, 0, 255]
+    overlay[test_only > 0] = [255, 100, 0]
+    black_3ch = cv2.merge([black_mask, black_mask, black_mask])
+    return np.where(black_3ch > 0, np.array([40, 40, 40], dtype=np.uint8), overlay)
+
+
+def test_edge_metrics_match_original():
+    ref, aligned = _pair()
+    _, per_edge, _, _ = sg._compute_edge_iou(ref, aligned)
+    ew = sg.EDGE_WIDTH_PX
+    regions = {'top': np.s_[:ew, :], 'bottom': np.s_[-ew:, :],
+               'left': np.s_[:, :ew], 'right': np.s_[:, -ew:]}
+    assert any(v['void'] for v in per_edge.values()), "fixture should include a void strip"
+    for name, sl in regions.items():
+        expected = _original_strip_metrics(ref[sl], aligned[sl])
+        got = per_edge[name]
+        for key in ('iou', 'dilated_iou', 'void'):
+            assert got[key] == expected[key], (name, key, got[key], expected[key])
+        assert abs(got['ssim'] - expected['ssim']) < 1e-5, (name, got['ssim'], expected['ssim'])
+
+
+def test_canny_overlay_unchanged_with_shared_analysis():
+    ref, aligned = _pair()
+    ba = sg._border_analysis(ref, aligned)
+    sg._compute_edge_iou(ref, aligned, analysis=ba)
+    b64, match_pct = sg._create_canny_overlay(ref, aligned, analysis=ba)
+    assert b64 == sg._create_canny_overlay(ref, aligned)[0]
+
+    # Same legend + encoder settings as _create_canny_overlay → identical bytes.
+    expected = _original_overlay_image(ref, aligned)
+    cv2.putText(expected, "Canny Edge Overlay — Border Strips", (10, 22),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    cv2.putText(expected, "GREEN=both  RED=REF only  BLUE=TEST only  DARK=warp void", (10, 42),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (180, 180, 180), 1)
+    cv2.putText(expected, f"Edge match: {match_pct:.0f}%", (10, 62),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.45, (180, 180, 180), 1)
+    _, buf = cv2.imencode('.jpg', expected, [cv2.IMWRITE_JPEG_QUALITY, 88])
+    assert b64 == base64.standard_b64encode(buf).decode('utf-8')
+
+
+if __name__ == '__main__':
+    test_edge_metrics_match_original()
+    test_canny_overlay_unchanged_with_shared_analysis()
+    print("ALL BORDER ANALYSIS TESTS PASSED")
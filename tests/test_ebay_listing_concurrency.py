@@ -0,0 +1,140 @@
+"""
+ebay_listing must upload listing photos concurrently (bounded, in input order,
+with timeouts), pass eBay-hosted URLs through, serve merchant location /
+policy IDs from the per-user cache, and drop that cache when eBay rejects the
+offer.
+
+Run:  python tests/test_ebay_listing_concurrency.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ebay_listing
+
+_SAVED = (ebay_listing.requests, ebay_listing.get_user_token)
+
+
+def teardown_function(_fn):
+    ebay_listing.requests, ebay_listing.get_user_token = _SAVED
+    with ebay_listing._account_cache_lock:
+        ebay_listing._account_cache.clear()
+
+
+class _Resp:
+    def __init__(self, status, body=None, headers=None):
+        self.status_code = status
+        self._body = body or {}
+        self.text = str(self._body) if body else ''
+        self.headers = headers or {}
+
+    def json(self):
+        return self._body
+
+
+class _FakeRequests:
+    """Stands in for the requests module inside ebay_listing."""
+    exceptions = _SAVED[0].exceptions
+    UPLOAD_DELAY_S = 0.1
+
+    def __init__(self, offer_status=201):
+        self.calls = []
+        self.timeouts = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.offer_status = offer_status
+
+    def _record(self, method, url, timeout):
+        with self.lock:
+            self.calls.append((method, url))
+            self.timeouts.append(timeout)
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self._record('POST', url, timeout)
+        if 'create_image_from_url' in url:
+            with self.lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(self.UPLOAD_DELAY_S)
+            with self.lock:
+                self.active -= 1
+            name = json['imageUrl'].rsplit('/', 1)[1]
+            return _Resp(201, {'imageUrl': f'https://i.ebayimg.com/{name}'})
+        if url.endswith('/offer'):
+            if self.offer_status != 201:
+                return _Resp(self.offer_status, {'errors': ['invalid fulfillment policy']})
+            return _Resp(201, {'offerId': 'O1'})
+        raise AssertionError(url)
+
+    def put(self, url, headers=None, json=None, timeout=None):
+        self._record('PUT', url, timeout)
+        self.last_inventory = json
+        return _Resp(204)
+
+    def get(self, url, headers=None, timeout=None):
+        self._record('GET', url, timeout)
+        if url.endswith('/location'):
+            return _Resp(200, {'locations': [{'merchantLocationKey': 'loc-1'}]})
+        for kind in ('fulfillment', 'payment', 'return'):
+            if f'/{kind}_policy' in url:
+                return _Resp(200, {f'{kind}Policies': [{f'{kind}PolicyId': f'{kind}-1'}]})
+        raise AssertionError(url)
+
+
+def _install(fake):
+    ebay_listing.requests = fake
+    ebay_listing.get_user_token = lambda user_id: {'access_token': 'tok'}
+
+
+def test_uploads_concurrent_in_order_with_timeouts():
+    fake = _FakeRequests()
+    _install(fake)
+    urls = [f'https://pub-x.r2.dev/{n}.jpg' for n in ('front', 'spine', 'back', 'center')]
+    urls.insert(2, 'https://i.ebayimg.com/already.jpg')
+    start = time.monotonic()
+    results = ebay_listing.upload_images_to_ebay('tok', urls)
+    elapsed = time.monotonic() - start
+    assert [r['image_url'].rsplit('/', 1)[1] for r in results] == \
+        ['front.jpg', 'spine.jpg', 'already.jpg', 'back.jpg', 'center.jpg']
+    assert fake.peak == 4 and elapsed < 3 * _FakeRequests.UPLOAD_DELAY_S
+    assert len(fake.calls) == 4                       # eBay-hosted URL not re-uploaded
+    assert all(t == ebay_listing.EBAY_HTTP_TIMEOUT for t in fake.timeouts)
+
+
+def test_setup_cached_per_user_and_invalidated_on_offer_error():
+    fake = _FakeRequests()
+    _install(fake)
+    photos = ['https://pub-x.r2.dev/front.jpg', 'https://pub-x.r2.dev/back.jpg']
+    r = ebay_listing.create_listing('5', 'Spawn', '1', 20.0, image_urls=photos)
+    assert r['success'] and r['draft']
+    assert fake.last_inventory['product']['imageUrls'] == \
+        ['https://i.ebayimg.com/front.jpg', 'https://i.ebayimg.com/back.jpg']
+    account_gets = [c for c in fake.calls if c[0] == 'GET']
+    assert len(account_gets) == 4
+
+    fake.calls.clear()
+    assert ebay_listing.create_listing('5', 'Spawn', '2', 20.0)['success']
+    assert not [c for c in fake.calls if c[0] == 'GET']          # cache hit
+
+    fake.offer_status = 400
+    r = ebay_listing.create_listing('5', 'Spawn', '3', 20.0)
+    assert not r['success'] and r.get('needs_setup')
+    assert '5' not in ebay_listing._account_cache
+    fake.calls.clear()
+    fake.offer_status = 201
+    ebay_listing.create_listing('5', 'Spawn', '4', 20.0)
+    assert len([c for c in fake.calls if c[0] == 'GET']) == 4    # re-read
+
+
+if __name__ == '__main__':
+    for test in (test_uploads_concurrent_in_order_with_timeouts,
+                 test_setup_cached_per_user_and_invalidated_on_offer_error):
+        try:
+            test()
+        finally:
+            teardown_function(test)
+    print("ALL EBAY LISTING CONCURRENCY TESTS PASSED")
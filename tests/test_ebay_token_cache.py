@@ -0,0 +1,135 @@
+"""
+ebay_oauth.get_user_token must serve a cached access token without touching
+the DB, run the ebay_tokens DDL once per process, and coalesce concurrent
+refreshes of a near-expiry token into ONE refresh_access_token + save.
+
+Run:  python tests/test_ebay_token_cache.py
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ebay_oauth
+
+_SAVED = (ebay_oauth.get_db_connection, ebay_oauth.refresh_access_token)
+
+
+def teardown_function(_fn):
+    ebay_oauth.get_db_connection, ebay_oauth.refresh_access_token = _SAVED
+    with ebay_oauth._token_cache_lock:
+        ebay_oauth._token_cache.clear()
+        ebay_oauth._refresh_failed.clear()
+    ebay_oauth._tokens_table_ready = False
+
+
+class _DB:
+    def __init__(self, expiry):
+        self.row = ['tok-old', 'refresh-1', expiry]
+        self.connections = 0
+        self.ddl = 0
+        self.selects = 0
+        self.saves = 0
+
+    def conn(self):
+        self.connections += 1
+        db = self
+
+        class Cur:
+            def execute(self, sql, params=()):
+                if 'CREATE TABLE' in sql:
+                    db.ddl += 1
+                elif 'SELECT access_token' in sql:
+                    db.selects += 1
+                    time.sleep(0.05)
+                elif 'INSERT INTO ebay_tokens' in sql:
+                    db.saves += 1
+                    db.row = [params[1], db.row[1], params[3]]
+
+            def fetchone(self):
+                return tuple(db.row)
+
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self):
+                return Cur()
+
+            def commit(self):
+                pass
+
+            def close(self):
+                pass
+        return Conn()
+
+
+def _install(db, refresh=None):
+    ebay_oauth.get_db_connection = db.conn
+    if refresh:
+        ebay_oauth.refresh_access_token = refresh
+
+
+def test_cache_hit_skips_db_and_ddl_runs_once():
+    db = _DB(datetime.now() + timedelta(hours=2))
+    _install(db)
+    assert ebay_oauth.init_ebay_tokens_table()
+    for _ in range(5):
+        assert ebay_oauth.get_user_token(42) == {'access_token': 'tok-old'}
+    assert db.ddl == 1 and db.selects == 1 and db.connections == 2
+
+
+def test_concurrent_refresh_is_single_flight():
+    db = _DB(datetime.now() + timedelta(minutes=1))      # inside the 5 min margin
+    calls = []
+
+    def refresh(refresh_token):
+        calls.append(refresh_token)
+        time.sleep(0.1)
+        return {'access_token': 'tok-new', 'expires_in': 7200}
+    _install(db, refresh)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ebay_oauth.get_user_token('7')))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [{'access_token': 'tok-new'}] * 8
+    assert calls == ['refresh-1'] and db.saves == 1 and db.selects == 1
+    assert ebay_oauth._user_locks == {}
+
+
+def test_failed_refresh_backs_off_and_disconnect_forgets():
+    db = _DB(datetime.now() - timedelta(minutes=1))
+    calls = []
+
+    def refresh(refresh_token):
+        calls.append(refresh_token)
+        raise Exception('invalid_grant')
+    _install(db, refresh)
+    assert ebay_oauth.get_user_token('9') is None
+    assert ebay_oauth.get_user_token('9') is None
+    assert len(calls) == 1                                 # backoff, no second call
+
+    ebay_oauth.save_user_token('9', {'access_token': 'tok-reconnected', 'expires_in': 7200})
+    assert ebay_oauth.get_user_token('9') == {'access_token': 'tok-reconnected'}
+    selects = db.selects
+    ebay_oauth.disconnect_user('9')
+    ebay_oauth.get_user_token('9')
+    assert db.selects == selects + 1                       # cache dropped
+
+
+if __name__ == '__main__':
+    for test in (test_cache_hit_skips_db_and_ddl_runs_once,
+                 test_concurrent_refresh_is_single_flight,
+                 test_failed_refresh_backs_off_and_disconnect_forgets):
+        try:
+            test()
+        finally:
+            teardown_function(test)
+    print("ALL EBAY TOKEN CACHE TESTS PASSED")
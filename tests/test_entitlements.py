@@ -0,0 +1,163 @@
+"""
+entitlements must read the users row once per request for every plan gate,
+serve plan-only gates from the short-TTL cache across requests, re-read for
+counter gates (fresh=True), and forget a user on invalidate() — which
+update_user_subscription (the Stripe webhook path) calls.
+
+Run:  python tests/test_entitlements.py
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+import auth
+import db as _dbpool
+import entitlements
+
+_SAVED = (_dbpool.get_db, auth.get_user_by_id)
+
+
+def teardown_function(_fn):
+    _dbpool.get_db, auth.get_user_by_id = _SAVED
+    entitlements.clear()
+
+
+class _DB:
+    def __init__(self):
+        self.loads = 0
+        self.user = {
+            'plan': 'guard', 'stripe_customer_id': 'cus_1', 'stripe_subscription_id': 'sub_1',
+            'subscription_status': 'active', 'billing_period': 'monthly',
+            'current_period_end': datetime(2026, 11, 1, tzinfo=timezone.utc),
+            'valuations_this_month': 3, 'valuations_reset_date': None,
+            'gradings_this_month': 7, 'gradings_reset_date': None,
+            'sig_checks_this_month': 2, 'sig_checks_reset_date': None,
+            'is_admin': False, 'registrations': 4,
+        }
+        self.updates = []
+        self.fail_updates = False
+        self.opened = self.closed = 0
+
+    def conn(self, dict_rows=False):
+        db = self
+
+        class Cur:
+            def execute(self, sql, params=()):
+                if 'FROM users u' in sql:
+                    db.loads += 1
+                    self.row = dict(db.user)
+                else:
+                    if db.fail_updates:
+                        raise RuntimeError('update failed')
+                    db.updates.append(sql)
+
+            def fetchone(self):
+                return self.row
+
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self):
+                return Cur()
+
+            def commit(self):
+                pass
+
+            def close(self):
+                db.closed += 1
+        db.opened += 1
+        return Conn()
+
+
+def _setup():
+    db = _DB()
+    entitlements.clear()
+    _dbpool.get_db = db.conn
+    return db
+
+
+def test_one_read_per_request_and_ttl():
+    from routes import billing
+    db = _setup()
+    app = Flask(__name__)
+    with app.test_request_context('/'):
+        assert billing.check_feature_access(1, 'chrome_extension') == (True, 'Included')
+        assert billing.get_signature_id_entitlement(1)['limit'] == 10
+        assert billing.get_user_plan(1)['registrations'] == 4
+        assert db.loads == 1
+        # Loaded from the DB in this request, so counter gates reuse it too.
+        assert billing.check_feature_access(1, 'valuations') == (True, '247 remaining')
+        assert db.loads == 1
+
+    with app.test_request_context('/'):
+        billing.get_user_plan(1)                   # next request: process cache
+        assert db.loads == 1
+        # Counter gate: one fresh read, then shared by the rest of the request.
+        assert billing.check_feature_access(1, 'valuations') == (True, '247 remaining')
+        assert billing.check_feature_access(1, 'slab_guard_registrations') == (True, 'Unlimited')
+        entitlements.get_entitlements(1, fresh=True)
+        assert db.loads == 2
+
+    entitlements._cache[1] = (0, entitlements._cache[1][1])   # expire
+    with app.test_request_context('/'):
+        billing.get_user_plan(1)
+        assert db.loads == 3
+
+
+def test_webhook_update_invalidates():
+    from routes import billing
+    db = _setup()
+    app = Flask(__name__)
+    with app.test_request_context('/'):
+        assert billing.get_signature_id_entitlement(1)['reason'] == 'ok'
+        db.user.update(plan='free', subscription_status='canceled')
+        assert billing.update_user_subscription(1, 'free', status='canceled')
+        assert billing.get_signature_id_entitlement(1)['reason'] == 'no_access'
+        assert db.loads == 2
+
+
+def test_outside_request_and_errors_not_cached():
+    from routes import billing
+    db = _setup()
+    entitlements.get_entitlements(1)
+    entitlements.get_entitlements(1)
+    assert db.loads == 1
+
+    def boom(dict_rows=False):
+        raise RuntimeError('db down')
+    entitlements.clear()
+    _dbpool.get_db = boom
+    assert billing.get_user_plan(1)['plan'] == 'free'                     # fails open
+    assert billing.get_signature_id_entitlement(1)['reason'] == 'error'   # fails closed
+    assert billing.check_feature_access(1, 'slab_guard_registrations') == (True, 'Unknown')
+    assert entitlements._cache == {}
+
+
+def test_sig_cap_reset_failure_closes_connection():
+    from flask import g
+    from routes import signature_orchestrator
+    db = _setup()
+    db.fail_updates = True                         # monthly reset UPDATE raises
+    auth.get_user_by_id = lambda user_id: {'id': user_id, 'is_approved': True}
+    app = Flask(__name__)
+    app.before_request(lambda: setattr(g, 'user_id', 1))
+    app.register_blueprint(signature_orchestrator.signatures_v2_bp)
+    r = app.test_client().post('/api/signatures/v2/match', json={})
+    assert r.status_code == 503 and r.get_json()['error'] == 'entitlement_unavailable'
+    assert db.opened == db.closed
+
+
+if __name__ == '__main__':
+    for test in (test_one_read_per_request_and_ttl, test_webhook_update_invalidates,
+                 test_outside_request_and_errors_not_cached,
+                 test_sig_cap_reset_failure_closes_connection):
+        try:
+            test()
+        finally:
+            teardown_function(test)
+    print("ALL ENTITLEMENT TESTS PASSED")
@@ -0,0 +1,109 @@
+"""
+The float32 separable LPQ (slab_guard_cv._compute_lpq_histogram) must give the
+same histograms as the original float64 filter2D implementation — chi² ≤ 1e-6
+on full covers, border strips, and whole _compute_lpq_distance comparisons —
+and stored reference histograms must be interchangeable with recomputed ones.
+
+Run:  python tests/test_lpq_fast_path.py
+"""
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from routes import slab_guard_cv as sg
+from routes.reference_features import pack_features, unpack_features
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+PARITY = 1e-6
+
+
+def _reference_lpq_histogram(img_gray, win_size=sg.LPQ_WIN_SIZE):
+    """The pre-fast-path implementation, verbatim: 8 float64 filter2D passes."""
+    h, w = img_gray.shape
+    img_f = img_gray.astype(np.float64)
+    freqs = [(1, 0), (0, 1), (1, 1), (1, -1)]
+    responses = []
+    for fx, fy in freqs:
+        x_r = np.arange(-(win_size // 2), win_size // 2 + 1)
+        y_r = np.arange(-(win_size // 2), win_size // 2 + 1)
+        xx, yy = np.meshgrid(x_r, y_r)
+        fnx, fny = fx / win_size, fy / win_size
+        kr = np.cos(2 * np.pi * (fnx * xx + fny * yy))
+        ki = np.sin(2 * np.pi * (fnx * xx + fny * yy))
+        responses.append(cv2.filter2D(img_f, cv2.CV_64F, kr))
+        responses.append(cv2.filter2D(img_f, cv2.CV_64F, ki))
+    code = np.zeros((h, w), dtype=np.uint8)
+    for i, resp in enumerate(responses):
+        code += ((resp >= 0).astype(np.uint8) << i)
+    hist, _ = np.histogram(code.ravel(), bins=256, range=(0, 256))
+    hist = hist.astype(np.float64)
+    hist /= (hist.sum() + 1e-10)
+    return hist
+
+
+def _chi2(a, b):
+    return float(np.sum((a - b) ** 2 / (a + b + 1e-10)))
+
+
+def _covers():
+    paths = sorted(p for p in glob.glob(os.path.join(ROOT, 'CCImages', '*'))
+                   if p.lower().endswith(('.jpg', '.jpeg', '.png')))
+    for p in paths[:8]:
+        img = cv2.imread(p)
+        if img is not None:
+            yield os.path.basename(p), sg._resize_standard(img)
+
+
+def test_histogram_parity_full_and_border():
+    for name, img in _covers():
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        for label, x in (('full', gray), ('border', sg._lpq_border_strip(gray))):
+            chi2 = _chi2(_reference_lpq_histogram(x), sg._compute_lpq_histogram(x))
+            assert chi2 <= PARITY, f"{name} {label}: chi2={chi2}"
+
+
+def test_synthetic_flat_and_gradient_regions():
+    # Constant blocks and pure ramps are where the float64 responses are
+    # rounding noise around zero — the bits the fast path must reproduce.
+    img = np.zeros((120, 160), np.uint8)
+    img[:, :40] = 200
+    img[:, 40:80] = np.arange(40, dtype=np.uint8)[None, :] * 3
+    img[:60, 80:] = np.arange(60, dtype=np.uint8)[:, None] * 4
+    noise = np.random.RandomState(3).randint(0, 256, (60, 80)).astype(np.uint8)
+    img[60:, 80:] = cv2.GaussianBlur(noise, (7, 7), 2)
+    chi2 = _chi2(_reference_lpq_histogram(img), sg._compute_lpq_histogram(img))
+    assert chi2 <= PARITY, chi2
+
+
+def test_distance_parity_and_stored_reference_hists():
+    name, ref = next(_covers())
+    warp = np.float32([[1, 0.015, 4], [-0.01, 1, 3]])
+    aligned = cv2.GaussianBlur(cv2.warpAffine(ref, warp, sg.TARGET_SIZE), (3, 3), 0.8)
+
+    ref_gray = cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY)
+    al_gray = cv2.cvtColor(aligned, cv2.COLOR_BGR2GRAY)
+    old_full = _chi2(_reference_lpq_histogram(ref_gray), _reference_lpq_histogram(al_gray))
+    old_border = _chi2(_reference_lpq_histogram(sg._lpq_border_strip(ref_gray)),
+                       _reference_lpq_histogram(sg._lpq_border_strip(al_gray)))
+
+    fresh = sg._compute_lpq_distance(ref, aligned)
+    assert abs(fresh['lpq_full_chi2'] - round(old_full, 6)) <= PARITY
+    assert abs(fresh['lpq_chi2'] - round(old_border, 6)) <= PARITY
+
+    kps, des = sg.detect_reference_features(ref)
+    stored = unpack_features(pack_features(kps, des, lpq=sg.compute_reference_lpq(ref)))
+    assert sg._compute_lpq_distance(ref, aligned, ref_hists=stored['lpq']) == fresh
+    # Payloads written before the histograms were added still load.
+    assert unpack_features(pack_features(kps, des))['lpq'] is None
+
+
+if __name__ == '__main__':
+    test_histogram_parity_full_and_border()
+    test_synthetic_flat_and_gradient_regions()
+    test_distance_parity_and_stored_reference_hists()
+    print("ALL LPQ FAST PATH TESTS PASSED")
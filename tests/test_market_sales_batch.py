@@ -0,0 +1,195 @@
+"""
+/api/sales/record/batch must upsert the whole batch with ONE execute_values
+statement (repeats of a source_id collapsed, last wins), answer without
+touching images, hand base64 photos to the bounded background stage (and say
+which ones did not fit), and fall back to per-row savepoints when the bulk
+statement fails.
+
+Run:  python tests/test_market_sales_batch.py
+"""
+import os
+import queue
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+import db as _dbpool
+from routes import sales_market as sm
+
+_SAVED = (_dbpool.get_db, sm.execute_values, sm._image_queue, sm._image_workers_started,
+          sm.scan_barcode_from_base64, sm.upload_sale_image, sm.R2_AVAILABLE)
+
+
+def teardown_function(_fn):
+    (_dbpool.get_db, sm.execute_values, sm._image_queue, sm._image_workers_started,
+     sm.scan_barcode_from_base64, sm.upload_sale_image, sm.R2_AVAILABLE) = _SAVED
+
+
+class _DB:
+    def __init__(self, fail_source_ids=(), reverse_returning=False):
+        self.statements = []
+        self.reverse_returning = reverse_returning
+        self.bulk_rows = None
+        self.next_id = 100
+        self.commits = 0
+        self.fail_source_ids = set(fail_source_ids)
+
+    def conn(self, dict_rows=False):
+        db = self
+
+        class Cur:
+            def execute(self, sql, params=None):
+                db.statements.append((sql, params))
+                if 'INSERT INTO market_sales' in sql:
+                    if params[INDEX_SOURCE_ID] in db.fail_source_ids:
+                        raise ValueError('bad row')
+                    db.next_id += 1
+                    self.result = (db.next_id,)
+
+            def fetchone(self):
+                return self.result
+
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self):
+                return Cur()
+
+            def commit(self):
+                db.commits += 1
+
+            def rollback(self):
+                pass
+
+            def close(self):
+                pass
+        return Conn()
+
+    def execute_values(self, cur, sql, rows, page_size=None, fetch=False):
+        assert 'ON CONFLICT (source, source_id)' in sql and fetch
+        assert 'RETURNING id, source, source_id' in sql
+        self.bulk_rows = rows
+        if self.fail_source_ids:
+            raise ValueError('bulk failed')
+        returned = [(201 + n, row[0], str(row[INDEX_SOURCE_ID])) for n, row in enumerate(rows)]
+        return returned[::-1] if self.reverse_returning else returned
+
+
+INDEX_SOURCE_ID = sm.INSERT_COLUMNS.index('source_id')
+
+
+def _client(db, queue_size=10):
+    os.environ.setdefault('DATABASE_URL', 'postgres://test')
+    _dbpool.get_db = db.conn
+    sm.execute_values = db.execute_values
+    sm._image_queue = queue.Queue(maxsize=queue_size)
+    sm._image_workers_started = sm._IMAGE_WORKERS        # no worker threads in tests
+    app = Flask(__name__)
+    app.register_blueprint(sm.market_sales_bp)
+    return app.test_client()
+
+
+def _sale(source_id, price, **extra):
+    return dict(title='Spawn', issue='1', price=price, source_id=source_id,
+                raw_title='Spawn #1 CGC 9.8', **extra)
+
+
+def test_one_statement_collapsed_duplicates_and_deferred_images():
+    db = _DB()
+    client = _client(db, queue_size=1)
+    scans = []
+    sm.scan_barcode_from_base64 = lambda image: scans.append(image)
+    r = client.post('/api/sales/record/batch', json={'sales': [
+        _sale('w1', 10, image='data:image/jpeg;base64,AAA'),
+        _sale('w2', 20, image='data:image/jpeg;base64,BBB', upc_main='75960608936'),
+        _sale('w1', 12),
+    ]}).get_json()
+    assert r['success'] and r['total'] == 3 and r['duplicates_in_batch'] == 1
+    assert len(db.bulk_rows) == 2 and db.bulk_rows[0][sm.INSERT_COLUMNS.index('price')] == 12
+    assert r['ids'] == [201, 202, 201] and db.commits == 1
+    assert not [s for s, _ in db.statements if 'INSERT' in s]   # no per-row statements
+    assert scans == []                                          # nothing scanned inline
+    # w1's last copy carried no image; w2's photo is queued with scan=False
+    # (it already had a barcode) and nothing was rejected.
+    assert r['images_queued'] == 1 and r['images_rejected'] == []
+    assert sm._image_queue.get_nowait() == (202, 'data:image/jpeg;base64,BBB', False)
+
+
+def test_returning_order_is_not_trusted():
+    db = _DB(reverse_returning=True)
+    client = _client(db)
+    r = client.post('/api/sales/record/batch', json={'sales': [
+        _sale('a', 1, image='A'), _sale(7, 2), _sale(None, 3, image='N'),
+        _sale('c', 4, image='C')]}).get_json()
+    # Bulk ids follow the VALUES position (201..203) whatever order they come
+    # back in; the sale without a source_id went through the per-row insert.
+    assert [row[INDEX_SOURCE_ID] for row in db.bulk_rows] == ['a', 7, 'c']
+    assert r['ids'] == [201, 202, 101, 203] and r['saved'] == 4
+    assert len([s for s, _ in db.statements if 'INSERT' in s]) == 1
+    jobs = [sm._image_queue.get_nowait() for _ in range(r['images_queued'])]
+    assert jobs == [(201, 'A', True), (101, 'N', True), (203, 'C', True)]
+
+
+def test_full_queue_reports_rejected_ids():
+    db = _DB()
+    client = _client(db, queue_size=1)
+    r = client.post('/api/sales/record/batch', json={'sales': [
+        _sale('a', 1, image='X'), _sale('b', 2, image='Y'), _sale('c', 3, image='Z')]}).get_json()
+    assert r['images_queued'] == 1 and r['images_rejected'] == [202, 203]
+
+
+def test_bulk_failure_falls_back_per_row():
+    db = _DB(fail_source_ids={'bad'})
+    client = _client(db)
+    r = client.post('/api/sales/record/batch', json={'sales': [
+        _sale('ok1', 5), _sale('bad', 6), _sale('ok2', 7)]}).get_json()
+    assert r['success'] and r['row_errors'] == 1 and r['saved'] == 2
+    assert r['ids'] == [101, None, 102]
+    sql = [s for s, _ in db.statements]
+    assert 'ROLLBACK TO SAVEPOINT sw_market_bulk' in sql
+    assert sql.count('ROLLBACK TO SAVEPOINT sw_market_row') == 1
+
+
+def test_background_stage_fills_barcode_and_image():
+    db = _DB()
+    _dbpool.get_db = db.conn
+    sm.scan_barcode_from_base64 = lambda image: {'upc_main': '76194134192', 'upc_addon': '00111',
+                                                 'is_reprint': False}
+    sm.R2_AVAILABLE = True
+    sm.upload_sale_image = lambda sale_id, image, side: {'success': True,
+                                                         'url': f'https://r2/{sale_id}.jpg'}
+    sm.process_sale_image(7, 'AAA', True)
+    sql, params = db.statements[-1]
+    assert 'UPDATE market_sales' in sql
+    assert params == ('https://r2/7.jpg', '76194134192', '00111', False, 7)
+
+    db.statements.clear()
+    sm.R2_AVAILABLE = False
+    sm.scan_barcode_from_base64 = lambda image: None
+    sm.process_sale_image(8, 'BBB', True)
+    assert db.statements == []                     # nothing found → no write
+
+
+def test_rejects_bad_payloads():
+    client = _client(_DB())
+    assert client.post('/api/sales/record/batch', json={'sales': []}).status_code == 400
+    assert client.post('/api/sales/record/batch', json={'sales': ['x']}).status_code == 400
+    too_many = [_sale(str(i), 1) for i in range(sm.MAX_BATCH_SALES + 1)]
+    assert client.post('/api/sales/record/batch', json={'sales': too_many}).status_code == 400
+
+
+if __name__ == '__main__':
+    for test in (test_one_statement_collapsed_duplicates_and_deferred_images,
+                 test_returning_order_is_not_trusted,
+                 test_full_queue_reports_rejected_ids,
+                 test_bulk_failure_falls_back_per_row,
+                 test_background_stage_fills_barcode_and_image,
+                 test_rejects_bad_payloads):
+        try:
+            test()
+        finally:
+            teardown_function(test)
+    print("ALL MARKET SALES BATCH TESTS PASSED")
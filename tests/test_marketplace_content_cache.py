@@ -0,0 +1,170 @@
+"""
+marketplace_prep must serve generated platform content from the shared cache
+(keyed by normalized identity + platform + grade + FMV bucket), write every
+missing platform with ONE model call, keep pricing out of the cache, and skip
+the cache entirely for users who opted out.
+
+Run:  python tests/test_marketplace_content_cache.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import auth
+import marketplace_content_cache as mcc
+import marketplace_prep
+from routes import marketplace as marketplace_routes
+
+_SAVED = (mcc.lookup, mcc.store, marketplace_prep._get_client, auth.get_user_by_id,
+          marketplace_routes.generate_platforms_content)
+
+
+def teardown_function(_fn):
+    (mcc.lookup, mcc.store, marketplace_prep._get_client, auth.get_user_by_id,
+     marketplace_routes.generate_platforms_content) = _SAVED
+
+
+class _Store:
+    """In-memory stand-in for the marketplace_content_cache table."""
+
+    def __init__(self):
+        self.rows = {}
+        self.lookups = 0
+
+    def lookup(self, keys):
+        self.lookups += 1
+        return {k: self.rows[k][1] for k in keys if k in self.rows}
+
+    def store(self, entries):
+        self.rows.update(entries)
+
+
+class _Client:
+    """Fake Anthropic client answering in the batched section format."""
+
+    def __init__(self):
+        self.prompts = []
+        self.messages = self
+
+    def create(self, model, max_tokens, messages):
+        prompt = messages[0]['content']
+        self.prompts.append(prompt)
+        keys = [k for k in marketplace_prep.PLATFORMS if f'=== {k} ===' in prompt]
+        if not keys:
+            text = 'DESCRIPTION: single platform copy\nSHOW_NOTES:\n• hook'
+        else:
+            text = '\n'.join(f'=== {k} ===\nDESCRIPTION: {k} copy\nSHOW_NOTES:\n• {k} notes'
+                             for k in keys)
+
+        class _Text:
+            pass
+        block = _Text()
+        block.text = text
+        response = _Text()
+        response.content = [block]
+        return response
+
+
+def _install():
+    store, client = _Store(), _Client()
+    mcc.lookup, mcc.store = store.lookup, store.store
+    marketplace_prep._get_client = lambda: client
+    return store, client
+
+
+def test_key_normalization_and_fmv_bucket():
+    a = mcc.content_key('mercari', 'The Amazing  Spider-Man ', '#0300', '9.80', 42,
+                        publisher='Marvel', year='1988')
+    b = mcc.content_key('mercari', 'the amazing spider-man', '300', '9.8', 48,
+                        publisher='marvel ', year=1988)
+    assert a == b
+    assert a != mcc.content_key('mercari', 'the amazing spider-man', '300', '9.8', 52,
+                                publisher='marvel', year=1988)
+    assert a != mcc.content_key('whatnot', 'the amazing spider-man', '300', '9.8', 42,
+                                publisher='marvel', year=1988)
+    assert mcc.fmv_bucket(0) == (0, 1) and mcc.fmv_bucket(9.99) == (5, 10)
+    assert mcc.fmv_bucket(1000) == (1000, 2000)
+
+
+def test_batch_is_one_call_then_cache_hits():
+    store, client = _install()
+    r = marketplace_prep.generate_platforms_content(
+        ['whatnot', 'mercari', 'heritage'], 'Spawn', '1', '9.8', 45, publisher='Image')
+    assert r['success'] and r['model_calls'] == 1 and r['cache_hits'] == 0
+    assert len(client.prompts) == 1 and '$20-$50' in client.prompts[0]
+    assert r['platforms']['mercari']['description'] == 'mercari copy'
+    assert 'show_notes' not in r['platforms']['mercari']
+    assert r['platforms']['whatnot']['show_notes'] == '• whatnot notes'
+    assert len(store.rows) == 3
+
+    # Same comic, different FMV inside the bucket: no model call, fresh pricing.
+    one = marketplace_prep.generate_platform_content('heritage', 'spawn', '#1', '9.8', 30,
+                                                     publisher='image')
+    assert one['cached'] and one['description'] == 'heritage copy'
+    assert one['suggested_buy_now'] == 30 and one['suggested_start'] == 24.0
+    assert len(client.prompts) == 1
+
+    # A new platform for the same comic only generates what is missing.
+    r = marketplace_prep.generate_platforms_content(['whatnot', 'comc'], 'Spawn', '1', '9.8', 45,
+                                                    publisher='Image')
+    assert r['cache_hits'] == 1 and r['model_calls'] == 1
+    assert len(client.prompts) == 2 and 'PIECE 1' in client.prompts[1]
+    assert r['platforms']['comc']['description'] == 'single platform copy'
+
+
+def test_opt_out_and_fresh():
+    store, client = _install()
+    marketplace_prep.generate_platform_content('mercari', 'Saga', '1', '9.6', 80)
+    assert len(store.rows) == 1
+
+    r = marketplace_prep.generate_platform_content('mercari', 'Saga', '1', '9.6', 80,
+                                                   use_cache=False)
+    assert 'cached' not in r and store.lookups == 1 and len(client.prompts) == 2
+
+    r = marketplace_prep.generate_platform_content('mercari', 'Saga', '1', '9.6', 80, fresh=True)
+    assert 'cached' not in r and store.lookups == 1 and len(client.prompts) == 3
+
+
+def test_unknown_platform_and_missing_section():
+    _install()
+    assert marketplace_prep.generate_platform_content('ebay', 'X', '1', '', 5) == \
+        {'success': False, 'error': 'Unknown platform: ebay'}
+    original = marketplace_prep._generate_ai
+    marketplace_prep._generate_ai = lambda client, keys, *a: {keys[0]: {'description': 'only one'}}
+    try:
+        r = marketplace_prep.generate_platforms_content(['mercari', 'facebook'], 'X', '1', '', 5)
+    finally:
+        marketplace_prep._generate_ai = original
+    assert r['platforms']['mercari']['source'] == 'ai'
+    assert r['platforms']['facebook']['source'] == 'template'
+    assert r['platforms']['facebook']['ai_error']
+
+
+def test_batch_route_rejects_non_string_platforms():
+    from flask import Flask, g
+    calls = []
+    auth.get_user_by_id = lambda user_id: {'id': user_id, 'is_approved': True}
+    marketplace_routes.generate_platforms_content = lambda **kw: calls.append(kw)
+    app = Flask(__name__)
+    app.before_request(lambda: setattr(g, 'user_id', 1))
+    app.register_blueprint(marketplace_routes.marketplace_bp)
+    client = app.test_client()
+    for platforms in ([{}], ['whatnot', ['mercari']], 'whatnot', []):
+        r = client.post('/api/marketplace/generate-content/batch',
+                        json={'title': 'Spawn', 'platforms': platforms})
+        assert r.status_code == 400, platforms
+    assert calls == []
+
+
+if __name__ == '__main__':
+    for test in (test_key_normalization_and_fmv_bucket,
+                 test_batch_is_one_call_then_cache_hits,
+                 test_opt_out_and_fresh,
+                 test_unknown_platform_and_missing_section,
+                 test_batch_route_rejects_non_string_platforms):
+        try:
+            test()
+        finally:
+            teardown_function(test)
+    print("ALL MARKETPLACE CONTENT CACHE TESTS PASSED")
@@ -0,0 +1,103 @@
+"""
+Moderation verdict cache (content_moderation.py) against the local Rekognition
+stub — no AWS, no database (DATABASE_URL is cleared, so only the per-worker
+tier is exercised).
+
+Run:  python tests/test_moderation_cache.py
+"""
+import base64
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import content_moderation as cm
+
+_SAVED = (cm.rekognition_client, cm.MODERATION_AVAILABLE, os.environ.get('DATABASE_URL'))
+
+
+def setup_function(_fn):
+    # content_moderation reads DATABASE_URL per call: clear it only while a test runs.
+    os.environ.pop('DATABASE_URL', None)
+
+
+def teardown_function(_fn):
+    cm.rekognition_client, cm.MODERATION_AVAILABLE, database_url = _SAVED
+    if database_url is None:
+        os.environ.pop('DATABASE_URL', None)
+    else:
+        os.environ['DATABASE_URL'] = database_url
+    cm.clear_moderation_cache()
+
+CLEAN = base64.b64encode(b'\xff\xd8clean-cover-bytes').decode()
+EXPLICIT = base64.b64encode(b'\xff\xd8explicit-bytes').decode()
+
+
+def _stub():
+    cm.clear_moderation_cache()
+    stub = cm.StubRekognition({
+        cm.image_digest(base64.b64decode(EXPLICIT)): [
+            {'Name': 'Explicit Nudity', 'ParentName': '', 'Confidence': 97.0}],
+    })
+    cm.use_rekognition_client(stub)
+    return stub
+
+
+def test_repeat_image_skips_rekognition():
+    stub = _stub()
+    first = cm.moderate_image(CLEAN)
+    # Same bytes, different base64 framing — still the same digest.
+    second = cm.moderate_image('data:image/jpeg;base64,' + CLEAN)
+    assert first['allowed'] and second['allowed']
+    assert second.get('cached') and not first.get('cached')
+    assert stub.calls == 1, stub.calls
+
+
+def test_blocked_verdict_is_cached():
+    stub = _stub()
+    assert cm.moderate_image(EXPLICIT)['blocked']
+    again = cm.moderate_image(EXPLICIT)
+    assert again['blocked'] and again['cached']
+    assert stub.calls == 1
+
+
+def test_failures_are_not_cached():
+    class Down:
+        calls = 0
+
+        def detect_moderation_labels(self, **kw):
+            Down.calls += 1
+            raise RuntimeError('rekognition outage')
+
+    cm.clear_moderation_cache()
+    cm.use_rekognition_client(Down())
+    assert cm.moderate_image(CLEAN)['allowed']
+    assert cm.moderate_image(CLEAN)['allowed']
+    assert Down.calls == 2, "a fail-open verdict must not be served from cache"
+
+
+def test_size_bound():
+    stub = _stub()
+    old_max = cm.MODERATION_CACHE_MAX_ENTRIES
+    cm.MODERATION_CACHE_MAX_ENTRIES = 3
+    try:
+        for i in range(5):
+            cm.moderate_image(base64.b64encode(b'img%d' % i).decode())
+        assert cm.moderation_cache_stats()['entries'] == 3
+        cm.moderate_image(base64.b64encode(b'img0').decode())   # evicted → miss
+        assert stub.calls == 6
+    finally:
+        cm.MODERATION_CACHE_MAX_ENTRIES = old_max
+
+
+if __name__ == '__main__':
+    for test in (test_repeat_image_skips_rekognition,
+                 test_blocked_verdict_is_cached,
+                 test_failures_are_not_cached,
+                 test_size_bound):
+        setup_function(test)
+        try:
+            test()
+        finally:
+            teardown_function(test)
+    print("ALL MODERATION CACHE TESTS PASSED")
@@ -0,0 +1,141 @@
+"""
+opus_token_budget must admit within budget immediately, queue beyond it,
+refund on settle, hold callers back for a 429's retry-after, and the v2
+orchestrator must fan passes 2..N out once pass 1 has primed the prompt cache
+while retrying a 429'd pass instead of failing it.
+
+Run:  python tests/test_opus_token_budget.py
+"""
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image
+
+import opus_token_budget as otb
+from routes import signature_orchestrator as orch
+
+
+def _budget(tpm=60000):
+    return otb.TokenBudget('test', tpm, shared=False)
+
+
+def test_bucket_admits_queues_refunds_and_blocks():
+    b = _budget()                                   # 1000 tokens/s
+    assert b.acquire(60000) < 0.05                  # full bucket
+    t = time.monotonic()
+    assert b.acquire(200) is not None
+    assert 0.15 < time.monotonic() - t < 0.6        # waited for the refill
+    assert b.acquire(50000, timeout=0.2) is None    # would need ~50s
+    b.settle(60000, 0)                              # refund
+    assert b.acquire(30000) < 0.05
+    b.penalize(0.3)
+    t = time.monotonic()
+    b.acquire(1)
+    assert time.monotonic() - t >= 0.28
+    # Bigger than a minute's budget: admitted once the bucket is full.
+    assert _budget(600).acquire(5000) < 0.05
+
+
+def test_retry_after_and_estimates():
+    exc = SimpleNamespace(status_code=429, response=SimpleNamespace(headers={'retry-after': '7'}))
+    assert otb.is_rate_limited(exc) and otb.retry_after_seconds(exc) == 7.0
+    assert otb.retry_after_seconds(SimpleNamespace()) == otb.DEFAULT_RETRY_AFTER_S
+
+    def b64(w, h):
+        buf = BytesIO()
+        Image.new('RGB', (w, h)).save(buf, 'JPEG')
+        return base64.b64encode(buf.getvalue()).decode()
+
+    msgs = [{"role": "user", "content": [
+        {"type": "image", "source": {"type": "base64", "data": b64(1000, 500)}},
+        {"type": "image", "source": {"type": "base64", "data": b64(4000, 3000)}},
+        {"type": "text", "text": "x" * 350}]}]
+    est = otb.estimate_input_tokens([{"type": "text", "text": "y" * 350}], msgs)
+    assert 2350 < est < 2450, est     # 667 + ~1533 (scaled to 1.15MP) + 700 chars / 3.5
+    assert otb.charged_tokens({'input_tokens': 10, 'cache_creation_input_tokens': 5,
+                               'cache_read_input_tokens': 900}) == 15
+
+
+class _RateLimited(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={'retry-after': '0.2'})
+
+
+class _Client:
+    """Each call sleeps PASS_S; the first call with fail_first raises a 429."""
+    PASS_S = 0.4
+
+    def __init__(self, fail_first=False):
+        self.messages = self
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls.append((time.monotonic(), kwargs['temperature']))
+            if self.fail_first:
+                self.fail_first = False
+                raise _RateLimited('rate limited')
+        time.sleep(self.PASS_S)
+        body = {"rankings": [{"rank": 1, "creator": "Jim Lee", "confidence": 0.8}],
+                "analysis": {}, "flags": {}}
+        usage = SimpleNamespace(input_tokens=40, output_tokens=100,
+                                cache_creation_input_tokens=9000, cache_read_input_tokens=0)
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(body))], usage=usage)
+
+
+def _candidates():
+    return [orch.CreatorCandidate(creator_id=1, name='Jim Lee', era_start=None, era_end=None,
+                                  publisher_affiliations=[], signature_style=None,
+                                  reference_images_b64=['aGk='], reference_image_urls=['u'])]
+
+
+def test_single_pass_waits_out_429():
+    b = _budget()
+    client = _Client(fail_first=True)
+    r = orch.run_single_pass(0.2, 'aGk=', _candidates(), {}, 'sys', client, budget=b)
+    assert r.rankings and len(client.calls) == 2
+    assert client.calls[1][0] - client.calls[0][0] >= 0.18
+
+
+def test_passes_fan_out_after_first():
+    saved = (orch.prefilter_candidates, orch.fetch_reference_images, orch.visual_prefilter,
+             orch._anthropic, orch.ANTHROPIC_AVAILABLE, orch.ANTHROPIC_API_KEY, otb.OPUS_BUDGET)
+    client = _Client()
+    try:
+        orch.prefilter_candidates = lambda **kw: _candidates()
+        orch.fetch_reference_images = lambda c: c
+        orch.visual_prefilter = lambda unknown, c: c
+        orch._anthropic = SimpleNamespace(Anthropic=lambda **kw: client)
+        orch.ANTHROPIC_AVAILABLE, orch.ANTHROPIC_API_KEY = True, 'k'
+        otb.OPUS_BUDGET = _budget()
+        t = time.monotonic()
+        result = orch.run_orchestrated_identification('aGk=', {}, 'sys')
+        elapsed = time.monotonic() - t
+    finally:
+        (orch.prefilter_candidates, orch.fetch_reference_images, orch.visual_prefilter,
+         orch._anthropic, orch.ANTHROPIC_AVAILABLE, orch.ANTHROPIC_API_KEY, otb.OPUS_BUDGET) = saved
+    n = len(orch.PASS_TEMPERATURES)
+    assert result.pass_count == n and len(client.calls) == n
+    # Pass 1 alone, then the rest together: ~2 pass durations, not n.
+    assert elapsed < (n - 0.5) * _Client.PASS_S, elapsed
+    starts = sorted(c[0] for c in client.calls)
+    assert starts[1] - starts[0] >= _Client.PASS_S * 0.9
+    assert starts[-1] - starts[1] < _Client.PASS_S * 0.5
+
+
+if __name__ == '__main__':
+    test_bucket_admits_queues_refunds_and_blocks()
+    test_retry_after_and_estimates()
+    test_single_pass_waits_out_429()
+    test_passes_fan_out_after_first()
+    print("ALL OPUS TOKEN BUDGET TESTS PASSED")
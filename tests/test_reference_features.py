@@ -0,0 +1,52 @@
+"""
+Stored SIFT reference features (routes/reference_features.py) must be
+interchangeable with a fresh detection: same alignment stats, same warp.
+Uses a CCImages/ cover and a synthetic shear/shift as the query photo.
+
+Run:  python tests/test_reference_features.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from routes import slab_guard_cv as sg
+from routes.reference_features import pack_features, unpack_features
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def _pair():
+    ref = sg._resize_standard(cv2.imread(os.path.join(ROOT, 'CCImages', 'Avengers1ComicCoverTestFB.jpg')))
+    shear = np.float32([[1, 0.02, 5], [0.01, 1, -4]])
+    return ref, cv2.warpAffine(ref, shear, sg.TARGET_SIZE)
+
+
+def test_packed_features_round_trip():
+    ref, _ = _pair()
+    kps, des = sg.detect_reference_features(ref)
+    restored = unpack_features(pack_features(kps, des))
+    assert len(restored['keypoints']) == len(kps)
+    assert np.array_equal(restored['descriptors'], des), "uint8 storage must be lossless"
+    assert [k.pt for k in restored['keypoints']] == [k.pt for k in kps]
+
+
+def test_stored_features_align_identically():
+    ref, test = _pair()
+    stored = unpack_features(pack_features(*sg.detect_reference_features(ref)))
+    cv2.setRNGSeed(7)   # RANSAC
+    fresh_img, fresh_stats = sg._sift_align(ref, test, sg.BORDER_INLIER_EDGE_WIDTH)
+    cv2.setRNGSeed(7)
+    reused_img, reused_stats = sg._sift_align(ref, test, sg.BORDER_INLIER_EDGE_WIDTH,
+                                              ref_features=stored)
+    assert fresh_stats == reused_stats
+    assert np.array_equal(fresh_img, reused_img)
+
+
+if __name__ == '__main__':
+    test_packed_features_round_trip()
+    test_stored_features_align_identically()
+    print("ALL REFERENCE FEATURE TESTS PASSED")
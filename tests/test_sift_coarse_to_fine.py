@@ -0,0 +1,71 @@
+"""
+Coarse-to-fine SIFT (slab_guard_cv._sift_align_coarse_to_fine, SIFT_COARSE_TO_FINE)
+must reach the same alignment decisions as the full-resolution path on a
+re-captured cover and on a different cover, with border inliers still counted
+from full-resolution features. Also checks that reusing the query's features
+across _sift_align_with_stable_border runs changes nothing.
+
+Run:  python tests/test_sift_coarse_to_fine.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from routes import slab_guard_cv as sg
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def _load(name):
+    return sg._resize_standard(cv2.imread(os.path.join(ROOT, 'CCImages', name)))
+
+
+def _recapture(img):
+    h, w = img.shape[:2]
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    dst = src + np.float32([[9, -6], [-12, 8], [7, 11], [-8, -10]])
+    out = cv2.warpPerspective(img, cv2.getPerspectiveTransform(src, dst), (w, h),
+                              borderMode=cv2.BORDER_REPLICATE)
+    return cv2.GaussianBlur(cv2.convertScaleAbs(out, alpha=1.05, beta=-6), (3, 3), 0.7)
+
+
+def test_same_cover_aligns_with_full_res_border_inliers():
+    ref = _load('Avengers1ComicCoverTestFB.jpg')
+    cv2.setRNGSeed(3)
+    _, stats = sg._sift_align_with_stable_border(ref, _recapture(ref), coarse_to_fine=True)
+    assert stats['mode'] == 'coarse_to_fine'
+    assert stats['aligned'] and stats['coarse_inliers'] >= sg.MIN_SIFT_INLIERS
+    assert stats['border_inliers'] >= sg.BORDER_INLIER_SAME_COPY
+    assert stats['border_inliers'] <= stats['fine_matches']
+
+
+def test_different_cover_does_not_align():
+    ref = _load('Avengers1ComicCoverTestFB.jpg')
+    other = _recapture(_load('ConquerorOfBarrenEarth_1_Cover.jpeg'))
+    _, full = sg._sift_align_with_stable_border(ref, other, coarse_to_fine=False)
+    _, c2f = sg._sift_align_with_stable_border(ref, other, coarse_to_fine=True)
+    assert not full['aligned'] and not c2f['aligned']
+    assert c2f['border_inliers'] == 0
+
+
+def test_query_feature_reuse_is_identical():
+    ref = _load('Avengers1ComicCoverTestFB.jpg')
+    test = _recapture(ref)
+    cv2.setRNGSeed(11)
+    fresh_img, fresh = sg._sift_align(ref, test, sg.BORDER_INLIER_EDGE_WIDTH)
+    cv2.setRNGSeed(11)
+    reused_img, reused = sg._sift_align(ref, test, sg.BORDER_INLIER_EDGE_WIDTH,
+                                        test_features=sg.detect_reference_features(test))
+    assert fresh == reused
+    assert np.array_equal(fresh_img, reused_img)
+
+
+if __name__ == '__main__':
+    test_same_cover_aligns_with_full_res_border_inliers()
+    test_different_cover_does_not_align()
+    test_query_feature_reuse_is_identical()
+    print("ALL COARSE-TO-FINE SIFT TESTS PASSED")
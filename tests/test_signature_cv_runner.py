@@ -0,0 +1,98 @@
+"""
+signatures/cv_runner must run held-out cases concurrently, resume from a
+partial results file (retrying error rows only), and replay recorded
+responses offline with the same predictions as the recording run.
+
+Run:  python tests/test_signature_cv_runner.py
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from signatures import cv_runner
+from signatures import signature_matcher as sm
+
+
+class _SlowStub(sm.LocalStubClient):
+    DELAY_S = 0.2
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.DELAY_S)
+        with self.lock:
+            self.in_flight -= 1
+            return super().create(**kwargs)
+
+
+def _tmp():
+    return Path(tempfile.mkdtemp(prefix='cv_runner_'))
+
+
+def test_concurrent_run_and_resume():
+    tmp = _tmp()
+    try:
+        cases = cv_runner.build_cases(seed=3)[:8]
+        path = tmp / 'stub-keep8.jsonl'
+        client = _SlowStub()
+        summary = cv_runner.run_config(cases, client, 8, path, workers=4, verbose=False)
+        # Overlapping calls, not wall-clock time: the latter flakes on a busy box.
+        assert 1 < client.peak <= 4
+        assert summary['total'] == 8 and client.calls == 8
+        assert sum(summary['confusion'][c['artist']].get(c['artist'], 0) for c in cases) \
+            == summary['correct']
+
+        # Keep 5 rows, turn one into an error: the rerun runs 3 + 1 cases.
+        rows = path.read_text().splitlines()[:5]
+        bad = json.loads(rows[0])
+        bad.update(error='boom', predicted='ERROR', correct=False)
+        path.write_text('\n'.join(rows + [json.dumps(bad)]) + '\n')
+        client = _SlowStub()
+        resumed = cv_runner.run_config(cases, client, 8, path, workers=4, verbose=False)
+        assert client.calls == 4 and resumed['resumed'] == 4 and resumed['total'] == 8
+        assert resumed['correct'] == summary['correct']
+        assert (tmp / 'stub-keep8.summary.json').exists()
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_record_then_replay_offline():
+    tmp = _tmp()
+    try:
+        cases = cv_runner.build_cases(seed=5)[:6]
+        store = tmp / 'replay.jsonl'
+        recorder = cv_runner.ReplayClient(store, inner=sm.LocalStubClient())
+        recorded = cv_runner.run_config(cases, recorder, 5, tmp / 'rec.jsonl', verbose=False)
+        assert recorder.misses == 6 and len(recorder) == 6
+
+        replay = cv_runner.ReplayClient(store)
+        replayed = cv_runner.run_config(cases, replay, 5, tmp / 'rep.jsonl', verbose=False)
+        assert replay.hits == 6 and replay.misses == 0
+        assert replayed['confusion'] == recorded['confusion']
+
+        # A different configuration changes the prompt: replay-only misses
+        # become error rows, never a stale answer.
+        missing = cv_runner.run_config(cases, cv_runner.ReplayClient(store), 3,
+                                       tmp / 'miss.jsonl', verbose=False)
+        assert missing['errors'] == 6
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    test_concurrent_run_and_resume()
+    test_record_then_replay_offline()
+    print("ALL SIGNATURE CV RUNNER TESTS PASSED")
@@ -0,0 +1,106 @@
+"""
+signature_reference_cache must serve the same reference payloads the uncached
+code built (signatures/ files byte-identical), downscale oversized uploads,
+stay inside its byte budget, fetch URL misses once, and drop entries on the
+admin invalidation hooks.
+
+Run:  python tests/test_signature_reference_cache.py
+"""
+import base64
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image
+
+import signature_reference_cache as rc
+
+
+class _Resp:
+    def __init__(self, content):
+        self.content = content
+        self.headers = {'content-type': 'image/jpeg'}
+
+    def raise_for_status(self):
+        pass
+
+
+def _jpeg(size, color=(30, 30, 30)):
+    buf = BytesIO()
+    Image.new('RGB', size, color).save(buf, 'JPEG', quality=95)
+    return buf.getvalue()
+
+
+def _patch_get(blobs, calls):
+    def fake_get(url, timeout=None):
+        calls.append(url)
+        if url not in blobs:
+            raise IOError('404')
+        return _Resp(blobs[url])
+    rc.http_requests.get = fake_get
+
+
+def test_local_references_pass_through_unchanged():
+    rc.clear()
+    name = sorted(f for f in os.listdir(rc.SIGNATURES_DIR) if f.endswith('.jpg'))[0]
+    with open(rc.SIGNATURES_DIR / name, 'rb') as f:
+        expected = base64.b64encode(f.read()).decode('utf-8')
+    assert rc.local_image(name, creator='X') == (expected, 'image/jpeg')
+    assert rc.local_image(name, creator='X') == (expected, 'image/jpeg')
+    assert rc.stats()['hits'] == 1
+    assert rc.invalidate_creator('X') == 1 and rc.stats()['entries'] == 0
+
+
+def test_oversized_upload_is_downscaled():
+    b64, media = rc.prepare_payload(_jpeg((4000, 3000)), 'image/png')
+    with Image.open(BytesIO(base64.b64decode(b64))) as img:
+        assert max(img.size) == rc.REF_MAX_LONG_EDGE
+    assert media == 'image/jpeg'
+    # Undecodable bytes are sent as they were.
+    assert rc.prepare_payload(b'not an image', 'image/jpeg') == (
+        base64.b64encode(b'not an image').decode('utf-8'), 'image/jpeg')
+
+
+def test_url_batch_fetches_misses_once_and_invalidates():
+    rc.clear()
+    original = rc.http_requests.get
+    calls = []
+    blobs = {f'https://r2/sig/{i}.jpg': _jpeg((200 + i, 100)) for i in range(5)}
+    try:
+        _patch_get(blobs, calls)
+        urls = list(blobs) + ['https://r2/sig/missing.jpg']
+        first = rc.url_images(urls, [1, 1, 2, 2, 2, 3])
+        assert first[-1] is None and all(first[:-1])
+        assert rc.url_images(urls[:5]) == first[:5]
+        assert sorted(calls) == sorted(urls)   # hits never refetch
+
+        assert rc.invalidate_url(urls[0])
+        assert rc.invalidate_creator(2) == 3
+        assert rc.stats()['entries'] == 1
+    finally:
+        rc.http_requests.get = original
+
+
+def test_byte_budget_evicts_least_recently_used():
+    rc.clear()
+    budget = rc.REF_CACHE_MAX_BYTES
+    try:
+        rc.REF_CACHE_MAX_BYTES = 2500
+        for i in range(4):
+            rc._put(('url', str(i)), 'x' * 1000, 'image/jpeg', None)
+        s = rc.stats()
+        assert s['entries'] == 2 and s['bytes'] == 2000
+        assert rc._get(('url', '0')) is None and rc._get(('url', '3')) is not None
+    finally:
+        rc.REF_CACHE_MAX_BYTES = budget
+        rc.clear()
+
+
+if __name__ == '__main__':
+    test_local_references_pass_through_unchanged()
+    test_oversized_upload_is_downscaled()
+    test_url_batch_fetches_misses_once_and_invalidates()
+    test_byte_budget_evicts_least_recently_used()
+    print("ALL SIGNATURE REFERENCE CACHE TESTS PASSED")
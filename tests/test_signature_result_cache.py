@@ -0,0 +1,164 @@
+"""
+signature_result_cache must serve a resubmitted cover (same bytes, context and
+reference DB), refuse a re-encode of it even though its pHash matches, and go
+stale when a ranked creator's reference images or the creator roster change.
+
+The DB is an in-memory stand-in that answers the module's four queries.
+
+Run:  python tests/test_signature_result_cache.py
+"""
+import base64
+import json
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageDraw
+
+import signature_result_cache as src
+
+
+class _FakeDB:
+    def __init__(self):
+        self.creators = {1: 'Jim Lee', 2: 'Todd McFarlane'}
+        self.images = {1: [10, 11], 2: [20]}   # creator_id → signature_images ids
+        self.rows = []
+
+    def get_db(self, dict_rows=False):
+        return _FakeConn(self)
+
+
+class _FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        db = self.db
+        if 'FROM creator_signatures' in sql and 'LEFT JOIN' not in sql:
+            self.result = [{'n': len(db.creators), 'max_id': max(db.creators)}]
+        elif 'LEFT JOIN signature_images' in sql:
+            self.result = [{'name': name.lower(), 'n': len(db.images.get(cid, [])),
+                            'max_id': max(db.images.get(cid, [0]))}
+                           for cid, name in db.creators.items() if name.lower() in params[0]]
+        elif sql.strip().startswith('SELECT id, creator_stamps'):
+            key = tuple(params)
+            self.result = [{'id': i, 'creator_stamps': r['stamps'], 'result': r['result']}
+                           for i, r in enumerate(db.rows) if r and r['key'] == key][-1:]
+        elif 'INSERT INTO signature_id_cache' in sql:
+            db.rows.append({'key': tuple(params[:5]), 'stamps': json.loads(params[5]),
+                            'result': json.loads(params[6])})
+        elif 'WHERE id = %s' in sql:
+            db.rows[params[0]] = None
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def _cover(**save_kw):
+    img = Image.new('RGB', (400, 600), (200, 40, 40))
+    ImageDraw.Draw(img).rectangle((60, 80, 340, 300), fill=(30, 30, 160))
+    buf = BytesIO()
+    img.save(buf, 'JPEG', quality=90, **save_kw)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def _probe(ctx='dc'):
+    return src.SignatureCacheProbe('/api/signatures/v2/match', 'opus|[0.2]', context={'publisher': ctx})
+
+
+def _run(check):
+    saved = (src._dbpool, os.environ.get('DATABASE_URL'))
+    src._dbpool = _FakeDB()
+    os.environ['DATABASE_URL'] = 'postgres://fake'
+    try:
+        check(src._dbpool)
+    finally:
+        src._dbpool = saved[0]
+        if saved[1] is None:
+            os.environ.pop('DATABASE_URL', None)
+        else:
+            os.environ['DATABASE_URL'] = saved[1]
+
+
+def test_resubmission_hits_and_reencode_misses():
+    def check(db):
+        cover = _cover()
+        first = _probe()
+        assert first.lookup(cover) is None and first.outcome == 'miss'
+        first.store({'top5': [{'creator': 'Jim Lee', 'confidence': 0.9}]}, ['Jim Lee'])
+
+        again = _probe()
+        hit = again.lookup(cover)
+        assert again.outcome == 'hit' and hit['cached'] is True
+        assert hit['top5'][0]['creator'] == 'Jim Lee'
+
+        # Same pixels and pHash, different bytes: not served (module docstring).
+        reencoded = _cover(comment=b're-saved')
+        probe = _probe()
+        assert probe.lookup(reencoded) is None and probe.phash == again.phash
+        # Different context (pre-filter inputs) is a different key.
+        assert _probe(ctx='marvel').lookup(cover) is None
+    _run(check)
+
+
+def test_reference_changes_invalidate():
+    def check(db):
+        cover = _cover()
+        p = _probe()
+        p.lookup(cover)
+        p.store({'top5': []}, ['Jim Lee'])
+        db.images[2].append(21)                 # unranked creator: still a hit
+        assert _probe().lookup(cover) is not None
+        db.images[1].remove(11)                 # ranked creator's image deleted
+        stale = _probe()
+        assert stale.lookup(cover) is None and stale.outcome == 'stale'
+        assert _probe().lookup(cover) is None   # stale row was dropped
+
+        p = _probe()
+        p.lookup(cover)
+        p.store({'top5': []}, ['Jim Lee'])
+        assert _probe().lookup(cover) is not None
+        db.creators[3] = 'Frank Miller'          # roster change → new ref version
+        assert _probe().lookup(cover) is None
+    _run(check)
+
+
+def test_disabled_without_database():
+    os.environ.pop('DATABASE_URL', None)
+    probe = _probe()
+    assert probe.lookup(_cover()) is None and probe.outcome == 'off'
+    probe.store({'top5': []}, ['Jim Lee'])   # no-op, must not raise
+
+
+if __name__ == '__main__':
+    test_resubmission_hits_and_reencode_misses()
+    test_reference_changes_invalidate()
+    test_disabled_without_database()
+    print("ALL SIGNATURE RESULT CACHE TESTS PASSED")
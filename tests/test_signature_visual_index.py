@@ -0,0 +1,112 @@
+"""
+The local visual pre-filter (signature_visual_index + the orchestrator's
+visual_prefilter) must be invariant to ink polarity and scale, keep the
+measured leave-one-out recall on signatures/, leave the Opus pool untouched in
+shadow mode, and the cross_validate() harness must run offline with the stub.
+
+Run:  python tests/test_signature_visual_index.py
+"""
+import base64
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+import signature_reference_cache as ref_cache
+import signature_visual_index as vi
+from routes import signature_orchestrator as orch
+from signatures import signature_matcher as sm
+
+
+def _b64(img):
+    return base64.b64encode(cv2.imencode('.png', img)[1].tobytes()).decode('utf-8')
+
+
+def _local_db():
+    db = sm.load_db()
+    return [a for a in db['artists'] if any((sm.SIGNATURES_DIR / f).exists() for f in a['images'])]
+
+
+def test_descriptor_ignores_ink_polarity_and_scale():
+    first = sorted(f for f in os.listdir(sm.SIGNATURES_DIR) if f.endswith('.jpg'))[0]
+    gray = cv2.imread(str(sm.SIGNATURES_DIR / first), cv2.IMREAD_GRAYSCALE)
+    base = vi.describe_b64(_b64(gray))
+    assert base.shape == (vi.DESCRIPTOR_DIM,) and base.dtype == np.float32
+    assert float(base @ vi.describe_b64(_b64(255 - gray))) > 0.95
+    assert float(base @ vi.describe_b64(_b64(cv2.resize(gray, None, fx=2, fy=2)))) > 0.9
+    assert vi.describe_b64('bm90IGFuIGltYWdl') is None
+
+
+def test_leave_one_out_recall():
+    index = vi.SignatureIndex()
+    for a in _local_db():
+        for f in a['images']:
+            index.add(f, a['name'], ref_cache.local_image(f)[0])
+    ranks = []
+    for a in _local_db():
+        if len(a['images']) < 2:
+            continue
+        for f in a['images']:
+            query = vi.describe_b64(ref_cache.local_image(f)[0])
+            keys = [k for k in index._keys if k != f]
+            names = [name for name, _ in index.rank(query, keys=keys)]
+            ranks.append(names.index(a['name']) + 1)
+    ranks = np.array(ranks)
+    assert np.mean(ranks <= 8) >= 0.88, np.mean(ranks <= 8)
+
+
+def test_index_grows_in_place_without_losing_rows():
+    vecs = np.eye(vi.DESCRIPTOR_DIM, dtype=np.float32)
+    original = vi.describe_b64
+    vi.describe_b64 = lambda b64: vecs[int(b64)]
+    try:
+        index = vi.SignatureIndex()
+        n = 2 * vi.SignatureIndex.INITIAL_ROWS + 1          # forces two doublings
+        for i in range(n):
+            assert index.add(f'k{i}', f'creator{i}', str(i))
+        assert index.add('k0', 'creator0', '0') and len(index) == n
+        assert len(index._matrix) == 4 * vi.SignatureIndex.INITIAL_ROWS
+        for i in (0, vi.SignatureIndex.INITIAL_ROWS, n - 1):
+            assert index.rank(vecs[i])[0] == (f'creator{i}', 1.0)
+    finally:
+        vi.describe_b64 = original
+
+
+def test_orchestrator_shadow_mode_keeps_pool_and_trim_keeps_best():
+    cands = []
+    for i, a in enumerate(_local_db()[:6]):
+        files = [f for f in a['images'] if (sm.SIGNATURES_DIR / f).exists()][:2]
+        cands.append(orch.CreatorCandidate(
+            creator_id=1000 + i, name=a['name'], era_start=None, era_end=None,
+            publisher_affiliations=[], signature_style=None,
+            reference_images_b64=[ref_cache.local_image(f)[0] for f in files],
+            reference_image_urls=[f'local://{f}' for f in files]))
+    unknown = cands[3].reference_images_b64[0]
+
+    shadow = orch.visual_prefilter(unknown, list(cands), keep=0)
+    assert [c.name for c in shadow] == [c.name for c in cands]
+    assert all(c.visual_score is not None for c in shadow)
+    assert orch._visual_rank_of(cands[3].name, cands) == 1
+
+    trimmed = orch.visual_prefilter(unknown, list(cands), keep=2)
+    assert len(trimmed) == 2 and trimmed[0].name == cands[3].name
+
+
+def test_cross_validate_runs_offline_with_stub():
+    client = sm.LocalStubClient()
+    results = sm.cross_validate(client=client, visual_keep=8, seed=1, save=False)
+    assert client.calls == len(results) > 0
+    assert all('in_shortlist' in r for r in results)
+    assert sum(r['in_shortlist'] for r in results) / len(results) >= 0.8
+
+
+if __name__ == '__main__':
+    test_descriptor_ignores_ink_polarity_and_scale()
+    test_leave_one_out_recall()
+    test_index_grows_in_place_without_losing_rows()
+    test_orchestrator_shadow_mode_keeps_pool_and_trim_keeps_best()
+    test_cross_validate_runs_offline_with_stub()
+    print("ALL SIGNATURE VISUAL INDEX TESTS PASSED")
@@ -0,0 +1,99 @@
+"""
+slabguard_phash_index must return exactly what the old linear Hamming scan did,
+load lazily, pick up rows added by other workers incrementally, reload after
+deletions, and never match the 'manual_<id>' placeholder rows.
+
+Run:  python tests/test_slabguard_phash_index.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import slabguard_phash_index as spi
+
+
+class _Cursor:
+    """Dict-row cursor over an in-memory slabguard_flagged_images."""
+
+    def __init__(self, rows):
+        self.rows = rows          # {id: phash}
+        self.queries = []
+        self.result = []
+
+    def execute(self, sql, params=()):
+        self.queries.append(sql)
+        if 'COUNT(*)' in sql:
+            self.result = [{'n': len(self.rows), 'max_id': max(self.rows, default=0)}]
+        elif 'id > %s' in sql:
+            self.result = [{'id': i, 'phash': h} for i, h in self.rows.items() if i > params[0]]
+        else:
+            self.result = [{'id': i, 'phash': h} for i, h in self.rows.items()]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+def _hex(v):
+    return format(v, '016x').zfill(64)    # slabguard_routes._compute_phash format
+
+
+def test_matches_linear_scan():
+    rng = random.Random(11)
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    mih = spi.MultiIndexHash()
+    for i, h in enumerate(hashes):
+        mih.add(i, h)
+    for r in (0, 4, 10, 13):
+        for _ in range(100):
+            q = hashes[rng.randrange(len(hashes))] ^ sum(1 << b for b in rng.sample(range(64), rng.randrange(15)))
+            want = sorted(((h ^ q).bit_count(), i) for i, h in enumerate(hashes) if (h ^ q).bit_count() <= r)
+            assert mih.query(q, r) == want
+    mih.remove(0)
+    assert all(i != 0 for _, i in mih.query(hashes[0], 10))
+
+
+def test_lazy_incremental_and_reload():
+    base = 0x0123456789ABCDEF
+    rows = {1: _hex(base), 2: 'manual_7', 3: _hex(base ^ 0xFFFF_FFFF)}
+    cur = _Cursor(rows)
+    index = spi.FlaggedPhashIndex(refresh_s=0)
+    assert index.query(cur, _hex(base ^ 0b111), 10) == [(3, 1)]
+    assert len(index) == 2                                # placeholder not indexed
+    assert index.query(cur, 'manual_7', 10) == []
+
+    rows[4] = _hex(base ^ 0xF00)                          # another worker's insert
+    cur.queries.clear()
+    assert [i for _, i in index.query(cur, _hex(base), 10)] == [1, 4]
+    assert any('id > %s' in q for q in cur.queries)
+    assert not any(q.strip() == 'SELECT id, phash FROM slabguard_flagged_images' for q in cur.queries)
+
+    del rows[1]                                           # deletion → full reload
+    assert [i for _, i in index.query(cur, _hex(base), 10)] == [4]
+
+    # This worker's own approve: visible at once, not double-counted later.
+    rows[5] = _hex(~base & (2 ** 64 - 1))
+    index.add(5, rows[5])
+    cur.queries.clear()
+    assert [i for _, i in index.query(cur, rows[5], 0)] == [5]
+    assert len(cur.queries) == 1                           # count check only, no reload
+
+
+def test_refresh_is_rate_limited():
+    cur = _Cursor({1: _hex(1)})
+    index = spi.FlaggedPhashIndex(refresh_s=3600)
+    index.query(cur, _hex(1), 10)
+    cur.queries.clear()
+    index.query(cur, _hex(1), 10)
+    assert cur.queries == []
+
+
+if __name__ == '__main__':
+    test_matches_linear_scan()
+    test_lazy_incremental_and_reload()
+    test_refresh_is_rate_limited()
+    print("ALL SLABGUARD PHASH INDEX TESTS PASSED")
@@ -0,0 +1,175 @@
+"""
+vision_result_cache must serve a retry with byte-identical photos, refuse a
+different photo whose pHash is within the near-dup radius (a second copy of the
+same issue), honour TTL / prompt version / per-user scope, and degrade to a
+miss on an undecodable photo or a DB error.
+
+The DB is an in-memory stand-in that answers the module's queries.
+
+Run:  python tests/test_vision_result_cache.py
+"""
+import base64
+import json
+import os
+import sys
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageDraw
+
+import vision_result_cache as vc
+
+_SAVED = (vc._dbpool, vc.VISION_CACHE_GRADE_NEAR)
+
+
+def teardown_function(_fn):
+    vc._dbpool, vc.VISION_CACHE_GRADE_NEAR = _SAVED
+
+
+class _FakeDB:
+    """vision_result_cache rows; `expired` stands in for expires_at <= NOW()."""
+
+    def __init__(self, broken=False):
+        self.rows = []
+        self.broken = broken
+
+    def get_db(self, dict_rows=False):
+        if self.broken:
+            raise RuntimeError('connection refused')
+        return _FakeConn(self)
+
+
+class _FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=()):
+        db = self.db
+        live = [r for r in db.rows if not r['expired']]
+        if 'INSERT INTO vision_result_cache' in sql:
+            db.rows.append({'key': tuple(params[:4]), 'content_key': params[4],
+                            'phashes': json.loads(params[6]), 'result': json.loads(params[7]),
+                            'expired': False})
+        elif 'content_key = %s' in sql:
+            self.result = [{'result': r['result']} for r in live
+                           if r['key'] == tuple(params[:4]) and r['content_key'] == params[4]][-1:]
+        elif 'SELECT phashes' in sql:
+            self.result = [{'phashes': r['phashes'], 'result': r['result']} for r in live
+                           if r['key'] == tuple(params)]
+        elif 'DELETE FROM vision_result_cache' in sql:
+            db.rows = [r for r in db.rows if not (r['key'][0] == params[0] and r['expired'])]
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def _photo(**save_kw):
+    img = Image.new('RGB', (400, 600), (200, 40, 40))
+    ImageDraw.Draw(img).rectangle((60, 80, 340, 300), fill=(30, 30, 160))
+    buf = BytesIO()
+    img.save(buf, 'JPEG', quality=90, **save_kw)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def _probe(user_id=1, endpoint='/api/grade', version='g-1', allow_near=False):
+    return vc.ResultCacheProbe(user_id, endpoint, vc.identity_key(title='Spawn', issue='1'),
+                               version, allow_near=allow_near)
+
+
+def _seed(photos, user_id=1, endpoint='/api/grade', version='g-1'):
+    probe = _probe(user_id, endpoint, version)
+    assert probe.lookup(photos) is None and probe.outcome == 'miss'
+    probe.store({'grade': 9.4})
+    return probe
+
+
+def test_identical_bytes_hit():
+    vc._dbpool = _FakeDB()
+    photos = [_photo(), _photo(comment=b'back')]
+    _seed(photos)
+    probe = _probe()
+    hit = probe.lookup(photos)
+    assert probe.outcome == 'hit' and hit['grade'] == 9.4
+    assert hit['cached'] is True and hit['cache_match'] == 'exact'
+
+
+def test_other_photo_within_radius_is_not_served():
+    vc._dbpool = _FakeDB()
+    _seed([_photo()])
+    # Same pixels → same pHash (0 bits), different bytes: a second copy.
+    other = _photo(comment=b'second copy')
+    probe = _probe()
+    assert probe.lookup([other]) is None and probe.outcome == 'miss'
+    assert vc._distance(probe.hashes[0], vc.image_phash(_photo())) <= vc.NEAR_DUP_MAX_DISTANCE
+
+    # allow_near alone is not enough; the env opt-in must be on too.
+    assert _probe(allow_near=True).lookup([other]) is None
+    vc.VISION_CACHE_GRADE_NEAR = True
+    near = _probe(allow_near=True)
+    assert near.lookup([other])['cache_match'] == 'near' and near.outcome == 'near'
+    # An extraction probe never asks for near hits.
+    assert _probe(endpoint='/api/extract').lookup([other]) is None
+
+
+def test_ttl_version_and_user_scope():
+    db = vc._dbpool = _FakeDB()
+    photos = [_photo()]
+    _seed(photos)
+    assert _probe(user_id=2).lookup(photos) is None          # other account
+    assert _probe(version='g-2').lookup(photos) is None      # prompt bumped
+    assert _probe().lookup(photos) is not None
+    db.rows[0]['expired'] = True
+    probe = _probe()
+    assert probe.lookup(photos) is None and probe.outcome == 'miss'
+    probe.store({'grade': 9.6})                              # sweeps the expired row
+    assert len(db.rows) == 1 and db.rows[0]['result'] == {'grade': 9.6}
+
+
+def test_degrades_to_miss():
+    vc._dbpool = _FakeDB()
+    probe = _probe()
+    assert probe.lookup(['not an image']) is None and probe.outcome == 'error'
+    probe.store({'grade': 9.4})                              # no key → no-op
+    assert vc._dbpool.rows == []
+
+    vc._dbpool = _FakeDB(broken=True)
+    probe = _probe()
+    assert probe.lookup([_photo()]) is None and probe.outcome == 'error'
+    probe.store({'grade': 9.4})                              # must not raise
+
+
+if __name__ == '__main__':
+    for test in (test_identical_bytes_hit,
+                 test_other_photo_within_radius_is_not_served,
+                 test_ttl_version_and_user_scope,
+                 test_degrades_to_miss):
+        try:
+            test()
+        finally:
+            teardown_function(test)
+    print("ALL VISION RESULT CACHE TESTS PASSED")
@@ -0,0 +1,170 @@
+"""
+watermark_cache must render each (photo, status, size) once, serve it from
+disk afterwards (one render for concurrent misses), re-render when the photo
+or status changes, and /api/verify/watermark must answer If-None-Match with a
+304 and only mark matching ?v= URLs immutable.
+
+Run:  python tests/test_watermark_cache.py
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageDraw, ImageFont
+
+import watermark_cache as wc
+
+
+class _Render:
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, cover_url, serial_number, max_edge):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append((cover_url, serial_number, max_edge))
+        return f'{cover_url}|{serial_number}|{max_edge}'.encode()
+
+
+def _with_cache_dir(fn):
+    def run():
+        tmp = tempfile.mkdtemp(prefix='wm_cache_')
+        old = wc.CACHE_DIR
+        wc.CACHE_DIR = tmp
+        try:
+            fn(tmp)
+        finally:
+            wc.CACHE_DIR = old
+            shutil.rmtree(tmp)
+    run.__name__ = fn.__name__
+    return run
+
+
+@_with_cache_dir
+def test_render_once_then_disk(tmp):
+    render = _Render()
+    data, key, source = wc.get_or_render('SW-2026-000001', 'https://r2/a.jpg', 'active', 'md', render)
+    assert source == 'render' and render.calls == [('https://r2/a.jpg', 'SW-2026-000001', 1024)]
+    again = wc.get_or_render('SW-2026-000001', 'https://r2/a.jpg', 'active', 'md', render)
+    assert again == (data, key, 'disk') and len(render.calls) == 1
+
+    # New status → new key, old file of that tier removed.
+    _, new_key, source = wc.get_or_render('SW-2026-000001', 'https://r2/a.jpg', 'reported_stolen', 'md', render)
+    assert source == 'render' and new_key != key
+    assert os.listdir(os.path.join(tmp, 'SW-2026-000001')) == [f'md-{new_key}.jpg']
+
+    wc.invalidate('SW-2026-000001')
+    assert not os.path.exists(os.path.join(tmp, 'SW-2026-000001'))
+
+
+@_with_cache_dir
+def test_concurrent_misses_render_once(tmp):
+    render = _Render(delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        wc.get_or_render('SW-2026-000002', 'u', 'active', 'sm', render))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(render.calls) == 1 and len({r[0] for r in results}) == 1
+    assert wc._locks == {}
+
+
+@_with_cache_dir
+def test_prune_drops_least_recently_served(tmp):
+    render = _Render()
+    paths = []
+    for i in range(4):
+        serial = f'SW-2026-00001{i}'
+        wc.get_or_render(serial, 'u' * 1000, 'active', 'full', render)
+        paths.append(wc._path(serial, 'full', wc.derivative_key(serial, 'u' * 1000, 'active', 'full')))
+        os.utime(paths[-1], (1000 + i, 1000 + i))
+    assert wc.prune(max_mb=3000 / (1024 * 1024)) == 2     # ~1KB each, keep ≤ 2.7KB
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True]
+
+
+@_with_cache_dir
+def test_route_etag_and_cache_control(tmp):
+    from flask import Flask
+    from routes import verify
+
+    class _Cur:
+        def execute(self, sql, params):
+            pass
+
+        def fetchone(self):
+            return ({'front': 'https://r2/cover.jpg'}, 'active')
+
+        def close(self):
+            pass
+
+    class _Conn:
+        def cursor(self):
+            return _Cur()
+
+        def close(self):
+            pass
+
+    render = _Render()
+    old = verify.get_db, verify.render_watermark_jpeg
+    verify.init_modules(None, Image, ImageDraw, ImageFont)
+    verify.get_db, verify.render_watermark_jpeg = (lambda: _Conn()), render
+    try:
+        app = Flask(__name__)
+        app.register_blueprint(verify.verify_bp)
+        client = app.test_client()
+        key = wc.derivative_key('SW-2026-000003', 'https://r2/cover.jpg', 'active', 'lg')
+
+        r = client.get(f'/api/verify/watermark/SW-2026-000003?size=lg&v={key}')
+        assert r.status_code == 200 and r.headers['ETag'] == f'"{key}"'
+        assert 'immutable' in r.headers['Cache-Control']
+        assert r.headers['X-Watermark-Cache'] == 'render'
+
+        r = client.get('/api/verify/watermark/SW-2026-000003?size=lg&v=stale')
+        assert r.headers['X-Watermark-Cache'] == 'disk' and 'immutable' not in r.headers['Cache-Control']
+
+        r = client.get('/api/verify/watermark/SW-2026-000003?size=lg',
+                       headers={'If-None-Match': f'"{key}"'})
+        assert r.status_code == 304 and len(render.calls) == 1
+
+        assert client.get('/api/verify/watermark/SW-2026-000003?size=huge').status_code == 400
+    finally:
+        verify.get_db, verify.render_watermark_jpeg = old
+
+
+def test_watermark_image_respects_max_edge():
+    import requests
+    from routes import verify
+
+    buf = io.BytesIO()
+    Image.new('RGB', (3000, 2000), (90, 120, 150)).save(buf, 'JPEG')
+
+    class _Resp:
+        content = buf.getvalue()
+
+    old_get = requests.get
+    verify.init_modules(None, Image, ImageDraw, ImageFont)
+    requests.get = lambda url, timeout=None: _Resp()
+    try:
+        assert verify.watermark_image('u', 'SW-2026-000004', 480).size == (480, 320)
+        assert verify.watermark_image('u', 'SW-2026-000004').size == (3000, 2000)
+    finally:
+        requests.get = old_get
+
+
+if __name__ == '__main__':
+    test_render_once_then_disk()
+    test_concurrent_misses_render_once()
+    test_prune_drops_least_recently_served()
+    test_route_etag_and_cache_control()
+    test_watermark_image_respects_max_edge()
+    print("ALL WATERMARK CACHE TESTS PASSED")
@@ -13,23 +13,179 @@ Uses multiple signals:
   3. Compression artifact analysis (double-JPEG detection)
   4. Color/lighting uniformity (screens are unnaturally flat)
   5. Resolution & dimension analysis (screenshot vs camera resolution)
+  6. Edge sharpness & detail (Laplacian variance)
+  7. Error level analysis (ELA)
 
 Usage:
   python photo_authenticity.py <image_path>
 
 Returns JSON with overall score and per-check breakdown.
+
+Decode once (AnalysisContext)
+-----------------------------
+Every analyzer used to reopen the file and decode it again — seven decodes of
+a 12MP photo per check, plus two per-pixel Python loops (the moiré radial
+profile, and the Laplacian at NATIVE resolution) that dominated the runtime.
+check_authenticity() now builds one AnalysisContext: the header is opened once,
+pixels are decoded once, and the grayscale (native + 512²), RGB (native +
+256²) and FFT intermediates are built lazily, once, by whichever analyzer asks
+first. The analyzers run concurrently (PHOTO_AUTH_WORKERS threads; NumPy, the
+FFT, PIL resize and the ELA JPEG re-encode release the GIL) under a memory
+budget (PHOTO_AUTH_MEMORY_MB): an analyzer reserves its estimated peak
+(bytes per native pixel) before it runs, so two full-resolution float64
+analyzers on a big photo wait for each other instead of stacking.
+
+⚠️ Scores and details are byte-identical to the per-analyzer implementation:
+the shared intermediates are built with the exact same PIL calls, and the two
+vectorized loops keep exact arithmetic (integer-valued pixels in the
+Laplacian; np.bincount sums the radial profile in the same row-major order the
+loop did). ELA still re-encodes at full resolution — downscaling it would move
+its error levels, i.e. change verdicts. Checked byte-for-byte against the
+previous implementation on JPEG/PNG/WebP/CMYK/palette/truncated inputs
+(a 3.1MP photo: 23.3s → 0.7s, single core); tests/test_photo_authenticity.py
+pins the vectorized kernels against the original loops.
+
+The result gains "timings_ms" (per analyzer wall time, plus decode and total).
+Every analyzer still accepts a plain path, as before.
 """
 
 import json
 import struct
 import sys
 import os
-import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from PIL import Image, ExifTags
 import numpy as np
 from scipy import fft as scipy_fft
 
+PHOTO_AUTH_WORKERS = int(os.environ.get("PHOTO_AUTH_WORKERS", "4"))
+PHOTO_AUTH_MEMORY_MB = int(os.environ.get("PHOTO_AUTH_MEMORY_MB", "1024"))
+
+
+# =============================================================================
+# SHARED ANALYSIS CONTEXT
+# =============================================================================
+class AnalysisContext:
+    """
+    One image, opened and decoded once, with the intermediates the analyzers
+    share. Each intermediate is built on first use under its own lock; a
+    build that raises is remembered and re-raised to every later caller, so an
+    analyzer sees the same exception it would have hit decoding on its own.
+    """
+
+    def __init__(self, image_path):
+        self.image_path = image_path
+        self._lock = threading.Lock()
+        self._built = {}          # name → (ok, value or exception)
+        self._locks = {}
+        self.decode_ms = 0.0
+
+    @classmethod
+    def of(cls, source):
+        return source if isinstance(source, cls) else cls(source)
+
+    def _get(self, name, build):
+        with self._lock:
+            if name not in self._built:
+                lock = self._locks.setdefault(name, threading.Lock())
+            else:
+                lock = None
+        if lock is not None:
+            with lock:
+                if name not in self._built:
+                    try:
+                        self._built[name] = (True, build())
+                    except Exception as e:
+                        self._built[name] = (False, e)
+        ok, value = self._built[name]
+        if not ok:
+            raise value
+        return value
+
+    # --- file / header (no pixel decode) ----------------------------------
+    @property
+    def file_size(self):
+        return self._get("file_size", lambda: os.path.getsize(self.image_path))
+
+    @property
+    def header(self):
+        """PIL image opened from the path — format / mode / size; not decoded."""
+        return self._get("header", lambda: Image.open(self.image_path))
+
+    @property
+    def exif(self):
+        # Own handle: EXIF is header data, and a truncated file whose pixels
+        # fail to decode still has readable EXIF.
+        return self._get("exif", lambda: Image.open(self.image_path)._getexif())
+
+    # --- pixels (decoded once) --------------------------------------------
+    def _decode(self):
+        t = time.perf_counter()
+        img = self.header
+        img.load()
+        self.decode_ms = (time.perf_counter() - t) * 1000
+        return img
+
+    @property
+    def decoded(self):
+        return self._get("decoded", self._decode)
+
+    @property
+    def gray_image(self):
+        return self._get("gray_image", lambda: self.decoded.convert("L"))
+
+    @property
+    def rgb_image(self):
+        return self._get("rgb_image", lambda: self.decoded.convert("RGB"))
+
+    @property
+    def gray_native(self):
+        """float64 grayscale at native resolution (compression, sharpness)."""
+        return self._get("gray_native", lambda: np.array(self.gray_image, dtype=np.float64))
+
+    @property
+    def gray_512(self):
+        """float64 grayscale resized to 512×512 (moiré)."""
+        return self._get("gray_512", lambda: np.array(
+            self.gray_image.resize((512, 512), Image.LANCZOS), dtype=np.float64))
+
+    @property
+    def rgb_256(self):
+        """float64 RGB resized to 256×256 (lighting)."""
+        return self._get("rgb_256", lambda: np.array(
+            self.rgb_image.resize((256, 256), Image.LANCZOS), dtype=np.float64))
+
+    @property
+    def spectrum_512(self):
+        """|fftshift(fft2(gray_512))| — the moiré magnitude spectrum."""
+        return self._get("spectrum_512", lambda: np.abs(
+            scipy_fft.fftshift(scipy_fft.fft2(self.gray_512))))
+
+
+class _MemoryBudget:
+    """Counting budget in bytes. A reservation larger than the whole budget
+    is clamped to it (that analyzer then runs alone) — never a deadlock."""
+
+    def __init__(self, capacity_bytes):
+        self.capacity = max(1, int(capacity_bytes))
+        self._free = self.capacity
+        self._cond = threading.Condition()
+
+    def acquire(self, n):
+        n = min(max(0, int(n)), self.capacity)
+        with self._cond:
+            self._cond.wait_for(lambda: self._free >= n)
+            self._free -= n
+        return n
+
+    def release(self, n):
+        with self._cond:
+            self._free += n
+            self._cond.notify_all()
+
 
 # =============================================================================
 # 1. EXIF METADATA ANALYSIS
@@ -46,9 +202,9 @@ def analyze_exif(image_path):
       score (0-100): Higher = more likely authentic
       details (dict): What was found/missing
     """
+    ctx = AnalysisContext.of(image_path)
     try:
-        img = Image.open(image_path)
-        exif_data = img._getexif()
+        exif_data = ctx.exif
     except Exception:
         return 25, {"error": "Could not read EXIF", "verdict": "No EXIF data — may be messaging-compressed or web-saved"}
 
@@ -145,21 +301,15 @@ def detect_moire(image_path):
       score (0-100): Higher = more likely authentic (no moiré)
       details (dict): Analysis results
     """
+    ctx = AnalysisContext.of(image_path)
     try:
-        img = Image.open(image_path).convert("L")  # Grayscale
-        # Resize to standard size for consistent analysis
-        img = img.resize((512, 512), Image.LANCZOS)
-        arr = np.array(img, dtype=np.float64)
+        # Grayscale, resized to a standard 512x512 for consistent analysis
+        ctx.gray_512
     except Exception as e:
         return 50, {"error": str(e), "verdict": "Could not analyze"}
 
-    # Apply 2D FFT
-    f_transform = scipy_fft.fft2(arr)
-    f_shift = scipy_fft.fftshift(f_transform)
-    magnitude = np.abs(f_shift)
-
-    # Log magnitude for analysis
-    log_magnitude = np.log1p(magnitude)
+    # 2D FFT magnitude (fftshift-ed: DC at the centre)
+    magnitude = ctx.spectrum_512
 
     # Analyze high-frequency energy distribution
     rows, cols = magnitude.shape
@@ -189,16 +339,13 @@ def detect_moire(image_path):
     # Moiré creates distinctive peaks in mid-high frequencies
     # Look for periodic spikes (peaks significantly above neighbors)
     # Analyze radial profile for unusual peaks
+    # (Was a per-pixel Python loop. `distance` holds the same sqrt of the same
+    # integer, and bincount adds the weights in the same row-major order, so
+    # the profile is bit-for-bit what the loop produced.)
     radial_bins = 50
-    radial_profile = np.zeros(radial_bins)
-    radial_counts = np.zeros(radial_bins)
-
-    for i in range(rows):
-        for j in range(cols):
-            d = math.sqrt((i - center_r) ** 2 + (j - center_c) ** 2)
-            bin_idx = min(int(d / max_dist * radial_bins), radial_bins - 1)
-            radial_profile[bin_idx] += magnitude[i, j]
-            radial_counts[bin_idx] += 1
+    bin_idx = np.minimum((distance / max_dist * radial_bins).astype(np.int64), radial_bins - 1).ravel()
+    radial_profile = np.bincount(bin_idx, weights=magnitude.ravel(), minlength=radial_bins)
+    radial_counts = np.bincount(bin_idx, minlength=radial_bins).astype(np.float64)
 
     # Average per bin
     radial_counts[radial_counts == 0] = 1
@@ -264,9 +411,10 @@ def analyze_compression(image_path):
       details (dict): Analysis results
     """
     details = {}
+    ctx = AnalysisContext.of(image_path)
 
     try:
-        img = Image.open(image_path)
+        img = ctx.header
     except Exception as e:
         return 50, {"error": str(e)}
 
@@ -289,7 +437,7 @@ def analyze_compression(image_path):
     score = 70  # Default for JPEG
 
     # Check JPEG quality estimate via file size vs dimensions
-    file_size = os.path.getsize(image_path)
+    file_size = ctx.file_size
     width, height = img.size
     pixels = width * height
 
@@ -322,7 +470,7 @@ def analyze_compression(image_path):
 
     # Analyze 8x8 block boundary artifacts (sign of JPEG double compression)
     try:
-        gray = np.array(img.convert("L"), dtype=np.float64)
+        gray = ctx.gray_native
 
         # Compute block boundary differences
         # In single-compressed JPEG, 8x8 block boundaries are smooth
@@ -388,10 +536,9 @@ def analyze_lighting(image_path):
       score (0-100): Higher = more likely authentic
       details (dict): Analysis results
     """
+    ctx = AnalysisContext.of(image_path)
     try:
-        img = Image.open(image_path).convert("RGB")
-        img_resized = img.resize((256, 256), Image.LANCZOS)
-        arr = np.array(img_resized, dtype=np.float64)
+        arr = ctx.rgb_256
     except Exception as e:
         return 50, {"error": str(e)}
 
@@ -501,8 +648,9 @@ def analyze_dimensions(image_path):
       score (0-100): Higher = more likely authentic
       details (dict): Analysis results
     """
+    ctx = AnalysisContext.of(image_path)
     try:
-        img = Image.open(image_path)
+        img = ctx.header
     except Exception as e:
         return 50, {"error": str(e)}
 
@@ -574,7 +722,7 @@ def analyze_dimensions(image_path):
     # Real camera photos: typically 1.5-8+ MB
     # WhatsApp-compressed: typically 100-300 KB
     # Screengrabs/web-saves: typically 50-150 KB
-    file_size_kb = os.path.getsize(image_path) / 1024
+    file_size_kb = ctx.file_size / 1024
     details["file_size_kb"] = round(file_size_kb, 1)
 
     if file_size_kb >= 1500:
@@ -622,10 +770,10 @@ def analyze_sharpness(image_path):
       score (0-100): Higher = more likely authentic
       details (dict): Analysis results
     """
+    ctx = AnalysisContext.of(image_path)
     try:
-        img = Image.open(image_path).convert("L")
         # Don't resize — analyze at native resolution for true sharpness
-        arr = np.array(img, dtype=np.float64)
+        arr = ctx.gray_native
     except Exception as e:
         return 50, {"error": str(e)}
 
@@ -637,14 +785,14 @@ def analyze_sharpness(image_path):
     if h < 10 or w < 10:
         return 50, {"error": "Image too small for sharpness analysis"}
 
-    # Pad the array
+    # Pad the array, then apply the kernel as shifted slices (was a per-pixel
+    # Python loop — minutes on a 12MP photo). Pixels are integers 0-255, so
+    # every sum is exact and the result is identical to the loop's.
     padded = np.pad(arr, 1, mode='edge')
-    laplacian = np.zeros_like(arr)
-
-    for i in range(h):
-        for j in range(w):
-            region = padded[i:i+3, j:j+3]
-            laplacian[i, j] = np.sum(region * laplacian_kernel)
+    k = laplacian_kernel
+    laplacian = (k[0, 1] * padded[:-2, 1:-1] + k[1, 0] * padded[1:-1, :-2]
+                 + k[1, 1] * padded[1:-1, 1:-1] + k[1, 2] * padded[1:-1, 2:]
+                 + k[2, 1] * padded[2:, 1:-1])
 
     # Laplacian variance — classic sharpness metric
     lap_var = float(np.var(laplacian))
@@ -741,15 +889,16 @@ def analyze_ela(image_path):
       score (0-100): Higher = more likely authentic
       details (dict): Analysis results
     """
+    ctx = AnalysisContext.of(image_path)
     try:
-        img = Image.open(image_path).convert("RGB")
+        img = ctx.rgb_image
     except Exception as e:
         return 50, {"error": str(e), "verdict": "Could not analyze"}
 
     # ELA only works well on JPEGs — PNG/other formats don't have
     # the same compression artifact structure
     try:
-        original_format = Image.open(image_path).format
+        original_format = ctx.header.format
     except Exception:
         original_format = None
 
@@ -771,10 +920,6 @@ def analyze_ela(image_path):
     resaved_arr = np.array(resaved, dtype=np.float64)
     ela_map = np.abs(original_arr - resaved_arr)
 
-    # Scale for visibility (multiply by a factor)
-    scale_factor = 10
-    ela_scaled = np.clip(ela_map * scale_factor, 0, 255)
-
     # Analyze the ELA map
     ela_mean = float(np.mean(ela_map))
     ela_std = float(np.std(ela_map))
@@ -866,39 +1011,70 @@ def analyze_ela(image_path):
 # =============================================================================
 # OVERALL AUTHENTICITY SCORE
 # =============================================================================
-def check_authenticity(image_path):
+# (key, analyzer, estimated peak bytes per native pixel) — the estimate is what
+# the analyzer reserves from the memory budget while it runs. Full-resolution
+# float64 work dominates: ELA holds two float64 RGB copies + the error map,
+# sharpness the padded image + Laplacian + |Laplacian| temporaries.
+ANALYZERS = [
+    ("exif", analyze_exif, 0),
+    ("moire", detect_moire, 1),
+    ("compression", analyze_compression, 16),
+    ("lighting", analyze_lighting, 4),
+    ("dimensions", analyze_dimensions, 0),
+    ("sharpness", analyze_sharpness, 48),
+    ("ela", analyze_ela, 80),
+]
+
+
+def check_authenticity(image_path, workers=None, memory_mb=None):
     """
     Run all checks and produce an overall authenticity assessment.
 
+    The image is decoded once (AnalysisContext) and the analyzers run on
+    `workers` threads (default PHOTO_AUTH_WORKERS; 1 = sequential) within
+    `memory_mb` (default PHOTO_AUTH_MEMORY_MB).
+
     Returns dict with:
       - overall_score (0-100)
       - overall_verdict (string)
       - checks (dict of individual check results)
       - recommendation (string for Slab Guard)
+      - timings_ms (per analyzer, plus decode and total)
     """
-    results = {}
-
-    # Run all checks
-    exif_score, exif_details = analyze_exif(image_path)
-    results["exif"] = {"score": exif_score, "details": exif_details}
-
-    moire_score, moire_details = detect_moire(image_path)
-    results["moire"] = {"score": moire_score, "details": moire_details}
-
-    comp_score, comp_details = analyze_compression(image_path)
-    results["compression"] = {"score": comp_score, "details": comp_details}
-
-    light_score, light_details = analyze_lighting(image_path)
-    results["lighting"] = {"score": light_score, "details": light_details}
-
-    dim_score, dim_details = analyze_dimensions(image_path)
-    results["dimensions"] = {"score": dim_score, "details": dim_details}
-
-    sharp_score, sharp_details = analyze_sharpness(image_path)
-    results["sharpness"] = {"score": sharp_score, "details": sharp_details}
+    started = time.perf_counter()
+    ctx = AnalysisContext(image_path)
+    budget = _MemoryBudget((memory_mb or PHOTO_AUTH_MEMORY_MB) * 1024 * 1024)
+    try:
+        w, h = ctx.header.size
+        native_pixels = w * h
+    except Exception:
+        native_pixels = 0      # unreadable — every analyzer reports its own error
+    timings = {}
+
+    def run(key, analyzer, bytes_per_pixel):
+        held = budget.acquire(bytes_per_pixel * native_pixels)
+        try:
+            t = time.perf_counter()
+            score, details = analyzer(ctx)
+            timings[key] = round((time.perf_counter() - t) * 1000, 1)
+            return score, details
+        finally:
+            budget.release(held)
+
+    workers = PHOTO_AUTH_WORKERS if workers is None else workers
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Biggest first, so the long full-resolution analyzers overlap
+            # with everything else instead of starting last.
+            order = sorted(ANALYZERS, key=lambda a: -a[2])
+            futures = {key: pool.submit(run, key, fn, bpp) for key, fn, bpp in order}
+            outcomes = {key: f.result() for key, f in futures.items()}
+    else:
+        outcomes = {key: run(key, fn, bpp) for key, fn, bpp in ANALYZERS}
 
-    ela_score, ela_details = analyze_ela(image_path)
-    results["ela"] = {"score": ela_score, "details": ela_details}
+    # Same key order as always (JSON output is compared byte-for-byte).
+    results = {key: {"score": outcomes[key][0], "details": outcomes[key][1]}
+               for key, _, _ in ANALYZERS}
 
     # Weighted overall score
     # Dimensions (resolution + file size) is strongest differentiator from real testing
@@ -938,12 +1114,17 @@ def check_authenticity(image_path):
         verdict = "LIKELY FRAUDULENT — Strong indicators of screenshot, web-saved, or photo-of-screen"
         recommendation = "BLOCK — Do not allow registration without manual review and proof of possession"
 
+    timings = {key: timings.get(key) for key, _, _ in ANALYZERS}
+    timings["decode"] = round(ctx.decode_ms, 1)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+
     return {
         "image": os.path.basename(image_path),
         "overall_score": overall,
         "overall_verdict": verdict,
         "recommendation": recommendation,
         "checks": results,
+        "timings_ms": timings,
     }
 
 
@@ -0,0 +1,263 @@
+"""
+Vision result cache for /api/grade and /api/extract.
+
+Users retry a grade or an extraction with the SAME photos after a client-side
+timeout — the server usually finished the first attempt, and every retry was a
+second full Sonnet vision call. This module stores each successful result keyed
+by a SHA-256 of every NORMALIZED photo's bytes (post normalize_for_photo_type),
+plus the comic identity and the prompt version, and serves it back on a retry.
+
+- Exact hit: every photo's content digest identical → stored result,
+  cache_match='exact'. That is what a retry sends: the same bytes.
+- ⚠️ A perceptual hash alone is NOT a safe key (same reasoning as
+  signature_result_cache.py). The pHash preprocessing grays, blurs and shrinks
+  to 256², so two physical copies of the same issue — or a direct and a
+  newsstand copy, or two printings with the same cover art — land within a few
+  bits of each other, often 0. Serving on pHash gave the second copy the first
+  copy's grade (or UPC / variant / printing) labelled 'exact'.
+- Near hit (opt-in, /api/grade only): every photo within NEAR_DUP_MAX_DISTANCE
+  bits (of 64) → stored result, cache_match='near'. Off unless
+  VISION_CACHE_GRADE_NEAR=1, and only for a probe built with allow_near=True.
+  Extraction never serves a near hit — its result is exactly the detail a
+  near-identical cover gets wrong.
+- Scoped per user (a cached grade is never served to a different account),
+  expires after VISION_CACHE_TTL_HOURS, and is invalidated whenever
+  GRADING_PROMPT_VERSION / EXTRACTION_PROMPT_VERSION changes (part of the key).
+- Admin invalidation: invalidate() behind DELETE /api/admin/vision-cache.
+
+Stored in Postgres (migrations/add_vision_result_cache.sql,
+add_vision_result_cache_content_key.sql) so every gunicorn worker shares it —
+a retry rarely lands on the worker that served the original.
+
+The pHash is kept as a secondary column (the opt-in near scan reads it). It
+reuses routes/fingerprint_utils.preprocess_for_fingerprint (orient → gray →
+crop → 256² → autocontrast → blur) after a thumbnail to HASH_MAX_LONG_EDGE:
+that function's auto-crop walks pixels in Python, which is ~1s on a 2000px
+grading photo and negligible at 512px. The thumbnail is applied to every image
+hashed here, so keys stay comparable with each other — they are NOT comparable
+with Slab Guard fingerprints and must never be mixed with them.
+
+Nothing in here may fail a request: every DB or decode error degrades to a miss.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+from io import BytesIO
+
+import db as _dbpool
+
+VISION_CACHE_ENABLED = os.environ.get('VISION_CACHE_ENABLED', '1') == '1'
+VISION_CACHE_TTL_HOURS = int(os.environ.get('VISION_CACHE_TTL_HOURS', '24'))
+NEAR_DUP_MAX_DISTANCE = int(os.environ.get('VISION_CACHE_NEAR_DISTANCE', '4'))
+VISION_CACHE_GRADE_NEAR = os.environ.get('VISION_CACHE_GRADE_NEAR', '0') == '1'
+HASH_MAX_LONG_EDGE = 512
+
+# Per-worker tally behind the cache_hit_rate timing field.
+_stats_lock = threading.Lock()
+_stats = {'lookups': 0, 'hits': 0}
+
+
+def _count(hit):
+    with _stats_lock:
+        _stats['lookups'] += 1
+        if hit:
+            _stats['hits'] += 1
+
+
+def hit_rate():
+    """'hits/lookups' for this worker since boot, e.g. '3/41'."""
+    with _stats_lock:
+        return '%d/%d' % (_stats['hits'], _stats['lookups'])
+
+
+def image_phash(b64):
+    """64-bit pHash (hex) of one base64 photo, via the shared fingerprint
+    preprocessing. Raises on undecodable input — callers treat that as a miss."""
+    import imagehash
+    from PIL import Image
+    from routes.fingerprint_utils import preprocess_for_fingerprint
+
+    if ',' in b64[:100]:
+        b64 = b64.split(',', 1)[1]
+    with Image.open(BytesIO(base64.b64decode(b64))) as img:
+        img.draft('RGB', (HASH_MAX_LONG_EDGE, HASH_MAX_LONG_EDGE))
+        img = img.convert('RGB')
+        img.thumbnail((HASH_MAX_LONG_EDGE, HASH_MAX_LONG_EDGE))
+    return str(imagehash.phash(preprocess_for_fingerprint(img)))
+
+
+def content_digest(b64):
+    """SHA-256 hex of the decoded image bytes (data: prefix tolerated)."""
+    if ',' in b64[:100]:
+        b64 = b64.split(',', 1)[1]
+    return hashlib.sha256(base64.b64decode(b64)).hexdigest()
+
+
+def identity_key(**fields):
+    """Stable digest of the non-image inputs (title, issue, photo labels, runs…).
+    Lower-cased and stripped so 'Batman ' and 'batman' share an entry."""
+    norm = {k: (str(v).strip().lower() if v is not None else '') for k, v in fields.items()}
+    return hashlib.sha256(json.dumps(norm, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+class ResultCacheProbe:
+    """One request's view of the cache.
+
+    lookup() fingerprints the photos once and remembers them, so the store()
+    after a miss writes the same key without re-hashing. `outcome` is one of
+    off | hit | near | miss | error, for the timings line. allow_near opts the
+    probe into pHash near hits (grade only, and only with
+    VISION_CACHE_GRADE_NEAR=1 — see the module docstring).
+    """
+
+    def __init__(self, user_id, endpoint, identity, prompt_version, enabled=True,
+                 allow_near=False):
+        self.user_id = user_id
+        self.endpoint = endpoint
+        self.identity = identity
+        self.prompt_version = prompt_version
+        self.enabled = enabled and VISION_CACHE_ENABLED and user_id is not None
+        self.allow_near = allow_near and VISION_CACHE_GRADE_NEAR
+        self.digests = None
+        self.hashes = None
+        self.outcome = 'off'
+        self.distance = None
+
+    def lookup(self, images_b64):
+        """Return a copy of the stored result (flagged cached=True) or None."""
+        if not self.enabled:
+            return None
+        try:
+            self.digests = [content_digest(b) for b in images_b64]
+            self.hashes = [image_phash(b) for b in images_b64]
+        except Exception as e:
+            print(f"[VisionCache] fingerprint failed (treated as miss): {e}")
+            self.digests = self.hashes = None
+            self.outcome = 'error'
+            return None
+
+        conn = None
+        try:
+            conn = _dbpool.get_db(dict_rows=True)
+            cur = conn.cursor()
+            # Exact key: the content digests, index hit.
+            cur.execute("""
+                SELECT result FROM vision_result_cache
+                WHERE user_id = %s AND endpoint = %s AND identity_key = %s
+                  AND prompt_version = %s AND content_key = %s AND expires_at > NOW()
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (self.user_id, self.endpoint, self.identity, self.prompt_version,
+                  '|'.join(self.digests)))
+            row = cur.fetchone()
+            rows = []
+            if row is None and self.allow_near:
+                # Opt-in near-dup scan over this user's live entries for the
+                # same identity — a handful of rows.
+                cur.execute("""
+                    SELECT phashes, result FROM vision_result_cache
+                    WHERE user_id = %s AND endpoint = %s AND identity_key = %s
+                      AND prompt_version = %s AND expires_at > NOW()
+                    ORDER BY created_at DESC
+                    LIMIT 50
+                """, (self.user_id, self.endpoint, self.identity, self.prompt_version))
+                rows = cur.fetchall()
+            cur.close()
+        except Exception as e:
+            print(f"[VisionCache] lookup failed (treated as miss): {e}")
+            self.outcome = 'error'
+            _count(False)
+            return None
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+        best = (0, row['result']) if row is not None else None
+        for near in rows:
+            stored = near['phashes'] or []
+            if len(stored) != len(self.hashes):
+                continue
+            worst = max(_distance(a, b) for a, b in zip(stored, self.hashes))
+            if worst <= NEAR_DUP_MAX_DISTANCE and (best is None or worst < best[0]):
+                best = (worst, near['result'])
+
+        if best is None:
+            self.outcome = 'miss'
+            _count(False)
+            return None
+
+        exact = row is not None
+        self.distance = best[0]
+        self.outcome = 'hit' if exact else 'near'
+        _count(True)
+        result = dict(best[1])
+        result['cached'] = True
+        result['cache_match'] = 'exact' if exact else 'near'
+        result['cache_distance'] = best[0]
+        return result
+
+    def store(self, result):
+        """Persist a successful result under the keys from lookup(). Never raises."""
+        if not self.enabled or not self.digests:
+            return
+        conn = None
+        try:
+            conn = _dbpool.get_db()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO vision_result_cache
+                    (user_id, endpoint, identity_key, prompt_version,
+                     content_key, phash_key, phashes, result, expires_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s,
+                        NOW() + make_interval(hours => %s))
+            """, (self.user_id, self.endpoint, self.identity, self.prompt_version,
+                  '|'.join(self.digests), '|'.join(self.hashes), json.dumps(self.hashes),
+                  json.dumps(result, default=str), VISION_CACHE_TTL_HOURS))
+            # Opportunistic sweep of this user's expired rows keeps the table
+            # bounded without a scheduled job.
+            cur.execute("DELETE FROM vision_result_cache WHERE user_id = %s AND expires_at <= NOW()",
+                        (self.user_id,))
+            conn.commit()
+            cur.close()
+        except Exception as e:
+            print(f"[VisionCache] store failed (non-fatal): {e}")
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def invalidate(user_id=None, endpoint=None):
+    """Admin invalidation. No filters = drop everything. Returns rows deleted."""
+    clauses, params = [], []
+    if user_id is not None:
+        clauses.append("user_id = %s"); params.append(user_id)
+    if endpoint:
+        clauses.append("endpoint = %s"); params.append(endpoint)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    conn = _dbpool.get_db()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM vision_result_cache {where}", params)
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
+    finally:
+        conn.close()
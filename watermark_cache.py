@@ -0,0 +1,269 @@
+"""
+Rendered-watermark cache for /api/verify/watermark/<serial>.
+
+get_watermarked_image used to download the R2 original and re-render the
+serial/SLABWORTHY.COM overlay on EVERY hit — one verify link shared on social
+media became N full downloads + N decode/draw/encode passes. This module keeps
+the rendered JPEG per (registration, size tier) and serves it back.
+
+Size tiers (long edge, never upscaled; the overlay is drawn AFTER the resize
+so text stays proportional):
+
+    sm    480     link previews / thumbnails
+    md    1024
+    lg    2048    the verify page (PAGE_TIER)
+    full  original size — the old behaviour, still the default with no ?size=
+
+Key: sha256 of RENDER_VERSION | serial | cover URL | registry status | tier.
+The key doubles as the strong ETag and as the ?v= in the URLs lookup_serial
+hands out, so:
+- a changed cover photo or status is a different key → re-rendered, and
+  lookup_serial starts handing out the new ?v= immediately;
+- a request whose ?v= equals the current key can be cached for a year
+  (`immutable`); anything else gets a short max-age and revalidates with
+  If-None-Match → 304, which only costs the registry SELECT.
+⚠️ Bump RENDER_VERSION whenever watermark_image() output changes.
+
+Storage:
+- Local disk (WATERMARK_CACHE_DIR) — shared by the gunicorn workers on one
+  box, LRU-pruned to WATERMARK_CACHE_MAX_MB. Files are written tmp + rename,
+  so a reader never sees half a JPEG.
+- R2 (WATERMARK_R2_CACHE=1) under watermarks/<serial>/ — survives deploys
+  (Render's disk is ephemeral), so a fresh box doesn't re-render everything.
+- Concurrent misses for one key in a worker render once (per-key lock).
+
+invalidate(serial) drops every derivative of a registration. The key already
+makes stale files unreachable; invalidation frees the space and runs from
+report-stolen / mark-recovered / collection delete. Warm-up at registration:
+warm_async() renders PAGE_TIER on a daemon thread.
+
+Nothing in here may fail a request: cache read/write errors degrade to a
+plain render.
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+
+RENDER_VERSION = 'wm-1'
+
+TIERS = {'sm': 480, 'md': 1024, 'lg': 2048, 'full': None}
+DEFAULT_TIER = 'full'
+PAGE_TIER = 'lg'
+
+CACHE_DIR = os.environ.get('WATERMARK_CACHE_DIR', '/tmp/slabworthy-watermarks')
+CACHE_MAX_MB = int(os.environ.get('WATERMARK_CACHE_MAX_MB', '512'))
+R2_CACHE = os.environ.get('WATERMARK_R2_CACHE', '0') == '1'
+PRUNE_EVERY = 50            # writes between disk-size checks
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=300'
+
+_SAFE_SERIAL = re.compile(r'[^A-Za-z0-9-]')
+
+_locks_guard = threading.Lock()
+_locks = {}                 # key → [lock, waiters]
+_writes = 0
+
+
+def derivative_key(serial_number, cover_url, status, tier):
+    """Cache key / strong ETag / ?v= for one rendered derivative."""
+    raw = '|'.join([RENDER_VERSION, serial_number, cover_url or '', status or '', tier])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _serial_dir(serial_number):
+    return os.path.join(CACHE_DIR, _SAFE_SERIAL.sub('_', serial_number))
+
+
+def _path(serial_number, tier, key):
+    return os.path.join(_serial_dir(serial_number), f'{tier}-{key}.jpg')
+
+
+def _r2_path(serial_number, tier, key):
+    return f'watermarks/{_SAFE_SERIAL.sub("_", serial_number)}/{tier}-{key}.jpg'
+
+
+# ── Disk tier ───────────────────────────────────────────────────────────────
+
+def _disk_read(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path)          # LRU: mtime = last served
+        return data
+    except OSError:
+        return None
+
+
+def _disk_write(serial_number, tier, key, data):
+    global _writes
+    path = _path(serial_number, tier, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        # Older renders of this tier (previous photo/status) are unreachable now.
+        prefix = f'{tier}-'
+        for name in os.listdir(os.path.dirname(path)):
+            if name.startswith(prefix) and name != os.path.basename(path) and name.endswith('.jpg'):
+                try:
+                    os.remove(os.path.join(os.path.dirname(path), name))
+                except OSError:
+                    pass
+    except OSError as e:
+        print(f"[Watermark] disk cache write failed: {e}")
+        return
+    _writes += 1
+    if _writes % PRUNE_EVERY == 0:
+        prune()
+
+
+def prune(max_mb=None):
+    """Delete least-recently-served derivatives until the cache is under
+    90% of WATERMARK_CACHE_MAX_MB. Returns the number of files removed."""
+    limit = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    files = []
+    total = 0
+    for root, _dirs, names in os.walk(CACHE_DIR):
+        for name in names:
+            if not name.endswith('.jpg'):
+                continue
+            p = os.path.join(root, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+    if total <= limit:
+        return 0
+    removed = 0
+    for _mtime, size, p in sorted(files):
+        if total <= limit * 0.9:
+            break
+        try:
+            os.remove(p)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    print(f"[Watermark] pruned {removed} cached derivatives")
+    return removed
+
+
+# ── R2 tier ─────────────────────────────────────────────────────────────────
+
+def _r2_read(serial_number, tier, key):
+    if not R2_CACHE:
+        return None
+    try:
+        from r2_storage import get_r2_client, R2_BUCKET_NAME
+        client = get_r2_client()
+        if not client:
+            return None
+        obj = client.get_object(Bucket=R2_BUCKET_NAME, Key=_r2_path(serial_number, tier, key))
+        return obj['Body'].read()
+    except Exception:
+        return None     # NoSuchKey or R2 down — either way, render
+
+
+def _r2_write(serial_number, tier, key, data):
+    if not R2_CACHE:
+        return
+    try:
+        from r2_storage import get_r2_client, R2_BUCKET_NAME
+        client = get_r2_client()
+        if client:
+            client.put_object(Bucket=R2_BUCKET_NAME, Key=_r2_path(serial_number, tier, key),
+                              Body=data, ContentType='image/jpeg')
+    except Exception as e:
+        print(f"[Watermark] R2 cache write failed: {e}")
+
+
+# ── Public API ──────────────────────────────────────────────────────────────
+
+def _key_lock(key):
+    with _locks_guard:
+        entry = _locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+        return entry
+
+
+def _release_key_lock(key, entry):
+    with _locks_guard:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _locks.pop(key, None)
+
+
+def get_or_render(serial_number, cover_url, status, tier, render):
+    """
+    (jpeg bytes, key, source) for one derivative; source is 'disk', 'r2' or
+    'render'. `render(cover_url, serial_number, max_edge)` produces the JPEG
+    bytes on a miss and may raise — the caller's error handling applies.
+    """
+    key = derivative_key(serial_number, cover_url, status, tier)
+    path = _path(serial_number, tier, key)
+
+    data = _disk_read(path)
+    if data is not None:
+        return data, key, 'disk'
+
+    entry = _key_lock(key)
+    try:
+        with entry[0]:
+            data = _disk_read(path)             # rendered while we waited
+            if data is not None:
+                return data, key, 'disk'
+
+            data = _r2_read(serial_number, tier, key)
+            if data is not None:
+                _disk_write(serial_number, tier, key, data)
+                return data, key, 'r2'
+
+            t0 = time.monotonic()
+            data = render(cover_url, serial_number, TIERS[tier])
+            print(f"[Watermark] rendered {serial_number} {tier} in "
+                  f"{(time.monotonic() - t0) * 1000:.0f}ms ({len(data) // 1024}KB)")
+            _disk_write(serial_number, tier, key, data)
+            _r2_write(serial_number, tier, key, data)
+            return data, key, 'render'
+    finally:
+        _release_key_lock(key, entry)
+
+
+def invalidate(serial_number):
+    """Drop every cached derivative of one registration (disk + R2)."""
+    shutil.rmtree(_serial_dir(serial_number), ignore_errors=True)
+    if not R2_CACHE:
+        return
+    try:
+        from r2_storage import get_r2_client, R2_BUCKET_NAME
+        client = get_r2_client()
+        if not client:
+            return
+        prefix = _r2_path(serial_number, '', '').rsplit('/', 1)[0] + '/'
+        listing = client.list_objects_v2(Bucket=R2_BUCKET_NAME, Prefix=prefix)
+        objects = [{'Key': o['Key']} for o in listing.get('Contents', [])]
+        if objects:
+            client.delete_objects(Bucket=R2_BUCKET_NAME, Delete={'Objects': objects})
+    except Exception as e:
+        print(f"[Watermark] R2 invalidate failed for {serial_number}: {e}")
+
+
+def warm_async(serial_number, cover_url, status, render, tier=PAGE_TIER):
+    """Render one tier in the background (registration) so the first verify
+    page view is a cache hit. Failures only log."""
+    def _run():
+        try:
+            get_or_render(serial_number, cover_url, status, tier, render)
+        except Exception as e:
+            print(f"[Watermark] warm-up failed for {serial_number}: {e}")
+
+    if cover_url:
+        threading.Thread(target=_run, name=f'wm-warm-{serial_number}', daemon=True).start()
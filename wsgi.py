@@ -88,10 +88,12 @@ except ImportError as e:
     generate_whatnot_content = None
 
 try:
-    from marketplace_prep import generate_platform_content, get_all_platforms
+    from marketplace_prep import (generate_platform_content, generate_platforms_content,
+                                  get_all_platforms)
 except ImportError as e:
     print(f"marketplace_prep import error: {e}")
     generate_platform_content = None
+    generate_platforms_content = None
     get_all_platforms = None
 
 try:
@@ -167,6 +169,21 @@ def scan_barcode_from_base64(image_data):
             image_data = image_data.split(',')[1]
         
         image_bytes = base64.b64decode(image_data)
+    except Exception as e:
+        print(f"[Barcode] Scan error: {e}")
+        return None
+    return scan_barcode_from_bytes(image_bytes)
+
+
+def scan_barcode_from_bytes(image_bytes):
+    """
+    scan_barcode_from_base64 for raw image bytes (an R2 download) — no
+    base64 round trip. Same return value.
+    """
+    if not BARCODE_AVAILABLE:
+        return None
+    
+    try:
         image = Image.open(io.BytesIO(image_bytes))
         
         if image.mode != 'RGB':
@@ -256,7 +273,8 @@ from routes.billing import billing_bp, init_modules as billing_init_modules, che
 from routes.vision import vision_bp, init_modules as vision_init_modules
 from routes.contact import contact_bp
 from routes.waitlist import waitlist_bp
-from routes.signatures import signatures_bp, init_modules as signatures_init_modules
+from routes.signatures import (signatures_bp, init_modules as signatures_init_modules,
+                               warm_reference_cache as warm_signature_reference_cache)
 from routes.signature_orchestrator import signatures_v2_bp, init_modules as signatures_v2_init_modules
 from routes.whatnot import whatnot_bp, init_modules as whatnot_init_modules
 from routes.marketplace import marketplace_bp, init_modules as marketplace_init_modules
@@ -277,7 +295,8 @@ utils_init_globals(BARCODE_AVAILABLE, MODERATION_AVAILABLE)
 admin_init_modules(
     MODERATION_AVAILABLE, BARCODE_AVAILABLE, R2_AVAILABLE, scan_barcode_from_base64,
     get_moderation_incidents if MODERATION_AVAILABLE else None,
-    get_moderation_stats if MODERATION_AVAILABLE else None
+    get_moderation_stats if MODERATION_AVAILABLE else None,
+    scan_barcode_bytes_func=scan_barcode_from_bytes
 )
 grading_init_modules(
     get_valuation_with_ebay, extract_from_base64, moderate_image,
@@ -294,8 +313,13 @@ ebay_init_modules(
     get_auth_url, exchange_code_for_token, get_user_token, is_user_connected,
     create_listing, upload_image_to_ebay, generate_description
 )
+# ebay_tokens DDL once per worker at boot — get_user_token/save_user_token no
+# longer run it per call (ebay_oauth token cache). Lazy retry if this fails.
+if get_user_token:
+    from ebay_oauth import init_ebay_tokens_table
+    init_ebay_tokens_table()
 whatnot_init_modules(generate_whatnot_content)
-marketplace_init_modules(generate_platform_content, get_all_platforms)
+marketplace_init_modules(generate_platform_content, get_all_platforms, generate_platforms_content)
 registry_init_modules(imagehash, Image if 'Image' in dir() else None)
 monitor_init_modules(imagehash, Image if 'Image' in dir() else None)
 billing_init_modules()
@@ -312,6 +336,10 @@ verify_init_modules(
 )
 signatures_init_modules(ANTHROPIC_API_KEY, anthropic, ANTHROPIC_AVAILABLE)
 signatures_v2_init_modules(ANTHROPIC_API_KEY, anthropic, ANTHROPIC_AVAILABLE)
+# Reference-signature payloads (signature_reference_cache): warmed off the boot
+# path so the first /match or /v2/match doesn't pay for ~46 file reads + R2 GETs.
+if os.environ.get('SIG_REF_CACHE_WARM', '1') == '1':
+    warm_signature_reference_cache()
 
 # Register all blueprints
 app.register_blueprint(utils_bp)       # /, /health, /api/debug/*, /api/beta/validate
@@ -319,7 +347,7 @@ app.register_blueprint(auth_bp)        # /api/auth/*
 app.register_blueprint(admin_bp)       # /api/admin/*
 app.register_blueprint(grading_bp)     # /api/valuate, /api/extract, /api/cache/*, /api/messages
 app.register_blueprint(ebay_sales_bp)   # /api/ebay-sales/*
-app.register_blueprint(market_sales_bp) # /api/sales/record, /api/sales/count, /api/sales/recent
+app.register_blueprint(market_sales_bp) # /api/sales/record[/batch], /api/sales/count, /api/sales/recent
 app.register_blueprint(valuation_bp)    # /api/sales/valuation, /api/sales/fmv
 app.register_blueprint(images_bp)      # /api/images/*
 app.register_blueprint(barcodes_bp)    # /api/barcode-*
@@ -335,7 +363,7 @@ app.register_blueprint(waitlist_bp)    # /api/waitlist, /api/waitlist/verify, /a
 app.register_blueprint(signatures_bp)  # /api/signatures/match, /api/signatures/db-stats, /api/signatures/signed-sales
 app.register_blueprint(signatures_v2_bp)  # /api/signatures/v2/match, /api/signatures/v2/match/stats
 app.register_blueprint(whatnot_bp)     # /api/whatnot/generate-content (legacy)
-app.register_blueprint(marketplace_bp) # /api/marketplace/platforms, /api/marketplace/generate-content
+app.register_blueprint(marketplace_bp) # /api/marketplace/platforms, /api/marketplace/generate-content[/batch], /api/marketplace/content-cache
 app.register_blueprint(feedback_bp)    # /api/feedback/grading, /api/feedback/general, /api/admin/feedback
 app.register_blueprint(slabguard_bp)        # /api/slabguard/submit, /api/slabguard/check
 app.register_blueprint(admin_slabguard_bp)  # /api/admin/slabguard/*